@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Checkout Product Lookup Benchmark
+=================================
+
+Compares how checkout loads the products of a cart:
+
+* per-item - one find_one per cart item returning the full product document, what
+             get_product_by_id (Product.get) did in every checkout path before
+* batch    - find_checkout_products: one $in query projected to the checkout fields
+
+Seeds --products products (each with --legacy-keys embedded legacy cdKeys, as older
+products still carry) and times carts of each --cart-sizes size. Uses a scratch
+database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/checkout_product_lookup_benchmark.py --cart-sizes 1 3 10 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mongodb.products_collection import find_checkout_products
+
+
+async def seed(collection, product_count: int, legacy_keys: int):
+    now = datetime.utcnow()
+    docs = []
+    for i in range(product_count):
+        docs.append({
+            "_id": ObjectId(),
+            "name": {"en": f"Product {i}", "he": ""},
+            "description": {"en": "A product description " * 20, "he": ""},
+            "price": 10 + i % 90, "active": True, "created_at": now, "manages_cd_keys": True,
+            "slug": f"product-{i}", "category": "Software", "imageUrl": f"https://example.com/{i}.png",
+            "cdKeys": [{"key": f"KEY-{i}-{k:05d}-XXXX", "isUsed": k % 3 == 0, "addedAt": now} for k in range(legacy_keys)],
+        })
+    await collection.insert_many(docs)
+    return [doc["_id"] for doc in docs]
+
+
+async def per_item(collection, cart):
+    return {str(pid): await collection.find_one({"_id": pid}) for pid in cart}
+
+
+async def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--legacy-keys", type=int, default=200)
+    parser.add_argument("--cart-sizes", type=int, nargs="+", default=[1, 3, 10, 20])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    collection = client[args.database]["Product"]
+    rng = random.Random(42)
+    try:
+        product_ids = await seed(collection, args.products, args.legacy_keys)
+        print(f"seeded {args.products} products with {args.legacy_keys} legacy keys each")
+        print(f"{'cart':>5}{'per-item p50':>15}{'p95':>11}{'batch p50':>13}{'p95':>11}{'speedup':>10}")
+        for size in args.cart_sizes:
+            cart = rng.sample(product_ids, min(size, len(product_ids)))
+            old_p50, old_p95 = await timed(lambda: per_item(collection, cart), args.repeats)
+            new_p50, new_p95 = await timed(lambda: find_checkout_products(collection, cart), args.repeats)
+            print(f"{size:>5}{old_p50:>13.2f}ms{old_p95:>9.2f}ms{new_p50:>11.2f}ms{new_p95:>9.2f}ms"
+                  f"{old_p50 / new_p50 if new_p50 else 0:>9.1f}x")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Coupon Lookup Benchmark
+=======================
+
+Compares the coupon queries run on every /api/coupons/validate and order creation:
+
+* regex      - case-insensitive ``^code$`` regex on couponCode/coupon_code, what
+               CouponService used before (cannot use an index, scans every order)
+* normalized - exact match on the indexed ``codeNormalized`` field
+
+for the coupon usage count and the per-user usage count.
+
+Seeds --orders orders (default 1M) spread over --coupons coupon codes in mixed case.
+Uses a scratch database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/coupon_lookup_benchmark.py --orders 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.coupon.coupon import normalize_coupon_code
+
+STATUSES = ["completed", "completed", "completed", "pending", "processing", "cancelled", "failed"]
+ACTIVE_FILTER = {"$nin": ["cancelled", "failed"]}
+
+
+async def seed(db, order_count: int, coupon_count: int, user_count: int, batch_size: int = 10000):
+    codes = [f"Promo{i:04d}" for i in range(coupon_count)]
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    batch = []
+    for i in range(order_count):
+        email = f"user{rng.randrange(user_count)}@example.com"
+        # ~30% of orders carry a coupon, written in whatever case the customer typed
+        code = rng.choice(codes) if rng.random() < 0.3 else None
+        if code is not None and rng.random() < 0.5:
+            code = code.upper()
+        batch.append({
+            "email": email, "userEmail": email, "customerEmail": email,
+            "couponCode": code, "coupon_code": code, "codeNormalized": normalize_coupon_code(code),
+            "status": rng.choice(STATUSES), "total": 10.0, "createdAt": now,
+        })
+        if len(batch) >= batch_size:
+            await db.orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch, ordered=False)
+    # Same index as ensure_coupon_indexes creates on orders (coupons live in the shared admin db)
+    await db.orders.create_index([("codeNormalized", ASCENDING), ("status", ASCENDING)])
+    return codes
+
+
+def regex_usage_query(code: str, email: str = None):
+    query = {
+        "$or": [
+            {"couponCode": {"$regex": f"^{code}$", "$options": "i"}},
+            {"coupon_code": {"$regex": f"^{code}$", "$options": "i"}},
+        ],
+        "status": ACTIVE_FILTER,
+    }
+    if email:
+        query["email"] = email
+    return query
+
+
+def normalized_usage_query(code: str, email: str = None):
+    query = {"codeNormalized": normalize_coupon_code(code), "status": ACTIVE_FILTER}
+    if email:
+        query["email"] = email
+    return query
+
+
+async def measure(db, build_query, samples):
+    latencies = []
+    for code, email in samples:
+        started = time.perf_counter()
+        await db.orders.count_documents(build_query(code, email))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--coupons", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    db = client[args.database]
+
+    try:
+        started = time.perf_counter()
+        codes = await seed(db, args.orders, args.coupons, args.users)
+        print(f"seeded orders={args.orders} coupons={args.coupons} in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(7)
+        samples = [(rng.choice(codes).upper(), None) for _ in range(args.iterations)]
+        user_samples = [(code, f"user{rng.randrange(args.users)}@example.com") for code, _ in samples]
+
+        print(f"{'query':<24}{'regex p50':>12}{'index p50':>12}{'regex p95':>12}{'index p95':>12}")
+        for name, query_samples in (("coupon usage count", samples), ("per-user usage count", user_samples)):
+            old_p50, old_p95 = await measure(db, regex_usage_query, query_samples)
+            new_p50, new_p95 = await measure(db, normalized_usage_query, query_samples)
+            print(f"{name:<24}{old_p50:>10.2f}ms{new_p50:>10.2f}ms{old_p95:>10.2f}ms{new_p95:>10.2f}ms")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
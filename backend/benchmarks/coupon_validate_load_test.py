@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Coupon Validate Load Test
+=========================
+
+Fires concurrent POST /api/coupons/validate requests at a running backend and reports
+throughput and latency. Each request uses a different customer email, so the per-user
+usage count (CouponService.get_user_usage_count) runs on every call for coupons with a
+maxUsagePerUser limit.
+
+Create a coupon with a per-user limit first (e.g. via POST /api/debug/create-test-coupons,
+which creates TEST10) and run against a database holding a realistic number of orders.
+
+Usage:
+    python benchmarks/coupon_validate_load_test.py --url http://localhost:8000 --code TEST10 \\
+        --requests 2000 --concurrency 50
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def validate(url: str, code: str, amount: float, index: int, users: int):
+    payload = {"code": code, "amount": amount, "email": f"loadtest{index % users}@example.com"}
+    started = time.perf_counter()
+    response = _session().post(url, json=payload, timeout=30)
+    elapsed = time.perf_counter() - started
+    ok = response.status_code == 200 and "valid" in response.json()
+    return elapsed, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--code", default="TEST10")
+    parser.add_argument("--amount", type=float, default=100.0)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=1000, help="distinct customer emails to rotate through")
+    args = parser.parse_args()
+
+    endpoint = f"{args.url.rstrip('/')}/api/coupons/validate"
+    # Warm up connections and caches outside the measurement
+    validate(endpoint, args.code, args.amount, 0, args.users)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda i: validate(endpoint, args.code, args.amount, i, args.users), range(args.requests)
+        ))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"requests={args.requests} concurrency={args.concurrency} errors={errors}")
+    print(f"throughput={args.requests / wall:.1f} req/s")
+    print(f"p50={statistics.median(latencies) * 1000:.2f}ms "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms "
+          f"max={latencies[-1] * 1000:.2f}ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
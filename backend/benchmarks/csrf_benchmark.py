@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+CSRF Token Benchmark
+====================
+
+Compares the previous in-memory CSRF token store with the stateless HMAC tokens:
+
+* legacy     - tokens kept in a per-instance dict (reproduced below as LegacyCSRFProtection),
+               including the full expiry sweep the middleware ran on 1% of requests
+* stateless  - CSRFProtection: issued_at + nonce + HMAC-SHA256, nothing stored
+
+Reports µs per generate / validate (valid, forged, expired) with --issued tokens
+outstanding, the legacy sweep cost and store size, and whether a token issued by
+one instance validates on another (a second uvicorn worker or a restart).
+
+Usage:
+    SECRET_KEY=bench python benchmarks/csrf_benchmark.py --issued 100000 --calls 100000
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Dict
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SECRET_KEY", "csrf-benchmark-secret")
+
+from src.middleware.security_middleware import CSRFProtection
+
+
+class LegacyCSRFProtection:
+    """The previous implementation: issued tokens live in instance memory."""
+
+    def __init__(self):
+        self.tokens: Dict[str, float] = {}
+        self.token_lifetime = 3600
+
+    def generate_token(self) -> str:
+        token = secrets.token_urlsafe(32)
+        self.tokens[token] = time.time()
+        return token
+
+    def validate_token(self, token: str) -> bool:
+        if not token or token not in self.tokens:
+            return False
+        if time.time() - self.tokens[token] > self.token_lifetime:
+            del self.tokens[token]
+            return False
+        return True
+
+    def cleanup_expired_tokens(self):
+        current_time = time.time()
+        expired = [token for token, issued in self.tokens.items() if current_time - issued > self.token_lifetime]
+        for token in expired:
+            del self.tokens[token]
+
+
+def per_call_us(fn, calls: int) -> float:
+    return timeit.timeit(fn, number=calls) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issued", type=int, default=100_000, help="tokens outstanding before timing")
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    legacy = LegacyCSRFProtection()
+    tracemalloc.start()
+    for _ in range(args.issued):
+        legacy.generate_token()
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stateless = CSRFProtection()
+    legacy_token, stateless_token = legacy.generate_token(), stateless.generate_token()
+    forged = stateless_token[:-4] + "AAAA"
+    expired_payload = f"{int(time.time()) - stateless.token_lifetime - 1:x}.{secrets.token_urlsafe(16)}"
+    expired = f"{expired_payload}.{stateless._sign(expired_payload)}"
+
+    print(f"{'operation':<18}{'legacy us':>12}{'stateless us':>15}")
+    rows = [
+        ("generate", lambda: legacy.generate_token(), lambda: stateless.generate_token()),
+        ("validate", lambda: legacy.validate_token(legacy_token), lambda: stateless.validate_token(stateless_token)),
+        ("validate forged", lambda: legacy.validate_token(forged), lambda: stateless.validate_token(forged)),
+        ("validate expired", None, lambda: stateless.validate_token(expired)),
+    ]
+    for name, legacy_fn, stateless_fn in rows:
+        legacy_us = f"{per_call_us(legacy_fn, args.calls):>12.2f}" if legacy_fn else f"{'-':>12}"
+        print(f"{name:<18}{legacy_us}{per_call_us(stateless_fn, args.calls):>15.2f}")
+
+    started = time.perf_counter()
+    legacy.cleanup_expired_tokens()
+    sweep_ms = (time.perf_counter() - started) * 1000
+    print(f"\nlegacy store: {len(legacy.tokens)} tokens, {legacy_bytes / 1024 / 1024:.1f} MiB, "
+          f"expiry sweep {sweep_ms:.1f}ms (ran on 1% of requests)")
+    print("stateless store: 0 tokens")
+
+    other_worker_legacy, other_worker_stateless = LegacyCSRFProtection(), CSRFProtection()
+    print(f"\ntoken accepted by another instance: legacy={other_worker_legacy.validate_token(legacy_token)} "
+          f"stateless={other_worker_stateless.validate_token(stateless_token)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
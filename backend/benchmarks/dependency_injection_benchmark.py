@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Dependency Injection Overhead Benchmark
+=======================================
+
+Measures what resolving the controller dependencies costs per request:
+
+* direct  - calling each dependency function --calls times (timeit), comparing the
+            previous per-request construction (rebuilt here as legacy_* factories)
+            with the shared instances handed out by dependency_provider
+* request - a minimal FastAPI route depending on all four controllers, called --requests
+            times in-process over httpx's ASGI transport, legacy vs provider
+
+No database is needed: controllers and collections are only constructed, never queried.
+
+Usage:
+    python benchmarks/dependency_injection_benchmark.py --calls 200000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import timeit
+
+import httpx
+from fastapi import Depends, FastAPI
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.deps import deps
+from src.controller.key_controller import KeyController
+from src.controller.key_metrics_controller import KeyMetricsController
+from src.controller.product_controller import ProductsController
+from src.controller.user_controller import UserController
+
+
+def legacy_user_controller():
+    shop_product_collection = deps.get_product_collection_with_coupons_dependency()
+    return UserController(deps.get_keys_collection_dependency(), deps.get_user_collection_dependency(),
+                          shop_product_collection, shop_product_collection)
+
+
+def legacy_products_controller():
+    product_collection = deps.get_product_collection_dependency()
+    return ProductsController(product_collection, deps.get_keys_collection_dependency(),
+                              deps.get_user_collection_dependency(), product_collection)
+
+
+def legacy_keys_controller():
+    return KeyController(deps.get_product_collection_dependency(), deps.get_keys_collection_dependency(),
+                         deps.get_user_collection_dependency())
+
+
+def legacy_key_metrics_controller():
+    return KeyMetricsController(deps.get_product_collection_dependency(), deps.get_keys_collection_dependency())
+
+
+LEGACY = (legacy_user_controller, legacy_products_controller, legacy_keys_controller, legacy_key_metrics_controller)
+PROVIDER = (deps.get_user_controller_dependency, deps.get_products_controller_dependency,
+            deps.get_keys_controller_dependency, deps.get_key_metrics_controller_dependency)
+
+
+def build_app(factories) -> FastAPI:
+    app = FastAPI()
+    users, products, keys, metrics = factories
+
+    @app.get("/ping")
+    async def ping(a=Depends(users), b=Depends(products), c=Depends(keys), d=Depends(metrics)):
+        return {"ok": True}
+
+    return app
+
+
+async def time_requests(app: FastAPI, requests: int):
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(min(200, requests)):
+            await client.get("/ping")  # warm-up
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/ping")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    latencies.sort()
+    return statistics.median(latencies) * 1e6, latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'dependency':<32}{'legacy ns/call':>16}{'provider ns/call':>18}")
+    for legacy, provided in zip(LEGACY, PROVIDER):
+        legacy_ns = timeit.timeit(legacy, number=args.calls) / args.calls * 1e9
+        provided_ns = timeit.timeit(provided, number=args.calls) / args.calls * 1e9
+        print(f"{provided.__name__:<32}{legacy_ns:>16.0f}{provided_ns:>18.0f}")
+
+    print(f"\n{'route (4 controllers)':<24}{'p50':>12}{'p95':>12}")
+    for name, factories in (("legacy", LEGACY), ("provider", PROVIDER)):
+        p50, p95 = asyncio.run(time_requests(build_app(factories), args.requests))
+        print(f"{name:<24}{p50:>10.1f}us{p95:>10.1f}us")
+
+    same = all(fn() is fn() for fn in PROVIDER)
+    print(f"\nprovider returns shared instances: {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Email Outbox Benchmark
+======================
+
+Delivers --messages emails to a local aiosmtpd server and compares:
+
+* direct - one smtplib connection per message, opened by the caller, i.e. what
+           src/lib/email_service._send_email did before
+* outbox - enqueue_email in the caller, then EmailOutboxSender drains the outbox over
+           pooled SMTP sessions
+
+For each mode it reports the caller-side latency (p50/p95), the total time until every
+message reached the server, and how many SMTP connections the server saw. The outbox run
+also injects --fail-rate transient 451 rejections to exercise retries (with backoff set to 0).
+
+Requires aiosmtpd (pip install aiosmtpd). Uses a scratch database (default
+"monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/email_outbox_benchmark.py --messages 500
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import smtplib
+import statistics
+import sys
+import time
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", "0")
+
+from src.services.email_outbox import OUTBOX_COLLECTION, EmailOutboxSender, SmtpSettings
+
+
+class CountingHandler:
+    def __init__(self, fail_rate: float = 0.0):
+        self.fail_rate = fail_rate
+        self.delivered = 0
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        if random.random() < self.fail_rate:
+            return "451 Temporary failure, try again later"
+        self.delivered += 1
+        return "250 OK"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(int(len(ordered) * pct) - 1, 0)] * 1000
+
+
+def send_direct(host: str, port: int, to: str, index: int):
+    msg = MIMEText(f"Benchmark message {index}")
+    msg["From"] = "bench@monkeyz.co.il"
+    msg["To"] = to
+    msg["Subject"] = f"Benchmark {index}"
+    with smtplib.SMTP(host, port) as server:
+        server.sendmail(msg["From"], [to], msg.as_string())
+
+
+async def run_direct(host: str, port: int, count: int):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        await asyncio.to_thread(send_direct, host, port, f"user{i}@example.com", i)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - started
+
+
+async def run_outbox(sender: EmailOutboxSender, handler: CountingHandler, count: int):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        await sender.enqueue(f"user{i}@example.com", f"Benchmark {i}", f"Benchmark message {i}", kind="benchmark")
+        latencies.append(time.perf_counter() - t0)
+    while handler.delivered < count:
+        if await sender.drain_once() == 0:
+            await asyncio.sleep(0.05)
+    return latencies, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    os.environ.update({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(args.port), "SMTP_STARTTLS": "false",
+                       "SMTP_USER": "", "SMTP_PASS": ""})
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    rows = []
+    try:
+        handler = CountingHandler()
+        controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+        controller.start()
+        try:
+            latencies, elapsed = await run_direct("127.0.0.1", args.port, args.messages)
+        finally:
+            controller.stop()
+        rows.append(("direct", latencies, elapsed, len(handler.sessions), 0))
+
+        handler = CountingHandler(fail_rate=args.fail_rate)
+        controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+        controller.start()
+        sender = EmailOutboxSender(SmtpSettings(), collection=client[args.database][OUTBOX_COLLECTION])
+        try:
+            latencies, elapsed = await run_outbox(sender, handler, args.messages)
+            await sender.stop()
+        finally:
+            controller.stop()
+        rows.append(("outbox", latencies, elapsed, len(handler.sessions), sender.retried))
+
+        print(f"messages={args.messages} outbox batch={sender.batch_size} sessions={sender.connections}")
+        print(f"{'mode':<8}{'p50':>10}{'p95':>10}{'mean':>10}{'total':>10}{'conns':>8}{'retries':>9}")
+        for name, latencies, elapsed, connections, retries in rows:
+            print(f"{name:<8}{percentile(latencies, 0.5):>8.2f}ms{percentile(latencies, 0.95):>8.2f}ms"
+                  f"{statistics.mean(latencies) * 1000:>8.2f}ms{elapsed:>9.2f}s{connections:>8}{retries:>9}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
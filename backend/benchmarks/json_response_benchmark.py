@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+JSON Response Serialization Benchmark
+=====================================
+
+Measures CPU time per response for the large list endpoints at --sizes items each:
+
+* orders    - dumped Order models (datetimes, nested items and status history), the
+              GET /api/orders and /api/orders/user payload
+* products  - raw storefront documents (ObjectId, datetime, Decimal128 price)
+* coupons   - admin Coupon models (GET /admin/coupons)
+
+for three renderers:
+
+* legacy    - jsonable_encoder + JSONResponse, what FastAPI did for these routes
+* stdlib    - dumps_compact_bytes forced onto the stdlib json encoder (no orjson)
+* fast      - MongoJSONResponse (orjson when installed)
+
+The outputs are checked to decode to the same JSON before timing. No database is needed.
+
+Usage:
+    python benchmarks/json_response_benchmark.py --sizes 1000 10000 100000 --repeats 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.lib import mongo_json_encoder
+from src.lib.mongo_json_encoder import MongoJSONResponse, dumps_compact_bytes
+from src.models.order import Order
+from src.routers.admin_router import Coupon
+
+
+def make_orders(count: int):
+    start = datetime(2025, 1, 1)
+    orders = []
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        order = Order.model_validate({
+            "_id": str(ObjectId()), "customerName": f"Customer {i}", "email": f"user{i}@example.com",
+            "phone": "0500000000", "status": "completed", "total": 19.9, "couponCode": None,
+            "items": [{"productId": str(ObjectId()), "name": "Product", "quantity": 1, "price": 9.95,
+                       "assigned_keys": [f"KEY-{i}-{k}-XXXX-XXXX"]} for k in range(2)],
+            "statusHistory": [{"status": "pending", "date": created}, {"status": "completed", "date": created}],
+            "date": created, "createdAt": created, "updatedAt": created,
+        })
+        orders.append(order.model_dump(by_alias=True))
+    return {"orders": orders, "next_cursor": None, "limit": count}
+
+
+def make_products(count: int):
+    now = datetime(2025, 1, 1)
+    return [{
+        "_id": ObjectId(), "name": {"en": f"Product {i}", "he": f"מוצר {i}"},
+        "description": {"en": "Lifetime license", "he": "רישיון לכל החיים"},
+        "price": Decimal128(Decimal("19.90")), "active": True, "category": "Software",
+        "imageUrl": f"https://cdn.example.com/{i}.png", "availableKeys": i % 50,
+        "createdAt": now, "updatedAt": now,
+    } for i in range(count)]
+
+
+def make_coupons(count: int):
+    now = datetime(2025, 1, 1)
+    return [Coupon.model_validate({
+        "id": str(ObjectId()), "code": f"promo{i}", "discountType": "percentage", "discountValue": 10.0,
+        "discountPercent": 10.0, "usageCount": i % 20, "createdAt": now, "expiresAt": now + timedelta(days=30),
+        "usageAnalytics": {"total": i % 20, "completed": i % 15, "cancelled": 0},
+        "userUsages": {f"user{k}@example.com": 1 for k in range(i % 5)},
+    }) for i in range(count)]
+
+
+def render_legacy(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def render_stdlib(content) -> bytes:
+    orjson, mongo_json_encoder.orjson = mongo_json_encoder.orjson, None
+    try:
+        return dumps_compact_bytes(content)
+    finally:
+        mongo_json_encoder.orjson = orjson
+
+
+def render_fast(content) -> bytes:
+    return MongoJSONResponse(content).body
+
+
+RENDERERS = (("legacy", render_legacy), ("stdlib", render_stdlib), ("fast", render_fast))
+
+
+def cpu_ms(render, content, repeats: int):
+    samples = []
+    body = b""
+    for _ in range(repeats):
+        started = time.process_time()
+        body = render(content)
+        samples.append(time.process_time() - started)
+    return statistics.median(samples) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"orjson installed: {mongo_json_encoder.orjson is not None}")
+    print(f"{'payload':<10}{'items':>8}" + "".join(f"{name + ' ms':>14}" for name, _ in RENDERERS) + f"{'KiB':>10}")
+    for name, factory in (("orders", make_orders), ("products", make_products), ("coupons", make_coupons)):
+        for size in args.sizes:
+            content = factory(size)
+            expected = json.loads(render_stdlib(content))
+            assert json.loads(render_fast(content)) == expected, f"{name}: fast output differs"
+            row = f"{name:<10}{size:>8}"
+            for renderer_name, render in RENDERERS:
+                # /product/* already pre-serialized with the stdlib encoder, the stdlib column is its baseline
+                if renderer_name == "legacy" and name == "products":
+                    row += f"{'-':>14}"
+                    continue
+                if renderer_name == "legacy" and name == "orders":
+                    assert json.loads(render(content)) == expected, "orders: legacy output differs"
+                ms, size_bytes = cpu_ms(render, content, args.repeats)
+                row += f"{ms:>14.2f}"
+            print(f"{row}{size_bytes / 1024:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
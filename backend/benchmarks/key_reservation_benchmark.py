@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+CD Key Reservation Benchmark
+============================
+
+Runs N parallel buyers against a single product and compares:
+
+* legacy    - load product, pick unused keys in Python, write the whole cdKeys array back
+* embedded  - atomic findOneAndUpdate pipeline on cdKeys (path for unmigrated products)
+* keys      - KeyReservationService.claim_keys on the indexed keys collection
+
+For each strategy it reports throughput, latency and the number of keys that were
+handed out to more than one order. Both atomic strategies must report 0 double assignments.
+
+Uses a scratch database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/key_reservation_benchmark.py --buyers 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from beanie import init_beanie
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.key.key import Key, KeyStatus
+from src.models.products.products import Product
+from src.services.key_reservation_service import KeyReservationService
+
+
+async def seed_product(key_count: int, embedded: bool) -> ObjectId:
+    product_id = ObjectId()
+    now = datetime.now(timezone.utc)
+    await Product.get_motor_collection().insert_one({
+        "_id": product_id,
+        "name": {"en": "Benchmark product", "he": "Benchmark product"},
+        "description": {"en": "", "he": ""},
+        "price": 10,
+        "active": True,
+        "created_at": now,
+        "manages_cd_keys": True,
+        "cdKeys": [
+            {"key": f"BENCH-{i:06d}", "isUsed": False, "usedAt": None, "orderId": None, "addedAt": now}
+            for i in range(key_count)
+        ] if embedded else [],
+    })
+    if not embedded:
+        await Key.get_motor_collection().insert_many([
+            {"key_string": f"BENCH-{i:06d}", "product_id": product_id, "status": KeyStatus.AVAILABLE.value,
+             "added_date": now, "used_date": None, "order_id": None}
+            for i in range(key_count)
+        ])
+    return product_id
+
+
+async def stored_owners(product_id, embedded: bool) -> dict:
+    """key string -> order id, for every key the database has marked as used"""
+    if embedded:
+        stored = await Product.get_motor_collection().find_one({"_id": product_id}, {"cdKeys": 1})
+        return {k["key"]: k.get("orderId") for k in stored["cdKeys"] if k.get("isUsed")}
+    cursor = Key.get_motor_collection().find({"product_id": product_id, "status": KeyStatus.USED.value})
+    return {k["key_string"]: k.get("order_id") async for k in cursor}
+
+
+async def legacy_claim(product_id, order_id, quantity):
+    """The read-modify-write flow the order routes used before the reservation engine."""
+    collection = Product.get_motor_collection()
+    product = await collection.find_one({"_id": product_id})
+    claimed = []
+    for key_obj in product["cdKeys"]:
+        if len(claimed) >= quantity:
+            break
+        if not key_obj["isUsed"]:
+            key_obj["isUsed"] = True
+            key_obj["usedAt"] = datetime.now(timezone.utc)
+            key_obj["orderId"] = order_id
+            claimed.append(key_obj["key"])
+    if claimed:
+        await collection.update_one({"_id": product_id}, {"$set": {"cdKeys": product["cdKeys"]}})
+    return claimed
+
+
+async def run_strategy(name, claim, embedded: bool, buyers: int, quantity: int, key_count: int):
+    await Product.get_motor_collection().delete_many({})
+    await Key.get_motor_collection().delete_many({})
+    product_id = await seed_product(key_count, embedded)
+    latencies = []
+
+    async def buyer():
+        order_id = str(ObjectId())
+        started = time.perf_counter()
+        keys = await claim(product_id, order_id, quantity)
+        latencies.append(time.perf_counter() - started)
+        return order_id, keys
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(buyer() for _ in range(buyers)))
+    elapsed = time.perf_counter() - started
+
+    handed_out = Counter(key for _, keys in results for key in keys)
+    double_assigned = sum(1 for count in handed_out.values() if count > 1)
+
+    # What the database thinks: every key returned to a buyer must be stored as used by that buyer
+    owner_by_key = await stored_owners(product_id, embedded)
+    lost_updates = sum(1 for order_id, keys in results for key in keys if owner_by_key.get(key) != order_id)
+
+    latencies.sort()
+    print(f"\n[{name}]")
+    print(f"  buyers={buyers} quantity={quantity} keys={key_count}")
+    print(f"  elapsed={elapsed:.3f}s throughput={buyers / elapsed:.1f} orders/s")
+    print(f"  latency p50={statistics.median(latencies) * 1000:.2f}ms "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms max={latencies[-1] * 1000:.2f}ms")
+    print(f"  keys handed out={sum(handed_out.values())} stored as used={len(owner_by_key)}")
+    print(f"  double assignments={double_assigned} lost updates={lost_updates}")
+    return double_assigned, lost_updates
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=100)
+    parser.add_argument("--quantity", type=int, default=1, help="keys per order")
+    parser.add_argument("--keys", type=int, default=5000, help="keys seeded on the product")
+    parser.add_argument("--database", default="monkeyz_bench")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    await init_beanie(database=client[args.database], document_models=[Product, Key])
+    engine = KeyReservationService()
+
+    failures = 0
+    try:
+        if not args.skip_legacy:
+            await run_strategy("legacy read-modify-write", legacy_claim, True, args.buyers, args.quantity, args.keys)
+        for name, claim, embedded in (
+            ("atomic embedded cdKeys pipeline", engine._claim_embedded_keys, True),
+            ("atomic keys collection", engine.claim_keys, False),
+        ):
+            double_assigned, lost_updates = await run_strategy(name, claim, embedded, args.buyers, args.quantity, args.keys)
+            failures += double_assigned + lost_updates
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+    return 0 if failures == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Logging Overhead Benchmark
+==========================
+
+Measures the logging time spent on the request path for a simulated coupon checkout
+request: --site-calls INFO records from one repeated call site (the per-order /
+per-key chatter) plus --unique-calls distinct INFO records and one WARNING.
+
+* sync      - StructuredFormatter + RotatingFileHandlers on the root logger, what
+              setup_logging attached before (formatting and disk I/O on the caller)
+* queue     - setup_logging with its defaults (sampling off): the caller only
+              enqueues, the listener thread formats and writes
+* sampled   - setup_logging with per-call-site sampling enabled (LOG_SAMPLE_BURST=50)
+* debug     - the same calls demoted to lazy DEBUG records (filtered out at INFO)
+
+Reports caller-side µs per request (p50/p95), the time the listener needed to drain
+the queue afterwards, and the records written. Logs go to a temporary directory.
+
+Usage:
+    python benchmarks/logging_benchmark.py --requests 5000 --site-calls 30 --unique-calls 5
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.lib import logging_config
+from src.lib.logging_config import StructuredFormatter, setup_logging, shutdown_logging
+
+logger = logging.getLogger("src.services.coupon_service")
+
+
+def simulated_request(request_no: int, site_calls: int, unique_calls: int, level: int) -> None:
+    for key_no in range(site_calls):
+        logger.log(level, "Order %s: assigned key %s for product %s", request_no, key_no, "prod-1")
+    for step in range(unique_calls):
+        logger.log(level, "Coupon check step %s for order %s: usage=%s/%s", step, request_no, step, 10)
+    logger.warning("Coupon %s close to its usage limit", f"promo{request_no % 50}")
+
+
+def setup_sync(log_dir: Path) -> None:
+    """The previous setup_logging: synchronous rotating file handlers on the root logger."""
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for name, level in (("monkeyz.log", logging.INFO), ("monkeyz_errors.log", logging.ERROR)):
+        handler = logging.handlers.RotatingFileHandler(log_dir / name, maxBytes=50 * 1024 * 1024, backupCount=10)
+        handler.setFormatter(StructuredFormatter())
+        handler.setLevel(level)
+        root.addHandler(handler)
+
+
+def teardown(log_dir: Path) -> int:
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        handler.close()
+        root.removeHandler(handler)
+    log_file = log_dir / "monkeyz.log"
+    written = sum(1 for _ in open(log_file)) if log_file.exists() else 0
+    for path in log_dir.iterdir():
+        path.unlink()
+    return written
+
+
+def run_case(name: str, args, log_dir: Path):
+    level = logging.DEBUG if name == "debug" else logging.INFO
+    if name == "sync":
+        setup_sync(log_dir)
+    else:
+        os.environ["LOG_SAMPLE_BURST"] = "0" if name == "queue" else "50"
+        setup_logging()
+
+    samples = []
+    for request_no in range(args.requests):
+        started = time.perf_counter()
+        simulated_request(request_no, args.site_calls, args.unique_calls, level)
+        samples.append(time.perf_counter() - started)
+
+    drain_started = time.perf_counter()
+    stats = logging_config.logging_stats()
+    written = teardown(log_dir)
+    drain_ms = (time.perf_counter() - drain_started) * 1000
+
+    samples.sort()
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    return statistics.median(samples) * 1e6, p95 * 1e6, drain_ms, written, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--site-calls", type=int, default=30)
+    parser.add_argument("--unique-calls", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["ENVIRONMENT"] = "production"  # no console handler
+    os.environ["LOG_QUEUE_SIZE"] = str(max(10000, args.requests * (args.site_calls + args.unique_calls + 2)))
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        log_dir = Path(tmp) / "logs"
+        log_dir.mkdir()
+        try:
+            print(f"{'case':<10}{'p50':>12}{'p95':>12}{'drain':>12}{'written':>10}{'sampled out':>13}{'dropped':>9}")
+            for name in ("sync", "queue", "sampled", "debug"):
+                p50, p95, drain_ms, written, stats = run_case(name, args, log_dir)
+                print(f"{name:<10}{p50:>10.1f}us{p95:>10.1f}us{drain_ms:>10.1f}ms{written:>10}"
+                      f"{stats['sampled_out']:>13}{stats['dropped']:>9}")
+        finally:
+            os.chdir(previous_cwd)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
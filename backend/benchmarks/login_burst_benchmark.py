@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Login Burst Benchmark
+=====================
+
+Measures storefront latency while a burst of logins is being verified on the same worker:
+
+* inline - Hase.verify called directly in the coroutine, i.e. what UserCollection.login
+           did before (bcrypt blocks the event loop)
+* pool   - Hase.verify_async on the bounded hashing pool
+
+A probe reads the storefront catalog (ProductsCollection.get_storefront_products) every
+--interval ms during the burst and reports its p50/p99; the storefront read runs with the
+catalog cache disabled so every probe hits MongoDB. Pool metrics are printed afterwards.
+
+Uses a scratch database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/login_burst_benchmark.py --logins 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("CATALOG_CACHE_TTL_SECONDS", "0")
+
+from src.lib.haseing import Hase, hashing_pool
+from src.models.key.key import Key
+from src.models.products.products import Product
+from src.mongodb.products_collection import ProductsCollection
+
+
+async def seed(product_count: int):
+    now = datetime.now(timezone.utc)
+    await Product.get_motor_collection().insert_many([
+        {"name": {"en": f"Product {p}", "he": ""}, "description": {"en": "Benchmark product", "he": ""},
+         "price": 10 + p, "active": True, "createdAt": now, "created_at": now, "slug": f"product-{p}",
+         "manages_cd_keys": False, "cdKeys": []}
+        for p in range(product_count)
+    ])
+
+
+async def inline_verify(password, hashed):
+    return Hase.verify(password, hashed)
+
+
+async def run_burst(verify, hashed: str, logins: int, interval: float, collection: ProductsCollection):
+    latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await collection.get_storefront_products({"active": True}, as_bytes=True)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(interval)
+
+    async def burst():
+        try:
+            results = await asyncio.gather(*[verify("correct horse", hashed) for _ in range(logins)],
+                                           return_exceptions=True)
+            return sum(1 for r in results if isinstance(r, Exception))
+        finally:
+            done.set()
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    failures = await burst()
+    elapsed = time.perf_counter() - started
+    await probe_task
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] if latencies else 0.0
+    return len(latencies), statistics.median(latencies) * 1000 if latencies else 0.0, p99 * 1000, elapsed, failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=10, help="ms between storefront probes")
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    await init_beanie(database=client[args.database], document_models=[Product, Key])
+    collection = ProductsCollection()
+    hashed = Hase.bcrypt("correct horse")
+
+    try:
+        await seed(args.products)
+        print(f"logins={args.logins} hashing workers={hashing_pool.workers} max_pending={hashing_pool.max_pending}")
+        print(f"{'mode':<8}{'probes':>8}{'p50':>10}{'p99':>10}{'burst':>10}{'rejected':>10}")
+        for name, verify in (("inline", inline_verify), ("pool", Hase.verify_async)):
+            probes, p50, p99, elapsed, failures = await run_burst(
+                verify, hashed, args.logins, args.interval / 1000, collection
+            )
+            print(f"{name:<8}{probes:>8}{p50:>8.2f}ms{p99:>8.2f}ms{elapsed:>9.2f}s{failures:>10}")
+        print(f"pool stats: {hashing_pool.stats()}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Order Listing Benchmark
+=======================
+
+Compares the admin order listing before and after keyset pagination:
+
+* full      - ``find().to_list(None)`` over every order, what GET /api/orders did before
+* page1     - first page (newest first) of find_orders_page
+* deep      - a page reached by following --walk next cursors (cost should not grow)
+* status    - first page filtered on one status
+* coupon    - first page filtered on one coupon code
+* email     - first page filtered on one customer email
+* range     - first page of a one-week createdAt window
+* summary   - first page with ORDER_SUMMARY_PROJECTION (list view)
+
+Seeds --orders orders (default 500k, a mix of ObjectId and PayPal-style string ids,
+each with two items, keys and status history) and creates the listing indexes.
+Uses a scratch database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/order_listing_benchmark.py --orders 500000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.coupon.coupon import normalize_coupon_code
+from src.mongodb.orders_collection import (
+    ORDER_SUMMARY_PROJECTION, build_order_filter, ensure_order_list_indexes, find_orders_page,
+)
+
+STATUSES = ["completed", "completed", "completed", "pending", "awaiting_stock", "cancelled"]
+
+
+async def seed(db, order_count: int, user_count: int, batch_size: int = 10000):
+    rng = random.Random(42)
+    start = datetime.now(timezone.utc) - timedelta(days=730)
+    batch = []
+    for i in range(order_count):
+        email = f"user{rng.randrange(user_count)}@example.com"
+        code = f"promo{rng.randrange(50)}" if rng.random() < 0.3 else None
+        created = start + timedelta(seconds=rng.randrange(730 * 86400))
+        status = rng.choice(STATUSES)
+        batch.append({
+            "_id": ObjectId() if rng.random() < 0.7 else f"PAYPAL{i:012d}",
+            "customerName": f"Customer {i}", "email": email, "phone": "0500000000",
+            "status": status, "total": 19.9, "originalTotal": 19.9, "discountAmount": 0.0,
+            "couponCode": code, "codeNormalized": normalize_coupon_code(code),
+            "items": [
+                {"productId": str(ObjectId()), "name": "Product", "quantity": 1, "price": 9.95,
+                 "assigned_keys": [f"KEY-{i}-{k}-XXXX-XXXX" for k in range(2)]}
+                for _ in range(2)
+            ],
+            "statusHistory": [{"status": "pending", "date": created}, {"status": status, "date": created}],
+            "createdAt": created, "updatedAt": created,
+        })
+        if len(batch) >= batch_size:
+            await db.orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch, ordered=False)
+
+
+async def timed(fn, repeats: int):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = await fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    return statistics.median(samples) * 1000, p95 * 1000, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--walk", type=int, default=200, help="pages followed before timing the deep page")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--full-repeats", type=int, default=3)
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    db = client[args.database]
+    try:
+        started = time.perf_counter()
+        await seed(db, args.orders, args.users)
+        await ensure_order_list_indexes(db)
+        print(f"seeded {args.orders} orders in {time.perf_counter() - started:.1f}s")
+
+        cursor = None
+        for _ in range(args.walk):
+            _, cursor = await find_orders_page(db.orders, {}, args.limit, cursor)
+            if cursor is None:
+                break
+        deep_cursor = cursor
+        week_start = datetime.now(timezone.utc) - timedelta(days=30)
+
+        cases = [
+            ("full", lambda: db.orders.find().to_list(length=None), args.full_repeats),
+            ("page1", lambda: find_orders_page(db.orders, {}, args.limit), args.repeats),
+            ("deep", lambda: find_orders_page(db.orders, {}, args.limit, deep_cursor), args.repeats),
+            ("status", lambda: find_orders_page(db.orders, build_order_filter(status=["awaiting_stock"]), args.limit), args.repeats),
+            ("coupon", lambda: find_orders_page(db.orders, build_order_filter(coupon_code="PROMO7"), args.limit), args.repeats),
+            ("email", lambda: find_orders_page(db.orders, build_order_filter(email="user42@example.com"), args.limit), args.repeats),
+            ("range", lambda: find_orders_page(db.orders, build_order_filter(
+                created_from=week_start, created_to=week_start + timedelta(days=7)), args.limit), args.repeats),
+            ("summary", lambda: find_orders_page(db.orders, {}, args.limit, None, ORDER_SUMMARY_PROJECTION), args.repeats),
+        ]
+        print(f"{'query':<10}{'p50':>12}{'p95':>12}{'docs':>10}")
+        for name, fn, repeats in cases:
+            p50, p95, result = await timed(fn, repeats)
+            docs = result if isinstance(result, list) else result[0]
+            print(f"{name:<10}{p50:>10.2f}ms{p95:>10.2f}ms{len(docs):>10}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
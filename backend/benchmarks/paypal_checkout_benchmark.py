@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+PayPal Checkout Benchmark
+=========================
+
+Runs --checkouts create+capture pairs, --concurrency at a time, against the local PayPal
+stand-in (benchmarks/paypal_standin.py, started in-process) and compares:
+
+* blocking - the previous call pattern: order creation executes synchronously on the
+             event loop, every capture builds a fresh ThreadPoolExecutor, each call opens
+             a new HTTP connection (token cached, as the SDK does)
+* gateway  - PayPalGateway: pooled async client, cached token, bounded concurrency
+
+Reports checkouts/s, p50/p95 checkout latency and how long a 10 ms ticker on the same
+loop was held up (loop lag), then the gateway's own metrics.
+
+Usage:
+    python benchmarks/paypal_checkout_benchmark.py --checkouts 500 --concurrency 50 --latency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from paypal_standin import create_app
+from src.services.paypal_gateway import PayPalGateway
+
+ORDER_BODY = {
+    "intent": "CAPTURE",
+    "purchase_units": [{"amount": {"currency_code": "USD", "value": "19.90"}, "description": "Benchmark"}],
+}
+
+
+class BlockingClient:
+    """The old request pattern, without the SDK itself."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.token = None
+
+    def _execute(self, method: str, path: str, json=None):
+        if self.token is None:
+            response = requests.post(f"{self.base_url}/v1/oauth2/token", data={"grant_type": "client_credentials"},
+                                     auth=("bench", "bench"), timeout=30)
+            self.token = response.json()["access_token"]
+        response = requests.request(method, f"{self.base_url}{path}", json=json, timeout=30,
+                                    headers={"Authorization": f"Bearer {self.token}"})
+        response.raise_for_status()
+        return response.json()
+
+    async def create_order(self, body):
+        return self._execute("POST", "/v2/checkout/orders", body)
+
+    async def capture_order(self, order_id):
+        loop = asyncio.get_event_loop()
+        with ThreadPoolExecutor() as pool:
+            return await loop.run_in_executor(pool, self._execute, "POST", f"/v2/checkout/orders/{order_id}/capture", {})
+
+
+async def run_checkouts(client, checkouts: int, concurrency: int):
+    latencies, lags = [], []
+    slots = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - started - 0.01)
+
+    async def checkout():
+        async with slots:
+            started = time.perf_counter()
+            order = await client.create_order(ORDER_BODY)
+            capture = await client.capture_order(order["id"])
+            assert capture["status"] == "COMPLETED"
+            latencies.append(time.perf_counter() - started)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*[checkout() for _ in range(checkouts)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+    latencies.sort()
+    return {
+        "throughput": checkouts / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000,
+        "max_lag": max(lags) * 1000 if lags else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=50, help="stand-in latency per call, ms")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--max-concurrency", type=int, default=20, help="gateway PAYPAL_MAX_CONCURRENCY")
+    args = parser.parse_args()
+
+    app = create_app(args.latency)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    gateway = PayPalGateway("bench", "bench", base_url, max_concurrency=args.max_concurrency)
+    try:
+        print(f"checkouts={args.checkouts} concurrency={args.concurrency} stand-in latency={args.latency}ms")
+        print(f"{'mode':<10}{'checkouts/s':>13}{'p50':>11}{'p95':>11}{'loop lag':>12}")
+        for name, client in (("blocking", BlockingClient(base_url)), ("gateway", gateway)):
+            result = await run_checkouts(client, args.checkouts, args.concurrency)
+            print(f"{name:<10}{result['throughput']:>13.1f}{result['p50']:>9.1f}ms{result['p95']:>9.1f}ms"
+                  f"{result['max_lag']:>10.1f}ms")
+        print(f"gateway stats: {gateway.stats()}")
+        print(f"stand-in calls: {app.state.calls}")
+    finally:
+        await gateway.close()
+        server.should_exit = True
+        thread.join(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+PayPal Stand-in Server
+======================
+
+A minimal local imitation of the PayPal REST endpoints used by checkout:
+
+* POST /v1/oauth2/token                     - client-credentials token (--token-ttl seconds)
+* POST /v2/checkout/orders                  - creates an order with status CREATED
+* POST /v2/checkout/orders/{id}/capture     - captures it (status COMPLETED, amount echoed back)
+
+Each call waits --latency ms to mimic the network round trip. Requests without a valid
+bearer token get 401, capturing twice gets 422 ORDER_ALREADY_CAPTURED, like PayPal.
+
+Point the backend at it for offline checkout testing:
+
+    python benchmarks/paypal_standin.py --port 8099
+    PAYPAL_API_BASE_URL=http://127.0.0.1:8099 uvicorn main:app
+
+benchmarks/paypal_checkout_benchmark.py starts it in-process.
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+
+import uvicorn
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 50, token_ttl: int = 32400) -> FastAPI:
+    app = FastAPI(title="PayPal stand-in")
+    app.state.tokens = {}
+    app.state.orders = {}
+    app.state.calls = {"token": 0, "create": 0, "capture": 0}
+
+    def authorized(authorization: str) -> bool:
+        token = (authorization or "").removeprefix("Bearer ")
+        return app.state.tokens.get(token, 0) > time.time()
+
+    def unauthorized():
+        return JSONResponse(status_code=401, content={"error": "invalid_token", "error_description": "Token expired"})
+
+    @app.post("/v1/oauth2/token")
+    async def token():
+        await asyncio.sleep(latency_ms / 1000)
+        app.state.calls["token"] += 1
+        access_token = secrets.token_hex(16)
+        app.state.tokens[access_token] = time.time() + token_ttl
+        return {"access_token": access_token, "token_type": "Bearer", "expires_in": token_ttl}
+
+    @app.post("/v2/checkout/orders")
+    async def create_order(request: Request, authorization: str = Header(None)):
+        await asyncio.sleep(latency_ms / 1000)
+        if not authorized(authorization):
+            return unauthorized()
+        app.state.calls["create"] += 1
+        body = await request.json()
+        order_id = secrets.token_hex(8).upper()
+        app.state.orders[order_id] = {"status": "CREATED", "purchase_units": body.get("purchase_units", [])}
+        return JSONResponse(status_code=201, content={"id": order_id, "status": "CREATED", "intent": body.get("intent")})
+
+    @app.post("/v2/checkout/orders/{order_id}/capture")
+    async def capture_order(order_id: str, authorization: str = Header(None)):
+        await asyncio.sleep(latency_ms / 1000)
+        if not authorized(authorization):
+            return unauthorized()
+        order = app.state.orders.get(order_id)
+        if order is None:
+            return JSONResponse(status_code=404, content={"name": "RESOURCE_NOT_FOUND", "message": "Order not found"})
+        if order["status"] == "COMPLETED":
+            return JSONResponse(status_code=422, content={"name": "UNPROCESSABLE_ENTITY", "message": "ORDER_ALREADY_CAPTURED"})
+        app.state.calls["capture"] += 1
+        order["status"] = "COMPLETED"
+        units = order["purchase_units"] or [{"amount": {"currency_code": "USD", "value": "0.00"}}]
+        return JSONResponse(status_code=201, content={
+            "id": order_id,
+            "status": "COMPLETED",
+            "purchase_units": [{"payments": {"captures": [{
+                "id": secrets.token_hex(8).upper(), "status": "COMPLETED", "amount": unit["amount"],
+            }]}} for unit in units],
+        })
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=50, help="ms added to every call")
+    parser.add_argument("--token-ttl", type=int, default=32400)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.token_ttl), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
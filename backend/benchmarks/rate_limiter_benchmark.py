@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Middleware Benchmark
+=================================
+
+Measures the per-request overhead of rate_limit_middleware with each backend:
+
+* legacy   - the previous per-IP timestamp deque (unbounded dicts), for reference
+* memory   - InMemoryRateLimitBackend (sliding-window counter, LRU bounded)
+* mongodb  - MongoRateLimitBackend against MONGODB_URI (scratch database, dropped at the end)
+* redis    - RedisRateLimitBackend against RATE_LIMIT_REDIS_URL, with --redis
+
+Requests are spread over --ips client addresses, and call_next is a no-op so only the
+middleware itself is timed. Also reports the memory backend's key count after the run.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/rate_limiter_benchmark.py --requests 20000 --ips 5000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict, deque
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.middleware import rate_limiter as rate_limiter_module
+from src.middleware.rate_limit_backends import (
+    InMemoryRateLimitBackend, MongoRateLimitBackend, RateLimitBackend, RedisRateLimitBackend,
+)
+
+
+class LegacyDequeBackend(RateLimitBackend):
+    """The timestamp log the limiter used before: one deque per IP, never evicted."""
+
+    name = "legacy"
+
+    def __init__(self):
+        self.request_history = defaultdict(deque)
+
+    async def hit(self, key, limit, window):
+        now = time.time()
+        queue = self.request_history[key]
+        while queue and queue[0] < now - window:
+            queue.popleft()
+        if len(queue) >= limit:
+            return False, window
+        queue.append(now)
+        return True, 0
+
+
+def make_request(ip: str) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/product/all", "query_string": b"",
+        "headers": [(b"x-forwarded-for", ip.encode())], "client": (ip, 12345), "server": ("bench", 80),
+        "scheme": "http", "root_path": "",
+    })
+
+
+async def call_next(request):
+    return Response(status_code=200)
+
+
+async def measure(backend: RateLimitBackend, requests: int, ips: int):
+    rate_limiter_module.rate_limiter = rate_limiter_module.RateLimiter(backend)
+    # Effectively unlimited, so every request takes the full "allowed" path
+    rate_limiter_module.rate_limiter.GENERAL_LIMIT = requests + 1
+    latencies = []
+    for i in range(requests):
+        n = i % ips
+        request = make_request(f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}")
+        started = time.perf_counter()
+        await rate_limiter_module.rate_limit_middleware(request, call_next)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return (statistics.median(latencies) * 1e6, latencies[int(len(latencies) * 0.95) - 1] * 1e6,
+            statistics.mean(latencies) * 1e6)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--ips", type=int, default=5000)
+    parser.add_argument("--database", default="monkeyz_bench")
+    parser.add_argument("--redis", action="store_true", help="also benchmark RATE_LIMIT_REDIS_URL")
+    parser.add_argument("--skip-mongodb", action="store_true")
+    args = parser.parse_args()
+
+    backends = [LegacyDequeBackend(), InMemoryRateLimitBackend(max_keys=args.ips)]
+    client = None
+    if not args.skip_mongodb:
+        client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+        mongo_backend = MongoRateLimitBackend()
+        mongo_backend._collection = client[args.database]["rate_limits"]
+        backends.append(mongo_backend)
+    if args.redis:
+        backends.append(RedisRateLimitBackend(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/15"), "bench:"))
+
+    try:
+        print(f"requests={args.requests} ips={args.ips}")
+        print(f"{'backend':<10}{'p50':>10}{'p95':>10}{'mean':>10}")
+        for backend in backends:
+            p50, p95, mean = await measure(backend, args.requests, args.ips)
+            print(f"{backend.name:<10}{p50:>8.1f}us{p95:>8.1f}us{mean:>8.1f}us")
+        print(f"memory backend stats: {backends[1].stats()}")
+    finally:
+        if client is not None:
+            await client.drop_database(args.database)
+            client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Sales Analytics Benchmark
+=========================
+
+Compares three ways of answering the admin dashboard (all-time sales plus the last 30 days):
+
+* python     - load every order and bucket it in Python, what GET /admin/analytics did before
+* aggregate  - SalesRollupService.compute_rollups_from_orders, one $match/$group over the orders
+* rollups    - SalesRollupService.get_summary over the materialized daily rollups
+
+Then times --updates incremental record_order_change calls (an order moving from pending to
+completed) and checks that the rollups still agree with the aggregation.
+
+Seeds --orders orders spread over two years. Uses a scratch database (default
+"monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/sales_analytics_benchmark.py --orders 200000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.sales_rollup_service import SalesRollupService, ensure_sales_rollups
+
+STATUSES = ["completed", "completed", "completed", "pending", "awaiting_stock", "cancelled"]
+
+
+async def seed(db, order_count: int, batch_size: int = 10000):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for i in range(order_count):
+        created = now - timedelta(seconds=rng.randrange(730 * 86400))
+        batch.append({
+            "customerName": f"Customer {i}", "email": f"user{rng.randrange(20000)}@example.com",
+            "status": rng.choice(STATUSES), "total": round(rng.uniform(5, 120), 2),
+            "items": [{"productId": "p1", "name": "Product", "quantity": 1, "price": 9.95}],
+            "createdAt": created, "date": created,
+        })
+        if len(batch) >= batch_size:
+            await db.orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch, ordered=False)
+
+
+async def python_summary(db):
+    orders = await db.orders.find().to_list(length=None)
+    start = datetime.now() - timedelta(days=30)
+    counted = [o for o in orders if o.get("status") != "cancelled"]
+    daily = {}
+    for order in counted:
+        if order["createdAt"] >= start:
+            day = order["createdAt"].strftime("%Y-%m-%d")
+            daily[day] = daily.get(day, 0) + order["total"]
+    return sum(o["total"] for o in counted), len(counted), daily
+
+
+async def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--full-repeats", type=int, default=3)
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    db = client[args.database]
+    service = SalesRollupService(db)
+    try:
+        started = time.perf_counter()
+        await seed(db, args.orders)
+        print(f"seeded {args.orders} orders in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        await ensure_sales_rollups(db)
+        print(f"backfilled rollups in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'query':<12}{'p50':>12}{'p95':>12}")
+        for name, fn, repeats in (
+            ("python", lambda: python_summary(db), args.full_repeats),
+            ("aggregate", service.compute_rollups_from_orders, args.full_repeats),
+            ("rollups", lambda: service.get_summary(days=30), args.repeats),
+        ):
+            p50, p95 = await timed(fn, repeats)
+            print(f"{name:<12}{p50:>10.2f}ms{p95:>10.2f}ms")
+
+        pending = await db.orders.find({"status": "pending"}).to_list(length=args.updates)
+        latencies = []
+        for order in pending:
+            started = time.perf_counter()
+            await db.orders.update_one({"_id": order["_id"]}, {"$set": {"status": "completed"}})
+            await service.record_order_change(order, {**order, "status": "completed"})
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        if latencies:
+            print(f"transition + rollup update: p50 {statistics.median(latencies) * 1000:.2f}ms "
+                  f"p95 {latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000:.2f}ms ({len(latencies)} orders)")
+
+        report = await service.reconcile(repair=False)
+        print(f"reconcile: checked={report['checked']} drifted={report['drifted']}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup and Connection Count Benchmark
+======================================
+
+Starts the FastAPI app (main.app) --runs times, each in a fresh Python process, runs its
+full lifespan (startup handlers and router lifespans) and reports:
+
+* startup  - time from entering the lifespan until the app is ready to serve
+* conns    - connections the app holds open on the MongoDB server once started
+             (serverStatus connections.current, measured by a separate monitor client)
+* pool     - the shared client's pool counters, when the tree exposes db_manager.pool_stats()
+
+The script only depends on main.app, so the same file gives the "before" numbers when
+run against an older checkout of the backend.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/startup_connections_benchmark.py --runs 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+async def child(settle: float):
+    sys.path.insert(0, BACKEND_DIR)
+    monitor = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"), maxPoolSize=1)
+    baseline = (await monitor.admin.command("serverStatus"))["connections"]["current"]
+
+    started = time.perf_counter()
+    from main import app
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        # Let pools reach minPoolSize before counting
+        await asyncio.sleep(settle)
+        current = (await monitor.admin.command("serverStatus"))["connections"]["current"]
+        pool = None
+        try:
+            from src.lib.database_manager import db_manager
+            pool = db_manager.pool_stats()
+        except (ImportError, AttributeError):
+            pass
+    monitor.close()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (ready - imported) * 1000,
+        "connections": current - baseline,
+        "pool": pool,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait before counting connections")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.settle))
+        return 0
+
+    results = []
+    for run in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--settle", str(args.settle)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"run {run + 1}: import {result['import_ms']:.0f}ms startup {result['startup_ms']:.0f}ms "
+              f"connections {result['connections']}")
+
+    print(f"median startup {statistics.median(r['startup_ms'] for r in results):.0f}ms, "
+          f"median connections {statistics.median(r['connections'] for r in results):.0f}")
+    if results[-1]["pool"]:
+        print(f"pool (last run): {results[-1]['pool']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
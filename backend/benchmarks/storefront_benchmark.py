@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Storefront Read Benchmark
+=========================
+
+Compares payload size and latency of the public product endpoints:
+
+* legacy      - full documents (cdKeys included) -> sanitize -> Product.model_validate
+                -> jsonable_encoder -> JSON, i.e. what /product/* did before
+* storefront  - ProductsCollection.get_storefront_* with the cdKeys-free projection,
+                computed availableKeys and pre-serialized bytes
+
+Products are seeded with --keys keys each (default 10k), embedded in cdKeys like
+unmigrated data, or in the keys collection with --keys-collection.
+
+Uses a scratch database (default "monkeyz_bench") that is dropped at the end.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/storefront_benchmark.py --products 20 --keys 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from beanie import init_beanie
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.key.key import Key, KeyStatus
+from src.models.products.products import Product
+from src.mongodb.products_collection import ProductsCollection
+
+
+async def seed(product_count: int, key_count: int, keys_collection: bool):
+    now = datetime.now(timezone.utc)
+    for p in range(product_count):
+        product_id = ObjectId()
+        cd_keys = [
+            {"key": f"P{p:03d}-{i:06d}", "isUsed": i % 3 == 0, "usedAt": None, "orderId": None, "addedAt": now}
+            for i in range(key_count)
+        ]
+        await Product.get_motor_collection().insert_one({
+            "_id": product_id,
+            "name": {"en": f"Product {p}", "he": f"מוצר {p}"},
+            "description": {"en": "Benchmark product " * 10, "he": ""},
+            "price": 10 + p,
+            "active": True,
+            "created_at": now,
+            "createdAt": now,
+            "manages_cd_keys": True,
+            "best_seller": p % 2 == 0,
+            "displayOnHomePage": p % 3 == 0,
+            "slug": f"product-{p}",
+            "imageUrl": f"https://example.com/{p}.png",
+            "cdKeys": [] if keys_collection else cd_keys,
+        })
+        if keys_collection:
+            await Key.get_motor_collection().insert_many([
+                {"key_string": k["key"], "product_id": product_id,
+                 "status": (KeyStatus.USED if k["isUsed"] else KeyStatus.AVAILABLE).value,
+                 "added_date": now, "used_date": None, "order_id": None}
+                for k in cd_keys
+            ])
+
+
+def legacy_reader(collection: ProductsCollection):
+    """The pre-projection read path: full documents through Product validation and jsonable_encoder."""
+    async def read(query, sort=None, limit=None, single=False):
+        cursor = Product.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        products = [Product.model_validate(collection._sanitize_product_doc(doc)) async for doc in cursor]
+        body = jsonable_encoder(products[0] if single else products)
+        return json.dumps(body).encode("utf-8")
+    return read
+
+
+def storefront_reader(collection: ProductsCollection):
+    async def read(query, sort=None, limit=None, single=False):
+        if single:
+            return await collection.get_storefront_product(query, as_bytes=True)
+        return await collection.get_storefront_products(query, sort=sort, limit=limit, as_bytes=True)
+    return read
+
+
+ENDPOINTS = {
+    "/product/all": ({"active": True}, None, None, False),
+    "/product/best-sellers": ({"best_seller": True, "active": True}, None, None, False),
+    "/product/recent": ({}, [("createdAt", -1)], 8, False),
+    "/product/homepage": ({"displayOnHomePage": True, "active": True}, None, 6, False),
+    "/product/{identifier}": ({"slug": "product-1", "active": True}, None, None, True),
+}
+
+
+async def measure(read, iterations: int, args):
+    latencies = []
+    body = b""
+    for _ in range(iterations):
+        started = time.perf_counter()
+        body = await read(*args)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return len(body), statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--keys", type=int, default=10000, help="keys per product")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--keys-collection", action="store_true", help="seed keys as migrated Key documents")
+    parser.add_argument("--database", default="monkeyz_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    await init_beanie(database=client[args.database], document_models=[Product, Key])
+    collection = ProductsCollection()
+
+    try:
+        await seed(args.products, args.keys, args.keys_collection)
+        print(f"products={args.products} keys/product={args.keys} "
+              f"storage={'keys collection' if args.keys_collection else 'embedded cdKeys'}")
+        print(f"{'endpoint':<24}{'legacy bytes':>14}{'new bytes':>12}{'legacy p50':>12}{'new p50':>10}{'legacy p95':>12}{'new p95':>10}")
+        for endpoint, endpoint_args in ENDPOINTS.items():
+            old_size, old_p50, old_p95 = await measure(legacy_reader(collection), args.iterations, endpoint_args)
+            new_size, new_p50, new_p95 = await measure(storefront_reader(collection), args.iterations, endpoint_args)
+            print(f"{endpoint:<24}{old_size:>14}{new_size:>12}{old_p50:>10.2f}ms{new_p50:>8.2f}ms{old_p95:>10.2f}ms{new_p95:>8.2f}ms")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
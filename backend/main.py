@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 from dotenv import load_dotenv
 import os
+import time
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
 import json
@@ -13,20 +14,29 @@ from src.routers.products_router import product_router
 from src.routers.admin_router import admin_router
 from src.base_exception.base_exception import BaseException
 from src.routers.keys_router import key_router, admin_key_router # Modified import
-from src.routers.orders import router as orders_router
+from src.routers.orders import router as orders_router, backorder_retry_queue
 from src.routers.health_router import health_router
 from src.routers.paypal_health import paypal_health_router
 from src.models.contact.contact import ContactForm, ContactResponse
 from src.mongodb.mongodb import MongoDb
 from src.mongodb.contacts_collection import ContactCollection
+from src.mongodb.products_collection import ProductsCollection
+from src.services.coupon_service import ensure_coupon_indexes
+from src.services.backorder_service import ensure_backorder_indexes
+from src.mongodb.orders_collection import ensure_order_list_indexes
+from src.services.sales_rollup_service import ensure_sales_rollups
+from src.lib.google_id_token import google_token_verifier
+from src.services.email_outbox import email_outbox
+from src.services.paypal_gateway import paypal_gateway
 from src.lib.email_service import send_contact_email, send_auto_reply_email  # Import email functions
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.lib.mongo_json_encoder import MongoJSONEncoder
 from bson.objectid import ObjectId
 from src.middleware.rate_limiter import rate_limit_middleware
 from src.middleware.security_middleware import SecurityMiddleware, get_csrf_token
-from src.lib.logging_config import setup_logging, get_logger, error_tracker
-from src.lib.database_manager import initialize_database, cleanup_database
+from src.lib.logging_config import setup_logging, shutdown_logging, get_logger, error_tracker
+from src.lib.database_manager import initialize_database, cleanup_database, init_document_models, db_manager
+from src.deps.deps import dependency_provider
 
 load_dotenv()
 
@@ -210,26 +220,83 @@ async def startup_event():
     
     # Initialize optimized database connection
     logger.info("Starting application initialization...")
+    startup_started = time.perf_counter()
     
     success = await initialize_database()
     if not success:
         logger.error("Failed to initialize database connection")
         raise RuntimeError("Database initialization failed")
+
+    # One Beanie initialization for every document model, on the shared client
+    await init_document_models()
+
+    # Controllers are built once and shared by every request
+    await dependency_provider.initialize()
     
     # Initialize legacy collections for backward compatibility
     mongo = MongoDb()
     await mongo.connection()
     mongo_client = await mongo.get_client()
     contact_collection = ContactCollection(mongo_client)
+
+    # Indexes behind exact coupon code lookups (coupons, orders, validation attempts)
+    try:
+        await ensure_coupon_indexes(await mongo.get_db())
+    except Exception as e:
+        logger.error(f"Failed to create coupon indexes: {e}")
+
+    # Per-product backorder queues (orders waiting for keys, oldest first)
+    try:
+        await ensure_backorder_indexes(await mongo.get_db())
+    except Exception as e:
+        logger.error(f"Failed to create backorder indexes: {e}")
+
+    # Keyset-paginated order listings
+    try:
+        await ensure_order_list_indexes(await mongo.get_db())
+    except Exception as e:
+        logger.error(f"Failed to create order listing indexes: {e}")
+
+    # Daily sales rollups behind the admin dashboard (backfilled from the orders on first run)
+    try:
+        await ensure_sales_rollups(await mongo.get_db())
+    except Exception as e:
+        logger.error(f"Failed to backfill sales rollups: {e}")
+
+    # Optional cross-process invalidation of the storefront catalog cache (needs a replica set)
+    if os.getenv("CATALOG_CACHE_CHANGE_STREAM", "false").lower() == "true":
+        products_collection = ProductsCollection()
+        await products_collection.initialize()
+        products_collection.start_catalog_change_stream()
     
-    logger.info("Application initialization completed successfully")
+    # Warm the Google sign-in key set so the first Google login does not wait for it
+    try:
+        await google_token_verifier.refresh()
+        google_token_verifier.start_background_refresh()
+    except Exception as e:
+        logger.warning(f"Could not preload Google signing keys, will retry on first use: {e}")
+    
+    # Deliver queued emails in the background
+    email_outbox.start()
+    
+    pool = db_manager.pool_stats()
+    logger.info(
+        f"Application initialization completed successfully in {(time.perf_counter() - startup_started) * 1000:.0f} ms "
+        f"({pool['open_connections']} database connections open)"
+    )
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on application shutdown."""
     logger.info("Starting application shutdown...")
+    await ProductsCollection().stop_catalog_change_stream()
+    await google_token_verifier.stop_background_refresh()
+    await email_outbox.stop()
+    await paypal_gateway.close()
+    await backorder_retry_queue.stop()
     await cleanup_database()
     logger.info("Application shutdown completed")
+    shutdown_logging()
 
 @app.post("/contact", response_model=ContactResponse)
 async def handle_contact_form(contact_form: ContactForm):
@@ -241,29 +308,29 @@ async def handle_contact_form(contact_form: ContactForm):
         
         # Send email notification to admin (you)
         admin_email = os.getenv("ADMIN_EMAIL", "support@monkeyz.co.il")  # Set your admin email in .env
-        email_sent_to_admin = send_contact_email(
+        email_sent_to_admin = await send_contact_email(
             to_email=admin_email,
             name=contact_form.name,
             message=f"Email: {contact_form.email}\nMessage: {contact_form.message}"
         )
         
         # Send auto-reply to customer
-        auto_reply_sent = send_auto_reply_email(
+        auto_reply_sent = await send_auto_reply_email(
             to_email=contact_form.email,
             subject="Thank you for contacting MonkeyZ!",
             message=f"Hello {contact_form.name},\n\nThank you for reaching out to us! We have received your message and will get back to you soon.\n\nYour message:\n{contact_form.message}\n\nBest regards,\nMonkeyZ Team"
         )
         
-        # Log email sending status
+        # Log email queueing status
         if email_sent_to_admin:
-            logger.info(f"Contact form notification sent to admin for contact ID: {contact_id}")
+            logger.info(f"Contact form notification queued for admin for contact ID: {contact_id}")
         else:
-            logger.error(f"Failed to send contact form notification to admin for contact ID: {contact_id}")
+            logger.error(f"Failed to queue contact form notification to admin for contact ID: {contact_id}")
         
         if auto_reply_sent:
-            logger.info(f"Auto-reply sent to {contact_form.email} for contact ID: {contact_id}")
+            logger.info(f"Auto-reply queued for {contact_form.email} for contact ID: {contact_id}")
         else:
-            logger.error(f"Failed to send auto-reply to {contact_form.email} for contact ID: {contact_id}")
+            logger.error(f"Failed to queue auto-reply to {contact_form.email} for contact ID: {contact_id}")
         
         return ContactResponse(
             message=f"Message received successfully! We'll get back to you soon. ID: {contact_id}"
@@ -1,3 +1,5 @@
+import logging
+
 from beanie import PydanticObjectId
 from src.models.user.user_exception import LoginError
 
@@ -10,6 +12,8 @@ from src.mongodb.keys_collection import KeysCollection
 from src.mongodb.users_collection import UserCollection
 from src.mongodb.products_collection import ProductsCollection
 
+logger = logging.getLogger(__name__)
+
 
 class KeyController(ControllerInterface):
     """Controller for managing keys, including creation, validation, and association with products."""
@@ -28,12 +32,9 @@ class KeyController(ControllerInterface):
         self.user_collection = user_collection
 
     async def initialize(self):
-        """Initializes database connections and collections."""
-        await self.keys_collection.connection()
+        """Initializes database connections and collections (shared client, Beanie initialized once)."""
         await self.keys_collection.initialize()
-        await self.user_collection.connection()
         await self.user_collection.initialize()
-        await self.product_collection.connection()
         await self.product_collection.initialize()
 
     async def disconnect(self):
@@ -192,5 +193,5 @@ class KeyController(ControllerInterface):
                 keys.append(key)
             return keys
         except Exception as e:
-            print(f"Error collecting keys: {e}")
+            logger.error("Error collecting keys: %s", e)
             return []
@@ -4,8 +4,11 @@ from src.mongodb.products_collection import ProductsCollection
 from src.mongodb.keys_collection import KeysCollection
 from src.mongodb.users_collection import UserCollection
 import datetime
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 class ProductsController:
     """Controller for managing products, including creation, editing, and deletion."""
     
@@ -32,7 +35,7 @@ class ProductsController:
     async def sync_products(self):
         """Synchronize products between admin collection and main collection."""
         try:
-            print("Starting product sync between collections")
+            logger.info("Starting product sync between collections")
             # Get all products from admin collection
             admin_products = await self.admin_product_collection.get_all_products()
             
@@ -56,10 +59,10 @@ class ProductsController:
                     # Create product in main collection
                     await self.product_collection.create_product_from_dict(product_dict)
             
-            print(f"Successfully synchronized {len(admin_products)} products")
+            logger.info("Successfully synchronized %s products", len(admin_products))
             return True
         except Exception as e:
-            print(f"Error synchronizing products: {e}")
+            logger.error("Error synchronizing products: %s", e)
             return False
     
     async def get_products(self, page: int = 1, limit: int = 10) -> list[Product]:
@@ -112,9 +115,9 @@ class ProductsController:
         try:
             # Create in main products collection
             await self.product_collection.create_product_from_dict(product_dict)
-            print(f"Product {product.id} created in both collections")
+            logger.info("Product %s created in both collections", product.id)
         except Exception as e:
-            print(f"Error creating product in main collection: {e}")
+            logger.error("Error creating product in main collection: %s", e)
             # Continue even if sync fails - at least it's in admin collection
         
         return created_admin_product
@@ -152,9 +155,9 @@ class ProductsController:
         try:
             # Update in main products collection
             await self.product_collection.update_product_from_dict(product_id, product_dict)
-            print(f"Product {product_id} updated in both collections")
+            logger.info("Product %s updated in both collections", product_id)
         except Exception as e:
-            print(f"Error updating product in main collection: {e}")
+            logger.error("Error updating product in main collection: %s", e)
             # Continue even if sync fails - at least it's updated in admin collection
         
         return updated_admin_product
@@ -256,6 +259,6 @@ class ProductsController:
             # Use the shop collection's implementation which properly filters by displayOnHomePage=True
             return await self.product_collection.get_homepage_products(limit)
         except Exception as e:
-            print(f"Error getting homepage products: {e}")
+            logger.error("Error getting homepage products: %s", e)
             return []
 
@@ -2,6 +2,7 @@
 import logging
 from src.models.token.token import LoginResponse
 from src.lib.token_handler import create_access_token
+from src.lib.role_cache import role_cache, role_claim
 from src.models.user.user_response import SelfResponse
 from src.controller.controller_interface import ControllerInterface
 from src.models.user.user import User, UserRequest, Role
@@ -10,7 +11,7 @@ from src.mongodb.keys_collection import KeysCollection
 from src.mongodb.users_collection import UserCollection
 from src.mongodb.product_collection import ProductCollection # Ensure this is the one being used
 # from src.mongodb.products_collection import ProductsCollection # Removed as ProductCollection is now standard
-from typing import List
+from typing import List, Optional
 
 class UserController(ControllerInterface):
     """Controller for managing user operations, including authentication and profile retrieval."""
@@ -35,47 +36,28 @@ class UserController(ControllerInterface):
         self.shop_product_collection = shop_product_collection
         
     async def initialize(self):
-        """Initializes database connections and collections."""
-        # Initialize all collections in parallel for better performance
-        # Assuming connection() and initialize() are idempotent or safe to call on the same instance if admin_product_collection and shop_product_collection are identical.
-        # As per deps.py, admin_product_collection and shop_product_collection are the same instance from get_product_collection_dependency()
-        
-        if self.keys_collection: # Check if collection exists before calling methods
-            await self.keys_collection.connection()
-        if self.user_collection:
-            await self.user_collection.connection()
-        if self.admin_product_collection: # This is the shop.Product collection
-            await self.admin_product_collection.connection()
-        # No separate connection for self.shop_product_collection if it's the same object as self.admin_product_collection
-            
-        init_tasks = []
-        if self.keys_collection:
-            init_tasks.append(self.keys_collection.initialize())
-        if self.user_collection:
-            init_tasks.append(self.user_collection.initialize())
-        if self.admin_product_collection: # This is the shop.Product collection
-            init_tasks.append(self.admin_product_collection.initialize())
-        # No separate initialize for self.shop_product_collection if it's the same object
-            
-        if init_tasks: # Ensure there are tasks to gather
-             await asyncio.gather(*init_tasks)
-             logging.info(f"Successfully initialized {len(init_tasks)} database collections with Beanie ODM")
+        """
+        Points the collections at the shared database client. Beanie is initialized once
+        per process by the database manager, so repeated calls are cheap.
+        """
+        # admin_product_collection and shop_product_collection are the same instance (see deps.py)
+        for collection in (self.keys_collection, self.user_collection, self.admin_product_collection):
+            if collection:
+                await collection.initialize()
 
-    async def has_role(self, username: str, role: Role) -> bool:
+    async def has_role(self, username: str, role: Role, claimed_role: Optional[str] = None) -> bool:
         """
         Check if a user has a specific role.
 
         Args:
             username (str): The username of the user.
             role (Role): The role to check for.
+            claimed_role (Optional[str]): The access token's role claim, saves the user lookup.
 
         Returns:
             bool: True if the user has the role, False otherwise.
         """
-        user = await self.user_collection.get_user_by_username(username)
-        if user and user.role and role == user.role:
-            return True
-        return False
+        return await role_cache.get_role(username, claimed_role, self.user_collection) == role
 
     async def get_user_by_token(self, username: str) -> SelfResponse:
         """
@@ -100,7 +82,7 @@ class UserController(ControllerInterface):
     
     async def login(self, body: UserRequest) -> LoginResponse:
         user:User = await self.user_collection.login(body)
-        access_token = create_access_token(data={"sub":user.username})
+        access_token = create_access_token(data={"sub":user.username, "role":role_claim(user.role)})
         response = await self.get_user_response(user)
         response = LoginResponse(access_token=access_token, user=response, token_type="Bearer")
         return response
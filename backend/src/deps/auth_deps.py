@@ -4,14 +4,16 @@ from src.lib.token_handler import get_current_user # Assuming this returns a use
 from src.mongodb.users_collection import UserCollection # To fetch user details
 from src.deps.deps import get_user_collection_dependency # Dependency for UserCollection
 from src.models.token.token import TokenData # Import TokenData
+from src.lib.role_cache import role_cache
 
 async def get_current_admin_user(
     current_user_token: TokenData = Depends(get_current_user), # Changed type to TokenData
     user_collection: UserCollection = Depends(get_user_collection_dependency)
-) -> User:
+) -> TokenData:
     """
     Dependency to get the current user and verify if they are an admin.
     Raises HTTPException if the user is not found or not an admin.
+    The role comes from the token claim and role cache, see src.lib.role_cache.
     """
     if not current_user_token.username:
         raise HTTPException(
@@ -20,10 +22,9 @@ async def get_current_admin_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Fetch the user by username from the token
-    db_user = await user_collection.get_user_by_username(current_user_token.username)
+    role = await role_cache.get_role(current_user_token.username, current_user_token.role, user_collection)
     
-    if not db_user:
+    if role is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found in database",
@@ -31,10 +32,10 @@ async def get_current_admin_user(
         )
 
     # Check if the user's role is manager (admin)
-    if db_user.role != Role.manager: # Changed Role.ADMIN to Role.manager
+    if role != Role.manager: # Changed Role.ADMIN to Role.manager
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user does not have administrative privileges",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return db_user
+    return current_user_token
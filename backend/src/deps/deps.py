@@ -1,4 +1,6 @@
+import asyncio
 import os
+from typing import Any, Callable, Dict, Optional
 from src.controller.key_controller import KeyController
 from src.controller.user_controller import UserController
 from src.mongodb.users_collection import UserCollection
@@ -46,33 +48,89 @@ def get_order_collection_dependency() -> OrdersCollection:
     return order_collection
     
     
+class DependencyProvider:
+    """
+    Builds every controller once and hands out the same instances to all requests.
+
+    The collections are process-wide singletons, so the controllers wrapping them are
+    stateless and can be shared. ``initialize`` (called at startup and by the router
+    lifespans) initializes each collection exactly once per process.
+    """
+
+    def __init__(self) -> None:
+        self._controllers: Dict[str, Any] = {}
+        self._initialized = False
+        self._init_lock: Optional[asyncio.Lock] = None
+        self.collection_initializations = 0
+
+    def _controller(self, name: str, factory: Callable[[], Any]) -> Any:
+        controller = self._controllers.get(name)
+        if controller is None:
+            controller = self._controllers[name] = factory()
+        return controller
+
+    @property
+    def user_controller(self) -> UserController:
+        # UserController should use ProductCollection which has coupon methods
+        return self._controller("user", lambda: UserController(
+            get_keys_collection_dependency(), get_user_collection_dependency(),
+            get_product_collection_with_coupons_dependency(), get_product_collection_with_coupons_dependency(),
+        ))
+
+    @property
+    def products_controller(self) -> ProductsController:
+        # The unified product collection serves as both product sources
+        return self._controller("products", lambda: ProductsController(
+            get_product_collection_dependency(), get_keys_collection_dependency(),
+            get_user_collection_dependency(), get_product_collection_dependency(),
+        ))
+
+    @property
+    def keys_controller(self) -> KeyController:
+        return self._controller("keys", lambda: KeyController(
+            get_product_collection_dependency(), get_keys_collection_dependency(), get_user_collection_dependency(),
+        ))
+
+    @property
+    def key_metrics_controller(self) -> KeyMetricsController:
+        # KeyMetricsController should also use the single source of truth for products
+        return self._controller("key_metrics", lambda: KeyMetricsController(
+            get_product_collection_dependency(), get_keys_collection_dependency(),
+        ))
+
+    async def initialize(self) -> None:
+        """Builds the controllers and initializes every collection, once per process."""
+        if self._initialized:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if self._initialized:
+                return
+            for collection in (
+                get_user_collection_dependency(), get_keys_collection_dependency(),
+                get_product_collection_dependency(), get_product_collection_with_coupons_dependency(),
+                get_order_collection_dependency(),
+            ):
+                await collection.initialize()
+                self.collection_initializations += 1
+            for name in ("user_controller", "products_controller", "keys_controller", "key_metrics_controller"):
+                getattr(self, name)
+            await self.products_controller.initialize()
+            self._initialized = True
+
+
+dependency_provider = DependencyProvider()
+
+
 def get_user_controller_dependency() -> UserController:
-    keys_collection = get_keys_collection_dependency()
-    user_collection = get_user_collection_dependency()
-    # UserController should use ProductCollection which has coupon methods
-    shop_product_collection = get_product_collection_with_coupons_dependency() 
-    user_controller = UserController(keys_collection, user_collection, shop_product_collection, shop_product_collection)
-    return user_controller
-    
-def get_products_controller_dependency() -> ProductsController: 
-    keys_collection = get_keys_collection_dependency()
-    user_collection = get_user_collection_dependency()
-    product_collection = get_product_collection_dependency() # Use the unified product collection
-    # Pass the same product_collection for both arguments if ProductController expects two but they should be the same source
-    product_controller = ProductsController(product_collection, keys_collection, user_collection, product_collection)
-    return product_controller
-    
-    
-def get_keys_controller_dependency() -> KeyController: 
-    keys_collection = get_keys_collection_dependency()
-    user_collection = get_user_collection_dependency()
-    product_collection = get_product_collection_dependency() # Use the unified product collection
-    keys_controller = KeyController(product_collection, keys_collection, user_collection)
-    return keys_controller
+    return dependency_provider.user_controller
+
+def get_products_controller_dependency() -> ProductsController:
+    return dependency_provider.products_controller
+
+def get_keys_controller_dependency() -> KeyController:
+    return dependency_provider.keys_controller
 
 def get_key_metrics_controller_dependency() -> KeyMetricsController:
-    # KeyMetricsController should also use the single source of truth for products
-    product_collection = get_product_collection_dependency()
-    keys_collection = get_keys_collection_dependency()
-    key_metrics_controller = KeyMetricsController(product_collection, keys_collection)
-    return key_metrics_controller
\ No newline at end of file
+    return dependency_provider.key_metrics_controller
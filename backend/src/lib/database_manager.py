@@ -0,0 +1,510 @@
+"""
+Optimized MongoDB connection management with connection pooling,
+retry logic, and comprehensive error handling.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.errors import (
+    ConnectionFailure, ServerSelectionTimeoutError, 
+    NetworkTimeout, OperationFailure, InvalidURI
+)
+import logging
+from datetime import datetime, timezone
+
+from ..lib.logging_config import get_logger, error_tracker
+from ..models.key.key import Key
+from ..models.products.products import Product
+from ..models.user.user import User
+
+logger = get_logger(__name__)
+
+# Database holding the Beanie documents (users, products, keys)
+SHOP_DATABASE = "shop"
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters for the shared client: open and checked-out connections and
+    how long operations waited for a connection. PyMongo calls the listener from the
+    driver's threads, so every update takes a lock.
+    """
+
+    def __init__(self, samples: int = 1000):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._waits = deque(maxlen=samples)
+        self.pools_created = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.max_wait = 0.0
+
+    def _record_wait(self, event) -> None:
+        # PyMongo >= 4.7 reports the wait on the event; older versions are timed here
+        duration = getattr(event, "duration", None)
+        started = getattr(self._local, "started", None)
+        if duration is None and started is not None:
+            duration = time.perf_counter() - started
+        self._local.started = None
+        if duration is not None:
+            self._waits.append(duration)
+            self.max_wait = max(self.max_wait, duration)
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools_created += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+
+            def pct(p):
+                return round(waits[min(int(len(waits) * p), len(waits) - 1)] * 1000, 3) if waits else 0.0
+
+            return {
+                "open_connections": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_queue_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": round(self.max_wait * 1000, 3)},
+            }
+
+class DatabaseConnectionManager:
+    """Enhanced database connection manager with pooling and monitoring."""
+    
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.database: Optional[AsyncIOMotorDatabase] = None
+        self._databases: Dict[str, AsyncIOMotorDatabase] = {}
+        self.pool_listener = PoolStatsListener()
+        self._models_initialized = False
+        self._models_lock: Optional[asyncio.Lock] = None
+        self.models_init_ms: Optional[float] = None
+        self.connection_pool_size = int(os.getenv("DB_POOL_SIZE", "50"))
+        self.max_idle_time = int(os.getenv("DB_MAX_IDLE_TIME", "300000"))  # 5 minutes
+        self.server_selection_timeout = int(os.getenv("DB_SELECTION_TIMEOUT", "5000"))  # 5 seconds
+        self.socket_timeout = int(os.getenv("DB_SOCKET_TIMEOUT", "10000"))  # 10 seconds
+        self.connect_timeout = int(os.getenv("DB_CONNECT_TIMEOUT", "10000"))  # 10 seconds
+        self.retry_writes = True
+        self.read_preference = "primary"
+        
+        # Connection state tracking
+        self.connection_attempts = 0
+        self.last_connection_attempt = None
+        self.connection_errors = []
+        self.is_connected = False
+        self.stats = {
+            "total_connections": 0,
+            "failed_connections": 0,
+            "last_successful_connection": None,
+            "last_failed_connection": None,
+            "current_connections": 0
+        }
+        
+    def _get_connection_string(self) -> str:
+        """Build optimized MongoDB connection string."""
+        # First, check if MONGODB_URI is set (preferred for production)
+        mongodb_uri = os.getenv("MONGODB_URI")
+        if mongodb_uri:
+            # Parse existing URI and add optimization parameters
+            base_uri = mongodb_uri
+            
+            # Check if URI already has query parameters
+            if "?" in base_uri:
+                # Add optimization parameters to existing query string
+                optimization_params = [
+                    f"maxPoolSize={self.connection_pool_size}",
+                    f"maxIdleTimeMS={self.max_idle_time}",
+                    f"serverSelectionTimeoutMS={self.server_selection_timeout}",
+                    f"socketTimeoutMS={self.socket_timeout}",
+                    f"connectTimeoutMS={self.connect_timeout}",
+                    f"retryWrites={str(self.retry_writes).lower()}",
+                    "waitQueueTimeoutMS=5000",
+                    "heartbeatFrequencyMS=10000",
+                    "minPoolSize=5",
+                    "maxConnecting=10"
+                ]
+                
+                # Only add params that aren't already in the URI
+                existing_params = base_uri.split("?")[1].lower()
+                new_params = []
+                for param in optimization_params:
+                    param_name = param.split("=")[0].lower()
+                    if param_name not in existing_params:
+                        new_params.append(param)
+                
+                if new_params:
+                    base_uri += "&" + "&".join(new_params)
+            else:
+                # Add all optimization parameters
+                options = [
+                    f"maxPoolSize={self.connection_pool_size}",
+                    f"maxIdleTimeMS={self.max_idle_time}",
+                    f"serverSelectionTimeoutMS={self.server_selection_timeout}",
+                    f"socketTimeoutMS={self.socket_timeout}",
+                    f"connectTimeoutMS={self.connect_timeout}",
+                    f"retryWrites={str(self.retry_writes).lower()}",
+                    f"readPreference={self.read_preference}",
+                    "waitQueueTimeoutMS=5000",
+                    "heartbeatFrequencyMS=10000",
+                    "minPoolSize=5",
+                    "maxConnecting=10"
+                ]
+                base_uri += "?" + "&".join(options)
+            
+            return base_uri
+        
+        # Fallback to individual environment variables for local development
+        host = os.getenv("MONGO_HOST", "localhost")
+        port = os.getenv("MONGO_PORT", "27017")
+        username = os.getenv("MONGO_USERNAME")
+        password = os.getenv("MONGO_PASSWORD")
+        database = os.getenv("MONGO_DATABASE", "monkeyz")
+        
+        # Build connection string
+        if username and password:
+            auth_string = f"{username}:{password}@"
+        else:
+            auth_string = ""
+        
+        # Connection options for optimization
+        options = [
+            f"maxPoolSize={self.connection_pool_size}",
+            f"maxIdleTimeMS={self.max_idle_time}",
+            f"serverSelectionTimeoutMS={self.server_selection_timeout}",
+            f"socketTimeoutMS={self.socket_timeout}",
+            f"connectTimeoutMS={self.connect_timeout}",
+            f"retryWrites={str(self.retry_writes).lower()}",
+            f"readPreference={self.read_preference}",
+            "waitQueueTimeoutMS=5000",
+            "heartbeatFrequencyMS=10000",
+            "minPoolSize=5",
+            "maxConnecting=10"
+        ]
+        
+        connection_string = f"mongodb://{auth_string}{host}:{port}/{database}?{'&'.join(options)}"
+        return connection_string
+    
+    async def connect(self, max_retries: int = 3, retry_delay: float = 1.0) -> bool:
+        """
+        Establish database connection with retry logic.
+        
+        Args:
+            max_retries: Maximum number of connection attempts
+            retry_delay: Delay between retry attempts (seconds)
+            
+        Returns:
+            bool: True if connection successful, False otherwise
+        """
+        self.connection_attempts += 1
+        self.last_connection_attempt = datetime.now(timezone.utc)
+        
+        for attempt in range(max_retries + 1):
+            try:
+                logger.debug(f"Attempting database connection (attempt {attempt + 1}/{max_retries + 1})")
+                
+                connection_string = self._get_connection_string()
+                
+                # A retry replaces the client, do not leak the previous pool
+                if self.client is not None:
+                    self.client.close()
+                self._databases = {}
+                self._models_initialized = False
+
+                # Create client with optimized settings
+                self.client = AsyncIOMotorClient(
+                    connection_string,
+                    # Additional connection options
+                    tz_aware=True,
+                    connect=False,  # Don't connect immediately
+                    uuidRepresentation='standard',
+                    event_listeners=[self.pool_listener]
+                )
+                
+                # Test the connection
+                await self.client.admin.command('ping')
+                
+                # Get database reference
+                database_name = os.getenv("MONGO_DATABASE", "monkeyz")
+                self.database = self.client[database_name]
+                
+                # Verify database access
+                await self.database.command('ping')
+                
+                self.is_connected = True
+                self.stats["total_connections"] += 1
+                self.stats["last_successful_connection"] = datetime.now(timezone.utc)
+                self.stats["current_connections"] = 1
+                
+                logger.info("Database connection established successfully")
+                logger.debug(f"Connection pool size: {self.connection_pool_size}")
+                logger.debug(f"Database: {database_name}")
+                
+                return True
+                
+            except InvalidURI as e:
+                error_msg = f"Invalid MongoDB URI: {e}"
+                logger.error(error_msg)
+                self.connection_errors.append((datetime.now(timezone.utc), error_msg))
+                return False  # Don't retry for URI errors
+                
+            except (ConnectionFailure, ServerSelectionTimeoutError, NetworkTimeout) as e:
+                error_msg = f"Database connection failed (attempt {attempt + 1}): {e}"
+                logger.warning(error_msg)
+                self.connection_errors.append((datetime.now(timezone.utc), error_msg))
+                
+                if attempt < max_retries:
+                    await asyncio.sleep(retry_delay * (2 ** attempt))  # Exponential backoff
+                else:
+                    self.stats["failed_connections"] += 1
+                    self.stats["last_failed_connection"] = datetime.now(timezone.utc)
+                    error_tracker.capture_exception(e, extra_data={
+                        "connection_attempts": self.connection_attempts,
+                        "max_retries": max_retries
+                    })
+                    
+            except Exception as e:
+                error_msg = f"Unexpected database connection error: {e}"
+                logger.error(error_msg)
+                self.connection_errors.append((datetime.now(timezone.utc), error_msg))
+                error_tracker.capture_exception(e)
+                return False
+        
+        self.is_connected = False
+        return False
+    
+    async def disconnect(self) -> None:
+        """Properly close database connections."""
+        if self.client:
+            try:
+                logger.debug("Closing database connections...")
+                self.client.close()
+                self.client = None
+                self._databases = {}
+                self._models_initialized = False
+                self.is_connected = False
+                self.stats["current_connections"] = 0
+                logger.debug("Database connections closed successfully")
+            except Exception as e:
+                logger.error(f"Error closing database connection: {e}")
+                error_tracker.capture_exception(e)
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """
+        Perform comprehensive database health check.
+        
+        Returns:
+            Dict containing health status and metrics
+        """
+        if not self.client or not self.database:
+            return {
+                "status": "disconnected",
+                "error": "No database connection"
+            }
+        
+        try:
+            start_time = time.time()
+            
+            # Test basic connectivity
+            await self.client.admin.command('ping')
+            
+            # Test database operations
+            await self.database.command('ping')
+            
+            # Get server info
+            server_info = await self.client.admin.command('buildInfo')
+            
+            # Get database stats
+            db_stats = await self.database.command('dbStats')
+            
+            response_time = (time.time() - start_time) * 1000
+            
+            return {
+                "status": "healthy",
+                "response_time_ms": round(response_time, 2),
+                "server_version": server_info.get('version'),
+                "database_size_mb": round(db_stats.get('dataSize', 0) / (1024 * 1024), 2),
+                "collections": db_stats.get('collections', 0),
+                "indexes": db_stats.get('indexes', 0),
+                "connection_stats": self.stats.copy(),
+                "pool": self.pool_listener.stats()
+            }
+            
+        except Exception as e:
+            logger.error(f"Database health check failed: {e}")
+            return {
+                "status": "unhealthy",
+                "error": str(e),
+                "connection_stats": self.stats.copy()
+            }
+    
+    async def get_database(self) -> AsyncIOMotorDatabase:
+        """
+        Get database instance with connection validation.
+        
+        Returns:
+            AsyncIOMotorDatabase instance
+            
+        Raises:
+            ConnectionError: If database is not connected
+        """
+        if not self.is_connected or self.database is None:
+            # Attempt to reconnect
+            if not await self.connect():
+                raise ConnectionError("Database connection failed")
+        
+        return self.database
+    
+    async def get_client(self) -> AsyncIOMotorClient:
+        """
+        Get client instance with connection validation.
+        
+        Returns:
+            AsyncIOMotorClient instance
+            
+        Raises:
+            ConnectionError: If database is not connected
+        """
+        if not self.is_connected or self.client is None:
+            if not await self.connect():
+                raise ConnectionError("Database connection failed")
+        
+        return self.client
+
+    async def get_named_database(self, name: str) -> AsyncIOMotorDatabase:
+        """
+        Handle to another database on the shared client (e.g. "shop" or "admin").
+        Handles are cached, so every caller shares the same client and pool.
+        """
+        client = await self.get_client()
+        if name not in self._databases:
+            self._databases[name] = client[name]
+        return self._databases[name]
+
+    async def init_models(self) -> None:
+        """
+        Initializes Beanie for every document model, once per client. Collection
+        ``initialize`` methods call this, so only the first call does the work.
+        """
+        if self._models_initialized:
+            return
+        if self._models_lock is None:
+            self._models_lock = asyncio.Lock()
+        async with self._models_lock:
+            if self._models_initialized:
+                return
+            started = time.perf_counter()
+            database = await self.get_named_database(SHOP_DATABASE)
+            await init_beanie(database=database, document_models=[User, Product, Key])
+            self.models_init_ms = round((time.perf_counter() - started) * 1000, 2)
+            self._models_initialized = True
+            logger.info(f"Beanie initialized for User, Product, Key in {self.models_init_ms} ms")
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool counters of the shared client."""
+        return {**self.pool_listener.stats(), "max_pool_size": self.connection_pool_size}
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Get current connection statistics."""
+        return {
+            "is_connected": self.is_connected,
+            "connection_attempts": self.connection_attempts,
+            "last_connection_attempt": self.last_connection_attempt,
+            "recent_errors": self.connection_errors[-5:],  # Last 5 errors
+            "stats": self.stats.copy(),
+            "pool_size": self.connection_pool_size,
+            "pool": self.pool_listener.stats(),
+            "models_initialized": self._models_initialized,
+            "timeouts": {
+                "server_selection": self.server_selection_timeout,
+                "socket": self.socket_timeout,
+                "connect": self.connect_timeout
+            }
+        }
+
+# Global database manager instance
+db_manager = DatabaseConnectionManager()
+
+async def get_database() -> AsyncIOMotorDatabase:
+    """Global function to get database instance."""
+    return await db_manager.get_database()
+
+async def get_client() -> AsyncIOMotorClient:
+    """Global function to get client instance."""
+    return await db_manager.get_client()
+
+async def get_shop_database() -> AsyncIOMotorDatabase:
+    """Global function to get the shop database (Beanie documents) on the shared client."""
+    return await db_manager.get_named_database(SHOP_DATABASE)
+
+async def init_document_models() -> None:
+    """Global function to initialize Beanie for all document models (idempotent)."""
+    await db_manager.init_models()
+
+async def initialize_database() -> bool:
+    """Initialize database connection on startup."""
+    logger.info("Initializing database connection...")
+    success = await db_manager.connect(max_retries=5, retry_delay=2.0)
+    if success:
+        logger.info("Database initialization completed successfully")
+    else:
+        logger.error("Database initialization failed")
+    return success
+
+async def cleanup_database() -> None:
+    """Cleanup database connections on shutdown."""
+    logger.info("Cleaning up database connections...")
+    await db_manager.disconnect()
+    logger.info("Database cleanup completed")
@@ -0,0 +1,133 @@
+import logging
+from dotenv import load_dotenv
+
+from ..services.email_outbox import enqueue_email
+
+load_dotenv()  # Load environment variables from .env file
+
+async def _send_email(template_type: str, template_params: dict) -> bool:
+    """
+    Render an email from template type and params and queue it for delivery.
+
+    Returns True once the message is in the outbox; the background sender delivers it.
+    """
+    try:
+        subject = "MonkeyZ Notification"
+        body = ""
+        # Basic template logic (customize as needed)
+        if template_type == "password_reset":
+            subject = "Password Reset Request - MonkeyZ"
+            reset_link = template_params.get('reset_link') or template_params.get('link')
+            body = f"""Hello,
+
+You requested a password reset for your MonkeyZ account.
+
+Click the link below to reset your password:
+{reset_link}
+
+This link will expire in 30 minutes.
+
+If you did not request this password reset, please ignore this email and your password will remain unchanged.
+
+Best regards,
+MonkeyZ Support Team"""
+        elif template_type == "otp":
+            subject = "Your One-Time Password (OTP)"
+            body = f"Hello,\n\nYour OTP is: {template_params.get('otp')}\n\nDo not share this code."
+        elif template_type == "welcome":
+            subject = "Welcome to MonkeyZ!"
+            body = f"Hello {template_params.get('username', '')},\n\nWelcome to MonkeyZ! We're glad to have you."
+        elif template_type == "contact_us":
+            subject = "Contact Form Submission"
+            body = f"Name: {template_params.get('from_name', '')}\nEmail: {template_params.get('to_email', '')}\nMessage: {template_params.get('message', '')}"
+        elif template_type == "auto_reply":
+            subject = template_params.get('subject', 'Auto Reply')
+            body = template_params.get('message', '')
+        else:
+            body = str(template_params)
+
+        to_email = template_params.get('to_email')
+        queued = await enqueue_email(to=to_email, subject=subject, body=body, kind=template_type)
+        if queued:
+            logging.info(f"[SMTP] Queued {template_type} email to {to_email}")
+        return queued
+    except Exception as e:
+        logging.error(f"[SMTP] Error queueing {template_type} email: {e}")
+        return False
+
+async def send_password_reset_email(to_email: str, reset_link: str) -> bool:
+    """
+    Send a password reset email.
+    
+    Args:
+        to_email (str): Recipient's email address
+        reset_link (str): Password reset link
+    """
+    template_params = {
+        "to_email": to_email,
+        "email": to_email,
+        "reset_link": reset_link,
+        "link": reset_link  # Keep both for compatibility
+    }
+    return await _send_email("password_reset", template_params)
+
+async def send_otp_email(to_email: str, otp: str) -> bool:
+    """
+    Send a one-time password email.
+    
+    Args:
+        to_email (str): Recipient's email address
+        otp (str): One-time password
+    """
+    template_params = {
+        "to_email": to_email,
+        "otp": otp
+    }
+    return await _send_email("otp", template_params)
+
+async def send_welcome_email(to_email: str, username: str) -> bool:
+    """
+    Send a welcome email.
+    
+    Args:
+        to_email (str): Recipient's email address
+        username (str): User's username
+    """
+    template_params = {
+        "to_email": to_email,
+        "email": to_email,
+        "username": username
+    }
+    return await _send_email("welcome", template_params)
+
+async def send_contact_email(to_email: str, name: str, message: str) -> bool:
+    """
+    Send a contact form email.
+    
+    Args:
+        to_email (str): Recipient's email address
+        name (str): Sender's name
+        message (str): Message content
+    """
+    template_params = {
+        "to_email": to_email,
+        "from_name": name,
+        "message": message
+    }
+    return await _send_email("contact_us", template_params)
+
+async def send_auto_reply_email(to_email: str, subject: str, message: str) -> bool:
+    """
+    Send an auto-reply email.
+    
+    Args:
+        to_email (str): Recipient's email address
+        subject (str): Email subject
+        message (str): Message content
+    """
+    template_params = {
+        "to_email": to_email,
+        "subject": subject,
+        "message": message
+    }
+    return await _send_email("auto_reply", template_params)
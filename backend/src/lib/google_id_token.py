@@ -0,0 +1,155 @@
+"""
+Local verification of Google Sign-In ID tokens.
+
+Tokens are checked against Google's published signing keys (JWKS) instead of calling
+the tokeninfo endpoint on every login. The key set is fetched off the event loop, kept
+until the expiry announced in its Cache-Control header and refreshed in the background
+shortly before that. A token signed with an unknown key id triggers one refresh, at most
+every GOOGLE_JWKS_MIN_REFRESH_SECONDS.
+
+Set GOOGLE_JWKS_FILE to a JWKS json file to verify against a fixed key set without any
+network access (tests, offline development).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from jose import jwk, jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_GOOGLE_CLIENT_ID = "946645411512-tn9qmppcsnp5oqqo88ivkuapou2cmg53.apps.googleusercontent.com"
+
+
+class GoogleTokenError(ValueError):
+    """The credential is not a valid Google ID token for this application."""
+
+
+class GoogleIdTokenVerifier:
+    def __init__(self, client_id: str, jwks_url: str = GOOGLE_JWKS_URL, jwks_file: Optional[str] = None):
+        self.client_id = client_id
+        self.jwks_url = jwks_url
+        self.jwks_file = jwks_file
+        self.min_refresh_interval = float(os.getenv("GOOGLE_JWKS_MIN_REFRESH_SECONDS", "60"))
+        self.default_max_age = float(os.getenv("GOOGLE_JWKS_DEFAULT_MAX_AGE_SECONDS", "3600"))
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _max_age(cache_control: str) -> Optional[float]:
+        match = re.search(r"max-age=(\d+)", cache_control or "")
+        return float(match.group(1)) if match else None
+
+    def _fetch_jwks(self):
+        """Blocking fetch, run in a worker thread. Returns (jwks, max_age)."""
+        if self.jwks_file:
+            with open(self.jwks_file, "r", encoding="utf-8") as f:
+                return json.load(f), None
+        response = requests.get(self.jwks_url, timeout=10)
+        response.raise_for_status()
+        return response.json(), self._max_age(response.headers.get("Cache-Control", ""))
+
+    async def refresh(self) -> None:
+        """Reload the key set (single flight: concurrent callers share one fetch)."""
+        started = time.monotonic()
+        async with self._lock:
+            if self._last_fetch > started:
+                return
+            jwks, max_age = await asyncio.to_thread(self._fetch_jwks)
+            keys = {}
+            for key in jwks.get("keys", []):
+                try:
+                    keys[key["kid"]] = jwk.construct(key, key.get("alg", "RS256"))
+                except Exception as e:
+                    logger.warning(f"[Google OAuth] Skipping unusable signing key {key.get('kid')}: {e}")
+            self._keys = keys
+            self._last_fetch = time.monotonic()
+            self._expires_at = float("inf") if self.jwks_file else self._last_fetch + (max_age or self.default_max_age)
+            logger.info(f"[Google OAuth] Loaded {len(keys)} Google signing keys")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            # Refresh a little before the announced expiry, retry sooner after a failure
+            delay = max(self._expires_at - time.monotonic() - 300, self.min_refresh_interval)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"[Google OAuth] Background JWKS refresh failed: {e}")
+
+    def start_background_refresh(self) -> None:
+        if self.jwks_file or (self._refresh_task and not self._refresh_task.done()):
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _get_key(self, kid: Optional[str]):
+        if not self._keys or time.monotonic() >= self._expires_at:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if not self._keys:
+                    raise
+                logger.warning(f"[Google OAuth] JWKS refresh failed, using the previous keys: {e}")
+            self.start_background_refresh()
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_fetch >= self.min_refresh_interval:
+            # Google rotated its keys before our copy expired
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def verify(self, credential: str) -> Dict[str, Any]:
+        """
+        Verifies signature, audience, issuer and expiry of a Google ID token.
+
+        Returns:
+            Dict[str, Any]: The token claims (email, name, sub, ...).
+
+        Raises:
+            GoogleTokenError: If the token is invalid.
+        """
+        try:
+            kid = jwt.get_unverified_header(credential).get("kid")
+        except JWTError as e:
+            raise GoogleTokenError(f"Malformed Google token: {e}")
+        try:
+            key = await self._get_key(kid)
+        except Exception as e:
+            logger.error(f"[Google OAuth] Could not load Google signing keys: {e}")
+            raise GoogleTokenError("Google signing keys unavailable")
+        if key is None:
+            raise GoogleTokenError("Google token signed with an unknown key")
+        try:
+            return jwt.decode(
+                credential, key, algorithms=["RS256"], audience=self.client_id, issuer=GOOGLE_ISSUERS,
+                options={"verify_at_hash": False, "leeway": 60},
+            )
+        except JWTError as e:
+            raise GoogleTokenError(f"Invalid Google token: {e}")
+
+
+google_token_verifier = GoogleIdTokenVerifier(
+    client_id=os.getenv("GOOGLE_CLIENT_ID", DEFAULT_GOOGLE_CLIENT_ID),
+    jwks_url=os.getenv("GOOGLE_JWKS_URL", GOOGLE_JWKS_URL),
+    jwks_file=os.getenv("GOOGLE_JWKS_FILE") or None,
+)
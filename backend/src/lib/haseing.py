@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import status
+from passlib.context import CryptContext
+
+from src.base_exception.base_exception import BaseException
+
+pwa_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashingBusyError(BaseException):
+    def __init__(self, msg: str = "Too many concurrent sign-in requests, please try again shortly.") -> None:
+        super().__init__(msg, "[HashingBusyError]:", status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class HashingPool:
+    """
+    Runs bcrypt on a small dedicated thread pool so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and ``max_pending`` more are queued for a worker.
+    Calls beyond that wait for a slot and raise HashingBusyError after ``queue_timeout`` seconds.
+    """
+
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers + self.max_pending)
+        submitted = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HashingBusyError()
+        self.in_flight += 1
+        try:
+            started = []
+
+            def job():
+                started.append(time.perf_counter())
+                return func(*args)
+
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+            finished = time.perf_counter()
+            wait = started[0] - submitted
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += finished - started[0]
+            self.completed += 1
+            return result
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_hash_ms": round(self.total_run / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+hashing_pool = HashingPool(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")),
+    queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "5")),
+)
+
+
+class Hase:
+    @staticmethod
+    def bcrypt(password: str) -> str:
+        return pwa_cxt.hash(password)
+
+    @staticmethod
+    def verify(password: str, hashed_password: str) -> bool:
+        return pwa_cxt.verify(password, hashed_password)
+
+    @staticmethod
+    async def bcrypt_async(password: str) -> str:
+        """``bcrypt`` on the hashing pool, for use inside request handlers."""
+        return await hashing_pool.run(pwa_cxt.hash, password)
+
+    @staticmethod
+    async def verify_async(password: str, hashed_password: str) -> bool:
+        """``verify`` on the hashing pool, for use inside request handlers."""
+        return await hashing_pool.run(pwa_cxt.verify, password, hashed_password)
@@ -0,0 +1,420 @@
+"""
+Structured logging configuration for MonkeyZ application.
+Provides centralized logging with proper formatting, rotation, and error tracking.
+
+Loggers only enqueue records (``NonBlockingQueueHandler``); a ``QueueListener`` thread
+formats them and writes the console and rotating files, so request handlers never
+block on disk I/O. Records below WARNING pass ``LogSampler`` first, which applies the
+rate limits from LOG_RATE_LIMITS and, when LOG_SAMPLE_BURST is set, samples call
+sites that repeat (off by default, so per-order lines are never dropped silently).
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import json
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+
+class StructuredFormatter(logging.Formatter):
+    """Custom formatter that outputs structured JSON logs."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        # Base log entry
+        log_entry = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        
+        # Add extra fields if present
+        if hasattr(record, 'user_id'):
+            log_entry['user_id'] = record.user_id
+        if hasattr(record, 'request_id'):
+            log_entry['request_id'] = record.request_id
+        if hasattr(record, 'ip_address'):
+            log_entry['ip_address'] = record.ip_address
+        if hasattr(record, 'endpoint'):
+            log_entry['endpoint'] = record.endpoint
+        if hasattr(record, 'method'):
+            log_entry['method'] = record.method
+        if hasattr(record, 'duration'):
+            log_entry['duration_ms'] = record.duration
+        if hasattr(record, 'status_code'):
+            log_entry['status_code'] = record.status_code
+            
+        # Add exception info if present
+        if record.exc_info:
+            log_entry['exception'] = {
+                'type': record.exc_info[0].__name__,
+                'message': str(record.exc_info[1]),
+                'traceback': self.formatException(record.exc_info)
+            }
+            
+        return json.dumps(log_entry)
+
+class RequestLogger:
+    """Helper class for logging HTTP requests."""
+    
+    @staticmethod
+    def log_request(
+        logger: logging.Logger,
+        method: str,
+        path: str,
+        ip_address: str,
+        user_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        duration: Optional[float] = None,
+        status_code: Optional[int] = None,
+        level: int = logging.INFO
+    ):
+        """Log an HTTP request with structured data."""
+        extra = {
+            'method': method,
+            'endpoint': path,
+            'ip_address': ip_address,
+        }
+        
+        if user_id:
+            extra['user_id'] = user_id
+        if request_id:
+            extra['request_id'] = request_id
+        if duration:
+            extra['duration'] = duration
+        if status_code:
+            extra['status_code'] = status_code
+            
+        message = f"{method} {path}"
+        if status_code:
+            message += f" - {status_code}"
+        if duration:
+            message += f" ({duration:.2f}ms)"
+            
+        logger.log(level, message, extra=extra)
+
+def _parse_rate_limits(value: str) -> Dict[str, float]:
+    """Parses LOG_RATE_LIMITS ("logger.name=records_per_second,...")."""
+    limits = {}
+    for entry in value.split(","):
+        name, _, rate = entry.partition("=")
+        if name.strip() and rate.strip():
+            try:
+                limits[name.strip()] = float(rate)
+            except ValueError:
+                pass
+    return limits
+
+
+class LogSampler(logging.Filter):
+    """
+    Drops repetitive records below WARNING before they are enqueued.
+
+    * rate_limits - records per second allowed for a logger prefix, one token bucket
+      shared by the prefix and all its children (the longest matching prefix applies)
+    * burst / sample_every - per call site (file, line), the first ``burst`` records of
+      each ``window`` seconds pass, then one in ``sample_every``; burst 0 disables it
+    """
+
+    MAX_TRACKED_SITES = 10000
+
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None, burst: int = 0,
+                 sample_every: int = 100, window: float = 60.0):
+        super().__init__()
+        self.rate_limits = rate_limits or {}
+        self.burst = burst
+        self.sample_every = max(sample_every, 1)
+        self.window = window
+        self._prefix_by_logger: Dict[str, Optional[str]] = {}
+        self._buckets: Dict[str, List[float]] = {}
+        self._sites: Dict[Tuple[str, int], List[float]] = {}
+        self.rate_limited = 0
+        self.sampled_out = 0
+
+    def _prefix_for(self, name: str) -> Optional[str]:
+        """The configured prefix whose limit applies to logger ``name``, if any."""
+        if name not in self._prefix_by_logger:
+            matches = [prefix for prefix in self.rate_limits if name == prefix or name.startswith(prefix + ".")]
+            self._prefix_by_logger[name] = max(matches, key=len) if matches else None
+        return self._prefix_by_logger[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+
+        prefix = self._prefix_for(record.name)
+        if prefix is not None:
+            limit = self.rate_limits[prefix]
+            bucket = self._buckets.get(prefix)
+            if bucket is None:
+                bucket = self._buckets[prefix] = [max(limit, 1.0), now]
+            bucket[0] = min(max(limit, 1.0), bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                self.rate_limited += 1
+                return False
+            bucket[0] -= 1.0
+
+        if self.burst > 0:
+            site = (record.pathname, record.lineno)
+            entry = self._sites.get(site)
+            if entry is None or now - entry[1] >= self.window:
+                if entry is None and len(self._sites) >= self.MAX_TRACKED_SITES:
+                    self._sites.clear()
+                entry = self._sites[site] = [0, now]
+            entry[0] += 1
+            if entry[0] > self.burst and (entry[0] - self.burst) % self.sample_every:
+                self.sampled_out += 1
+                return False
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records for the listener thread; drops them instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change after the call returns); formatting,
+        # including exc_info, is left to the handlers on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listeners: List[logging.handlers.QueueListener] = []
+_queue_handlers: List[NonBlockingQueueHandler] = []
+_sampler: Optional[LogSampler] = None
+
+
+def _attach_queue(logger: logging.Logger, handlers: List[logging.Handler], queue_size: int,
+                  sampler: Optional[LogSampler] = None) -> None:
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    if sampler is not None:
+        queue_handler.addFilter(sampler)
+    logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    _queue_handlers.append(queue_handler)
+
+
+def shutdown_logging() -> None:
+    """Stops the listener threads after they have written every queued record."""
+    while _listeners:
+        _listeners.pop().stop()
+    for handler in _queue_handlers:
+        for logger in (logging.getLogger(), get_security_logger()):
+            logger.removeHandler(handler)
+    _queue_handlers.clear()
+
+
+atexit.register(shutdown_logging)
+
+
+def logging_stats() -> Dict[str, Any]:
+    return {
+        "queued": sum(handler.queue.qsize() for handler in _queue_handlers),
+        "dropped": sum(handler.dropped for handler in _queue_handlers),
+        "rate_limited": _sampler.rate_limited if _sampler else 0,
+        "sampled_out": _sampler.sampled_out if _sampler else 0,
+    }
+
+
+def setup_logging():
+    """Configure structured logging for the application."""
+    global _sampler
+    shutdown_logging()
+    
+    # Create logs directory if it doesn't exist
+    log_dir = Path("logs")
+    log_dir.mkdir(exist_ok=True)
+    
+    # Get log level from environment
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    
+    # Configure root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, log_level))
+    
+    # Remove existing handlers
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    
+    # Create formatters
+    structured_formatter = StructuredFormatter()
+    console_formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # Handlers run on the listener threads; loggers only get the queue handlers
+    handlers = []
+    
+    # Console handler (for development)
+    if os.getenv("ENVIRONMENT", "development").lower() == "development":
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(console_formatter)
+        console_handler.setLevel(logging.DEBUG)
+        handlers.append(console_handler)
+    
+    # File handler for all logs
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_dir / "monkeyz.log",
+        maxBytes=50 * 1024 * 1024,  # 50MB
+        backupCount=10
+    )
+    file_handler.setFormatter(structured_formatter)
+    file_handler.setLevel(logging.INFO)
+    handlers.append(file_handler)
+    
+    # Error file handler
+    error_handler = logging.handlers.RotatingFileHandler(
+        log_dir / "monkeyz_errors.log",
+        maxBytes=50 * 1024 * 1024,  # 50MB
+        backupCount=10
+    )
+    error_handler.setFormatter(structured_formatter)
+    error_handler.setLevel(logging.ERROR)
+    handlers.append(error_handler)
+    
+    queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    _sampler = LogSampler(
+        rate_limits=_parse_rate_limits(os.getenv("LOG_RATE_LIMITS", "")),
+        burst=int(os.getenv("LOG_SAMPLE_BURST", "0")),
+        sample_every=int(os.getenv("LOG_SAMPLE_EVERY", "100")),
+        window=float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", "60")),
+    )
+    _attach_queue(root_logger, handlers, queue_size, _sampler)
+    
+    # Security events handler
+    security_handler = logging.handlers.RotatingFileHandler(
+        log_dir / "security.log",
+        maxBytes=50 * 1024 * 1024,  # 50MB
+        backupCount=20
+    )
+    security_handler.setFormatter(structured_formatter)
+    
+    # Create security logger
+    security_logger = logging.getLogger("security")
+    for handler in security_logger.handlers[:]:
+        security_logger.removeHandler(handler)
+    _attach_queue(security_logger, [security_handler], queue_size)
+    security_logger.setLevel(logging.WARNING)
+    
+    # Disable propagation to avoid duplicate logs
+    security_logger.propagate = False
+    
+    logging.info("Logging configured successfully")
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger instance with the given name."""
+    return logging.getLogger(name)
+
+def get_security_logger() -> logging.Logger:
+    """Get the security logger instance."""
+    return logging.getLogger("security")
+
+# Error tracking functions
+class ErrorTracker:
+    """Simple error tracking system."""
+    
+    def __init__(self):
+        self.logger = get_logger("error_tracker")
+        
+    def capture_exception(
+        self,
+        exception: Exception,
+        user_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        extra_data: Optional[Dict[str, Any]] = None
+    ):
+        """Capture and log an exception with context."""
+        extra = {}
+        
+        if user_id:
+            extra['user_id'] = user_id
+        if request_id:
+            extra['request_id'] = request_id
+        if extra_data:
+            extra.update(extra_data)
+            
+        self.logger.error(
+            f"Exception occurred: {type(exception).__name__}: {str(exception)}",
+            exc_info=True,
+            extra=extra
+        )
+        
+    def capture_message(
+        self,
+        message: str,
+        level: str = "error",
+        user_id: Optional[str] = None,
+        extra_data: Optional[Dict[str, Any]] = None
+    ):
+        """Capture a custom message."""
+        extra = {}
+        
+        if user_id:
+            extra['user_id'] = user_id
+        if extra_data:
+            extra.update(extra_data)
+            
+        log_level = getattr(logging, level.upper(), logging.ERROR)
+        self.logger.log(log_level, message, extra=extra)
+
+# Global error tracker instance
+error_tracker = ErrorTracker()
+
+# Convenience functions
+def log_security_event(message: str, **kwargs):
+    """Log a security event."""
+    security_logger = get_security_logger()
+    security_logger.warning(message, extra=kwargs)
+
+def log_authentication_failure(ip_address: str, username: str, reason: str):
+    """Log authentication failure."""
+    log_security_event(
+        f"Authentication failure for user '{username}': {reason}",
+        ip_address=ip_address,
+        username=username,
+        event_type="auth_failure"
+    )
+
+def log_rate_limit_exceeded(ip_address: str, endpoint: str):
+    """Log rate limit exceeded."""
+    log_security_event(
+        f"Rate limit exceeded for IP {ip_address} on endpoint {endpoint}",
+        ip_address=ip_address,
+        endpoint=endpoint,
+        event_type="rate_limit_exceeded"
+    )
+
+def log_suspicious_activity(ip_address: str, activity: str, **kwargs):
+    """Log suspicious activity."""
+    log_security_event(
+        f"Suspicious activity from IP {ip_address}: {activity}",
+        ip_address=ip_address,
+        activity=activity,
+        event_type="suspicious_activity",
+        **kwargs
+    )
@@ -0,0 +1,82 @@
+"""
+Custom JSON encoder for MongoDB ObjectId.
+
+``dumps_compact_bytes`` and ``MongoJSONResponse`` serialize BSON-native values (ObjectId,
+datetime, Decimal128) and Pydantic models straight to UTF-8 bytes in one pass, using
+orjson when it is installed and the stdlib encoder otherwise.
+"""
+
+from json import JSONEncoder
+from datetime import datetime
+from decimal import Decimal
+import json
+from typing import Any
+
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see requirements.txt
+    orjson = None
+
+class MongoJSONEncoder(JSONEncoder):
+    def default(self, o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        return super().default(o)
+
+def mongo_json_serializer(obj):
+    """
+    JSON serializer that can handle MongoDB ObjectId and datetime
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+def bson_json_serializer(obj):
+    """
+    Fallback for values the JSON encoder does not know: BSON types, Decimal,
+    sets and Pydantic models (dumped by alias, like FastAPI responses)
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(by_alias=True)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+def dumps_with_objectid(obj):
+    """
+    JSON dumps that can handle MongoDB ObjectId
+    """
+    return json.dumps(obj, default=mongo_json_serializer)
+
+def dumps_compact_bytes(obj) -> bytes:
+    """
+    Compact UTF-8 JSON bytes for pre-serialized responses (BSON and Pydantic aware)
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=bson_json_serializer, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=bson_json_serializer, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class MongoJSONResponse(JSONResponse):
+    """
+    JSON response rendered with ``dumps_compact_bytes``: return it from a route to skip
+    FastAPI's ``jsonable_encoder``/response_model pass over large lists. Documents and
+    model instances go in as they are; the route's response_model then only documents the shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_compact_bytes(content)
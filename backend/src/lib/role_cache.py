@@ -0,0 +1,74 @@
+"""
+Role lookup for authorization checks, without a user query on every request.
+
+Access tokens carry the user's role as a signed ``role`` claim. A claim for a
+non-privileged role is trusted as is, since it can never grant more than the user already
+has. Privileged claims and tokens without a claim are confirmed against the database once
+and the result is cached (username -> role) for ``ROLE_CACHE_TTL_SECONDS``.
+
+Call ``role_cache.invalidate(username)`` whenever a role changes (see
+UserCollection.set_user_role, used by PATCH /admin/users/{username}/role). Roles edited
+directly in the database bypass it and are picked up when the entry expires. The cache is
+per process, so other workers pick a demotion up when their entry expires.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from src.lib.ttl_cache import TTLCache, MISSING
+from src.models.user.user import Role
+
+
+def role_claim(role: Role) -> str:
+    """Value stored in the access token ``role`` claim."""
+    return role.name
+
+
+def parse_role_claim(claim: Optional[str]) -> Optional[Role]:
+    if not claim:
+        return None
+    try:
+        return Role[claim]
+    except KeyError:
+        return None
+
+
+class RoleCache:
+    def __init__(self):
+        self._cache = TTLCache(
+            ttl=float(os.getenv("ROLE_CACHE_TTL_SECONDS", "300")),
+            max_size=int(os.getenv("ROLE_CACHE_MAX_ENTRIES", "4096")),
+        )
+
+    async def get_role(self, username: str, claimed_role: Optional[str], user_collection) -> Optional[Role]:
+        """
+        Current role of ``username``, or None if the user does not exist.
+
+        Args:
+            username: The token subject.
+            claimed_role: The token's ``role`` claim, if any.
+            user_collection: UserCollection used on a cache miss.
+        """
+        cached = self._cache.get(username)
+        if cached is not MISSING:
+            return cached
+        claimed = parse_role_claim(claimed_role)
+        if claimed is not None and claimed != Role.manager:
+            return claimed
+        user = await user_collection.get_user_by_username(username)
+        role = user.role if user else None
+        self._cache.set(username, role)
+        return role
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        """Forget the cached role of ``username``, or of every user."""
+        if username is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(username)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+role_cache = RoleCache()
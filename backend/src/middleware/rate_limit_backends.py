@@ -0,0 +1,206 @@
+"""
+Storage backends for the rate limiting middleware.
+
+All backends implement a sliding-window counter: per key only the request count of the
+current and previous fixed window is kept, and the previous count is weighted by how much
+of it still overlaps the sliding window. Memory per key is constant, unlike a timestamp log.
+
+* memory  - per-process dict with LRU eviction (default; each worker enforces its own limit)
+* mongodb - one document per key in a TTL collection, shared by all workers
+* redis   - one hash per key updated by a Lua script, shared by all workers (needs ``redis``)
+
+Every check is a single round trip. Shared backends fail open: if the store is unavailable
+the request is allowed and the error is logged.
+"""
+
+import abc
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+
+from pymongo import ReturnDocument
+
+from ..lib.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _window_position(now: float, window: int) -> Tuple[int, float]:
+    """Index of the current fixed window and the fraction of it that has elapsed."""
+    index = math.floor(now / window)
+    return index, (now - index * window) / window
+
+
+def _retry_after(now: float, window: int) -> int:
+    index, _ = _window_position(now, window)
+    return max(1, math.ceil((index + 1) * window - now))
+
+
+class RateLimitBackend(abc.ABC):
+    """Interface: ``hit`` counts a request for ``key`` unless it would exceed ``limit`` per ``window`` seconds."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        """Returns (allowed, retry_after_seconds)."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [window index, current window count, previous window count]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+        self.evictions = 0
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        now = time.time()
+        index, elapsed = _window_position(now, window)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [index, 0, 0]
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._counters.move_to_end(key)
+            if counter[0] != index:
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+
+        if counter[2] * (1 - elapsed) + counter[1] >= limit:
+            return False, _retry_after(now, window)
+        counter[1] += 1
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "keys": len(self._counters), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """Counters in a MongoDB collection; documents expire through a TTL index on ``expiresAt``."""
+
+    name = "mongodb"
+
+    def __init__(self, collection_name: str = "rate_limits"):
+        self.collection_name = collection_name
+        self._collection = None
+        self.errors = 0
+
+    async def _get_collection(self):
+        if self._collection is None:
+            from ..lib.database_manager import get_database
+            db = await get_database()
+            collection = db[self.collection_name]
+            await collection.create_index("expiresAt", expireAfterSeconds=0)
+            self._collection = collection
+        return self._collection
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        now = time.time()
+        index, elapsed = _window_position(now, window)
+        # Stage 1 rolls the counters over to the current window, stage 2 counts the
+        # request only if the weighted estimate is still below the limit.
+        pipeline = [
+            {"$set": {
+                "prev": {"$switch": {"branches": [
+                    {"case": {"$eq": ["$window", index]}, "then": {"$ifNull": ["$prev", 0]}},
+                    {"case": {"$eq": ["$window", index - 1]}, "then": {"$ifNull": ["$curr", 0]}},
+                ], "default": 0}},
+                "curr": {"$cond": [{"$eq": ["$window", index]}, {"$ifNull": ["$curr", 0]}, 0]},
+                "window": index,
+            }},
+            {"$set": {"allowed": {"$lt": [
+                {"$add": [{"$multiply": ["$prev", 1 - elapsed]}, "$curr"]}, limit
+            ]}}},
+            {"$set": {
+                "curr": {"$cond": ["$allowed", {"$add": ["$curr", 1]}, "$curr"]},
+                "expiresAt": datetime.fromtimestamp((index + 2) * window, timezone.utc),
+            }},
+        ]
+        try:
+            collection = await self._get_collection()
+            doc = await collection.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True,
+                projection={"allowed": 1}, return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Rate limit backend '{self.name}' unavailable, allowing request: {e}")
+            return True, 0
+        if doc and doc.get("allowed") is False:
+            return False, _retry_after(now, window)
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "collection": self.collection_name, "errors": self.errors}
+
+
+# KEYS[1] = counter hash; ARGV = window index, elapsed fraction, limit, ttl seconds
+_REDIS_SLIDING_WINDOW = """
+local index = tonumber(ARGV[1])
+local window = tonumber(redis.call('HGET', KEYS[1], 'window') or '-1')
+local curr = tonumber(redis.call('HGET', KEYS[1], 'curr') or '0')
+local prev = tonumber(redis.call('HGET', KEYS[1], 'prev') or '0')
+if window ~= index then
+    if window == index - 1 then prev = curr else prev = 0 end
+    curr = 0
+end
+local allowed = prev * (1 - tonumber(ARGV[2])) + curr < tonumber(ARGV[3])
+if allowed then curr = curr + 1 end
+redis.call('HSET', KEYS[1], 'window', index, 'curr', curr, 'prev', prev)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+if allowed then return 1 else return 0 end
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Counters in Redis (or any server speaking its protocol with Lua scripting)."""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis  # optional dependency, only needed for this backend
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_SLIDING_WINDOW)
+        self.prefix = prefix
+        self.errors = 0
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        now = time.time()
+        index, elapsed = _window_position(now, window)
+        try:
+            allowed = await self._script(keys=[self.prefix + key], args=[index, elapsed, limit, 2 * window])
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Rate limit backend '{self.name}' unavailable, allowing request: {e}")
+            return True, 0
+        if not allowed:
+            return False, _retry_after(now, window)
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "errors": self.errors}
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    """Backend selected by RATE_LIMIT_BACKEND (memory, mongodb or redis)."""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "mongodb":
+        return MongoRateLimitBackend(os.getenv("RATE_LIMIT_COLLECTION", "rate_limits"))
+    if backend == "redis":
+        try:
+            return RedisRateLimitBackend(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+        except ImportError:
+            logger.error("RATE_LIMIT_BACKEND=redis needs the 'redis' package, falling back to memory")
+    elif backend != "memory":
+        logger.error(f"Unknown RATE_LIMIT_BACKEND '{backend}', falling back to memory")
+    return InMemoryRateLimitBackend(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
@@ -1,8 +1,10 @@
 """
 Rate limiting middleware for FastAPI application.
 Implements both global rate limiting and specific limits for authentication endpoints.
+Request counting is delegated to a pluggable backend (see rate_limit_backends).
 """
 
+import os
 import time
 import asyncio
 from collections import defaultdict, deque
@@ -11,13 +13,16 @@ from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 
 from ..lib.logging_config import get_logger, log_rate_limit_exceeded, log_authentication_failure
+from .rate_limit_backends import RateLimitBackend, create_rate_limit_backend
 
 logger = get_logger(__name__)
 
 class RateLimiter:
-    def __init__(self):
-        # Store request timestamps per IP/user
-        self.request_history: Dict[str, deque] = defaultdict(lambda: deque())
+    def __init__(self, backend: Optional[RateLimitBackend] = None):
+        # Sliding-window request counters per IP
+        self.backend = backend or create_rate_limit_backend()
+        # Bound on the per-IP failed login / ban dicts below (oldest IPs are dropped first)
+        self.max_tracked_ips = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
         # Track failed login attempts
         self.failed_attempts: Dict[str, deque] = defaultdict(lambda: deque())
         # Track temporary bans
@@ -67,10 +72,16 @@ class RateLimiter:
                 del self.banned_ips[client_ip]
         return False
     
+    def _evict_oldest(self, entries: dict) -> None:
+        """Drop the least recently inserted IPs once ``entries`` exceeds max_tracked_ips."""
+        while len(entries) > self.max_tracked_ips:
+            del entries[next(iter(entries))]
+
     def _ban_ip(self, client_ip: str) -> None:
         """Temporarily ban an IP address."""
         ban_until = time.time() + self.BAN_DURATION
         self.banned_ips[client_ip] = ban_until
+        self._evict_oldest(self.banned_ips)
         logger.warning(f"IP {client_ip} has been temporarily banned until {ban_until}")
     
     async def check_rate_limit(self, request: Request, is_auth_endpoint: bool = False) -> Optional[JSONResponse]:
@@ -92,28 +103,20 @@ class RateLimiter:
                 }
             )
         
-        # Get request history for this IP
-        request_queue = self.request_history[client_ip]
-        
-        # Clean up old requests
-        self._cleanup_old_requests(request_queue)
-        
         # Determine rate limit based on endpoint type
         limit = self.AUTH_LIMIT if is_auth_endpoint else self.GENERAL_LIMIT
         
-        # Check if limit exceeded
-        if len(request_queue) >= limit:
+        # Count the request against this IP's window (rejected requests are not counted)
+        allowed, retry_after = await self.backend.hit(client_ip, limit, self.WINDOW_SIZE)
+        if not allowed:
             log_rate_limit_exceeded(client_ip, str(request.url.path))
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": f"Rate limit exceeded. Maximum {limit} requests per minute allowed.",
-                    "retry_after": 60
+                    "retry_after": retry_after
                 }
             )
-        
-        # Add current request to history
-        request_queue.append(current_time)
         return None
     
     def record_failed_login(self, client_ip: str) -> bool:
@@ -123,6 +126,7 @@ class RateLimiter:
         """
         current_time = time.time()
         failed_queue = self.failed_attempts[client_ip]
+        self._evict_oldest(self.failed_attempts)
         
         # Clean up old failed attempts (5 minute window for login attempts)
         self._cleanup_old_requests(failed_queue, window_size=300)
@@ -143,7 +147,7 @@ class RateLimiter:
     def record_successful_login(self, client_ip: str) -> None:
         """Clear failed login attempts for IP after successful login."""
         if client_ip in self.failed_attempts:
-            self.failed_attempts[client_ip].clear()
+            del self.failed_attempts[client_ip]
             logger.info(f"Cleared failed login attempts for IP {client_ip} after successful login")
 
 # Global rate limiter instance
@@ -3,9 +3,13 @@ Security middleware for FastAPI application.
 Implements comprehensive security headers, CSRF protection, and security policies.
 """
 
+import base64
+import hashlib
+import hmac
+import os
 import secrets
 import time
-from typing import Dict, Optional, Set
+from typing import Optional, Set
 from fastapi import Request, Response, HTTPException, status
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -56,39 +60,66 @@ class SecurityHeaders:
     )
 
 class CSRFProtection:
-    """CSRF protection utility."""
+    """
+    Stateless CSRF tokens: ``<issued_at>.<nonce>.<signature>``, signed with HMAC-SHA256.
+
+    Validation only recomputes the signature and checks the age, so nothing is stored
+    and every worker (and every restart) sharing the secret accepts the same tokens.
+    The key comes from CSRF_SECRET_KEY, or is derived from SECRET_KEY.
+    """
+    
+    CLOCK_SKEW_SECONDS = 60  # tolerated issued_at drift between hosts
+    
+    def __init__(self, secret: Optional[str] = None, token_lifetime: Optional[int] = None):
+        secret = secret or os.getenv("CSRF_SECRET_KEY") or self._derive_from_jwt_secret()
+        if not secret:
+            logger.warning("Neither CSRF_SECRET_KEY nor SECRET_KEY is set; CSRF tokens are only valid in this process")
+            secret = secrets.token_urlsafe(32)
+        self._key = secret.encode("utf-8")
+        self.token_lifetime = token_lifetime or int(os.getenv("CSRF_TOKEN_LIFETIME_SECONDS", "3600"))
+    
+    @staticmethod
+    def _derive_from_jwt_secret() -> Optional[str]:
+        jwt_secret = str(os.getenv("SECRET_KEY", "")).strip('"\'')
+        if not jwt_secret:
+            return None
+        # A separate key, so a CSRF token can never double as anything signed with SECRET_KEY
+        return hmac.new(jwt_secret.encode("utf-8"), b"monkeyz-csrf-token", hashlib.sha256).hexdigest()
     
-    def __init__(self):
-        self.tokens: Dict[str, float] = {}  # token -> timestamp
-        self.token_lifetime = 3600  # 1 hour
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key, payload.encode("ascii"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
         
     def generate_token(self) -> str:
         """Generate a new CSRF token."""
-        token = secrets.token_urlsafe(32)
-        self.tokens[token] = time.time()
-        return token
+        payload = f"{int(time.time()):x}.{secrets.token_urlsafe(16)}"
+        return f"{payload}.{self._sign(payload)}"
     
     def validate_token(self, token: str) -> bool:
         """Validate a CSRF token."""
-        if not token or token not in self.tokens:
+        if not token or len(token) > 128:
+            return False
+        payload, _, signature = token.rpartition(".")
+        issued_hex, _, nonce = payload.partition(".")
+        if not nonce:
+            return False
+        try:
+            issued_at = int(issued_hex, 16)
+        except ValueError:
             return False
         
-        # Check if token is expired
-        if time.time() - self.tokens[token] > self.token_lifetime:
-            del self.tokens[token]
+        # Check if token is expired (or issued in the future)
+        age = time.time() - issued_at
+        if age > self.token_lifetime or age < -self.CLOCK_SKEW_SECONDS:
             return False
         
-        return True
-    
-    def cleanup_expired_tokens(self):
-        """Remove expired tokens."""
-        current_time = time.time()
-        expired_tokens = [
-            token for token, timestamp in self.tokens.items()
-            if current_time - timestamp > self.token_lifetime
-        ]
-        for token in expired_tokens:
-            del self.tokens[token]
+        try:
+            return hmac.compare_digest(signature, self._sign(payload))
+        except (UnicodeEncodeError, TypeError):  # non-ASCII header value
+            return False
+
+# Global CSRF protection instance, shared by the middleware and the token endpoint
+csrf_protection = CSRFProtection()
 
 class SecurityMiddleware(BaseHTTPMiddleware):
     """Comprehensive security middleware."""
@@ -96,7 +127,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, is_development: bool = False):
         super().__init__(app)
         self.is_development = is_development
-        self.csrf_protection = CSRFProtection()
+        self.csrf_protection = csrf_protection
         
         # Endpoints that require CSRF protection
         self.csrf_protected_endpoints = {
@@ -258,15 +289,8 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         # Add security headers to response
         self._add_security_headers(response)
         
-        # Cleanup expired CSRF tokens periodically
-        if secrets.randbelow(100) == 0:  # 1% chance
-            self.csrf_protection.cleanup_expired_tokens()
-        
         return response
 
-# Global CSRF protection instance for external access
-csrf_protection = CSRFProtection()
-
 # Endpoint to get CSRF token
 def get_csrf_token() -> str:
     """Generate and return a new CSRF token."""
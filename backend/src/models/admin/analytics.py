@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 from datetime import datetime
 
 class DailySale(BaseModel):
@@ -11,3 +11,4 @@ class AdminAnalytics(BaseModel):
     totalOrders: int = 0
     averageOrderValue: float = 0 
     dailySales: List[DailySale] = []
+    ordersByStatus: Dict[str, int] = {}  # All-time, every status including cancelled
@@ -3,6 +3,14 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 
+
+def normalize_coupon_code(code: Any) -> Optional[str]:
+    """Canonical form of a coupon code (trimmed, lower-case) stored as ``codeNormalized`` on coupons and orders."""
+    if not isinstance(code, str):
+        return None
+    code = code.strip().lower()
+    return code or None
+
 class CouponAnalytics(BaseModel):
     total_orders: int = 0
     completed: int = 0
@@ -1,9 +1,9 @@
 from beanie import Document, PydanticObjectId  # Removed Indexed here, will define in Settings
-from typing import Optional
+from typing import Optional, Union
 from pydantic import BaseModel, Field
 from datetime import datetime
 from enum import Enum
-import pymongo  # Import pymongo for index types if needed later
+import pymongo
 
 
 class KeyStatus(str, Enum):
@@ -18,7 +18,7 @@ class Key(Document):
     status: KeyStatus = Field(default=KeyStatus.AVAILABLE)  # Removed Indexed()
     added_date: datetime = Field(default_factory=datetime.utcnow)
     used_date: Optional[datetime] = None
-    order_id: Optional[PydanticObjectId] = None  # Removed Indexed()
+    order_id: Optional[Union[PydanticObjectId, str]] = None  # ObjectId for manual orders, string for PayPal order IDs
 
     class Settings:
         name = "keys"
@@ -27,8 +27,16 @@ class Key(Document):
             "product_id",
             "status",
             "order_id",
-            # Example for a compound index or unique index if needed later:
-            # [("product_id", pymongo.ASCENDING), ("key_string", pymongo.ASCENDING), {"unique": True}],
+            # Serves fulfillment claims (oldest available key first) and per-product status counts
+            pymongo.IndexModel(
+                [("product_id", pymongo.ASCENDING), ("status", pymongo.ASCENDING), ("added_date", pymongo.ASCENDING)],
+                name="product_status_added",
+            ),
+            # Lookup used by key release and the idempotent cdKeys migration upserts
+            pymongo.IndexModel(
+                [("product_id", pymongo.ASCENDING), ("key_string", pymongo.ASCENDING)],
+                name="product_key_string",
+            ),
         ]
 
 
@@ -46,7 +54,7 @@ class BulkKeyCreateRequest(BaseModel):
 
 class KeyUpdateRequest(BaseModel):
     status: Optional[KeyStatus] = None
-    order_id: Optional[PydanticObjectId] = None
+    order_id: Optional[Union[PydanticObjectId, str]] = None
 
 
 class KeyResponse(BaseModel):
@@ -56,7 +64,7 @@ class KeyResponse(BaseModel):
     status: KeyStatus
     added_date: datetime
     used_date: Optional[datetime] = None
-    order_id: Optional[PydanticObjectId] = None
+    order_id: Optional[Union[PydanticObjectId, str]] = None
 
     class Config:
         populate_by_name = True
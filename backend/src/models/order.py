@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 from bson import ObjectId
@@ -42,6 +42,11 @@ class Order(BaseModel):
             datetime: lambda dt: dt.isoformat()
         }
 
+class OrderPage(BaseModel):
+    orders: List[Order]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+    limit: int
+
 class OrderStatusUpdateRequest(BaseModel):
     status: str
     note: Optional[str] = None
@@ -55,10 +60,10 @@ class StatusEnum(str, Enum):
     AWAITING_STOCK = "awaiting_stock"
     PARTIALLY_FULFILLED = "partially_fulfilled"
 
-def normalize_status(status: str) -> str:
-    """Normalizes a status string to a valid StatusEnum value or a default."""
+def normalize_status(status: str, default: Optional[str] = StatusEnum.PENDING.value) -> Optional[str]:
+    """Normalizes a status string to a valid StatusEnum value, or ``default`` if it matches none."""
     if not isinstance(status, str):
-        return StatusEnum.PENDING.value # Default for non-string inputs
+        return default # Default for non-string inputs
     
     s = status.lower().replace(" ", "_")
     
@@ -77,4 +82,11 @@ def normalize_status(status: str) -> str:
         if s == member.value:
             return member.value
             
-    return StatusEnum.PENDING.value # Default for unknown statuses
+    return default # Default for unknown statuses
+
+def normalize_email(email: Any) -> Optional[str]:
+    """Canonical form of a customer email (trimmed, lower-case) stored as ``emailNormalized`` on orders."""
+    if not isinstance(email, str):
+        return None
+    email = email.strip().lower()
+    return email or None
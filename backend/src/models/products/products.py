@@ -28,7 +28,8 @@ class Product(Document):
     price: int # Assuming price is an integer (e.g., cents) or float
     active: bool
     created_at: datetime # Consider default_factory=datetime.utcnow if not always provided
-    cdKeys: List[CDKey] = Field(default_factory=list)  # Added new field for CD keys
+    cdKeys: List[CDKey] = Field(default_factory=list)  # Legacy embedded keys; new keys live in the "keys" collection
+    keysMigration: Optional[dict] = None  # Set by src/scripts/migrate_cd_keys.py: {"status": "copying"|"done", ...}
     manages_cd_keys: bool = Field(default=True) # Ensures this field exists, default True is fine.
     is_new: bool = False  # New product tag
     percent_off: int = 0  # Discount percentage
@@ -47,6 +48,13 @@ class Product(Document):
         populate_by_name = True
         use_enum_values = True
 
+class CheckoutProduct(BaseModel):
+    """The product fields checkout reads, loaded in one batch by ProductsCollection.get_checkout_products."""
+    id: PydanticObjectId
+    name: Union[dict, str]
+    price: Union[int, float]
+    manages_cd_keys: bool = True
+
 class AddKeysRequest(BaseModel):
     keys: List[str] # This is good for adding new keys by string value
 
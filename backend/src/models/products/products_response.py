@@ -22,3 +22,23 @@ class ProductResponse(BaseModel):
 
 
 
+
+
+class StorefrontProductResponse(BaseModel):
+    """Compact public product shape: no key inventory, only a computed availableKeys count."""
+    id: str
+    name: dict  # {'en': str, 'he': str}
+    description: dict  # {'en': str, 'he': str}
+    price: float
+    active: bool
+    created_at: Optional[datetime] = None
+    image: Optional[str] = None
+    imageUrl: Optional[str] = None
+    category: Optional[str] = None
+    is_new: Optional[bool] = False
+    percent_off: Optional[int] = 0
+    best_seller: bool = False
+    displayOnHomePage: bool = False
+    slug: Optional[str] = None
+    manages_cd_keys: bool = True
+    availableKeys: int = 0
@@ -12,6 +12,7 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
     access_token: str
+    role: Optional[str] = None  # signed "role" claim, see src.lib.role_cache
 
 
 
@@ -1,13 +1,15 @@
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+import pymongo
 from beanie import PydanticObjectId
+from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from .mongodb import MongoDb
 from src.models.key.key import Key, KeyCreateRequest, BulkKeyCreateRequest, KeyUpdateRequest, KeyStatus # Updated imports
 from src.models.user.user import Role # Keep if user validation is still needed for some operations
 from src.models.key.key_exception import UpdateError, KeyNotFoundError # Added KeyNotFoundError
+from src.models.products.products import CDKey
 from src.singleton.singleton import Singleton
+from src.services.key_metrics_cache import key_metrics_cache
 # from src.models.user.user import User # Commented out if User object not directly passed to methods anymore
 
 class KeysCollection(MongoDb, metaclass=Singleton):
@@ -27,21 +29,23 @@ class KeysCollection(MongoDb, metaclass=Singleton):
 
     validate_user_role(user: User) -> None:
         Validates the role of the user.
+
+    claim_available_keys(product_id, order_id, quantity) -> List[str]:
+        Atomically marks available keys of a product as used by an order.
+
+    release_keys(product_id, key_strings) -> int:
+        Returns used keys of a product to the available pool.
     """
 
+    # Admin views address keys by position, so every listing uses the same stable order.
+    _admin_sort = [("added_date", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+
     async def initialize(self) -> None:
         """
         Initializes the KeysDB with the 'shop' database and Key model.
         """
-        await self.connection()  # Ensure we're connected
-        mongo_uri = os.getenv("MONGODB_URI")
-        if not mongo_uri:
-            raise ValueError("MONGODB_URI environment variable is not set.")
-            
-        self.client = AsyncIOMotorClient(mongo_uri)
-        self.db = self.client.get_database("shop")
-        await self.initialize_beanie(self.db, [Key]) # Ensure Key model is initialized
-        self.is_connected = True
+        # Shared client, 'shop' database; Beanie models are initialized once per process
+        await self.use_shop_database()
 
     async def add_keys_to_product(self, product_id: PydanticObjectId, bulk_key_request: BulkKeyCreateRequest) -> List[Key]:
         """
@@ -75,6 +79,7 @@ class KeysCollection(MongoDb, metaclass=Singleton):
         
         if keys_to_create:
             await Key.insert_many(keys_to_create)
+            key_metrics_cache.invalidate()
         return keys_to_create
 
     async def find_available_key_for_product(self, product_id: PydanticObjectId) -> Optional[Key]:
@@ -131,6 +136,7 @@ class KeysCollection(MongoDb, metaclass=Singleton):
         key.order_id = order_id
         key.used_date = datetime.utcnow()
         await key.save()
+        key_metrics_cache.invalidate()
         return key
 
     async def count_keys_by_status_for_product(self, product_id: PydanticObjectId, status: KeyStatus) -> int:
@@ -194,6 +200,234 @@ class KeysCollection(MongoDb, metaclass=Singleton):
         keys = await Key.find(Key.product_id == product_id).skip(skip).limit(limit).to_list()
         return keys
 
+    @staticmethod
+    def _to_object_id(product_id: Union[PydanticObjectId, str]) -> Any:
+        if isinstance(product_id, str) and ObjectId.is_valid(product_id):
+            return ObjectId(product_id)
+        return product_id
+
+    @staticmethod
+    def to_cd_key(key: Key) -> CDKey:
+        """Maps a Key document to the CDKey shape the admin endpoints and frontend expect."""
+        return CDKey(
+            key=key.key_string,
+            isUsed=key.status == KeyStatus.USED,
+            usedAt=key.used_date,
+            orderId=key.order_id,
+            addedAt=key.added_date,
+        )
+
+    async def claim_available_keys(self, product_id: Union[PydanticObjectId, str], order_id: Union[PydanticObjectId, str], quantity: int) -> List[str]:
+        """
+        Atomically claims up to `quantity` available keys of a product for an order.
+
+        Keys are claimed in batches: the oldest available keys are read, flipped from
+        AVAILABLE to USED with one conditional update_many stamped with a per-call
+        ``claim_id``, and the keys this call won are read back by that claim id. Keys taken
+        by a concurrent claim in between (even one for the same order) fail the status
+        condition or carry another claim id, so no key is ever handed out twice, and the
+        loop tops up until the call has ``quantity`` keys or the product runs out.
+
+        Parameters
+        ----------
+        product_id : PydanticObjectId or str
+            The ID of the product.
+        order_id : PydanticObjectId or str
+            The order the keys are assigned to (ObjectId or PayPal order ID string).
+        quantity : int
+            Number of keys wanted.
+
+        Returns
+        -------
+        List[str]
+            The claimed key strings; shorter than `quantity` when stock runs out.
+        """
+        collection = Key.get_motor_collection()
+        product_oid = self._to_object_id(product_id)
+        now = datetime.utcnow()
+        claim_id = ObjectId()
+        claimed = []
+        while len(claimed) < quantity:
+            candidates = await collection.find(
+                {"product_id": product_oid, "status": KeyStatus.AVAILABLE.value},
+                projection={"_id": 1},
+                sort=[("added_date", pymongo.ASCENDING)],
+                limit=quantity - len(claimed),
+            ).to_list(None)
+            if not candidates:
+                break
+            candidate_ids = [doc["_id"] for doc in candidates]
+            result = await collection.update_many(
+                {"_id": {"$in": candidate_ids}, "status": KeyStatus.AVAILABLE.value},
+                {"$set": {"status": KeyStatus.USED.value, "order_id": order_id, "used_date": now, "claim_id": claim_id}},
+            )
+            if result.modified_count:
+                won = await collection.find(
+                    {"_id": {"$in": candidate_ids}, "claim_id": claim_id},
+                    projection={"_id": 0, "key_string": 1},
+                    sort=[("added_date", pymongo.ASCENDING)],
+                ).to_list(None)
+                claimed.extend(doc["key_string"] for doc in won)
+        if claimed:
+            key_metrics_cache.invalidate()
+        return claimed
+
+    async def release_keys(self, product_id: Union[PydanticObjectId, str], key_strings: List[str]) -> int:
+        """
+        Returns used keys of a product to the available pool (order cancelled/deleted).
+
+        Parameters
+        ----------
+        product_id : PydanticObjectId or str
+            The ID of the product.
+        key_strings : List[str]
+            The key strings that were assigned to the order.
+
+        Returns
+        -------
+        int
+            The number of keys released.
+        """
+        if not key_strings:
+            return 0
+        result = await Key.get_motor_collection().update_many(
+            {
+                "product_id": self._to_object_id(product_id),
+                "key_string": {"$in": [str(k).strip() for k in key_strings]},
+                "status": KeyStatus.USED.value,
+            },
+            {"$set": {"status": KeyStatus.AVAILABLE.value, "order_id": None, "used_date": None}, "$unset": {"claim_id": ""}},
+        )
+        if result.modified_count:
+            key_metrics_cache.invalidate()
+        return result.modified_count
+
+    async def get_cd_keys_for_product(self, product_id: Union[PydanticObjectId, str]) -> List[CDKey]:
+        """
+        Retrieves all keys of a product in the CDKey shape, in admin listing order.
+
+        Parameters
+        ----------
+        product_id : PydanticObjectId or str
+            The ID of the product.
+
+        Returns
+        -------
+        List[CDKey]
+            The product's keys, oldest first.
+        """
+        keys = await Key.find({"product_id": self._to_object_id(product_id)}).sort(self._admin_sort).to_list()
+        return [self.to_cd_key(key) for key in keys]
+
+    async def count_keys_for_product(self, product_id: Union[PydanticObjectId, str]) -> int:
+        """Counts all keys of a product in the keys collection (the length of its admin listing there)."""
+        return await Key.get_motor_collection().count_documents({"product_id": self._to_object_id(product_id)})
+
+    async def get_key_at_index(self, product_id: Union[PydanticObjectId, str], index: int) -> Key:
+        """
+        Retrieves the key at a position of the admin listing of a product.
+
+        Raises
+        ------
+        KeyNotFoundError
+            If the product has no key at that index.
+        """
+        keys = []
+        if index >= 0:
+            keys = await Key.find({"product_id": self._to_object_id(product_id)}).sort(self._admin_sort).skip(index).limit(1).to_list()
+        if not keys:
+            raise KeyNotFoundError(f"CD key at index {index} not found in product {product_id}")
+        return keys[0]
+
+    async def update_key_at_index(self, product_id: Union[PydanticObjectId, str], index: int, update_data: Dict[str, Any]) -> Key:
+        """
+        Updates the status fields of a key addressed by admin listing position.
+
+        Parameters
+        ----------
+        update_data : Dict[str, Any]
+            CDKey-style fields: isUsed, usedAt, orderId. The key string itself is never changed.
+
+        Returns
+        -------
+        Key
+            The updated key.
+        """
+        key = await self.get_key_at_index(product_id, index)
+        field_map = {"usedAt": "used_date", "orderId": "order_id"}
+        set_data = {}
+        for field_name, value in update_data.items():
+            if field_name == "isUsed":
+                set_data["status"] = (KeyStatus.USED if value else KeyStatus.AVAILABLE).value
+            elif field_name in field_map:
+                set_data[field_map[field_name]] = value
+        if set_data:
+            await key.update({"$set": set_data})
+            key_metrics_cache.invalidate()
+        return key
+
+    async def delete_key_at_index(self, product_id: Union[PydanticObjectId, str], index: int) -> None:
+        """Deletes the key at a position of the admin listing of a product."""
+        key = await self.get_key_at_index(product_id, index)
+        await key.delete()
+        key_metrics_cache.invalidate()
+
+    async def count_available_by_product(self, product_ids: List[Union[PydanticObjectId, str]]) -> Dict[Any, int]:
+        """
+        Counts available keys for several products with one indexed aggregation.
+
+        Parameters
+        ----------
+        product_ids : List[PydanticObjectId or str]
+            The products to count keys for.
+
+        Returns
+        -------
+        Dict[ObjectId, int]
+            Available key count per product ID; products without keys are absent.
+        """
+        if not product_ids:
+            return {}
+        pipeline = [
+            {"$match": {
+                "product_id": {"$in": [self._to_object_id(pid) for pid in product_ids]},
+                "status": KeyStatus.AVAILABLE.value,
+            }},
+            {"$group": {"_id": "$product_id", "count": {"$sum": 1}}},
+        ]
+        return {row["_id"]: row["count"] async for row in Key.get_motor_collection().aggregate(pipeline)}
+
+    async def get_key_stats_by_product(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregates key counts per product in a single pass over the keys collection.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            Keyed by product ID string: total, available, used, reserved, and the
+            sum/count of add-to-use durations in hours for used keys.
+        """
+        # A missing/null used_date sorts before any date in BSON order, so $gte also filters those out
+        timed_use = {"$and": [
+            {"$eq": ["$status", KeyStatus.USED.value]},
+            {"$gte": ["$used_date", "$added_date"]},
+        ]}
+        pipeline = [
+            {"$group": {
+                "_id": "$product_id",
+                "total": {"$sum": 1},
+                "available": {"$sum": {"$cond": [{"$eq": ["$status", KeyStatus.AVAILABLE.value]}, 1, 0]}},
+                "used": {"$sum": {"$cond": [{"$eq": ["$status", KeyStatus.USED.value]}, 1, 0]}},
+                "reserved": {"$sum": {"$cond": [{"$eq": ["$status", KeyStatus.RESERVED.value]}, 1, 0]}},
+                "usage_hours_sum": {"$sum": {"$cond": [timed_use, {"$divide": [{"$subtract": ["$used_date", "$added_date"]}, 3600000]}, 0]}},
+                "usage_count": {"$sum": {"$cond": [timed_use, 1, 0]}},
+            }},
+        ]
+        stats = {}
+        async for row in Key.get_motor_collection().aggregate(pipeline):
+            stats[str(row.pop("_id"))] = row
+        return stats
+
     # --- Potentially refactor or remove old methods ---
 
     async def create_key(self, key_create_request: KeyCreateRequest) -> Key: # Updated signature
@@ -208,6 +442,7 @@ class KeysCollection(MongoDb, metaclass=Singleton):
             added_date=datetime.utcnow()
         )
         await key.save()
+        key_metrics_cache.invalidate()
         return key
     
     async def update_key_details(self, key_id: PydanticObjectId, key_update_request: KeyUpdateRequest) -> Key:
@@ -254,6 +489,7 @@ class KeysCollection(MongoDb, metaclass=Singleton):
 
         if update_data:
             await key.update({"$set": update_data})
+            key_metrics_cache.invalidate()
             # Re-fetch to get the updated document with proper types
             updated_key = await Key.get(key_id)
             if not updated_key: # Should not happen if update was successful
@@ -301,6 +537,7 @@ class KeysCollection(MongoDb, metaclass=Singleton):
         # For now, allowing deletion if not USED.
         
         delete_result = await key.delete()
+        key_metrics_cache.invalidate()
         return delete_result.deleted_count > 0
 
 
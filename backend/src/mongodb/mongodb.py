@@ -1,10 +1,9 @@
-import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorClient
 from beanie import init_beanie
 from typing import Optional
 
-from ..lib.database_manager import db_manager, get_database, get_client
+from ..lib.database_manager import db_manager, get_database, get_client, get_shop_database, init_document_models
 
 class MongoDb:
     """
@@ -22,74 +21,35 @@ class MongoDb:
 
     async def connection(self) -> None:
         """
-        Establishes a connection to the MongoDB server using the optimized connection manager.
-        Falls back to direct connection if optimized manager fails.
+        Points this collection at the process-wide client of the database manager, connecting
+        it on first use. Every collection shares that one client and its connection pool.
         """
         if self.is_connected and self.client is not None and self.db is not None:
             return
 
         try:
-            # Try the optimized database manager first
             if not self.manager.is_connected:
                 success = await self.manager.connect(max_retries=2, retry_delay=1.0)
                 if not success:
-                    raise ConnectionError("Optimized manager connection failed")
-            
-            # Get connections from the manager
+                    raise ConnectionError("Database manager could not connect")
+
             self.client = await get_client()
             self.db = await get_database()
             self.is_connected = True
-            logging.debug("Database connection established successfully via optimized manager")
-            return
-                
+            logging.debug("Database connection established successfully via the database manager")
         except Exception as e:
-            logging.warning(f"Optimized connection failed: {e}, attempting direct connection...")
-        
-        # Fallback to direct connection using MONGODB_URI
-        try:
-            mongodb_uri = os.getenv("MONGODB_URI")
-            if not mongodb_uri:
-                # If no MONGODB_URI, try to build one from individual variables
-                host = os.getenv("MONGO_HOST", "localhost")
-                port = os.getenv("MONGO_PORT", "27017")
-                database = os.getenv("MONGO_DATABASE", "monkeyz")
-                mongodb_uri = f"mongodb://{host}:{port}/{database}"
-                
-            logging.info(f"Attempting direct MongoDB connection to: {mongodb_uri[:50]}...")
-            
-            from motor.motor_asyncio import AsyncIOMotorClient
-            
-            # Create client with basic connection options
-            self.client = AsyncIOMotorClient(
-                mongodb_uri,
-                serverSelectionTimeoutMS=15000,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=45000,
-                retryWrites=True,
-                retryReads=True
-            )
-            
-            # Test the connection
-            await self.client.admin.command('ping')
-            
-            # Get database
-            if "/" in mongodb_uri and "?" in mongodb_uri:
-                db_name = mongodb_uri.split("/")[-1].split("?")[0]
-            elif "/" in mongodb_uri:
-                db_name = mongodb_uri.split("/")[-1]
-            else:
-                db_name = os.getenv("MONGO_DATABASE", "monkeyz")
-                
-            self.db = self.client[db_name]
-            await self.db.command('ping')
-            
-            self.is_connected = True
-            logging.info("Direct database connection established successfully")
-            
-        except Exception as e:
-            logging.error(f"Failed to establish any database connection: {e}")
+            logging.error(f"Failed to establish database connection: {e}")
             self.is_connected = False
-            raise ConnectionError(f"All database connection methods failed: {e}")
+            raise ConnectionError(f"Database connection failed: {e}")
+
+    async def use_shop_database(self) -> None:
+        """
+        Points ``self.db`` at the shop database on the shared client and makes sure the
+        Beanie document models are initialized (done once per process).
+        """
+        await self.connection()
+        self.db = await get_shop_database()
+        await init_document_models()
 
     async def get_db(self) -> AsyncIOMotorDatabase:
         """
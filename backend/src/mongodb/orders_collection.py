@@ -1,10 +1,108 @@
+import base64
+import json
+from datetime import datetime
+
 from beanie import PydanticObjectId
+from pymongo import ASCENDING, DESCENDING
 from .mongodb import MongoDb
 from src.models.order import Order # Assuming Order model is in src.models.order
+from src.models.coupon.coupon import normalize_coupon_code
 from src.singleton.singleton import Singleton
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from bson.objectid import ObjectId
 
+# Fields the admin order table needs; drops keys, status history and other detail fields
+ORDER_SUMMARY_PROJECTION = {
+    "customerName": 1, "email": 1, "customerEmail": 1, "phone": 1, "status": 1,
+    "total": 1, "totalPaid": 1, "originalTotal": 1, "original_total": 1,
+    "discountAmount": 1, "discount_amount": 1, "couponCode": 1, "coupon_code": 1,
+    "createdAt": 1, "updatedAt": 1, "date": 1,
+    "items.productId": 1, "items.name": 1, "items.quantity": 1, "items.price": 1,
+    "cart.id": 1, "cart.quantity": 1, "cart.price": 1,
+}
+
+# Newest first; _id breaks ties between orders created in the same millisecond
+ORDER_LIST_SORT = [("createdAt", DESCENDING), ("_id", DESCENDING)]
+
+
+async def ensure_order_list_indexes(db) -> None:
+    """Indexes behind the paginated order listings (idempotent)."""
+    await db.orders.create_index(ORDER_LIST_SORT, name="orders_by_created")
+    for field in ("status", "codeNormalized", "email"):
+        await db.orders.create_index([(field, ASCENDING)] + ORDER_LIST_SORT, name=f"orders_by_{field}_created")
+
+
+def encode_order_cursor(order_doc: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just after ``order_doc`` in ORDER_LIST_SORT order."""
+    created_at = order_doc.get("createdAt")
+    order_id = order_doc["_id"]
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "i": str(order_id),
+        "o": isinstance(order_id, ObjectId),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_order_cursor(cursor: str) -> Tuple[Optional[datetime], Any]:
+    """Raises ValueError for a cursor that was not produced by encode_order_cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        order_id = ObjectId(payload["i"]) if payload["o"] else payload["i"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    return created_at, order_id
+
+
+def _after_cursor(created_at: Optional[datetime], order_id: Any) -> Dict[str, Any]:
+    # _id holds ObjectIds (manual orders) and strings (PayPal ids). Strings sort below
+    # ObjectIds, and a range query only matches its own BSON type, so "below an
+    # ObjectId" has to include every string id explicitly. Missing createdAt sorts last.
+    if isinstance(order_id, ObjectId):
+        id_below = {"$or": [{"_id": {"$lt": order_id}}, {"_id": {"$type": "string"}}]}
+    else:
+        id_below = {"_id": {"$lt": order_id}}
+    if created_at is None:
+        return {"$and": [{"createdAt": None}, id_below]}
+    return {"$or": [
+        {"createdAt": {"$lt": created_at}},
+        {"createdAt": None},
+        {"$and": [{"createdAt": created_at}, id_below]},
+    ]}
+
+
+def build_order_filter(status: Optional[List[str]] = None, coupon_code: Optional[str] = None,
+                       email: Optional[str] = None, created_from: Optional[datetime] = None,
+                       created_to: Optional[datetime] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status[0] if len(status) == 1 else {"$in": status}
+    if coupon_code:
+        query["codeNormalized"] = normalize_coupon_code(coupon_code)
+    if email:
+        variants = list(dict.fromkeys([email.strip(), email.strip().lower()]))
+        query["email"] = variants[0] if len(variants) == 1 else {"$in": variants}
+    if created_from or created_to:
+        query["createdAt"] = {}
+        if created_from:
+            query["createdAt"]["$gte"] = created_from
+        if created_to:
+            query["createdAt"]["$lt"] = created_to
+    return query
+
+async def find_orders_page(collection, query: Dict[str, Any], limit: int, cursor: Optional[str] = None,
+                           projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Keyset page over an orders collection; see OrdersCollection.list_orders_page."""
+    if cursor:
+        after = _after_cursor(*decode_order_cursor(cursor))
+        query = {"$and": [query, after]} if query else after
+    # One extra document tells whether another page exists
+    docs = await collection.find(query, projection).sort(ORDER_LIST_SORT).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_order_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
 class OrdersCollection(MongoDb, metaclass=Singleton):
     """
     A class for interacting with the Orders Collection, implemented as a Singleton.
@@ -12,16 +110,8 @@ class OrdersCollection(MongoDb, metaclass=Singleton):
 
     async def get_orders_by_coupon_code(self, coupon_code: str) -> List[Dict[str, Any]]:
         db = await self.get_db()
-        # Normalize coupon code to lowercase for consistent searching
-        coupon_code_lower = coupon_code.lower().strip()
-        
-        # Support both couponCode and coupon_code for legacy data, case-insensitive
-        orders_cursor = db.orders.find({
-            "$or": [
-                {"couponCode": {"$regex": f"^{coupon_code_lower}$", "$options": "i"}},
-                {"coupon_code": {"$regex": f"^{coupon_code_lower}$", "$options": "i"}}
-            ]
-        })
+        # codeNormalized holds the trimmed, lower-cased couponCode/coupon_code and is indexed
+        orders_cursor = db.orders.find({"codeNormalized": normalize_coupon_code(coupon_code)})
         orders_list = []
         async for order_doc in orders_cursor:
             # Normalize coupon fields for consistency
@@ -43,6 +133,17 @@ class OrdersCollection(MongoDb, metaclass=Singleton):
         # However, existing routers seem to use direct pymongo via self.db.orders
         pass # db is initialized in MongoDb base or via get_db()
 
+    async def list_orders_page(self, query: Dict[str, Any], limit: int, cursor: Optional[str] = None,
+                               projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of orders matching ``query``, newest first.
+
+        Returns the raw documents and the cursor for the next page (None on the last page).
+        Raises ValueError for a malformed cursor.
+        """
+        db = await self.get_db()
+        return await find_orders_page(db.orders, query, limit, cursor, projection)
+
     async def get_orders_by_user_id(self, user_id: str) -> List[Order]:
         db = await self.get_db()
         orders_cursor = db.orders.find({"user_id": user_id})
@@ -3,33 +3,35 @@ from bson import ObjectId # Import ObjectId
 from pydantic import ValidationError # Import ValidationError
 from pymongo.database import Database
 from .mongodb import MongoDb
+from .keys_collection import KeysCollection
 from src.models.products.products import Product, CDKey, CDKeyUpdateRequest
+from src.models.key.key import BulkKeyCreateRequest
+from src.models.key.key_exception import KeyNotFoundError
+from src.models.coupon.coupon import normalize_coupon_code
+from src.services.coupon_validation_cache import coupon_validation_cache
+from src.services.key_metrics_cache import key_metrics_cache
 from src.singleton.singleton import Singleton
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import pymongo
+from pymongo.errors import DuplicateKeyError
 import logging
 import copy
 import re
 from unidecode import unidecode
 
+logger = logging.getLogger(__name__)
+
 class ProductCollection(MongoDb, metaclass=Singleton):
     """Collection for managing shop products."""
     
     async def initialize(self):
         """Initialize the collection with the shop database."""
-        # Ensure we have a connection
-        await self.connection()
-        
-        # Use the existing database connection but access the 'shop' database
-        database_name = "shop"  # Ensure this is 'shop'
-        self.db = self.client[database_name]
-        
-        # Initialize Beanie with the database and Product model
-        await self.initialize_beanie(self.db, [Product]) # Ensure Product model is used
+        # Shared client, 'shop' database; Beanie models are initialized once per process
+        await self.use_shop_database()
         
     async def add_keys_to_product(self, product_id: PydanticObjectId, keys: List[str]) -> Product:
-        """Add a list of CD keys to a specific product."""
+        """Add a list of CD keys to a specific product (stored as documents in the keys collection)."""
         product = await Product.get(product_id)
         
         if not product:
@@ -38,22 +40,40 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         if not product.manages_cd_keys:
             raise ValueError(f"Product {product.name} does not manage CD keys.")
         
-        new_cd_keys = []
-        for key_string in keys:
-            new_key = CDKey(
-                key=key_string,
-                isUsed=False,
-                addedAt=datetime.utcnow()
-            )
-            new_cd_keys.append(new_key)
-        
-        if not product.cdKeys:
-            product.cdKeys = []
-        
-        product.cdKeys.extend(new_cd_keys)
-        await product.save()
+        await KeysCollection().add_keys_to_product(
+            product.id, BulkKeyCreateRequest(product_id=product.id, key_strings=keys)
+        )
         return product
 
+    @staticmethod
+    def _unmigrated_cd_keys(product: Product) -> List[CDKey]:
+        """Legacy embedded keys fulfillment still claims from (product not touched by the migration yet)."""
+        return product.cdKeys if product.keysMigration is None else []
+
+    async def _update_embedded_cd_key(self, product: Product, embedded_index: int, update: Dict[str, Any]) -> None:
+        """Applies an update to an embedded key addressed by its position after the keys collection keys."""
+        embedded_keys = self._unmigrated_cd_keys(product)
+        if not 0 <= embedded_index < len(embedded_keys):
+            raise KeyNotFoundError(f"CD key at index {embedded_index} not found in the embedded keys of product {product.id}")
+        result = await Product.get_motor_collection().update_one(
+            {"_id": product.id, "keysMigration": {"$exists": False}, "cdKeys.key": embedded_keys[embedded_index].key},
+            update,
+        )
+        if not result.matched_count:
+            raise KeyNotFoundError(f"CD key {embedded_index} of product {product.id} changed or was migrated meanwhile")
+        key_metrics_cache.invalidate()
+
+    async def get_cd_keys_for_product(self, product_id: PydanticObjectId) -> List[CDKey]:
+        """
+        Get all CD keys of a product in admin listing order: the keys collection first, then the
+        embedded keys of a product the migration has not started on yet.
+        """
+        keys = await KeysCollection().get_cd_keys_for_product(product_id)
+        product = await Product.get(product_id)
+        if product:
+            keys.extend(self._unmigrated_cd_keys(product))
+        return keys
+
     async def update_cd_key_in_product(self, product_id: PydanticObjectId, cd_key_index: int, update_data: Dict[str, Any]) -> Product: # Changed type hint
         """Update a specific CD key in a product by its index."""
         product = await Product.get(product_id)
@@ -63,28 +83,25 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         if not product.manages_cd_keys:
             raise ValueError(f"Product {product.name} does not manage CD keys.")
 
-        if not product.cdKeys or cd_key_index < 0 or cd_key_index >= len(product.cdKeys):
-            raise ValueError(f"CD key at index {cd_key_index} not found in product {product_id}")
-
-        cd_key_to_update = product.cdKeys[cd_key_index]
-        # update_data is already a dict, no need to call model_dump()
-        # update_data = cd_key_update_request.model_dump(exclude_unset=True) 
-
         # Ensure that the 'key' field itself is not being updated through this method.
         # This method should only update status fields like isUsed, usedAt, orderId.
         if 'key' in update_data:
             # Log or handle this case, for now, we'll prevent the key string from being changed.
-            print(f"Warning: Attempt to update 'key' string in update_cd_key_in_product was ignored. Key: {update_data['key']}")
+            logger.warning("Attempt to update 'key' string in update_cd_key_in_product was ignored. Key: %s", update_data['key'])
             del update_data['key']
 
-        for field_name, value in update_data.items():
-            if hasattr(cd_key_to_update, field_name):
-                setattr(cd_key_to_update, field_name, value)
+        keys_collection = KeysCollection()
+        try:
+            collection_count = await keys_collection.count_keys_for_product(product.id)
+            if cd_key_index < collection_count:
+                await keys_collection.update_key_at_index(product.id, cd_key_index, update_data)
             else:
-                # Optionally log a warning if trying to set a non-existent attribute
-                print(f"Warning: Attribute '{field_name}' does not exist on CDKey model.")
-        
-        await product.save()
+                set_data = {f"cdKeys.$.{field}": value for field, value in update_data.items()
+                            if field in ("isUsed", "usedAt", "orderId")}
+                if set_data:
+                    await self._update_embedded_cd_key(product, cd_key_index - collection_count, {"$set": set_data})
+        except KeyNotFoundError:
+            raise ValueError(f"CD key at index {cd_key_index} not found in product {product_id}")
         return product
 
     async def delete_cd_key_from_product(self, product_id: PydanticObjectId, cd_key_index: int) -> Product:
@@ -96,11 +113,18 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         if not product.manages_cd_keys:
             raise ValueError(f"Product {product.name} does not manage CD keys.")
 
-        if not product.cdKeys or cd_key_index < 0 or cd_key_index >= len(product.cdKeys):
+        keys_collection = KeysCollection()
+        try:
+            collection_count = await keys_collection.count_keys_for_product(product.id)
+            if cd_key_index < collection_count:
+                await keys_collection.delete_key_at_index(product.id, cd_key_index)
+            else:
+                embedded_keys = self._unmigrated_cd_keys(product)
+                embedded_index = cd_key_index - collection_count
+                key_string = embedded_keys[embedded_index].key if 0 <= embedded_index < len(embedded_keys) else None
+                await self._update_embedded_cd_key(product, embedded_index, {"$pull": {"cdKeys": {"key": key_string}}})
+        except KeyNotFoundError:
             raise ValueError(f"CD key at index {cd_key_index} not found in product {product_id}")
-
-        del product.cdKeys[cd_key_index]
-        await product.save()
         return product
         
     async def get_all_products(self) -> List[Dict[str, Any]]:
@@ -290,12 +314,13 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         coupon_data["createdAt"] = datetime.utcnow()
         # Normalize code to lowercase and trim spaces
         coupon_data["code"] = coupon_data["code"].strip().lower()
+        coupon_data["codeNormalized"] = normalize_coupon_code(coupon_data["code"])
         # Ensure maxUsagePerUser is always present and integer
         # Accept string, int, float, but never boolean, and always save as integer
         # Accept both camelCase and snake_case from frontend
         value = None
         # Patch: Print the entire coupon_data for debugging
-        print(f"[DEBUG] Incoming coupon_data: {coupon_data}")
+        logger.debug("Incoming coupon_data: %s", coupon_data)
         for k in ["maxUsagePerUser", "max_usage_per_user", "max_usage_per_User", "maxusageperuser"]:
             if k in coupon_data:
                 value = coupon_data[k]
@@ -318,11 +343,15 @@ class ProductCollection(MongoDb, metaclass=Singleton):
                 parsed = 0
             # Always save as integer, but allow 0 ONLY for empty/invalid, otherwise save positive integer
             coupon_data["maxUsagePerUser"] = parsed if (isinstance(parsed, int) and parsed > 0) else 0
-            print(f"[DEBUG] Saved maxUsagePerUser: {coupon_data['maxUsagePerUser']} (input: {value}, type: {type(value)})")
+            logger.debug("Saved maxUsagePerUser: %s (input: %s, type: %s)", coupon_data['maxUsagePerUser'], value, type(value))
         except Exception as e:
-            print(f"[ERROR] Failed to parse maxUsagePerUser: {value} ({e})")
+            logger.error("Failed to parse maxUsagePerUser: %s (%s)", value, e)
             coupon_data["maxUsagePerUser"] = 0
-        result = await collection.insert_one(coupon_data)
+        try:
+            result = await collection.insert_one(coupon_data)
+        except DuplicateKeyError:
+            raise ValueError(f"Coupon code '{coupon_data['code']}' already exists")
+        coupon_validation_cache.invalidate(coupon_data.get("code"))
         return {"id": str(result.inserted_id), **coupon_data}
 
     async def get_all_coupons(self):
@@ -349,6 +378,7 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         # Normalize code to lowercase and trim spaces
         if "code" in coupon_data:
             coupon_data["code"] = coupon_data["code"].strip().lower()
+            coupon_data["codeNormalized"] = normalize_coupon_code(coupon_data["code"])
         # Ensure maxUsagePerUser is always present and integer
         # Robustly handle maxUsagePerUser from frontend
         # Accept string, int, float, but never boolean, and always save as integer
@@ -376,11 +406,16 @@ class ProductCollection(MongoDb, metaclass=Singleton):
                 parsed = 0
             # Patch: Always save as integer, but allow 0 ONLY for empty/invalid, otherwise save positive integer
             coupon_data["maxUsagePerUser"] = parsed if (isinstance(parsed, int) and parsed > 0) else 0
-            print(f"[DEBUG] Updated maxUsagePerUser: {coupon_data['maxUsagePerUser']} (input: {value})")
+            logger.debug("Updated maxUsagePerUser: %s (input: %s)", coupon_data['maxUsagePerUser'], value)
         except Exception as e:
-            print(f"[ERROR] Failed to parse maxUsagePerUser: {value} ({e})")
+            logger.error("Failed to parse maxUsagePerUser: %s (%s)", value, e)
             coupon_data["maxUsagePerUser"] = 0
-        await collection.update_one({"_id": coupon_object_id}, {"$set": coupon_data})
+        try:
+            await collection.update_one({"_id": coupon_object_id}, {"$set": coupon_data})
+        except DuplicateKeyError:
+            raise ValueError(f"Coupon code '{coupon_data.get('code')}' already exists")
+        # The code itself may have changed, so drop every cached validation
+        coupon_validation_cache.invalidate()
         updated_coupon = await collection.find_one({"_id": coupon_object_id})
         if updated_coupon:
             updated_coupon["id"] = str(updated_coupon.pop("_id"))
@@ -398,6 +433,7 @@ class ProductCollection(MongoDb, metaclass=Singleton):
         result = await collection.delete_one({"_id": coupon_object_id})
         if result.deleted_count == 0:
             raise ValueError("Coupon not found")
+        coupon_validation_cache.invalidate()
         return {"message": "Coupon deleted successfully"}
 
     async def get_best_sellers(self, limit: int = 10) -> List[Product]:
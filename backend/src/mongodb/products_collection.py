@@ -2,34 +2,159 @@ from beanie import PydanticObjectId, Document
 from pydantic import ValidationError
 import logging
 import copy
+import asyncio
+import functools
+import os
+from pymongo.errors import PyMongoError
 from .mongodb import MongoDb
-from src.models.products.products import Product, ProductRequest, CDKeyUpdateRequest # Added CDKeyUpdateRequest
+from .keys_collection import KeysCollection
+from src.lib.mongo_json_encoder import dumps_compact_bytes
+from src.lib.ttl_cache import TTLCache, MISSING
+from src.services.key_metrics_cache import key_metrics_cache
+from src.models.products.products import Product, ProductRequest, CDKeyUpdateRequest, CheckoutProduct # Added CDKeyUpdateRequest
 from src.models.products.products_exception import CreateError, NotValid ,NotFound
 from src.singleton.singleton import Singleton
 from datetime import datetime, timedelta
-from typing import List, Optional, Union, Dict, Any # Ensure Dict and Any are imported
+from typing import Iterable, List, Optional, Union, Dict, Any # Ensure Dict and Any are imported
 from bson import ObjectId # Ensure ObjectId is imported
 from fastapi import HTTPException # Ensure HTTPException is imported
 from bson.errors import InvalidId
 
+logger = logging.getLogger(__name__)
+
+
+def _catalog_cached(method):
+    """
+    Serves a catalog read from the ProductsCollection TTL cache, keyed by method name and arguments.
+
+    Empty results (not found, or a read that failed and returned []) are not cached, and a
+    result loaded while an invalidation happened is dropped instead of stored.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (method.__name__, dumps_compact_bytes([args, kwargs]))
+        cached = self._catalog_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        generation = self._catalog_generation
+        result = await method(self, *args, **kwargs)
+        if result and generation == self._catalog_generation:
+            self._catalog_cache.set(key, result)
+        return result
+    return wrapper
+
+
+# Fields checkout needs from a product (see find_checkout_products)
+CHECKOUT_PRODUCT_PROJECTION = {"name": 1, "price": 1, "manages_cd_keys": 1}
+
+# Legacy embedded keys fulfillment still claims from (see KeyReservationService._claim_embedded_keys).
+# Once the migration has started on a product its keys are counted from the keys collection only.
+UNMIGRATED_CD_KEYS = {"$cond": [{"$ifNull": ["$keysMigration", False]}, [], {"$ifNull": ["$cdKeys", []]}]}
+
+
+async def find_checkout_products(collection, product_ids: Iterable[Any]) -> Dict[str, CheckoutProduct]:
+    """
+    Loads every active product of a cart with one ``$in`` query, projected to the checkout fields.
+
+    Returns a dict keyed by product ID string; unknown, inactive or malformed IDs are absent.
+    """
+    object_ids = list(dict.fromkeys(ObjectId(str(pid)) for pid in product_ids if ObjectId.is_valid(str(pid))))
+    if not object_ids:
+        return {}
+    cursor = collection.find({"_id": {"$in": object_ids}, "active": True}, CHECKOUT_PRODUCT_PROJECTION)
+    products = {}
+    async for doc in cursor:
+        products[str(doc["_id"])] = CheckoutProduct(
+            id=doc["_id"],
+            name=doc.get("name") or "",
+            price=doc.get("price", 0),
+            manages_cd_keys=doc.get("manages_cd_keys", True),
+        )
+    return products
+
+
 class ProductsCollection(MongoDb, metaclass=Singleton):
     """
     A class for interacting with the Products database, implemented as a Singleton.
+
+    Storefront reads are cached in process (see ``_catalog_cached``). Cached products are
+    shared between requests and must not be modified by callers.
     """
 
+    # Read paths never load the key inventory. Products returned through this projection
+    # are read-only views: saving one would drop its legacy embedded cdKeys.
+    _NO_KEYS_PROJECTION = {"cdKeys": 0}
+
+    # Fields of the compact storefront shape (StorefrontProductResponse)
+    _STOREFRONT_FIELDS = (
+        "name", "description", "price", "active", "created_at", "createdAt", "image", "imageUrl",
+        "category", "is_new", "percent_off", "best_seller", "displayOnHomePage", "slug", "manages_cd_keys",
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._catalog_cache = TTLCache(
+            ttl=float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60")),
+            max_size=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512")),
+        )
+        self._catalog_generation = 0
+        self._change_stream_task: Optional[asyncio.Task] = None
+
+    def invalidate_catalog_cache(self) -> None:
+        """
+        Drops every cached catalog read. Called after product or key writes.
+        """
+        self._catalog_generation += 1
+        self._catalog_cache.clear()
+        # Key metrics show product names and low-stock thresholds
+        key_metrics_cache.invalidate()
+
+    def get_catalog_cache_stats(self) -> Dict[str, Any]:
+        """
+        Returns the catalog cache hit/miss counters.
+        """
+        stats = self._catalog_cache.stats()
+        stats["change_stream"] = self._change_stream_task is not None and not self._change_stream_task.done()
+        return stats
+
+    async def watch_catalog_changes(self) -> None:
+        """
+        Invalidates the catalog cache on every change to the Product collection, including
+        writes made outside this process. Requires a replica set; on a standalone server the
+        watcher stops and the cache relies on write-through invalidation and its TTL.
+        """
+        try:
+            async with Product.get_motor_collection().watch() as stream:
+                logging.info("Catalog cache change stream started")
+                async for _ in stream:
+                    self.invalidate_catalog_cache()
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logging.warning(f"Catalog cache change stream unavailable, falling back to TTL: {e}")
+
+    def start_catalog_change_stream(self) -> None:
+        """
+        Starts ``watch_catalog_changes`` in the background if it is not already running.
+        """
+        if self._change_stream_task is None or self._change_stream_task.done():
+            self._change_stream_task = asyncio.create_task(self.watch_catalog_changes())
+
+    async def stop_catalog_change_stream(self) -> None:
+        if self._change_stream_task and not self._change_stream_task.done():
+            self._change_stream_task.cancel()
+            try:
+                await self._change_stream_task
+            except asyncio.CancelledError:
+                pass
+        self._change_stream_task = None
+
     async def initialize(self) -> None:
         """
         Initializes the Products Collection with the 'shop' database and Product model.
         """
-        # Ensure we have a connection
-        await self.connection()
-        
-        # Use the existing database connection but access the 'shop' database
-        database_name = "shop"
-        self.db = self.client[database_name]
-        
-        # Initialize Beanie with the database and Product model
-        await self.initialize_beanie(self.db, [Product])
+        # Shared client, 'shop' database; Beanie models are initialized once per process
+        await self.use_shop_database()
 
     def _sanitize_product_doc(self, p_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -73,6 +198,120 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             
         return p_data
 
+    async def _find_one_without_keys(self, query: Dict[str, Any]) -> Optional[Product]:
+        """Finds one product without its key inventory and validates it into a (read-only) Product."""
+        product_doc = await Product.get_motor_collection().find_one(query, self._NO_KEYS_PROJECTION)
+        if not product_doc:
+            return None
+        return Product.model_validate(self._sanitize_product_doc(product_doc))
+
+    @classmethod
+    def _storefront_projection(cls) -> Dict[str, Any]:
+        """Inclusion projection for storefront reads; unused legacy keys are counted server-side."""
+        projection = {field: 1 for field in cls._STOREFRONT_FIELDS}
+        projection["embeddedAvailableKeys"] = {"$size": {"$filter": {
+            "input": UNMIGRATED_CD_KEYS,
+            "as": "k",
+            "cond": {"$ne": ["$$k.isUsed", True]},
+        }}}
+        return projection
+
+    @staticmethod
+    def _to_storefront_dict(doc: Dict[str, Any], available_by_product: Dict[Any, int]) -> Dict[str, Any]:
+        """Builds the StorefrontProductResponse shape from a projected document without Pydantic validation."""
+        name = doc.get("name")
+        description = doc.get("description")
+        available_keys = 0
+        manages_cd_keys = doc.get("manages_cd_keys", True)
+        if manages_cd_keys:
+            available_keys = available_by_product.get(doc["_id"], 0) + doc.get("embeddedAvailableKeys", 0)
+        return {
+            "id": str(doc["_id"]),
+            "name": {"en": name, "he": ""} if isinstance(name, str) else (name or {}),
+            "description": {"en": description, "he": ""} if isinstance(description, str) else (description or {}),
+            "price": doc.get("price", 0),
+            "active": doc.get("active", False),
+            "created_at": doc.get("created_at") or doc.get("createdAt"),
+            "image": doc.get("image"),
+            "imageUrl": doc.get("imageUrl"),
+            "category": doc.get("category"),
+            "is_new": doc.get("is_new", False),
+            "percent_off": doc.get("percent_off", 0),
+            "best_seller": doc.get("best_seller", False),
+            "displayOnHomePage": doc.get("displayOnHomePage", False),
+            "slug": doc.get("slug"),
+            "manages_cd_keys": manages_cd_keys,
+            "availableKeys": available_keys,
+        }
+
+    async def _find_storefront_docs(self, query: Dict[str, Any], sort: Optional[list] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        cursor = Product.get_motor_collection().find(query, self._storefront_projection())
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def _docs_to_storefront(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        key_product_ids = [doc["_id"] for doc in docs if doc.get("manages_cd_keys", True)]
+        available_by_product = await KeysCollection().count_available_by_product(key_product_ids)
+        return [self._to_storefront_dict(doc, available_by_product) for doc in docs]
+
+    @_catalog_cached
+    async def get_storefront_products(self, query: Dict[str, Any], sort: Optional[list] = None, limit: Optional[int] = None, as_bytes: bool = False) -> Union[List[Dict[str, Any]], bytes]:
+        """
+        Lightweight storefront listing: projected documents, no key inventory, no model validation.
+
+        Args:
+            query (Dict[str, Any]): MongoDB filter, e.g. {"active": True, "best_seller": True}.
+            sort (list, optional): PyMongo sort specification.
+            limit (int, optional): Maximum number of products to return.
+            as_bytes (bool): Return the JSON-encoded response body instead of dicts.
+
+        Returns:
+            Union[List[Dict[str, Any]], bytes]: Products in the StorefrontProductResponse shape,
+            or the same list pre-serialized to JSON bytes.
+        """
+        products = await self._docs_to_storefront(await self._find_storefront_docs(query, sort, limit))
+        return dumps_compact_bytes(products) if as_bytes else products
+
+    @_catalog_cached
+    async def get_storefront_product(self, query: Dict[str, Any], as_bytes: bool = False) -> Optional[Union[Dict[str, Any], bytes]]:
+        """
+        Lightweight single-product read, see get_storefront_products.
+
+        Returns:
+            Optional[Union[Dict[str, Any], bytes]]: The product (or its JSON bytes), None if not found.
+        """
+        docs = await self._find_storefront_docs(query, limit=1)
+        if not docs:
+            return None
+        product = (await self._docs_to_storefront(docs))[0]
+        return dumps_compact_bytes(product) if as_bytes else product
+
+    @_catalog_cached
+    async def get_storefront_product_by_identifier(self, identifier: str, as_bytes: bool = False) -> Optional[Union[Dict[str, Any], bytes]]:
+        """
+        Finds an active product by name (plain or any language) first, then by slug.
+
+        Args:
+            identifier (str): Product name or slug from the URL.
+            as_bytes (bool): Return the JSON-encoded response body instead of a dict.
+
+        Returns:
+            Optional[Union[Dict[str, Any], bytes]]: The product, None if nothing matches.
+        """
+        for query in (
+            {"name": identifier, "active": True},
+            {"$or": [{"name.en": identifier}, {"name.he": identifier}], "active": True},
+            {"slug": identifier, "active": True},
+        ):
+            product = await self.get_storefront_product(query, as_bytes=as_bytes)
+            if product is not None:
+                return product
+        return None
+
+    @_catalog_cached
     async def get_all_products(self) -> list[Product]:
         """
         Retrieves all products from the database, sanitizing them before validation.
@@ -82,7 +321,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         """
         try:
             collection = Product.get_motor_collection()
-            cursor = collection.find({"active": True})  # Only fetch active products
+            cursor = collection.find({"active": True}, self._NO_KEYS_PROJECTION)  # Only fetch active products
             products = []
             
             async for doc in cursor:
@@ -101,9 +340,10 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
 
             return products
         except Exception as e:
-            print(f"Error in get_all_products: {str(e)}")
+            logger.error("Error in get_all_products: %s", str(e))
             return []
 
+    @_catalog_cached
     async def get_best_sellers(self, limit: int = None) -> list[Product]:
         """
             Retrieves all the best sellers products from the database.
@@ -115,7 +355,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             # Fetch raw data with projection to convert field names
             collection = Product.get_motor_collection()            # Use only best_seller field, as it's now standardized
             query = {"best_seller": True, "active": True}  # Also filter for active products
-            cursor = collection.find(query)
+            cursor = collection.find(query, self._NO_KEYS_PROJECTION)
             if limit:
                 cursor = cursor.limit(limit)
             products = []
@@ -135,7 +375,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
                 
             return products
         except Exception as e:
-            print(f"Error in get_best_sellers: {str(e)}")
+            logger.error("Error in get_best_sellers: %s", str(e))
             return []
 
     async def get_recent_products(self, limit: int) -> list[Product]:
@@ -154,7 +394,8 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             # Sort by createdAt (camelCase) or created_at (snake_case), whichever exists
             pipeline = [
                 {"$sort": {"createdAt": -1}},  # Try camelCase first
-                {"$limit": limit}
+                {"$limit": limit},
+                {"$project": self._NO_KEYS_PROJECTION},
             ]
             cursor = collection.aggregate(pipeline)
             products = []
@@ -174,7 +415,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
 
             return products
         except Exception as e:
-            print(f"Error in get_recent_products: {str(e)}")
+            logger.error("Error in get_recent_products: %s", str(e))
             return []
         
     async def get_product_by_name(self, product_name: str) -> Optional[Product]:
@@ -191,7 +432,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             # Find the product by its English name, which is used as the slug.
             collection = Product.get_motor_collection()
             # The name field is a dictionary, so we query the 'en' key.
-            product_doc = await collection.find_one({"name.en": product_name, "active": True})
+            product_doc = await collection.find_one({"name.en": product_name, "active": True}, self._NO_KEYS_PROJECTION)
 
             if product_doc:
                 try:
@@ -203,7 +444,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
                     return None # Or raise an exception
             return None
         except Exception as e:
-            print(f"Error in get_product_by_name: {str(e)}")
+            logger.error("Error in get_product_by_name: %s", str(e))
             return None
 
     async def get_product_by_id(self, product_id: PydanticObjectId) -> Optional[Product]:
@@ -228,7 +469,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
                     return None
             return None
         except Exception as e:
-            print(f"Error in get_product_by_id: {str(e)}")
+            logger.error("Error in get_product_by_id: %s", str(e))
             return None
 
     async def create_product(self, product_request: ProductRequest) -> Product:
@@ -249,6 +490,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             
         product = self.update_or_create_product(product_request, {})
         await product.save()
+        self.invalidate_catalog_cache()
         return product
         
     async def edit_product(self, product_id: PydanticObjectId, product_request: ProductRequest) -> Product:
@@ -274,6 +516,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         product = self.update_or_create_product(product_request, current_product.keys)
         product.id = current_product.id
         await product.save()
+        self.invalidate_catalog_cache()
         return product
         
     async def add_key_to_product(self, product_id: PydanticObjectId, key_id: PydanticObjectId) -> Product:
@@ -384,6 +627,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         # Create and save the product
         product = Product(**data)
         await product.save()
+        self.invalidate_catalog_cache()
         return product
         
     async def update_product_from_dict(self, product_id: str, product_data: dict) -> Product:
@@ -451,8 +695,10 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         
         # Update the product
         await product.update({'$set': data})
+        self.invalidate_catalog_cache()
         return product
 
+    @_catalog_cached
     async def get_product_by_name(self, name: str) -> Optional[Product]:
         """
         Retrieves a product by its name.
@@ -466,7 +712,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         """
         try:
             # Attempt to find by exact match on string name (for older data or simple names)
-            product = await Product.find_one({"name": name, "active": True})
+            product = await self._find_one_without_keys({"name": name, "active": True})
             if product:
                 return product
 
@@ -474,7 +720,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             # This searches if the provided name matches any of the language versions.
             # It's a common pattern to search for name.en == name or name.he == name etc.
             # For a direct match of the identifier against any language's name:
-            product = await Product.find_one(
+            product = await self._find_one_without_keys(
                 {
                     "$or": [
                         {"name.en": name},
@@ -501,7 +747,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         except NotFound: # Re-raise NotFound to be caught by the router
             raise
         except Exception as e:
-            print(f"Error in get_product_by_name: {str(e)}")
+            logger.error("Error in get_product_by_name: %s", str(e))
             # For other exceptions, you might want to log and return None or raise a different error
             # For now, let's conform to raising NotFound or letting other errors propagate if they are unexpected
             raise NotFound(f"An error occurred while searching for product \'{name}\'")
@@ -527,9 +773,22 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
                 raise NotFound(f"Product with id \'{product_id}\' is not active")
             return None # Should be covered by raises
         except Exception as e: # Catch potential Beanie errors if ID format is wrong, etc.
-            print(f"Error in get_product_by_id: {str(e)}")
+            logger.error("Error in get_product_by_id: %s", str(e))
             raise NotFound(f"Product with id \'{product_id}\' not found or error occurred.")
 
+    async def get_checkout_products(self, product_ids: Iterable[Any]) -> Dict[str, CheckoutProduct]:
+        """
+        Batch product lookup for checkout: one round trip for the whole cart.
+
+        Args:
+            product_ids: The cart's product IDs (duplicates are fine).
+
+        Returns:
+            Dict[str, CheckoutProduct]: Active products keyed by ID string.
+        """
+        return await find_checkout_products(Product.get_motor_collection(), product_ids)
+
+    @_catalog_cached
     async def get_product_by_slug(self, product_slug: str) -> Optional[Product]:
         """
         Retrieves a product by its slug.
@@ -541,14 +800,14 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
             Optional[Product]: The product if found, otherwise None.
         """
         try:
-            product = await Product.find_one({"slug": product_slug, "active": True})
+            product = await self._find_one_without_keys({"slug": product_slug, "active": True})
             if not product:
                 raise NotFound(f"Product with slug \'{product_slug}\' not found")
             return product
         except NotFound: # Re-raise NotFound
             raise
         except Exception as e:
-            print(f"Error in get_product_by_slug: {str(e)}")
+            logger.error("Error in get_product_by_slug: %s", str(e))
             raise NotFound(f"An error occurred while searching for product slug \'{product_slug}\'")
 
     async def delete_product(self, product_id: PydanticObjectId):
@@ -567,6 +826,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         # Remove all keys associated with this product (if you want cascading delete)
         # Example: await self.delete_keys_by_product(product_id)
         await product.delete()
+        self.invalidate_catalog_cache()
         return str(product.id)
     
     async def get_product_with_key_count(self, product_id: PydanticObjectId) -> dict:
@@ -614,6 +874,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         
         return products_with_counts
 
+    @_catalog_cached
     async def get_homepage_products(self, limit: int = None) -> list[Product]:
         """
         Retrieves all products marked for homepage display.
@@ -626,7 +887,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         """
         try:
             collection = Product.get_motor_collection()
-            cursor = collection.find({"displayOnHomePage": True, "active": True})
+            cursor = collection.find({"displayOnHomePage": True, "active": True}, self._NO_KEYS_PROJECTION)
             if limit:
                 cursor = cursor.limit(limit)
             products = []
@@ -644,7 +905,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
                     continue
             return products
         except Exception as e:
-            print(f"Error in get_homepage_products: {str(e)}")
+            logger.error("Error in get_homepage_products: %s", str(e))
             return []
 
     async def add_cd_keys_to_product(self, product_id: PydanticObjectId, cd_keys_request: list[dict]) -> Product:
@@ -671,6 +932,7 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         
         product.cdKeys.extend(new_cd_keys)
         await product.save()
+        self.invalidate_catalog_cache()
         return product
 
     async def update_cd_key_in_product(self, product_id: str, key_index: int, key_update_data: dict) -> dict:
@@ -763,4 +1025,5 @@ class ProductsCollection(MongoDb, metaclass=Singleton):
         del product.cdKeys[cd_key_index]
         
         await product.save()
+        self.invalidate_catalog_cache()
         return product
@@ -6,6 +6,7 @@ from src.models.user.user_exception import CreateError, LoginError, UserExceptio
 from src.singleton.singleton import Singleton
 from src.lib.haseing import Hase
 from src.lib.token_handler import create_access_token
+from src.lib.role_cache import role_cache
 from typing import Optional # Added Optional for type hinting
 from beanie import PydanticObjectId # Added for get_user_by_id
 
@@ -35,15 +36,8 @@ class UserCollection(MongoDb, metaclass=Singleton):
         """
             Initializes the UserDB with the 'shop' database and User model.
         """
-        # Ensure we have a connection
-        await self.connection()
-        
-        # Use the existing database connection but access the 'shop' database
-        database_name = "shop"
-        self.db = self.client[database_name]
-        
-        # Initialize Beanie with the database and User model
-        await self.initialize_beanie(self.db, [User])
+        # Shared client, 'shop' database; Beanie models are initialized once per process
+        await self.use_shop_database()
 
     async def get_all_users(self) -> list[User]:
         """ Retrieves all users from the User collection.
@@ -76,7 +70,7 @@ class UserCollection(MongoDb, metaclass=Singleton):
         """
         # Modified to not validate phone_number if it's None
         await self.validate_user_exist(body.username, body.email, body.phone_number)
-        hashed_password = Hase.bcrypt(body.password)
+        hashed_password = await Hase.bcrypt_async(body.password)
         user = User(username=body.username, password=hashed_password , role=Role.default,email=body.email,phone_number=body.phone_number)
         await user.save()
         return user
@@ -132,7 +126,7 @@ class UserCollection(MongoDb, metaclass=Singleton):
                         raise LoginError("Username, email, or Google name does not exist.")
         
         logger.info(f"User found, verifying password for user: {user.username}")
-        if not Hase.verify(body.password, user.password):
+        if not await Hase.verify_async(body.password, user.password):
             logger.warning(f"Password verification failed for user: {user.username}")
             raise LoginError("Password is incorrect.")
         
@@ -256,6 +250,32 @@ class UserCollection(MongoDb, metaclass=Singleton):
         user = await User.get(user_id)
         return user
 
+    async def set_user_role(self, username: str, role: Role) -> Optional[User]:
+        """ Changes the role of a user and drops their cached role.
+
+            Access tokens issued before a promotion still carry the old role claim,
+            so a promoted user has to log in again.
+
+            Parameters
+            ----------
+                username : str
+                    The username of the user to update.
+                role : Role
+                    The new role.
+
+            Returns
+            -------
+                Optional[User]
+                    The updated user, or None if not found.
+        """
+        user = await self.get_user_by_username(username)
+        if user is None:
+            return None
+        user.role = role
+        await user.save()
+        role_cache.invalidate(username)
+        return user
+
     async def validate_user_role(self, username: str) -> None:
         """
         Validates the role of the user.
@@ -270,9 +290,9 @@ class UserCollection(MongoDb, metaclass=Singleton):
         ProductCreateNotValidException
             If the user does not have permission to edit keys.
         """
-        user = await self.get_user_by_username(username)
-        if user is None:
+        role = await role_cache.get_role(username, None, self)
+        if role is None:
             raise LoginError("the user not exist")
         
-        if user.role != Role.manager:
+        if role != Role.manager:
             raise UserException("This user can't edit")
\ No newline at end of file
@@ -1,116 +1,31 @@
-from src.mongodb.orders_collection import OrdersCollection
-from src.models.order import normalize_status, StatusEnum
+from src.services.coupon_analytics_service import CouponAnalyticsService, coupon_analytics_refresher
+from src.services.sales_rollup_service import SalesRollupService
+from src.models.coupon.coupon import normalize_coupon_code
+from src.lib.role_cache import role_cache
+from src.lib.mongo_json_encoder import MongoJSONResponse
 import re  # Add import for regex operations
 import logging  # Add logging import
+
+logger = logging.getLogger(__name__)
+
 # --- COUPON ANALYTICS RECALCULATION ---
 async def recalculate_coupon_analytics(coupon_code: str, db):
     """
-    Recalculates and updates the analytics for a given coupon code based on all associated orders.
+    Rebuilds the analytics for a given coupon code from a full aggregation of its orders.
 
-    This function should be called whenever an order using a coupon is created, deleted, or has its status changed.
+    Order transitions keep the counters up to date incrementally through
+    CouponAnalyticsService.record_order_change; this full recalculation is the repair path
+    (see src/scripts/reconcile_coupon_analytics.py) and is not needed on every order write.
 
     It computes:
     - A breakdown of orders by status (completed, cancelled, pending, etc.).
     - A per-user usage count for all non-cancelled/failed orders.
     - The total number of times the coupon has been successfully used (i.e., is in an active state).
     """
-    orders_collection = OrdersCollection()
-    # Normalize coupon code for consistent analytics
-    coupon_code_normalized = coupon_code.lower().strip()
-    orders = await orders_collection.get_orders_by_coupon_code(coupon_code_normalized)
-
-    analytics = {
-        "total_orders": 0,
-        "completed": 0,
-        "cancelled": 0,
-        "pending": 0,
-        "processing": 0,
-        "awaiting_stock": 0,
-        "failed": 0, # Ensure all statuses are tracked
-    }
-    per_user_usage = {}
-
-    # Define which statuses count as an "active" or "used" coupon.
-    # This now includes pending, completed, processing, and awaiting_stock orders. It excludes only cancelled or failed orders.
-    active_statuses = {
-        StatusEnum.PENDING.value,
-        StatusEnum.COMPLETED.value,
-        StatusEnum.PROCESSING.value,
-        StatusEnum.AWAITING_STOCK.value
-    }
-
-
-    for order in orders:
-        status = normalize_status(order.get("status"))
-        # Check all possible email field variations for compatibility
-        email = order.get("email") or order.get("userEmail") or order.get("customerEmail")
-
-        if status in analytics:
-            analytics[status] += 1
-        analytics["total_orders"] += 1
-
-        # A coupon is considered "used" if the order is in an active state.
-        # This is the count that should be checked against `maxUsagePerUser`.
-        if status in active_statuses and email:
-            per_user_usage[email] = per_user_usage.get(email, 0) + 1
-
-    # The total `usageCount` for the coupon is the sum of all orders in an active state.
-    total_active_uses = sum(per_user_usage.values())
-
-    update_payload = {
-        "usageAnalytics": analytics,
-        "userUsages": per_user_usage,
-        "usageCount": total_active_uses,
-    }
-
-    # Update the coupon using case-insensitive search
-    # Use admin database where coupons are stored - improved access pattern
-    try:
-        if hasattr(db, 'client'):
-            admin_db = db.client.get_database("admin")
-            coupons_collection = admin_db.coupons
-        else:
-            # Fallback to current database
-            coupons_collection = db.coupons
-    except Exception as e:
-        logging.error(f"Error accessing admin database: {e}")
-        coupons_collection = db.coupons
-    
-    # Try both the original and normalized code
-    update_result = await coupons_collection.update_one(
-        {"code": {"$regex": f"^{re.escape(coupon_code)}$", "$options": "i"}}, 
-        {"$set": update_payload}
-    )
-    
-    # If no match found with original code, try normalized
-    if update_result.matched_count == 0:
-        update_result = await coupons_collection.update_one(
-            {"code": {"$regex": f"^{re.escape(coupon_code_normalized)}$", "$options": "i"}}, 
-            {"$set": update_payload}
-        )
-    
-    # If still no match, try exact matches
-    if update_result.matched_count == 0:
-        update_result = await coupons_collection.update_one(
-            {"code": coupon_code}, 
-            {"$set": update_payload}
-        )
-    
-    # If still no match, try normalized exact match
-    if update_result.matched_count == 0:
-        update_result = await coupons_collection.update_one(
-            {"code": coupon_code_normalized}, 
-            {"$set": update_payload}
-        )
-    
-    print(f"Recalculated analytics for coupon '{coupon_code}': {update_payload}")
-    print(f"Database update result: matched={update_result.matched_count}, modified={update_result.modified_count}")
-
+    update_payload = await CouponAnalyticsService(db).reconcile_coupon(coupon_code)
+    logger.info("Recalculated analytics for coupon '%s': %s", coupon_code, update_payload)
     return update_payload
 
-    # --- Ensure PayPal and manual orders are treated identically ---
-    # This function already aggregates all orders by coupon code, regardless of payment method.
-    # If PayPal orders are missing, ensure they are inserted with the same structure as manual orders in the DB.
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 
 # Define the admin_router at the very top so it is available for all endpoints
@@ -141,7 +56,9 @@ from src.lib.token_handler import get_current_user
 from src.deps.auth_deps import get_current_admin_user  # Import admin authentication
 from src.models.token.token import TokenData
 from src.models.user.user import User  # Import User model for admin user
+from src.models.user.user_response import UserResponse
 from src.mongodb.product_collection import ProductCollection
+from src.mongodb.products_collection import ProductsCollection
 from src.controller.key_controller import KeyController
 from src.models.user.user_exception import UserException # Added UserException
 
@@ -149,7 +66,7 @@ from src.models.products.products import Product as ProductModel, CDKey, CDKeyUp
 from src.models.admin.analytics import AdminAnalytics, DailySale
 from src.models.products.products_exception import NotFound, NotValid
 from ..mongodb.mongodb import MongoDb 
-from .orders import retry_failed_orders_internal
+from .orders import retry_failed_orders_internal, backorder_retry_queue
 from ..services.coupon_service import CouponService
 from fastapi.responses import JSONResponse
 
@@ -297,18 +214,14 @@ async def get_coupon_info(
         code.strip().replace(' ', '').lower(),
         code.strip().replace(' ', '').upper(),
     ]
-    all_coupons_cursor = user_controller.db.coupons.find({})
-    all_coupons = await all_coupons_cursor.to_list(length=1000)
-    db_codes = [c.get('code', None) for c in all_coupons if c.get('code', None)]
-    coupon = None
-    for db_code in db_codes:
-        for variant in code_variants:
-            if db_code and variant and db_code.strip().lower() == variant.strip().lower():
-                coupon = await user_controller.db.coupons.find_one({"code": db_code})
-                break
-        if coupon:
-            break
+    # Exact matches go through the indexed codeNormalized field
+    coupon = await user_controller.db.coupons.find_one(
+        {"codeNormalized": {"$in": list({normalize_coupon_code(v) for v in code_variants} - {None})}}
+    )
     if not coupon:
+        all_coupons_cursor = user_controller.db.coupons.find({}, {"code": 1})
+        all_coupons = await all_coupons_cursor.to_list(length=1000)
+        db_codes = [c.get('code', None) for c in all_coupons if c.get('code', None)]
         for db_code in db_codes:
             for variant in code_variants:
                 if db_code and variant and variant.strip().lower() in db_code.strip().lower():
@@ -355,7 +268,7 @@ from src.models.products.products import Product as ProductModel, CDKey, CDKeyUp
 from src.models.admin.analytics import AdminAnalytics, DailySale
 from src.models.products.products_exception import NotFound, NotValid
 from ..mongodb.mongodb import MongoDb 
-from .orders import retry_failed_orders_internal
+from .orders import retry_failed_orders_internal, backorder_retry_queue
 from ..services.coupon_service import CouponService
 from fastapi.responses import JSONResponse
 
@@ -437,6 +350,11 @@ class CouponCreate(CouponBase):
 class Coupon(CouponBase):
     id: str  # Using str for compatibility with MongoDB ObjectId
     createdAt: datetime
+    usageAnalytics: Dict[str, int] = {}
+    userUsages: Dict[str, int] = {}
+    analyticsUpdatedAt: Optional[datetime] = None  # Last counter change
+    analyticsReconciledAt: Optional[datetime] = None  # Last verification against the orders
+    analyticsStale: bool = False  # A background refresh has been scheduled for this coupon
     
     model_config = {
         "populate_by_name": True,
@@ -511,13 +429,41 @@ class CDKeysAddRequest(BaseModel):
 async def verify_admin(user_controller: UserController, current_user: TokenData):
     """Verify that the current user has admin privileges."""
     try:
-        user = await user_controller.user_collection.get_user_by_username(current_user.username)
-        if user.role != Role.manager:
+        role = await role_cache.get_role(current_user.username, current_user.role, user_controller.user_collection)
+        if role != Role.manager:
             raise HTTPException(status_code=403, detail="Admin privileges required")
-        return user
+        return current_user
     except UserException as e:
         raise HTTPException(status_code=403, detail=str(e))
 
+# User role routes
+class UserRoleUpdateRequest(BaseModel):
+    role: str  # Role name: "manager" or "default"
+
+@admin_router.patch("/users/{username}/role", response_model=UserResponse)
+async def update_user_role(
+    username: str,
+    request: UserRoleUpdateRequest,
+    user_controller: UserController = Depends(get_user_controller_dependency),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Changes a user's role. Goes through UserCollection.set_user_role so the cached role is
+    dropped right away; a promoted user has to log in again to get the new token claim.
+    """
+    await verify_admin(user_controller, current_user)
+    try:
+        role = Role[request.role]
+    except KeyError:
+        raise HTTPException(status_code=422, detail=f"Unknown role '{request.role}'")
+    if username == current_user.username and role != Role.manager:
+        raise HTTPException(status_code=400, detail="Admins cannot remove their own admin role")
+    user = await user_controller.user_collection.set_user_role(username, role)
+    if user is None:
+        raise HTTPException(status_code=404, detail=f"User '{username}' not found")
+    logger.info("User %s changed the role of %s to %s", current_user.username, username, role.name)
+    return user
+
 # Product routes
 @admin_router.get("/products", response_model=List[Product])
 async def get_products(
@@ -533,7 +479,7 @@ async def get_products(
         # The response_model will handle converting the list of Product models to JSON.
         return products_from_db
     except Exception as e:
-        print(f"Critical error in get_products: {str(e)}")
+        logger.error("Critical error in get_products: %s", str(e))
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching products")
 
 @admin_router.post("/products", response_model=Product)
@@ -583,6 +529,7 @@ async def create_product(
         product_data_dict['slug'] = None
     
     new_product = await user_controller.product_collection.create_product(product_data_dict) # Changed from create_admin_product
+    ProductsCollection().invalidate_catalog_cache()
       # Convert to dict to ensure proper serialization
     product_dict = new_product.dict() if hasattr(new_product, 'dict') else (
         new_product.model_dump() if hasattr(new_product, 'model_dump') else new_product
@@ -629,6 +576,7 @@ async def update_product(
     # Ensure product is a dict for update_product
     product_data_dict = product.model_dump(by_alias=True, exclude_unset=True) # Pydantic v2
     updated_product = await user_controller.product_collection.update_product(product_id, product_data_dict) # Changed from update_admin_product
+    ProductsCollection().invalidate_catalog_cache()
     # Sync to public collection is no longer needed as we operate directly on shop.Product
     # await user_controller.sync_products()
     # --- SERIALIZATION FIX START ---    # Convert to dict to ensure proper serialization
@@ -683,6 +631,7 @@ async def delete_product(
 ):
     await verify_admin(user_controller, current_user)
     await user_controller.product_collection.delete_product(product_id) # Changed from delete_admin_product
+    ProductsCollection().invalidate_catalog_cache()
     # Sync to public collection is no longer needed
     # await user_controller.sync_products()
     return {"message": "Product deleted successfully"}
@@ -700,19 +649,15 @@ async def add_cd_keys_to_product(
         key_strings = [cd_key.key for cd_key in request.keys]
         # Use product_collection (shop.Product) directly
         updated_product = await user_controller.product_collection.add_keys_to_product(product_id, key_strings)
+        ProductsCollection().invalidate_catalog_cache()
         
-        # Auto-trigger retry process for awaiting stock orders when new keys are added
+        # Serve the orders waiting on this product in the background
         try:
-            from .orders import retry_failed_orders_internal
-            from ..mongodb.mongodb import MongoDb
-            
-            mongo_db = MongoDb()
-            db = await mongo_db.get_db()
-            await retry_failed_orders_internal(db, user_controller.product_collection)
+            backorder_retry_queue.schedule(product_id)
             
             import logging
             logger = logging.getLogger(__name__)
-            logger.info(f"Auto-triggered retry process after adding {len(key_strings)} keys to product {product_id}")
+            logger.info(f"Scheduled backorder retry after adding {len(key_strings)} keys to product {product_id}")
         except Exception as retry_error:
             # Don't fail the main operation if retry fails
             import logging
@@ -746,7 +691,7 @@ async def get_cd_keys_for_product(
         if not product.manages_cd_keys:
             # This error is specific and indicates a configuration issue with an existing product.
             raise HTTPException(status_code=400, detail=f"Product '{product.name.get('en', str(product.id))}' does not manage CD keys.")
-        return product.cdKeys if product.cdKeys else []
+        return await user_controller.product_collection.get_cd_keys_for_product(product.id)
     except ValueError as e: # Catches PydanticObjectId validation errors or other ValueErrors from get_product_by_id if any
         raise HTTPException(status_code=400, detail=f"Invalid product ID or error fetching product: {str(e)}")
     except HTTPException: # Re-raise existing HTTPExceptions
@@ -766,42 +711,42 @@ async def update_cd_key_for_product(
     try:
         validated_request: CDKeyUpdateRequest
         # Log the type and content of the request for debugging
-        print(f"Received request in update_cd_key_for_product. Type: {type(request)}, Content: {request}")
+        logger.debug("Received request in update_cd_key_for_product. Type: %s, Content: %s", type(request), request)
 
         if isinstance(request, dict):
-            print(f"Request is a dict, attempting to parse as CDKeyUpdateRequest: {request}")
+            logger.debug("Request is a dict, attempting to parse as CDKeyUpdateRequest: %s", request)
             try:
                 # Pydantic v2 uses model_validate. If using Pydantic v1, use CDKeyUpdateRequest(**request)
                 validated_request = CDKeyUpdateRequest.model_validate(request)
             except ValidationError as ve:
-                print(f"Validation failed for dict: {ve}")
+                logger.debug("Validation failed for dict: %s", ve)
                 # Log the detailed validation errors
                 error_details = ve.errors()
-                print(f"Detailed validation errors: {error_details}")
+                logger.debug("Detailed validation errors: %s", error_details)
                 raise HTTPException(status_code=422, detail=f"Invalid request data: {error_details}")
         elif isinstance(request, CDKeyUpdateRequest):
-            print("Request is already a CDKeyUpdateRequest model.")
+            logger.debug("Request is already a CDKeyUpdateRequest model.")
             validated_request = request
         else:
             # This case should ideally not be reached if FastAPI type hints work as expected
-            print(f"Unexpected request type: {type(request)}. Raising 400 error.")
+            logger.debug("Unexpected request type: %s. Raising 400 error.", type(request))
             raise HTTPException(status_code=400, detail=f"Unexpected request type: {type(request).__name__}")
 
         # Convert Pydantic model to dict, excluding unset fields to prevent overwriting with defaults
         # Pydantic v2 uses model_dump. If using Pydantic v1, use .dict(exclude_unset=True)
         update_data_dict = validated_request.model_dump(exclude_unset=True)
-        print(f"Data after model_dump(exclude_unset=True): {update_data_dict}")
+        logger.debug("Data after model_dump(exclude_unset=True): %s", update_data_dict)
         
         # CRITICAL: Ensure the 'key' field itself is never part of the update payload from this endpoint.
         # This endpoint is for updating status (isUsed, usedAt, orderId), not the key string.
         if 'key' in update_data_dict:
-            print(f"WARNING: 'key' field was present in update_data_dict and is being removed: {update_data_dict['key']}")
+            logger.warning("'key' field was present in update_data_dict and is being removed: %s", update_data_dict['key'])
             del update_data_dict['key']
         
-        print(f"Sanitized update_data_dict for DB operation: {update_data_dict}")
+        logger.debug("Sanitized update_data_dict for DB operation: %s", update_data_dict)
 
         if not update_data_dict:
-            print("No valid fields to update after sanitization. Fetching current product.")
+            logger.debug("No valid fields to update after sanitization. Fetching current product.")
             # Use product_collection (shop.Product) directly
             product = await user_controller.product_collection.get_product_by_id(product_id)
             if not product:
@@ -812,6 +757,7 @@ async def update_cd_key_for_product(
         updated_product = await user_controller.product_collection.update_cd_key_in_product(
             product_id, cd_key_index, update_data_dict
         )
+        ProductsCollection().invalidate_catalog_cache()
         return updated_product
     except ValueError as e: 
         if "not found" in str(e).lower(): # Product or key index not found
@@ -823,8 +769,7 @@ async def update_cd_key_for_product(
     except HTTPException: 
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc() 
+        logger.exception("Unexpected error updating CD key")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while updating the CD key: {str(e)}")
 
 @admin_router.delete("/products/{product_id}/cdkeys/{cd_key_index}", response_model=ProductModel)
@@ -839,6 +784,7 @@ async def delete_cd_key_for_product(
         updated_product = await user_controller.admin_product_collection.delete_cd_key_from_product(
             product_id, cd_key_index
         )
+        ProductsCollection().invalidate_catalog_cache()
         return updated_product
     except ValueError as e:
         if "not found" in str(e).lower(): # Product or key index not found
@@ -859,8 +805,9 @@ async def get_coupons(
     await verify_admin(user_controller, current_user)
     coupons = await user_controller.get_all_coupons()  # Using the controller method instead of accessing collection directly
     
-    # Get database connection for analytics recalculation
-    db = user_controller.db if hasattr(user_controller, 'db') else await MongoDb().get_db()
+    # Analytics are served as stored (kept current by order transitions); coupons that were
+    # not verified recently are reconciled by the background refresher, not in this request.
+    any_stale = False
     
     # Convert backend model to frontend format for each coupon
     result = []
@@ -871,15 +818,8 @@ async def get_coupons(
                 coupon.model_dump() if hasattr(coupon, 'model_dump') else coupon
             )
             
-            # Recalculate total_active_uses for this coupon to ensure accuracy
-            if "code" in coupon_dict:
-                try:
-                    analytics = await recalculate_coupon_analytics(coupon_dict["code"], db)
-                    # Update usageCount with the current total_active_uses
-                    coupon_dict["usageCount"] = analytics.get("usageCount", 0)
-                except Exception as analytics_error:
-                    print(f"Failed to recalculate analytics for coupon {coupon_dict.get('code', 'unknown')}: {analytics_error}")
-                    # Keep the existing usageCount if analytics fails
+            coupon_dict["analyticsStale"] = coupon_analytics_refresher.is_stale(coupon_dict)
+            any_stale = any_stale or coupon_dict["analyticsStale"]
             
             # Ensure _id is properly converted to string id
             if "_id" in coupon_dict and "id" not in coupon_dict:
@@ -899,13 +839,16 @@ async def get_coupons(
                     # If it's a fixed discount, you might want to handle differently
                     coupon_dict["discountPercent"] = coupon_dict["discountValue"]
             
-            result.append(coupon_dict)
+            # Validated here so MongoJSONResponse renders the same fields as response_model would
+            result.append(Coupon.model_validate(coupon_dict))
         except Exception as e:
             # Log error but continue processing other coupons
-            print(f"Error processing coupon: {e}")
+            logger.error("Error processing coupon: %s", e)
             continue
     
-    return result
+    if any_stale:
+        coupon_analytics_refresher.schedule(await MongoDb().get_db())
+    return MongoJSONResponse(result)
 
 @admin_router.post("/coupons", response_model=Coupon)
 async def create_coupon(
@@ -937,7 +880,10 @@ async def create_coupon(
     except Exception:
         coupon_data["maxUsagePerUser"] = 0
     
-    new_coupon = await user_controller.create_coupon(coupon_data)
+    try:
+        new_coupon = await user_controller.create_coupon(coupon_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Convert to dict to ensure proper serialization
     coupon_dict = new_coupon.dict() if hasattr(new_coupon, 'dict') else new_coupon
@@ -974,7 +920,10 @@ async def update_coupon(
     except Exception:
         coupon_data["maxUsagePerUser"] = 0
 
-    updated_coupon = await user_controller.update_coupon(coupon_id, coupon_data)  # Using the controller method
+    try:
+        updated_coupon = await user_controller.update_coupon(coupon_id, coupon_data)  # Using the controller method
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Convert backend model to frontend format
     coupon_dict = updated_coupon.dict() if hasattr(updated_coupon, 'dict') else updated_coupon
@@ -1001,51 +950,19 @@ async def get_analytics(
     user_controller: UserController = Depends(get_user_controller_dependency),
     current_user: TokenData = Depends(get_current_user)
 ):
-    """Get analytics data for the admin dashboard."""
+    """Get analytics data for the admin dashboard, read from the daily sales rollups."""
     await verify_admin(user_controller, current_user)
-    
-    # Get all orders
-    orders = await user_controller.product_collection.get_all_orders()
-    
-    # Calculate total sales and orders
-    total_sales = sum(order.total for order in orders if order.status != "cancelled")
-    total_orders = len([o for o in orders if o.status != "cancelled"])
-    
-    # Calculate average order value
-    average_order_value = total_sales / total_orders if total_orders > 0 else 0
-    
-    # Calculate daily sales for the last 30 days
-    daily_sales = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    # Create a dict to store daily totals
-    daily_totals = {}
-    
-    # Calculate sales for each day
-    for order in orders:
-        order_date = order.date
-        if start_date <= order_date <= end_date and order.status != "cancelled":
-            date_str = order_date.strftime("%Y-%m-%d")
-            if date_str not in daily_totals:
-                daily_totals[date_str] = 0
-            daily_totals[date_str] += order.total
-    
-    # Fill in any missing days with zero sales
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        daily_sales.append(DailySale(
-            date=date_str,
-            amount=daily_totals.get(date_str, 0)
-        ))
-        current_date += timedelta(days=1)
-    
+
+    summary = await SalesRollupService(await MongoDb().get_db()).get_summary(days=30)
+    total_sales = summary["totalRevenue"]
+    total_orders = summary["totalOrders"]
+
     return AdminAnalytics(
         totalSales=total_sales,
         totalOrders=total_orders,
-        averageOrderValue=average_order_value,
-        dailySales=sorted(daily_sales, key=lambda x: x.date)
+        averageOrderValue=round(total_sales / total_orders, 2) if total_orders > 0 else 0,
+        dailySales=[DailySale(date=day["date"], amount=day["revenue"]) for day in summary["daily"]],
+        ordersByStatus=summary["ordersByStatus"],
     )
 
 # Order routes
@@ -1252,16 +1169,15 @@ async def get_dashboard_stats(
 ):
     await verify_admin(user_controller, current_user)
     try:
-        # Provide mock data for dashboard stats
-        stats = DashboardStats(
-            totalOrders=15, 
-            totalProducts=24,
-            totalRevenue=1250.75, 
-            activeUsers=8
+        summary = await SalesRollupService(await MongoDb().get_db()).get_summary(days=0)
+        return DashboardStats(
+            totalOrders=summary["totalOrders"],
+            totalProducts=await ProductModel.find_all().count(),
+            totalRevenue=summary["totalRevenue"],
+            activeUsers=await User.find_all().count()
         )
-        return stats
     except Exception as e:
-        print(f"Error in get_dashboard_stats: {str(e)}")
+        logger.error("Error in get_dashboard_stats: %s", str(e))
         # Return default stats instead of failing
         return DashboardStats()
 
@@ -1289,9 +1205,8 @@ async def get_key_metrics(
     """Get metrics about key usage and availability."""
     await verify_admin(user_controller, current_user)
     
-    # Get metrics from the dedicated controller
-    # MODIFIED: Call the diagnostic version
-    metrics = await key_metrics_controller.get_key_metrics_diagnostic(current_user=current_user)
+    # Served from the key metrics cache, dropped whenever keys or products change
+    metrics = await key_metrics_controller.get_key_metrics(current_user=current_user)
     return metrics
 
 @admin_router.post("/api/coupons/validate")
@@ -1360,18 +1275,14 @@ async def get_coupon_info(
         code.strip().replace(' ', '').lower(),
         code.strip().replace(' ', '').upper(),
     ]
-    all_coupons_cursor = user_controller.db.coupons.find({})
-    all_coupons = await all_coupons_cursor.to_list(length=1000)
-    db_codes = [c.get('code', None) for c in all_coupons if c.get('code', None)]
-    coupon = None
-    for db_code in db_codes:
-        for variant in code_variants:
-            if db_code and variant and db_code.strip().lower() == variant.strip().lower():
-                coupon = await user_controller.db.coupons.find_one({"code": db_code})
-                break
-        if coupon:
-            break
+    # Exact matches go through the indexed codeNormalized field
+    coupon = await user_controller.db.coupons.find_one(
+        {"codeNormalized": {"$in": list({normalize_coupon_code(v) for v in code_variants} - {None})}}
+    )
     if not coupon:
+        all_coupons_cursor = user_controller.db.coupons.find({}, {"code": 1})
+        all_coupons = await all_coupons_cursor.to_list(length=1000)
+        db_codes = [c.get('code', None) for c in all_coupons if c.get('code', None)]
         for db_code in db_codes:
             for variant in code_variants:
                 if db_code and variant and variant.strip().lower() in db_code.strip().lower():
@@ -14,7 +14,14 @@ import os
 from ..mongodb.mongodb import MongoDb
 from ..lib.database_manager import db_manager
 from ..deps.deps import get_product_collection_dependency
-from ..lib.logging_config import get_logger
+from ..services.coupon_validation_cache import coupon_validation_cache
+from ..services.key_metrics_cache import key_metrics_cache
+from ..lib.role_cache import role_cache
+from ..lib.haseing import hashing_pool
+from ..services.email_outbox import email_outbox
+from ..services.paypal_gateway import paypal_gateway
+from .orders import backorder_retry_queue
+from ..lib.logging_config import get_logger, logging_stats
 
 logger = get_logger(__name__)
 health_router = APIRouter()
@@ -130,6 +137,17 @@ async def detailed_health_check():
                 "products_service": products_check,
                 "system_resources": system_check
             },
+            "caches": {
+                "catalog": get_product_collection_dependency().get_catalog_cache_stats(),
+                "coupon_validation": coupon_validation_cache.stats(),
+                "roles": role_cache.stats(),
+                "key_metrics": key_metrics_cache.stats()
+            },
+            "password_hashing": hashing_pool.stats(),
+            "email_outbox": email_outbox.stats(),
+            "paypal": paypal_gateway.stats(),
+            "backorder_queue": backorder_retry_queue.stats(),
+            "logging": logging_stats(),
             "environment": {
                 "python_version": f"{os.sys.version_info.major}.{os.sys.version_info.minor}.{os.sys.version_info.micro}",
                 "environment": os.getenv("ENVIRONMENT", "development"),
@@ -1,11 +1,13 @@
 import contextlib
 from fastapi import APIRouter, Depends, HTTPException
-from src.deps.deps import UserCollection,get_keys_controller_dependency, KeysCollection, KeyController
+from src.deps.deps import UserCollection,get_keys_controller_dependency, KeysCollection, KeyController, dependency_provider
 from src.models.key.key import Key, KeyCreateRequest, KeyUpdateRequest, KeyResponse, BulkKeyCreateRequest # Updated import
 from src.lib.token_handler import get_current_user
 from src.models.user.user import User
 from beanie import PydanticObjectId
 from src.deps.auth_deps import get_current_admin_user # Import the new admin auth dependency
+from src.models.token.token import TokenData
+from src.routers.orders import backorder_retry_queue
 
 
 
@@ -14,18 +16,15 @@ from src.deps.auth_deps import get_current_admin_user # Import the new admin aut
 @contextlib.asynccontextmanager
 async def lifespan(router: APIRouter):
    """
-   Lifespan context manager for initializing and disconnecting the user controller.
-
-   This context manager handles the lifecycle of the `user_controller` by initializing it
-   before yielding control to the FastAPI router and disconnecting it afterward.
+   Lifespan context manager that makes sure the shared controllers and collections are
+   initialized before the router serves requests.
 
    Args:
       router (APIRouter): The FastAPI router to which the lifespan manager is attached.
    """
-   key_controller:KeyController = get_keys_controller_dependency()
-   await key_controller.initialize()
+   # Controllers and collections are built and initialized once per process
+   await dependency_provider.initialize()
    yield
-   await key_controller.disconnect()
    
 key_router = APIRouter(prefix=f"/key",tags=["key"], lifespan=lifespan)
 
@@ -72,13 +71,14 @@ async def admin_add_keys_to_product(
     product_id: PydanticObjectId, 
     bulk_create_request: BulkKeyCreateRequest, 
     key_controller: KeyController = Depends(get_keys_controller_dependency), 
-    current_admin_user: User = Depends(get_current_admin_user)
+    current_admin_user: TokenData = Depends(get_current_admin_user)
 ):
     # Ensure bulk_create_request.product_id matches product_id from path or handle appropriately
     if bulk_create_request.product_id != product_id:
         raise HTTPException(status_code=400, detail="Product ID in path and body do not match")
     
     created_keys = await key_controller.keys_collection.add_keys_to_product(product_id, bulk_create_request)
+    backorder_retry_queue.schedule(product_id)
     return created_keys
 
 @admin_key_router.get("", response_model=list[KeyResponse])
@@ -87,7 +87,7 @@ async def admin_get_keys_for_product(
     skip: int = 0, 
     limit: int = 100,
     key_controller: KeyController = Depends(get_keys_controller_dependency),
-    current_admin_user: User = Depends(get_current_admin_user)
+    current_admin_user: TokenData = Depends(get_current_admin_user)
 ):
     keys = await key_controller.keys_collection.get_keys_for_product(product_id, skip=skip, limit=limit)
     return keys
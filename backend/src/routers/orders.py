@@ -1,21 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Query
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from ..lib.token_handler import get_current_user
+from ..lib.mongo_json_encoder import MongoJSONResponse
 from ..mongodb.mongodb import MongoDb
 from ..models.user.user import Role
-from ..models.order import Order, OrderItem, StatusHistoryEntry, OrderStatusUpdateRequest, StatusEnum
+from ..models.order import Order, OrderItem, OrderPage, StatusHistoryEntry, OrderStatusUpdateRequest, StatusEnum, normalize_status, normalize_email
+from ..mongodb.orders_collection import OrdersCollection, ORDER_SUMMARY_PROJECTION, build_order_filter
 from ..models.products.products import Product as ProductModel, CDKey # Import CDKey
 from ..mongodb.product_collection import ProductCollection
+from ..mongodb.products_collection import ProductsCollection
 from ..deps.deps import get_user_controller_dependency, get_product_collection_dependency
 from datetime import datetime, timezone
 from pymongo.database import Database
 from bson import ObjectId
+from pymongo import ReturnDocument
 from ..models.token.token import TokenData
 from .orders_key_release_utils import release_keys_for_order
 from ..services.coupon_service import CouponService
-from paypalcheckoutsdk.core import PayPalHttpClient, SandboxEnvironment, LiveEnvironment
-from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest
+from ..models.coupon.coupon import normalize_coupon_code
+from ..services.coupon_analytics_service import CouponAnalyticsService
+from ..services.sales_rollup_service import SalesRollupService
+from ..services.coupon_validation_cache import coupon_validation_cache
+from ..services.key_reservation_service import key_reservation_service
+from ..services.backorder_service import (
+    BACKORDER_STATUSES, BackorderRetryQueue, backorder_product_ids, find_backorders,
+)
+from ..services.paypal_gateway import paypal_gateway, PayPalBusyError, PayPalError, PayPalUnavailableError
 import os
 from ..services.email_service import EmailService
 import logging
@@ -23,21 +34,13 @@ import logging
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Initialize PayPal client
+# Page sizes of the order listings
+ORDERS_PAGE_DEFAULT_LIMIT = int(os.getenv("ORDERS_PAGE_DEFAULT_LIMIT", "100"))
+ORDERS_PAGE_MAX_LIMIT = int(os.getenv("ORDERS_PAGE_MAX_LIMIT", "500"))
+
+# PayPal calls go through the shared gateway (pooled HTTP client, cached access token)
 paypal_mode = os.getenv("PAYPAL_MODE", "sandbox").lower()
-logger.info(f"Initializing PayPal client in {paypal_mode} mode.")
-if paypal_mode == "live":
-    environment = LiveEnvironment(
-        client_id=os.getenv("PAYPAL_LIVE_CLIENT_ID"),
-        client_secret=os.getenv("PAYPAL_LIVE_CLIENT_SECRET")
-    )
-else:
-    environment = SandboxEnvironment(
-        client_id=os.getenv("PAYPAL_CLIENT_ID"),
-        client_secret=os.getenv("PAYPAL_CLIENT_SECRET")
-    )
-logger.debug(f"PayPal environment configured for {paypal_mode} mode")
-paypal_client = PayPalHttpClient(environment)
+logger.info("Using PayPal gateway in %s mode (%s).", paypal_mode, paypal_gateway.base_url)
 
 router = APIRouter()
 
@@ -104,9 +107,11 @@ async def debug_create_test_coupons():
             await coupons_collection.delete_many({"code": coupon["code"]})
             
             # Insert new coupon
+            coupon["codeNormalized"] = normalize_coupon_code(coupon["code"])
             result = await coupons_collection.insert_one(coupon)
             created_count += 1
-            logger.info(f"DEBUG: Created test coupon {coupon['code']}")
+            logger.info("DEBUG: Created test coupon %s", coupon['code'])
+        coupon_validation_cache.invalidate()
         
         # Verify creation
         total_coupons = await coupons_collection.count_documents({})
@@ -136,7 +141,7 @@ async def debug_apply_coupon(payload: dict):
         if not coupon_code:
             return {"error": "No coupon code provided"}
         
-        logger.info(f"DEBUG: Applying coupon {coupon_code} for email {email}, amount {amount}")
+        logger.info("DEBUG: Applying coupon %s for email %s, amount %s", coupon_code, email, amount)
         
         # Get database connection like in the capture process
         from ..deps.deps import get_user_controller_dependency
@@ -146,7 +151,7 @@ async def debug_apply_coupon(payload: dict):
             await user_controller.product_collection.initialize()
             
         db = user_controller.product_collection.db
-        logger.info(f"DEBUG: Using database: {db.name if db else 'None'}")
+        logger.info("DEBUG: Using database: %s", db.name if db else 'None')
         
         # Apply the coupon (this should increment usage)
         coupon_service = CouponService(db)
@@ -167,9 +172,9 @@ async def debug_apply_coupon(payload: dict):
                 }
             }
         
-        logger.info(f"DEBUG: Coupon application successful: discount={discount_applied}")
+        logger.info("DEBUG: Coupon application successful: discount=%s", discount_applied)
         used_count = coupon_obj.get("used", "unknown") if coupon_obj else "no_coupon_obj"
-        logger.info(f"DEBUG: Coupon used count after apply: {used_count}")
+        logger.info("DEBUG: Coupon used count after apply: %s", used_count)
         
         return {
             "success": True,
@@ -206,7 +211,7 @@ async def debug_recalc_analytics(payload: dict):
         if not coupon_code:
             return {"error": "No coupon code provided"}
         
-        logger.info(f"DEBUG: Recalculating analytics for coupon {coupon_code}")
+        logger.info("DEBUG: Recalculating analytics for coupon %s", coupon_code)
         
         # Get database connection
         from ..deps.deps import get_user_controller_dependency
@@ -216,13 +221,13 @@ async def debug_recalc_analytics(payload: dict):
             await user_controller.product_collection.initialize()
             
         db = user_controller.product_collection.db
-        logger.info(f"DEBUG: Using database: {db.name if db else 'None'}")
+        logger.info("DEBUG: Using database: %s", db.name if db else 'None')
         
         # Recalculate analytics
         from .admin_router import recalculate_coupon_analytics
         analytics = await recalculate_coupon_analytics(coupon_code, db)
         
-        logger.info(f"DEBUG: Analytics recalculated: {analytics}")
+        logger.info("DEBUG: Analytics recalculated: %s", analytics)
         
         return {
             "success": True,
@@ -254,7 +259,7 @@ async def validate_coupon_public(request: Request):
     """
     try:
         data = await request.json()
-        logger.info(f"Coupon validation request: {data}")
+        logger.debug("Coupon validation request: %s", data)
         
         code = data.get("code")
         amount = data.get("amount", 0)
@@ -269,7 +274,7 @@ async def validate_coupon_public(request: Request):
                 "error": "No coupon code provided"
             }, status_code=200)
         
-        logger.info(f"Attempting to validate coupon: code={code}, amount={amount}, email={user_email}")
+        logger.debug("Attempting to validate coupon: code=%s, amount=%s, email=%s", code, amount, user_email)
         
         # Use the same database connection as admin panel (UserController)
         from ..deps.deps import get_user_controller_dependency
@@ -282,23 +287,13 @@ async def validate_coupon_public(request: Request):
         # Access database through the product collection
         main_db = user_controller.product_collection.db
         
-        # Check the admin database where coupons are actually stored
-        admin_db = user_controller.product_collection.client['admin']
-        admin_coupon_count = await admin_db.coupons.count_documents({})
-        logger.info(f"Coupons in 'admin' database: {admin_coupon_count}")
-        
-        if admin_coupon_count > 0:
-            logger.info("Using 'admin' database as it contains coupons")
-        else:
-            logger.warning("No coupons found in admin database!")
-        
         # Initialize coupon service with the main database (where orders are stored)
         # Note: Coupons are in admin_db, but orders are in main_db
         try:
             coupon_service = CouponService(main_db)
-            logger.info("CouponService initialized with main database for order counting")
+            logger.debug("CouponService initialized with main database for order counting")
         except Exception as service_error:
-            logger.error(f"CouponService initialization failed: {service_error}")
+            logger.error("CouponService initialization failed: %s", service_error)
             return JSONResponse({
                 "valid": False,
                 "discount": 0, 
@@ -308,16 +303,16 @@ async def validate_coupon_public(request: Request):
         
         # Validate coupon
         try:
-            logger.info(f"🎯 CALLING validate_coupon with: code={code}, amount={amount}, email={user_email}")
-            discount, coupon, error = await coupon_service.validate_coupon(code, amount, user_email=user_email)
-            logger.info(f"🎯 validate_coupon returned: discount={discount}, coupon={coupon is not None}, error='{error}'")
+            logger.debug("🎯 CALLING validate_coupon with: code=%s, amount=%s, email=%s", code, amount, user_email)
+            discount, coupon, error = await coupon_validation_cache.validate(coupon_service, code, amount, user_email=user_email)
+            logger.debug("🎯 validate_coupon returned: discount=%s, coupon=%s, error='%s'", discount, coupon is not None, error)
             
             # CRITICAL DEBUG: Log the exact coupon details if found
             if coupon:
-                logger.info(f"🎯 Coupon details: maxUsagePerUser={coupon.get('maxUsagePerUser')}, maxUses={coupon.get('maxUses')}")
+                logger.debug("🎯 Coupon details: maxUsagePerUser=%s, maxUses=%s", coupon.get('maxUsagePerUser'), coupon.get('maxUses'))
             
         except Exception as validation_error:
-            logger.error(f"Coupon validation exception: {validation_error}", exc_info=True)
+            logger.error("Coupon validation exception: %s", validation_error, exc_info=True)
             return JSONResponse({
                 "valid": False,
                 "discount": 0, 
@@ -326,7 +321,7 @@ async def validate_coupon_public(request: Request):
             }, status_code=200)
         
         if error:
-            logger.warning(f"🚨 Coupon validation FAILED: {error}")
+            logger.warning("🚨 Coupon validation FAILED: %s", error)
             return JSONResponse({
                 "valid": False,
                 "discount": 0, 
@@ -334,7 +329,7 @@ async def validate_coupon_public(request: Request):
                 "error": error
             }, status_code=200)  # Return 200 to match production behavior
             
-        logger.info(f"✅ Coupon validation SUCCESSFUL: discount={discount}")
+        logger.debug("✅ Coupon validation SUCCESSFUL: discount=%s", discount)
         
         # Return comprehensive format that frontend expects
         response_data = {
@@ -357,7 +352,7 @@ async def validate_coupon_public(request: Request):
         return JSONResponse(response_data, status_code=200)
         
     except Exception as e:
-        logger.error(f"Error validating coupon: {str(e)}", exc_info=True)
+        logger.error("Error validating coupon: %s", str(e), exc_info=True)
         return JSONResponse({
             "valid": False,
             "discount": 0, 
@@ -365,19 +360,23 @@ async def validate_coupon_public(request: Request):
             "error": f"Internal server error: {str(e)}"
         }, status_code=200)
 
-# Customer: fetch authenticated user's own orders
-@router.get("/orders/user", response_model=List[Order])
+# Customer: fetch authenticated user's own orders (rendered by MongoJSONResponse; response_model documents OrderPage)
+@router.get("/orders/user", response_model=OrderPage)
 async def get_user_orders(
+    limit: int = Query(ORDERS_PAGE_DEFAULT_LIMIT, ge=1, le=ORDERS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
     current_user: TokenData = Depends(get_current_user)
 ):
-    db = await mongo_db.get_db()
-    cursor = db.orders.find({"email": current_user.username})
-    orders = await cursor.to_list(length=None)
-    # Convert ObjectId to string
-    for doc in orders:
-        if '_id' in doc and isinstance(doc['_id'], ObjectId):
-            doc['_id'] = str(doc['_id'])
-    return [Order(**doc).model_dump(by_alias=True) for doc in orders]
+    try:
+        docs, next_cursor = await OrdersCollection().list_orders_page({"email": current_user.username}, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    orders = []
+    for doc in docs:
+        normalized = _normalize_order_doc(doc)
+        if normalized is not None:
+            orders.append(normalized.model_dump(by_alias=True))
+    return MongoJSONResponse({"orders": orders, "next_cursor": next_cursor, "limit": limit})
 
 # Get MongoDB instance
 mongo_db = MongoDb()
@@ -385,7 +384,7 @@ mongo_db = MongoDb()
 async def assign_key_to_order_item(
     order_id: str, 
     item: OrderItem, 
-    product_collection: ProductCollection, 
+    product_collection: ProductsCollection, 
     db: Database
 ) -> bool:
     """
@@ -393,30 +392,13 @@ async def assign_key_to_order_item(
     Marks the key as used and updates the product in the database.
     Returns True if a key was successfully assigned, False otherwise.
     """
-    product = await product_collection.get_product_by_id(item.productId)
+    product = (await product_collection.get_checkout_products([item.productId])).get(str(item.productId))
     if not product or not product.manages_cd_keys:
         return False # Product doesn't manage keys or not found
 
-    assigned_key_to_item = None
-    key_updated_in_product = False
-
-    # Find an available key
-    for key_obj in product.cdKeys:
-        if not key_obj.isUsed:
-            key_obj.isUsed = True
-            key_obj.usedAt = datetime.now(timezone.utc)
-            key_obj.orderId = order_id  # Store order ID as string
-            item.assigned_keys = [key_obj.key]  # Assign key(s) to order item
-            assigned_key_to_item = key_obj.key
-            key_updated_in_product = True
-            break
-    
-    if key_updated_in_product:
-        # Update the product document with the modified cdKeys list
-        await db.Product.update_one( # Assuming your collection is named "Product"
-            {"_id": product.id},
-            {"$set": {"cdKeys": [k.model_dump() for k in product.cdKeys]}} # Use model_dump() for Pydantic v2
-        )
+    claimed = await key_reservation_service.claim_keys(product.id, order_id, 1)
+    if claimed:
+        item.assigned_keys = claimed  # Assign key(s) to order item
         return True
     return False
 
@@ -425,9 +407,9 @@ async def create_order(
     order_data: Order, 
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency),
-    product_collection: ProductCollection = Depends(get_product_collection_dependency)
+    product_collection: ProductsCollection = Depends(get_product_collection_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
     db = await mongo_db.get_db()
@@ -438,24 +420,22 @@ async def create_order(
     all_items_have_keys = True
     partial_fulfillment_items = []  # Track items that are partially fulfilled
     pending_items = []  # Track items waiting for stock
+    # One round trip for the whole cart
+    products = await product_collection.get_checkout_products(item.productId for item in order_data.items)
 
     for item_index, item in enumerate(order_data.items):
         if item.quantity <= 0:
             continue
 
-        product = await product_collection.get_product_by_id(item.productId)
+        product = products.get(str(item.productId))
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with ID {item.productId} not found.")
 
         if product.manages_cd_keys:
-            assigned_keys = []
-            # Use Beanie model for updating and saving
-            product_doc = await ProductModel.get(product.id)
-            available_keys = [k for k in product_doc.cdKeys if not k.isUsed]
-            
-            # NEW LOGIC: Always assign what's available, track what's pending
-            available_count = len(available_keys)
+            # Claim keys atomically on the server; never load or save the whole cdKeys array
             requested_count = item.quantity
+            assigned_keys = await key_reservation_service.claim_keys(product.id, order_data.id, requested_count)
+            available_count = len(assigned_keys)
             
             if available_count < requested_count:
                 all_items_have_keys = False
@@ -483,19 +463,7 @@ async def create_order(
                         "total": requested_count
                     })
             
-            # Assign all available keys (even if partial)
-            keys_to_assign = min(available_count, requested_count)
-            for i in range(keys_to_assign):
-                key_obj = available_keys[i]
-                key_obj.isUsed = True
-                key_obj.usedAt = datetime.now(timezone.utc)
-                key_obj.orderId = order_data.id
-                assigned_keys.append(key_obj.key)
-            
-            # Save the updated product with used keys (only if we assigned any)
-            if keys_to_assign > 0:
-                await product_doc.save()
-            
+            keys_to_assign = available_count
             item.assigned_keys = assigned_keys
             # Add fulfillment metadata to the item
             item.fulfillment_status = {
@@ -548,17 +516,20 @@ async def create_order(
     # Prepare order for insertion
     order_to_insert = order_data.model_dump(by_alias=True) # Use model_dump for Pydantic v2
     order_to_insert["_id"] = order_id_obj # Ensure _id is ObjectId
+    order_to_insert["codeNormalized"] = normalize_coupon_code(coupon_code)
+    order_to_insert["emailNormalized"] = normalize_email(order_to_insert.get("email"))
+    order_to_insert["backorderProductIds"] = backorder_product_ids(order_to_insert.get("items", []))
 
     insert_result = await db.orders.insert_one(order_to_insert)
 
     if not insert_result.inserted_id:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create order")
+    await SalesRollupService(db).record_order_change(None, order_to_insert)
 
-    # Step 2: After the order is successfully created, recalculate analytics.
+    # Step 2: After the order is successfully created, count it in the coupon analytics.
     if coupon_code:
-        from .admin_router import recalculate_coupon_analytics
-        await recalculate_coupon_analytics(coupon_code, db)
-        logger.info(f"Order {order_data.id}: Recalculated analytics for coupon {coupon_code} on creation.")
+        await CouponAnalyticsService(db).record_order_change(None, order_to_insert)
+        logger.info("Order %s: Updated analytics for coupon %s on creation.", order_data.id, coupon_code)
 
     created_order = await db.orders.find_one({"_id": insert_result.inserted_id})
     # Ensure _id is a string for Pydantic validation
@@ -641,8 +612,8 @@ async def create_order(
         
         # Send notification to admin (support@monkeyz.co.il)
         try:
-            from ..services.email_service import EMAIL_ENABLED, conf
-            if EMAIL_ENABLED and conf:
+            from ..services.email_service import EMAIL_ENABLED
+            if EMAIL_ENABLED:
                 admin_email = os.getenv("ADMIN_EMAIL", "support@monkeyz.co.il")
                 order_id = created_order.get('_id')
                 total = created_order.get('total', 0)
@@ -667,17 +638,8 @@ async def create_order(
                 <p><strong>Status:</strong> {created_order.get('status')}</p>
                 """
                 
-                from fastapi_mail import MessageSchema, FastMail
-                
-                admin_message = MessageSchema(
-                    subject=admin_subject,
-                    recipients=[admin_email],
-                    body=admin_body,
-                    subtype="html"
-                )
-                fm = FastMail(conf)
-                await fm.send_message(admin_message)
-                logger.info("Successfully sent admin notification email for order: %s", order_id)
+                await EmailService().send_admin_notification(admin_email, admin_subject, admin_body)
+                logger.info("Queued admin notification email for order: %s", order_id)
             else:
                 logger.warning("Email service disabled - cannot send admin notification for order: %s", created_order.get('_id'))
         except Exception as e:
@@ -688,174 +650,227 @@ async def create_order(
 # ... (rest of the existing router code for get_orders, get_order, update_order_status, etc.)
 # Ensure to add a new endpoint or a mechanism to retry failed orders.
 
-async def retry_failed_orders_internal(db: Database, product_collection: ProductCollection):
+async def _retry_order_fulfillment(db: Database, order_doc: dict, product_collection: ProductsCollection,
+                                   email_service: EmailService, product_id: Optional[str] = None) -> bool:
     """
-    Internal function to retry assigning keys to orders in 'AWAITING_STOCK', 'FAILED', or 'PARTIALLY_FULFILLED' status.
-    This would typically be called by a scheduled task or after a stock update.
+    Assigns the keys still missing from one backordered order, then updates its status,
+    backorder queue entries and customer emails.
+
+    With ``product_id`` only items of that product are retried (per-product backorder queue).
+    Returns False when a retried product ran out of keys before this order was served.
     """
-    email_service = EmailService()
-    orders_to_retry_cursor = db.orders.find({"status": {"$in": [StatusEnum.AWAITING_STOCK, StatusEnum.FAILED, StatusEnum.PARTIALLY_FULFILLED]}})
+    in_stock = True
+    # Keep the original ID for database operations (can be ObjectId or string like PayPal ID)
+    original_id = order_doc['_id']
+    logger.debug("Processing order with _id: %s (type: %s)", original_id, type(original_id))
     
-    async for order_doc in orders_to_retry_cursor:
-        try:
-            # Keep the original ID for database operations (can be ObjectId or string like PayPal ID)
-            original_id = order_doc['_id']
-            logger.debug(f"Processing order with _id: {original_id} (type: {type(original_id)})")
-            
-            # Convert ObjectId to string for '_id' to satisfy Pydantic validation
-            if '_id' in order_doc and not isinstance(order_doc['_id'], str):
-                order_doc['_id'] = str(order_doc['_id'])
+    # Convert ObjectId to string for '_id' to satisfy Pydantic validation
+    if '_id' in order_doc and not isinstance(order_doc['_id'], str):
+        order_doc['_id'] = str(order_doc['_id'])
+    
+    order = Order(**order_doc)
+    all_items_fully_fulfilled = True
+    needs_update = False
+    assigned_keys_for_email = []
+    products_for_email = []
+    partial_fulfillment_items = []
+    pending_items = []
+    claimed_by_product = {}
+    previously_waiting_on = set(order_doc.get("backorderProductIds") or [])
+    products = await product_collection.get_checkout_products(
+        item.productId for item in order.items if product_id is None or item.productId == str(product_id)
+    )
+
+    for item in order.items:
+        # Check current fulfillment status
+        currently_assigned = len(item.assigned_keys) if hasattr(item, 'assigned_keys') and item.assigned_keys else 0
+        still_needed = item.quantity - currently_assigned
+        
+        if still_needed <= 0:
+            continue  # Item is already fully fulfilled
+        
+        if product_id is not None and item.productId != str(product_id):
+            # Not retried in this pass, but the order keeps waiting on it
+            if item.productId not in previously_waiting_on:
+                continue
+        else:
+            product = products.get(str(item.productId))
+            if not (product and product.manages_cd_keys):
+                continue
+            # Try to fulfill remaining quantity
+            new_assigned_keys = await key_reservation_service.claim_keys(product.id, order.id, still_needed)
+            keys_to_assign = len(new_assigned_keys)
+            if keys_to_assign < still_needed:
+                in_stock = False
             
-            order = Order(**order_doc)
-            all_items_fully_fulfilled = True
-            needs_update = False
-            assigned_keys_for_email = []
-            products_for_email = []
-            partial_fulfillment_items = []
-            pending_items = []
-
-            for item in order.items:
-                # Check current fulfillment status
-                currently_assigned = len(item.assigned_keys) if hasattr(item, 'assigned_keys') and item.assigned_keys else 0
-                still_needed = item.quantity - currently_assigned
+            if keys_to_assign > 0:
+                # Update item's assigned keys
+                if not hasattr(item, 'assigned_keys') or not item.assigned_keys:
+                    item.assigned_keys = []
+                item.assigned_keys.extend(new_assigned_keys)
+                claimed_by_product.setdefault(product.id, []).extend(new_assigned_keys)
+                needs_update = True
                 
-                if still_needed <= 0:
-                    continue  # Item is already fully fulfilled
+                # Collect data for email
+                assigned_keys_for_email.extend(new_assigned_keys)
+                products_for_email.append({
+                    "name": item.name,
+                    "id": item.productId,
+                    "quantity": keys_to_assign
+                })
                 
-                product = await product_collection.get_product_by_id(item.productId)
-                if product and product.manages_cd_keys:
-                    # Try to fulfill remaining quantity
-                    new_assigned_keys = []
-                    available_keys = [k for k in product.cdKeys if not k.isUsed]
-                    available_count = len(available_keys)
-                    keys_to_assign = min(available_count, still_needed)
-                    
-                    if keys_to_assign > 0:
-                        # Assign available keys
-                        for i in range(keys_to_assign):
-                            key_obj = available_keys[i]
-                            key_obj.isUsed = True
-                            key_obj.usedAt = datetime.now(timezone.utc)
-                            key_obj.orderId = order.id
-                            new_assigned_keys.append(key_obj.key)
-                        
-                        # Save the updated product with used keys
-                        await product.save()
-                        
-                        # Update item's assigned keys
-                        if not hasattr(item, 'assigned_keys') or not item.assigned_keys:
-                            item.assigned_keys = []
-                        item.assigned_keys.extend(new_assigned_keys)
-                        needs_update = True
-                        
-                        # Collect data for email
-                        assigned_keys_for_email.extend(new_assigned_keys)
-                        products_for_email.append({
-                            "name": item.name,
-                            "id": item.productId,
-                            "quantity": keys_to_assign
-                        })
-                        
-                        logger.info("Retry: Assigned %d additional keys to item %s in order %s", keys_to_assign, item.productId, order.id)
-                    
-                    # Update fulfillment tracking
-                    total_assigned_now = len(item.assigned_keys) if hasattr(item, 'assigned_keys') and item.assigned_keys else 0
-                    remaining_needed = item.quantity - total_assigned_now
-                    
-                    if remaining_needed > 0:
-                        all_items_fully_fulfilled = False
-                        if total_assigned_now > 0:
-                            # Partial fulfillment
-                            partial_fulfillment_items.append({
-                                "productId": item.productId,
-                                "productName": item.name,
-                                "assigned": total_assigned_now,
-                                "pending": remaining_needed,
-                                "total": item.quantity
-                            })
-                        else:
-                            # Still completely pending
-                            pending_items.append({
-                                "productId": item.productId,
-                                "productName": item.name,
-                                "pending": remaining_needed,
-                                "total": item.quantity
-                            })
-
-            if needs_update: # If any key was assigned in this retry attempt
-                # Determine new status
-                if all_items_fully_fulfilled:
-                    new_status = StatusEnum.COMPLETED
-                    order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="All items fulfilled on retry - order completed."))
-                elif any(partial_fulfillment_items):
-                    new_status = StatusEnum.PARTIALLY_FULFILLED
-                    order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="Additional keys assigned on retry - partial fulfillment."))
-                else:
-                    new_status = StatusEnum.AWAITING_STOCK
-                    order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="Some keys assigned on retry - still awaiting stock."))
+                logger.info("Retry: Assigned %d additional keys to item %s in order %s", keys_to_assign, item.productId, order.id)
+            item.fulfillment_status = {
+                "assigned": len(item.assigned_keys or []),
+                "pending": item.quantity - len(item.assigned_keys or []),
+                "total_requested": item.quantity
+            }
+        
+        # Update fulfillment tracking
+        total_assigned_now = len(item.assigned_keys) if hasattr(item, 'assigned_keys') and item.assigned_keys else 0
+        remaining_needed = item.quantity - total_assigned_now
+        
+        if remaining_needed > 0:
+            all_items_fully_fulfilled = False
+            if total_assigned_now > 0:
+                # Partial fulfillment
+                partial_fulfillment_items.append({
+                    "productId": item.productId,
+                    "productName": item.name,
+                    "assigned": total_assigned_now,
+                    "pending": remaining_needed,
+                    "total": item.quantity
+                })
+            else:
+                # Still completely pending
+                pending_items.append({
+                    "productId": item.productId,
+                    "productName": item.name,
+                    "pending": remaining_needed,
+                    "total": item.quantity
+                })
+
+    backorder_ids = list(dict.fromkeys(entry["productId"] for entry in partial_fulfillment_items + pending_items))
+
+    if not needs_update:
+        if product_id is None and order_doc.get("backorderProductIds") != backorder_ids:
+            # Full scans also (re)build the queue entries of orders created before they existed
+            await db.orders.update_one({"_id": original_id}, {"$set": {"backorderProductIds": backorder_ids}})
+        return in_stock
+
+    # Determine new status
+    if all_items_fully_fulfilled:
+        new_status = StatusEnum.COMPLETED
+        order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="All items fulfilled on retry - order completed."))
+    elif any(partial_fulfillment_items):
+        new_status = StatusEnum.PARTIALLY_FULFILLED
+        order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="Additional keys assigned on retry - partial fulfillment."))
+    else:
+        new_status = StatusEnum.AWAITING_STOCK
+        order.statusHistory.append(StatusHistoryEntry(status=new_status, date=datetime.now(timezone.utc), note="Some keys assigned on retry - still awaiting stock."))
 
-                # Use the original ID for database update (handles both ObjectId and string IDs)
-                update_filter = {"_id": original_id}
-                
-                update_result = await db.orders.update_one(
-                    update_filter,
-                    {"$set": {
-                        "items": [i.model_dump() for i in order.items], 
-                        "status": new_status,
-                        "statusHistory": [sh.model_dump() for sh in order.statusHistory],
-                        "updatedAt": datetime.now(timezone.utc)
-                    }}
+    # Use the original ID for database update (handles both ObjectId and string IDs); the status
+    # condition keeps an order that was cancelled meanwhile from being revived, and matching the
+    # updatedAt we read makes a concurrent retry (queue worker or admin endpoint) that already
+    # rewrote the items lose instead of being overwritten with this stale copy
+    update_result = await db.orders.update_one(
+        {"_id": original_id, "status": {"$in": BACKORDER_STATUSES}, "updatedAt": order_doc.get("updatedAt")},
+        {"$set": {
+            "items": [i.model_dump() for i in order.items], 
+            "status": new_status,
+            "statusHistory": [sh.model_dump() for sh in order.statusHistory],
+            "backorderProductIds": backorder_ids,
+            "updatedAt": datetime.now(timezone.utc)
+        }}
+    )
+    
+    if update_result.modified_count == 0:
+        logger.warning("Failed to update order %s - changed or no longer awaiting stock, releasing the claimed keys", order.id)
+        for claimed_product_id, keys in claimed_by_product.items():
+            await key_reservation_service.release_keys(claimed_product_id, keys)
+        return in_stock
+
+    logger.info("Successfully updated order %s to status %s", order.id, new_status)
+    await CouponAnalyticsService(db).record_order_change(order_doc, {**order_doc, "status": new_status.value})
+    await SalesRollupService(db).record_order_change(order_doc, {**order_doc, "status": new_status.value})
+    
+    # Send appropriate emails based on new status
+    if assigned_keys_for_email and order.email:
+        try:
+            if new_status == StatusEnum.COMPLETED:
+                # Send complete fulfillment email
+                success = await email_service.send_order_email(
+                    to=order.email,
+                    subject=f"Order {order.id} - Final Keys Delivered!",
+                    products=products_for_email,
+                    keys=assigned_keys_for_email
                 )
-                
-                if update_result.modified_count == 0:
-                    logger.warning(f"Failed to update order {order.id} - no documents modified")
-                else:
-                    logger.info(f"Successfully updated order {order.id} to status {new_status}")
-                
-                # Send appropriate emails based on new status
-                if assigned_keys_for_email and order.email:
-                    try:
-                        if new_status == StatusEnum.COMPLETED:
-                            # Send complete fulfillment email
-                            success = await email_service.send_order_email(
-                                to=order.email,
-                                subject=f"Order {order.id} - Final Keys Delivered!",
-                                products=products_for_email,
-                                keys=assigned_keys_for_email
-                            )
-                            logger.info("Sent completion email to %s for order %s", order.email, order.id)
-                        else:
-                            # Send new keys + status update
-                            success = await email_service.send_order_email(
-                                to=order.email,
-                                subject=f"Order {order.id} - Additional Keys Delivered",
-                                products=products_for_email,
-                                keys=assigned_keys_for_email
-                            )
-                            if success:
-                                # Also send updated pending notification if still partially fulfilled
-                                if new_status == StatusEnum.PARTIALLY_FULFILLED or new_status == StatusEnum.AWAITING_STOCK:
-                                    await email_service.send_pending_stock_email(
-                                        to=order.email,
-                                        order_id=order.id,
-                                        partial_fulfillment_items=partial_fulfillment_items if partial_fulfillment_items else None,
-                                        pending_items=pending_items if pending_items else None
-                                    )
-                            logger.info("Sent additional keys email to %s for order %s", order.email, order.id)
-                    except Exception as e:
-                        logger.error("Error sending retry emails to %s for order %s: %s", order.email, order.id, str(e))
-        
+                logger.info("Sent completion email to %s for order %s", order.email, order.id)
+            else:
+                # Send new keys + status update
+                success = await email_service.send_order_email(
+                    to=order.email,
+                    subject=f"Order {order.id} - Additional Keys Delivered",
+                    products=products_for_email,
+                    keys=assigned_keys_for_email
+                )
+                if success:
+                    # Also send updated pending notification if still partially fulfilled
+                    if new_status == StatusEnum.PARTIALLY_FULFILLED or new_status == StatusEnum.AWAITING_STOCK:
+                        await email_service.send_pending_stock_email(
+                            to=order.email,
+                            order_id=order.id,
+                            partial_fulfillment_items=partial_fulfillment_items if partial_fulfillment_items else None,
+                            pending_items=pending_items if pending_items else None
+                        )
+                logger.info("Sent additional keys email to %s for order %s", order.email, order.id)
+        except Exception as e:
+            logger.error("Error sending retry emails to %s for order %s: %s", order.email, order.id, str(e))
+    return in_stock
+
+
+async def retry_failed_orders_internal(db: Database, product_collection: ProductsCollection, product_id: Optional[str] = None):
+    """
+    Internal function to retry assigning keys to orders in 'AWAITING_STOCK', 'FAILED', or 'PARTIALLY_FULFILLED' status.
+
+    With ``product_id`` only the backorder queue of that product is walked, oldest order first,
+    and the walk stops as soon as the product runs out of keys. Without it every waiting order
+    is retried (and its queue entries rebuilt).
+    """
+    email_service = EmailService()
+    if product_id is None:
+        orders_to_retry_cursor = db.orders.find({"status": {"$in": BACKORDER_STATUSES}}).sort([("createdAt", 1), ("_id", 1)])
+    else:
+        orders_to_retry_cursor = find_backorders(db, product_id)
+    
+    async for order_doc in orders_to_retry_cursor:
+        try:
+            in_stock = await _retry_order_fulfillment(db, order_doc, product_collection, email_service, product_id)
         except Exception as e:
             logger.error(f"Error processing order {order_doc.get('_id', 'unknown')}: {str(e)}")
             # Continue with next order instead of failing the entire batch
+            continue
+        if product_id is not None and not in_stock:
+            # Younger orders in this queue cannot be served either
+            break
+
+
+async def _retry_backorders_for_product(product_id: str):
+    db = await mongo_db.get_db()
+    await retry_failed_orders_internal(db, get_product_collection_dependency(), product_id)
+    logger.info("Processed backorder queue of product %s", product_id)
+
+
+# Background job that serves backorders after keys are added to a product
+backorder_retry_queue = BackorderRetryQueue(_retry_backorders_for_product)
 
 @router.post("/orders/retry-failed", status_code=status.HTTP_200_OK)
 async def retry_failed_orders_endpoint(
     current_user: TokenData = Depends(get_current_user), # Secure this endpoint
     user_controller = Depends(get_user_controller_dependency),
-    product_collection: ProductCollection = Depends(get_product_collection_dependency)
+    product_collection: ProductsCollection = Depends(get_product_collection_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     db = await mongo_db.get_db()
     await retry_failed_orders_internal(db, product_collection)
@@ -877,75 +892,117 @@ async def retry_failed_orders_endpoint(
 # with Pydantic v2 (e.g. using model_dump) and BSON ObjectId handling.
 
 # GET /orders
+def _normalize_order_doc(order_doc: dict) -> Optional[Order]:
+    """Maps legacy/PayPal order shapes onto the Order model; None if the document cannot be parsed."""
+    # If this is a PayPal order (has cart but no items), normalize it
+    if 'items' not in order_doc and 'cart' in order_doc:
+        # Map cart to items
+        order_doc['items'] = [
+            { 'productId': i.get('id'), 'name': '', 'quantity': i.get('quantity'), 'price': i.get('price'), 'assigned_keys': i.get('assigned_keys', []) }
+            for i in order_doc['cart']
+        ]
+        # Fill other required fields
+        order_doc['customerName'] = ''
+        order_doc['email'] = order_doc.get('customerEmail')
+        created_at = order_doc.get('createdAt')
+        order_doc['date'] = created_at
+        order_doc['statusHistory'] = [ { 'status': order_doc.get('status'), 'date': created_at } ]
+        order_doc['total'] = order_doc.get('totalPaid') or (order_doc.get('originalTotal', 0) - order_doc.get('discountAmount', 0))
+        order_doc['updatedAt'] = created_at
+        order_doc['coupon_code'] = order_doc.get('couponCode')
+        order_doc['discount_amount'] = order_doc.get('discountAmount')
+        order_doc['original_total'] = order_doc.get('originalTotal')
+    # Convert ObjectId to string for Pydantic
+    if '_id' in order_doc and isinstance(order_doc['_id'], ObjectId):
+        order_doc['_id'] = str(order_doc['_id'])
+    # If cart present, merge assigned_keys into items for PayPal orders
+    if 'cart' in order_doc and 'items' in order_doc:
+        for c in order_doc['cart']:
+            pid = c.get('id')
+            keys = c.get('assigned_keys', [])
+            for itm in order_doc['items']:
+                if itm.get('productId') == pid:
+                    itm['assigned_keys'] = keys
+    # Ensure email is a valid string
+    if not isinstance(order_doc.get('email'), str):
+        order_doc['email'] = order_doc.get('customerEmail') or order_doc.get('customer_email') or ''
+    # Sanitize item names
+    for itm in order_doc.get('items', []):
+        nm = itm.get('name')
+        if not isinstance(nm, str):
+            if isinstance(nm, dict):
+                itm['name'] = nm.get('en') or next(iter(nm.values()), '')
+            else:
+                itm['name'] = str(nm)
+    # Map coupon and discount fields
+    order_doc['coupon_code'] = order_doc.get('coupon_code') or order_doc.get('couponCode')
+    order_doc['discount_amount'] = order_doc.get('discount_amount') or order_doc.get('discountAmount')
+    order_doc['original_total'] = order_doc.get('original_total') or order_doc.get('originalTotal')
+    try:
+        return Order(**order_doc)
+    except Exception as e:
+        logger.error("Error parsing order %s: %s", order_doc.get('_id'), e)
+        return None
+
+
 @router.get("/orders")  # Temporarily return raw JSON to avoid Pydantic validation errors
 async def get_orders(
+    limit: int = Query(ORDERS_PAGE_DEFAULT_LIMIT, ge=1, le=ORDERS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Comma-separated statuses"),
+    coupon: Optional[str] = None,
+    email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    view: str = Query("full", pattern="^(full|summary)$", description="summary omits keys and status history"),
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency)
 ):
-    try:
-        if not await user_controller.has_role(current_user.username, Role.manager):
-            raise HTTPException(status_code=403, detail="Admin access required")
+    """
+    Admin order listing, newest first, one keyset-paginated page at a time.
+    Returns {"orders": [...], "next_cursor": str | None, "limit": int}, rendered by
+    MongoJSONResponse straight from the dumped orders (no jsonable_encoder pass).
+    """
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
+        raise HTTPException(status_code=403, detail="Admin access required")
 
-        db = await mongo_db.get_db()
-        orders_cursor = db.orders.find()
-        orders_from_db = await orders_cursor.to_list(length=None)
-        
-        processed_orders = []
-        for order_doc in orders_from_db:
-            # If this is a PayPal order (has cart but no items), normalize it
-            if 'items' not in order_doc and 'cart' in order_doc:
-                # Map cart to items
-                order_doc['items'] = [
-                    { 'productId': i.get('id'), 'name': '', 'quantity': i.get('quantity'), 'price': i.get('price'), 'assigned_keys': i.get('assigned_keys', []) }
-                    for i in order_doc['cart']
-                ]
-                # Fill other required fields
-                order_doc['customerName'] = ''
-                order_doc['email'] = order_doc.get('customerEmail')
-                created_at = order_doc.get('createdAt')
-                order_doc['date'] = created_at
-                order_doc['statusHistory'] = [ { 'status': order_doc.get('status'), 'date': created_at } ]
-                order_doc['total'] = order_doc.get('totalPaid') or (order_doc.get('originalTotal', 0) - order_doc.get('discountAmount', 0))
-                order_doc['updatedAt'] = created_at
-                order_doc['coupon_code'] = order_doc.get('couponCode')
-                order_doc['discount_amount'] = order_doc.get('discountAmount')
-                order_doc['original_total'] = order_doc.get('originalTotal')
-            # Convert ObjectId to string for Pydantic
-            if '_id' in order_doc and isinstance(order_doc['_id'], ObjectId):
-                order_doc['_id'] = str(order_doc['_id'])
-            # If cart present, merge assigned_keys into items for PayPal orders
-            if 'cart' in order_doc and 'items' in order_doc:
-                for c in order_doc['cart']:
-                    pid = c.get('id')
-                    keys = c.get('assigned_keys', [])
-                    for itm in order_doc['items']:
-                        if itm.get('productId') == pid:
-                            itm['assigned_keys'] = keys
-            # Ensure email is a valid string
-            if not isinstance(order_doc.get('email'), str):
-                order_doc['email'] = order_doc.get('customerEmail') or order_doc.get('customer_email') or ''
-            # Sanitize item names
-            for itm in order_doc.get('items', []):
-                nm = itm.get('name')
-                if not isinstance(nm, str):
-                    if isinstance(nm, dict):
-                        itm['name'] = nm.get('en') or next(iter(nm.values()), '')
-                    else:
-                        itm['name'] = str(nm)
-            # Map coupon and discount fields
-            order_doc['coupon_code'] = order_doc.get('coupon_code') or order_doc.get('couponCode')
-            order_doc['discount_amount'] = order_doc.get('discount_amount') or order_doc.get('discountAmount')
-            order_doc['original_total'] = order_doc.get('original_total') or order_doc.get('originalTotal')
-            try:
-                processed_orders.append(Order(**order_doc))
-            except Exception as e:
-                logger.error("Error parsing order %s: %s", order_doc.get('_id'), e)
+    statuses = None
+    if status_filter:
+        statuses = []
+        for value in (s.strip() for s in status_filter.split(",")):
+            if not value:
                 continue
-        return [order.model_dump(by_alias=True) for order in processed_orders]
+            status_value = normalize_status(value, default=None)
+            if status_value is None:
+                raise HTTPException(status_code=400, detail=f"Unknown order status '{value}'")
+            statuses.append(status_value)
+
+    query = build_order_filter(
+        status=statuses,
+        coupon_code=coupon,
+        email=email,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    summary = view == "summary"
+    try:
+        orders_from_db, next_cursor = await OrdersCollection().list_orders_page(
+            query, limit, cursor, ORDER_SUMMARY_PROJECTION if summary else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback; traceback.print_exc()
+        logger.error("Error retrieving orders: %s", e)
         raise HTTPException(status_code=500, detail=f"Error retrieving orders: {e}")
 
+    exclude = {"statusHistory": True, "items": {"__all__": {"assigned_keys", "fulfillment_status"}}} if summary else None
+    processed_orders = []
+    for order_doc in orders_from_db:
+        order = _normalize_order_doc(order_doc)
+        if order is not None:
+            processed_orders.append(order.model_dump(by_alias=True, exclude=exclude))
+    return MongoJSONResponse({"orders": processed_orders, "next_cursor": next_cursor, "limit": limit})
+
 # GET /orders/{order_id}
 @router.get("/orders/{order_id}", response_model=Order)
 async def get_order(
@@ -953,7 +1010,7 @@ async def get_order(
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     db = await mongo_db.get_db()
@@ -979,7 +1036,7 @@ async def update_order_status(
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     db = await mongo_db.get_db()
@@ -999,37 +1056,31 @@ async def update_order_status(
         note=status_update.note
     )
     
-    # Update the order
-    update_result = await db.orders.update_one(
+    # Update the order; the pre-update document is the exact state this transition started from
+    previous_order = await db.orders.find_one_and_update(
         {"_id": obj_order_id},
         {
             "$set": {"status": status_update.status, "updatedAt": datetime.now(timezone.utc)},
             "$push": {"statusHistory": new_status_entry.model_dump()} # Use model_dump for Pydantic v2
-        }
+        },
+        return_document=ReturnDocument.BEFORE
     )
+    if previous_order:
+        order_from_db = previous_order
 
     previous_status = order_from_db.get('status')
     coupon_code = order_from_db.get('couponCode') or order_from_db.get('coupon_code')
-    # If status is being set to Cancelled and it wasn't previously Cancelled, release keys and recalculate coupon analytics
+    # If status is being set to Cancelled and it wasn't previously Cancelled, release keys
     if status_update.status == StatusEnum.CANCELLED.value and previous_status != StatusEnum.CANCELLED.value:
         from .orders_key_release_utils import release_keys_for_order
         await release_keys_for_order(order_from_db, db)
         logger.info("Order %s: Released keys on cancel", order_id)
-        if coupon_code:
-            from .admin_router import recalculate_coupon_analytics
-            await recalculate_coupon_analytics(coupon_code, db)
-            logger.info("Order %s: Recalculated coupon analytics for %s after cancellation", order_id, coupon_code)
-    # If status is being changed from Cancelled to any other status, recalculate coupon analytics
-    if previous_status == StatusEnum.CANCELLED.value and status_update.status != StatusEnum.CANCELLED.value:
-        if coupon_code:
-            from .admin_router import recalculate_coupon_analytics
-            await recalculate_coupon_analytics(coupon_code, db)
-            logger.info("Order %s: Recalculated coupon analytics for %s after uncancellation", order_id, coupon_code)
-
-    if update_result.modified_count == 0:
-        # This might happen if the status is the same or order not found (already checked)
-        # For simplicity, we'll refetch, but ideally, handle more gracefully
-        pass
+    # Every status change moves the order between coupon analytics and sales rollup buckets
+    if previous_order and previous_status != status_update.status:
+        await SalesRollupService(db).record_order_change(order_from_db, {**order_from_db, "status": status_update.status})
+    if coupon_code and previous_order and previous_status != status_update.status:
+        await CouponAnalyticsService(db).record_order_change(order_from_db, {**order_from_db, "status": status_update.status})
+        logger.info("Order %s: Updated coupon analytics for %s (%s -> %s)", order_id, coupon_code, previous_status, status_update.status)
 
     updated_order_doc = await db.orders.find_one({"_id": obj_order_id})
     if not updated_order_doc: # Should not happen if previous checks passed
@@ -1046,7 +1097,7 @@ async def delete_order(
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     db = await mongo_db.get_db()
@@ -1064,12 +1115,13 @@ async def delete_order(
     coupon_code = order_from_db.get("couponCode") or order_from_db.get("coupon_code")
     await release_keys_for_order(order_from_db, db)
     logger.info("Order %s: Released keys before deletion", order_id)
-    await db.orders.delete_one({"_id": query_id})
-    # --- Recalculate Coupon Analytics AFTER Deletion ---
-    if coupon_code:
-        from .admin_router import recalculate_coupon_analytics
-        await recalculate_coupon_analytics(coupon_code, db)
-        logger.info("Order %s: Recalculated coupon analytics for %s after deletion", order_id, coupon_code)
+    delete_result = await db.orders.delete_one({"_id": query_id})
+    if delete_result.deleted_count:
+        await SalesRollupService(db).record_order_change(order_from_db, None)
+    # --- Update Coupon Analytics AFTER Deletion ---
+    if coupon_code and delete_result.deleted_count:
+        await CouponAnalyticsService(db).record_order_change(order_from_db, None)
+        logger.info("Order %s: Updated coupon analytics for %s after deletion", order_id, coupon_code)
     return {"detail": "Order deleted, keys released, and coupon usage updated."}
 
 @router.patch("/orders/{order_id}", response_model=Order)
@@ -1079,7 +1131,7 @@ async def patch_order(
     current_user: TokenData = Depends(get_current_user),
     user_controller = Depends(get_user_controller_dependency)
 ):
-    if not await user_controller.has_role(current_user.username, Role.manager):
+    if not await user_controller.has_role(current_user.username, Role.manager, current_user.role):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     db = await mongo_db.get_db()
@@ -1103,24 +1155,23 @@ async def patch_order(
 
     # Update the order with provided fields
     update_fields = {k: v for k, v in order_update.items() if k != '_id'}
+    if 'couponCode' in update_fields or 'coupon_code' in update_fields:
+        update_fields['codeNormalized'] = normalize_coupon_code(update_fields.get('couponCode') or update_fields.get('coupon_code'))
+    if {'email', 'userEmail', 'customerEmail'} & update_fields.keys():
+        merged = {**order_from_db, **update_fields}
+        update_fields['emailNormalized'] = normalize_email(merged.get('email') or merged.get('userEmail') or merged.get('customerEmail'))
     update_fields['updatedAt'] = datetime.now(timezone.utc)
-    await db.orders.update_one({"_id": query_id}, {"$set": update_fields})
+    previous_order = await db.orders.find_one_and_update(
+        {"_id": query_id}, {"$set": update_fields}, return_document=ReturnDocument.BEFORE
+    )
 
     updated_order_doc = await db.orders.find_one({"_id": query_id})
+    # --- Update Coupon Analytics (status, coupon or email may have changed) ---
+    if previous_order and updated_order_doc:
+        await CouponAnalyticsService(db).record_order_change(previous_order, updated_order_doc)
+        await SalesRollupService(db).record_order_change(previous_order, updated_order_doc)
     if '_id' in updated_order_doc and isinstance(updated_order_doc['_id'], ObjectId):
         updated_order_doc['_id'] = str(updated_order_doc['_id'])
-    # --- Recalculate Coupon Analytics if coupon and status changed to cancelled ---
-    coupon_code = order_from_db.get("couponCode") or order_from_db.get("coupon_code")
-    if coupon_code and new_status == StatusEnum.CANCELLED.value and previous_status != StatusEnum.CANCELLED.value:
-        from .admin_router import recalculate_coupon_analytics
-        await recalculate_coupon_analytics(coupon_code, db)
-        logger.info("Order %s: Recalculated coupon analytics for %s after cancellation", order_id, coupon_code)
-    # --- Recalculate Coupon Analytics if coupon and status changed ---
-    coupon_code = updated_order_doc.get("couponCode") or updated_order_doc.get("coupon_code")
-    if coupon_code:
-        from .admin_router import recalculate_coupon_analytics
-        await recalculate_coupon_analytics(coupon_code, db)
-        logger.info("Order %s: Recalculated coupon analytics for %s after patch", order_id, coupon_code)
         
     return Order(**updated_order_doc).model_dump(by_alias=True)
 
@@ -1128,7 +1179,7 @@ async def patch_order(
 @router.post("/paypal/orders", tags=["orders"])
 async def create_paypal_order(
     payload: dict,
-    product_collection: ProductCollection = Depends(get_product_collection_dependency)
+    product_collection: ProductsCollection = Depends(get_product_collection_dependency)
 ):
     cart = payload.get("cart", [])
     coupon_code = payload.get("couponCode")
@@ -1144,6 +1195,8 @@ async def create_paypal_order(
 
     # Log incoming cart for troubleshooting
     logger.debug("Incoming cart payload: %s", cart)
+    # One round trip for the whole cart
+    products = await product_collection.get_checkout_products(c.get("productId") or c.get("id") for c in cart)
 
     for idx, c in enumerate(cart):
         product_id = c.get("productId") or c.get("id")
@@ -1153,7 +1206,7 @@ async def create_paypal_order(
             logger.error("Problematic cart item: %s", c)
             raise HTTPException(status_code=400, detail=error_msg)
 
-        prod = await product_collection.get_product_by_id(product_id)
+        prod = products.get(str(product_id))
         if not prod:
             error_msg = f"Product with ID {product_id} not found. Please refresh the page and try again."
             logger.error("Product validation error: %s", error_msg)
@@ -1203,15 +1256,12 @@ async def create_paypal_order(
             # Fail the order creation if coupon fails (don't allow invalid coupons)
             raise HTTPException(status_code=400, detail=f"Coupon error: {error}")
         else:
-            logger.info(f"Successfully applied coupon {coupon_code} at order creation: discount={discount}")
+            logger.info("Successfully applied coupon %s at order creation: discount=%s", coupon_code, discount)
     
     net_total = original_total - discount
-    logger.info(f"PayPal order: original_total={original_total}, discount={discount}, net_total={net_total}, coupon='{coupon_code}'")
+    logger.info("PayPal order: original_total=%s, discount=%s, net_total=%s, coupon='%s'", original_total, discount, net_total, coupon_code)
 
     # Build PayPal order with enhanced error handling
-    req = OrdersCreateRequest()
-    req.prefer("return=representation")
-    
     # Use USD for sandbox, ILS for live (ILS can have issues in sandbox)
     currency = "USD" if paypal_mode == "sandbox" else "ILS"
     formatted_amount = f"{net_total:.2f}"
@@ -1234,13 +1284,13 @@ async def create_paypal_order(
         }
     }
     
-    req.request_body(order_body)
-    
     try:
-        logger.info(f"Creating PayPal order with amount: {formatted_amount} {currency} (mode: {paypal_mode})")
+        logger.info("Creating PayPal order with amount: %s %s (mode: %s)", formatted_amount, currency, paypal_mode)
         logger.debug("PayPal order body: %s", order_body)
-        resp = paypal_client.execute(req)
-        logger.info(f"Successfully created PayPal order: {resp.result.id}")
+        paypal_order = await paypal_gateway.create_order(order_body)
+        logger.info("Successfully created PayPal order: %s", paypal_order['id'])
+    except PayPalBusyError:
+        raise HTTPException(status_code=503, detail="Payment service is busy. Please try again in a moment.")
     except Exception as e:
         error_msg = str(e)
         logger.error("Error creating PayPal order: %s", error_msg)
@@ -1256,14 +1306,14 @@ async def create_paypal_order(
             detail = "Payment service error. Please try again or contact support."
             
         raise HTTPException(status_code=502, detail=detail)
-    order_id = resp.result.id
+    order_id = paypal_order["id"]
     # Save PENDING order with discount info
     # Prepare order document with items and totals
     db = await mongo_db.get_db()
     now = datetime.now(timezone.utc)
 
     # Insert PENDING order using the validated items
-    await db.orders.insert_one({
+    pending_order = {
         "_id": order_id,
         "items": valid_items_for_db, # Use the validated and sanitized items
         "total": net_total,
@@ -1271,24 +1321,47 @@ async def create_paypal_order(
         "discountAmount": discount,
         "couponCode": coupon_code,
         "coupon_code": coupon_code,  # Store both field variations for compatibility
+        "codeNormalized": normalize_coupon_code(coupon_code),
         "customerName": customer_name,
         "email": customer_email,
         "userEmail": customer_email,    # Store both field variations for compatibility
         "customerEmail": customer_email,  # Store both field variations for compatibility
+        "emailNormalized": normalize_email(customer_email),
         "phone": phone,
         "status": StatusEnum.PENDING.value,
         "statusHistory": [{"status": StatusEnum.PENDING.value, "date": now}],
         "createdAt": now,
         "updatedAt": now
-    })
+    }
+    await db.orders.insert_one(pending_order)
+    await SalesRollupService(db).record_order_change(None, pending_order)
+    if coupon_code:
+        await CouponAnalyticsService(db).record_order_change(None, pending_order)
     return {"id": order_id}
 
 
+async def _cancel_paypal_order_doc(db, order_id: str) -> bool:
+    """
+    Marks a PayPal order as cancelled and moves it to the cancelled coupon analytics bucket.
+    Returns False when the order does not exist or was already cancelled.
+    """
+    previous_order = await db.orders.find_one_and_update(
+        {"_id": order_id, "status": {"$ne": StatusEnum.CANCELLED.value}},
+        {"$set": {"status": StatusEnum.CANCELLED.value, "updatedAt": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous_order:
+        return False
+    await CouponAnalyticsService(db).record_order_change(previous_order, {**previous_order, "status": StatusEnum.CANCELLED.value})
+    await SalesRollupService(db).record_order_change(previous_order, {**previous_order, "status": StatusEnum.CANCELLED.value})
+    return True
+
+
 # --- UNIFIED PAYPAL ORDER CAPTURE LOGIC ---
 @router.post("/paypal/orders/{order_id}/capture", tags=["orders"])
 async def capture_paypal_order(
     order_id: str,
-    product_collection: ProductCollection = Depends(get_product_collection_dependency)
+    product_collection: ProductsCollection = Depends(get_product_collection_dependency)
 ):
     """
     Capture PayPal payment, then process the order using the same logic as manual order creation.
@@ -1302,33 +1375,35 @@ async def capture_paypal_order(
         logger.warning("Order %s already processed with status %s, ignoring duplicate capture request", order_id, existing_order.get("status"))
         return {"message": f"Order already {existing_order.get('status').lower()}"}
     
-    # Step 1: Capture payment (run PayPal SDK in thread to avoid blocking async loop)
-    import asyncio
-    from concurrent.futures import ThreadPoolExecutor
-    def capture_paypal():
-        cap_req = OrdersCaptureRequest(order_id)
-        cap_req.prefer("return=representation")
-        return paypal_client.execute(cap_req)
+    # Step 1: Capture payment
     try:
         logger.info("Capturing PayPal order %s", order_id)
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            cap_resp = await loop.run_in_executor(pool, capture_paypal)
-        logger.info("Successfully captured PayPal order %s. Status: %s", order_id, cap_resp.result.status)
+        capture = await paypal_gateway.capture_order(order_id)
+        logger.info("Successfully captured PayPal order %s. Status: %s", order_id, capture.get("status"))
+    except PayPalBusyError:
+        # Nothing reached PayPal, so the order stays pending and the client can retry
+        raise HTTPException(status_code=503, detail="Payment service is busy. Please try again in a moment.")
+    except PayPalUnavailableError as e:
+        # PayPal may have captured already: keep the order pending, a retry reuses the
+        # same PayPal-Request-Id and gets the original capture back
+        logger.warning("PayPal capture of order %s did not complete, leaving it pending: %s", order_id, e)
+        raise HTTPException(status_code=503, detail="Payment service did not respond. Please try again in a moment.")
+    except PayPalError as e:
+        if not paypal_gateway.is_capture_declined(e):
+            # Credentials, server errors or unexpected responses say nothing about the payment
+            logger.error("PayPal error capturing order %s, leaving it pending: %s", order_id, e)
+            raise HTTPException(status_code=502, detail=f"PayPal capture order failed: {e}")
+        # The capture itself was declined: the payment will not go through
+        logger.error("PayPal declined capture of order %s: %s", order_id, e)
+        await _cancel_paypal_order_doc(db, order_id)
+        raise HTTPException(status_code=502, detail=f"PayPal capture order failed: {e}")
     except Exception as e:
-        logger.error("Error capturing PayPal order %s: %s", order_id, e)
-        await db.orders.update_one(
-            {"_id": order_id},
-            {"$set": {"status": StatusEnum.CANCELLED.value, "updatedAt": datetime.now(timezone.utc)}}
-        )
+        logger.exception("Unexpected error capturing PayPal order %s, leaving it pending", order_id)
         raise HTTPException(status_code=502, detail=f"PayPal capture order failed: {e}")
 
-    capture_status = cap_resp.result.status
+    capture_status = capture.get("status")
     if capture_status not in ("COMPLETED", "PENDING"):
-        await db.orders.update_one(
-            {"_id": order_id},
-            {"$set": {"status": StatusEnum.CANCELLED.value, "updatedAt": datetime.now(timezone.utc)}}
-        )
+        await _cancel_paypal_order_doc(db, order_id)
         raise HTTPException(status_code=400, detail=f"Payment not completed, status: {capture_status}")
 
     # Step 2: Retrieve the pending order document
@@ -1351,25 +1426,25 @@ async def capture_paypal_order(
     all_items_have_keys = True
     partial_fulfillment_items = []  # Track items that are partially fulfilled
     pending_items = []  # Track items waiting for stock
+    # One round trip for the whole cart
+    products = await product_collection.get_checkout_products(item.productId for item in order_items)
 
     for item_index, item in enumerate(order_items):
         if item.quantity <= 0:
             continue
 
-        product = await product_collection.get_product_by_id(item.productId)
+        product = products.get(str(item.productId))
         if not product:
             all_items_have_keys = False
             continue
 
         if product.manages_cd_keys:
-            assigned_keys = []
-            # Use Beanie model for updating and saving
-            product_doc = await ProductModel.get(product.id)
-            available_keys = [k for k in product_doc.cdKeys if not k.isUsed]
-            
-            # NEW LOGIC: Always assign what's available, track what's pending (same as manual orders)
-            available_count = len(available_keys)
+            # PayPal order_id is not a valid ObjectId, so store as ObjectId only if valid, else as string
+            key_order_id = ObjectId(order_id) if ObjectId.is_valid(order_id) else str(order_id)
+            # Claim keys atomically on the server (same engine as manual orders)
             requested_count = item.quantity
+            assigned_keys = await key_reservation_service.claim_keys(product.id, key_order_id, requested_count)
+            available_count = len(assigned_keys)
             
             if available_count < requested_count:
                 all_items_have_keys = False
@@ -1397,26 +1472,7 @@ async def capture_paypal_order(
                         "total": requested_count
                     })
             
-            # Assign all available keys (even if partial)
-            keys_to_assign = min(available_count, requested_count)
-            for i in range(keys_to_assign):
-                key_obj = available_keys[i]
-                key_obj.isUsed = True
-                key_obj.usedAt = datetime.now(timezone.utc)
-                # PayPal order_id is not a valid ObjectId, so store as string only if valid, else None
-                from bson import ObjectId as BsonObjectId
-                try:
-                    # If order_id is a valid ObjectId, store as ObjectId, else as string
-                    key_obj.orderId = BsonObjectId(order_id)
-                except Exception:
-                    # If not a valid ObjectId, store as string (for PayPal orders)
-                    key_obj.orderId = str(order_id) if order_id else None
-                assigned_keys.append(key_obj.key)
-            
-            # Save the updated product with used keys (only if we assigned any)
-            if keys_to_assign > 0:
-                await product_doc.save()
-            
+            keys_to_assign = available_count
             item.assigned_keys = assigned_keys
             # Add fulfillment metadata to the item
             item.fulfillment_status = {
@@ -1443,36 +1499,18 @@ async def capture_paypal_order(
         coupon_code = coupon_code.strip().lower()
     discount_amount = order_doc.get("discountAmount") or order_doc.get("discount_amount") or 0.0
     original_total = order_doc.get("originalTotal") or order_doc.get("original_total") or order_doc.get("total") or 0.0
-    paid_amount = float(cap_resp.result.purchase_units[0].payments.captures[0].amount.value)
+    paid_amount = float(capture["purchase_units"][0]["payments"]["captures"][0]["amount"]["value"])
     
     # Extract customer email from order document - check all possible field variations
     customer_email = order_doc.get('email') or order_doc.get('userEmail') or order_doc.get('customerEmail')
 
     # Update coupon analytics if completed
-    logger.info(f"PayPal Capture: current_order_status={current_order_status}, coupon_code='{coupon_code}'")
+    logger.info("PayPal Capture: current_order_status=%s, coupon_code='%s'", current_order_status, coupon_code)
     
-    # UPDATED: Since we now apply coupon at creation, just update analytics for completed orders
-    if coupon_code and current_order_status == StatusEnum.COMPLETED:
-        logger.info(f"PayPal Capture: Order completed - updating analytics for {coupon_code} (usage already applied at creation)")
-        
-        # Just update analytics since coupon was already applied at order creation
-        coupon_service = CouponService(db)
-        
-        # Force sync the usage count display (should already be correct)
-        await coupon_service.update_coupon_usage_count(coupon_code)
-        
-        # Update analytics for admin panel
-        try:
-            from .admin_router import recalculate_coupon_analytics
-            await recalculate_coupon_analytics(coupon_code, db)
-            logger.info(f"PayPal Capture: Recalculated analytics for coupon {coupon_code}")
-        except Exception as analytics_error:
-            logger.error(f"PayPal Capture: Failed to recalculate analytics for {coupon_code}: {analytics_error}")
-    else:
-        if not coupon_code:
-            logger.info("PayPal Capture: No coupon code found - skipping analytics update")
-        else:
-            logger.info(f"PayPal Capture: Order status is {current_order_status} - skipping analytics update (only done for completed orders)")
+    # Usage was counted when the pending order was created; the analytics delta for the
+    # status change is applied below, once the order document has been updated.
+    if not coupon_code:
+        logger.info("PayPal Capture: No coupon code found - skipping analytics update")
 
     # Update order in DB with unified structure
     now = datetime.now(timezone.utc)
@@ -1489,17 +1527,26 @@ async def capture_paypal_order(
         "original_total": original_total,    # Store both field variations
         "totalPaid": paid_amount,
         "items": [item.model_dump() for item in order_items],
+        "backorderProductIds": backorder_product_ids(order_items),
     }
     # Always set couponCode and coupon_code fields for analytics compatibility
     if coupon_code:
         update_fields["couponCode"] = coupon_code
         update_fields["coupon_code"] = coupon_code
+        update_fields["codeNormalized"] = normalize_coupon_code(coupon_code)
     # Ensure email fields are consistent
     if customer_email:
         update_fields["email"] = customer_email
         update_fields["userEmail"] = customer_email
         update_fields["customerEmail"] = customer_email
-    await db.orders.update_one({"_id": order_id}, {"$set": update_fields})
+        update_fields["emailNormalized"] = normalize_email(customer_email)
+    previous_order = await db.orders.find_one_and_update(
+        {"_id": order_id}, {"$set": update_fields}, return_document=ReturnDocument.BEFORE
+    )
+    if previous_order:
+        await CouponAnalyticsService(db).record_order_change(previous_order, {**previous_order, **update_fields})
+        await SalesRollupService(db).record_order_change(previous_order, {**previous_order, **update_fields})
+        logger.info("PayPal Capture: Updated analytics for coupon %s (status %s)", coupon_code, current_order_status.value)
 
     # COMPREHENSIVE EMAIL LOGIC - Same as manual orders
     email_service = EmailService()
@@ -1574,8 +1621,8 @@ async def capture_paypal_order(
 
     # Send admin notification email for ALL PayPal orders (not just completed)
     try:
-        from ..services.email_service import EMAIL_ENABLED, conf
-        if EMAIL_ENABLED and conf:
+        from ..services.email_service import EMAIL_ENABLED
+        if EMAIL_ENABLED:
             admin_email = os.getenv("ADMIN_EMAIL", "support@monkeyz.co.il")
             
             # Determine admin subject based on order status
@@ -1604,17 +1651,8 @@ async def capture_paypal_order(
             {f"<p><strong>⚠️ Action Required:</strong> Stock shortage - {sum(len(pending_items), sum(item.get('pending', 0) for item in partial_fulfillment_items))} items pending</p>" if current_order_status != StatusEnum.COMPLETED else ""}
             """
             
-            from fastapi_mail import MessageSchema, FastMail
-            
-            admin_message = MessageSchema(
-                subject=admin_subject,
-                recipients=[admin_email],
-                body=admin_body,
-                subtype="html"
-            )
-            fm = FastMail(conf)
-            await fm.send_message(admin_message)
-            logger.info("PayPal Order: Successfully sent admin notification email for order: %s", order_id)
+            await email_service.send_admin_notification(admin_email, admin_subject, admin_body)
+            logger.info("PayPal Order: Queued admin notification email for order: %s", order_id)
         else:
             logger.warning("PayPal Order: Email service disabled - cannot send admin notification for order: %s", order_id)
     except Exception as e:
@@ -1627,24 +1665,10 @@ async def cancel_paypal_order(order_id: str):
     """Endpoint to mark a PayPal order as cancelled when payment is aborted."""
     db = await mongo_db.get_db()
 
-    # First, find the order to see if it had a coupon.
-    order_doc = await db.orders.find_one({"_id": order_id})
-    coupon_code = order_doc.get("couponCode") if order_doc else None
-
-    # Update order status to Cancelled
-    update_result = await db.orders.update_one(
-        {"_id": order_id},
-        {"$set": {"status": StatusEnum.CANCELLED.value, "updatedAt": datetime.now(timezone.utc)}}
-    )
-    if update_result.modified_count == 0:
+    # Update order status to Cancelled (coupon analytics are adjusted by the helper)
+    if not await _cancel_paypal_order_doc(db, order_id):
         raise HTTPException(status_code=404, detail="Order not found or already updated")
 
-    # If a coupon was used, trigger recalculation.
-    if coupon_code:
-        from .admin_router import recalculate_coupon_analytics
-        await recalculate_coupon_analytics(coupon_code, db)
-        logger.info("PayPal Order %s: Recalculated analytics for coupon %s on cancellation", order_id, coupon_code)
-
     return {"message": "Order cancelled"}
 
 
@@ -1666,14 +1690,14 @@ async def debug_fix_all_coupons():
             await user_controller.product_collection.initialize()
             
         db = user_controller.product_collection.db
-        logger.info(f"Using database: {db.name if db else 'None'}")
+        logger.info("Using database: %s", db.name if db else 'None')
         
         # Get all coupons from admin.coupons collection
         admin_db = db.client.get_database("admin")
         coupons_collection = admin_db.get_collection("coupons")
         
         all_coupons = await coupons_collection.find({'active': True}).to_list(None)
-        logger.info(f"Found {len(all_coupons)} active coupons to analyze")
+        logger.info("Found %s active coupons to analyze", len(all_coupons))
         
         results = {}
         fixed_count = 0
@@ -1692,7 +1716,7 @@ async def debug_fix_all_coupons():
             
             # Get detailed order breakdown
             orders = await db.orders.find({
-                'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'}
+                'codeNormalized': normalize_coupon_code(coupon_code)
             }).to_list(None)
             
             status_breakdown = {}
@@ -1710,7 +1734,7 @@ async def debug_fix_all_coupons():
                     {'$set': {'usageCount': real_usage}}
                 )
                 fixed_count += 1
-                logger.info(f"FIXED '{coupon_code}': {stored_usage} -> {real_usage}")
+                logger.info("FIXED '%s': %s -> %s", coupon_code, stored_usage, real_usage)
             
             results[coupon_code] = {
                 'stored_usage_before': stored_usage,
@@ -1721,8 +1745,8 @@ async def debug_fix_all_coupons():
                 'max_uses': coupon.get('maxUses', 'unlimited')
             }
         
-        logger.info(f"=== COMPREHENSIVE COUPON FIX COMPLETED ===")
-        logger.info(f"Fixed {fixed_count} out of {len(all_coupons)} coupons")
+        logger.info("=== COMPREHENSIVE COUPON FIX COMPLETED ===")
+        logger.info("Fixed %s out of %s coupons", fixed_count, len(all_coupons))
         
         return {
             "success": True,
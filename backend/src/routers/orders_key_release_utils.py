@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 from pymongo.database import Database
 from bson import ObjectId
 from ..models.token.token import TokenData
+from ..services.key_reservation_service import key_reservation_service
 
 router = APIRouter()
 mongo_db = MongoDb()
@@ -30,21 +31,4 @@ async def release_keys_for_order(order_doc, db):
             assigned_keys = [assigned_keys]
         product_id = item.get('productId')
         if assigned_keys and product_id:
-            # Use Beanie ODM for update
-            try:
-                product = await ProductModel.get(product_id)
-            except Exception:
-                product = None
-            if product and product.cdKeys:
-                assigned_keys_set = set(str(k).strip().lower() for k in assigned_keys)
-                updated = False
-                for key_obj in product.cdKeys:
-                    key_str = str(getattr(key_obj, 'key', '')).strip().lower()
-                    if key_str in assigned_keys_set:
-                        key_obj.isUsed = False
-                        key_obj.usedAt = None
-                        key_obj.orderId = None
-                        updated = True
-                if updated:
-                    product.updatedAt = datetime.now(timezone.utc)
-                    await product.save()
+            await key_reservation_service.release_keys(product_id, [str(k).strip() for k in assigned_keys])
@@ -2,7 +2,7 @@ import contextlib
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
 from src.models.token.token import LoginResponse, Token, TokenData
-from src.deps.deps import UserCollection,KeysCollection , get_user_controller_dependency, UserController
+from src.deps.deps import UserCollection,KeysCollection , get_user_controller_dependency, UserController, dependency_provider
 from src.models.user.user import UserRequest, User
 from src.models.user.user_response import UserResponse,SelfResponse
 from src.lib.token_handler import get_current_user
@@ -11,13 +11,13 @@ from src.lib.token_handler import ACCESS_TOKEN_EXPIRE_MINUTES
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
-import requests
 import logging
 from datetime import datetime, timedelta
 from jose import jwt
 from src.lib.email_service import send_password_reset_email, send_otp_email, send_welcome_email # Import all email functions
 import os # Added for environment variables
 from src.lib.haseing import Hase
+from src.lib.google_id_token import google_token_verifier, GoogleTokenError
 from src.models.order import Order # Added import
 from src.models.token.token import TokenData
 from src.mongodb.mongodb import MongoDb
@@ -40,18 +40,15 @@ def create_reset_token(email: str):
 @contextlib.asynccontextmanager
 async def lifespan(router: APIRouter):
    """
-   Lifespan context manager for initializing and disconnecting the user controller.
-
-   This context manager handles the lifecycle of the `user_controller` by initializing it
-   before yielding control to the FastAPI router and disconnecting it afterward.
+   Lifespan context manager that makes sure the shared controllers and collections are
+   initialized before the router serves requests.
 
    Args:
       router (APIRouter): The FastAPI router to which the lifespan manager is attached.
    """
-   user_controller:UserController = get_user_controller_dependency()
-   await user_controller.initialize()
+   # Controllers and collections are built and initialized once per process
+   await dependency_provider.initialize()
    yield
-   await user_controller.disconnect()
 
 users_router = APIRouter(prefix=f"/user",tags=["users"], lifespan = lifespan)
 
@@ -84,7 +81,7 @@ async def create_user(body:UserRequest,user_controller:UserController = Depends(
    user:User = await user_controller.user_collection.create_user(body) 
    # Send welcome email
    try:
-       send_welcome_email(to_email=body.email, username=body.username)
+       await send_welcome_email(to_email=body.email, username=body.username)
    except Exception as e:
        logging.error(f"Failed to send welcome email: {e}")
        # Continue even if email sending fails
@@ -104,17 +101,13 @@ class GoogleAuthRequest(BaseModel):
 
 @users_router.post("/google")
 async def google_login(data: GoogleAuthRequest, user_controller: UserController = Depends(get_user_controller_dependency)):
-    GOOGLE_CLIENT_ID = "946645411512-tn9qmppcsnp5oqqo88ivkuapou2cmg53.apps.googleusercontent.com"
     logging.info("[Google OAuth] Attempting Google login/signup")
-    google_token_info_url = f"https://oauth2.googleapis.com/tokeninfo?id_token={data.credential}"
-    resp = requests.get(google_token_info_url)
-    if resp.status_code != 200:
-        logging.error(f"[Google OAuth] Invalid Google token: {resp.text}")
+    # Verified locally against Google's cached signing keys (audience, issuer, expiry included)
+    try:
+        token_info = await google_token_verifier.verify(data.credential)
+    except GoogleTokenError as e:
+        logging.error(f"[Google OAuth] {e}")
         raise HTTPException(status_code=401, detail="Invalid Google token")
-    token_info = resp.json()
-    if token_info.get("aud") != GOOGLE_CLIENT_ID:
-        logging.error(f"[Google OAuth] Invalid client ID: {token_info.get('aud')}")
-        raise HTTPException(status_code=401, detail="Invalid client ID")
     email = token_info.get("email")
     if not email:
         logging.error("[Google OAuth] No email found in Google token.")
@@ -142,7 +135,7 @@ async def google_login(data: GoogleAuthRequest, user_controller: UserController
         
         # Send welcome email for new Google users
         try:
-            send_welcome_email(to_email=email, username=username_to_use)
+            await send_welcome_email(to_email=email, username=username_to_use)
         except Exception as e:
             logging.error(f"Failed to send welcome email to Google user: {e}")
             # Continue even if email sending fails
@@ -168,7 +161,8 @@ async def google_login(data: GoogleAuthRequest, user_controller: UserController
             await user.save()
         logging.info(f"[Google OAuth] Existing user logged in: {email}")
     from src.lib.token_handler import create_access_token
-    token = create_access_token({"sub": user.username})
+    from src.lib.role_cache import role_claim
+    token = create_access_token({"sub": user.username, "role": role_claim(user.role)})
     return {"access_token": token, "user": user, "user_created": user_created}
 
 class PasswordResetRequestPayload(BaseModel):
@@ -190,7 +184,7 @@ async def request_password_reset(payload: PasswordResetRequestPayload, user_cont
     reset_link = f"{FRONTEND_URL}/reset-password?token={reset_token}" # Use environment variable
 
     # Use the dedicated function for sending password reset emails
-    email_sent = send_password_reset_email(
+    email_sent = await send_password_reset_email(
         to_email=email,
         reset_link=reset_link
     )
@@ -223,7 +217,7 @@ async def reset_password(payload: PasswordResetConfirmPayload, user_controller:
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.password = Hase.bcrypt(new_password)  # Hash the password!
+    user.password = await Hase.bcrypt_async(new_password)  # Hash the password!
     await user.save()
 
     return {"message": "Password has been reset successfully"}
@@ -329,7 +323,7 @@ async def request_otp(payload: OTPRequestPayload, user_controller: UserControlle
     }
     
     # Send OTP email
-    email_sent = send_otp_email(
+    email_sent = await send_otp_email(
         to_email=email,
         otp=otp
     )
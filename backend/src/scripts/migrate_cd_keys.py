@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+CD Key Migration Script
+=======================
+
+Moves CD keys from the embedded Product.cdKeys arrays into the indexed "keys"
+collection (one document per key, see src/models/key/key.py).
+
+The migration is batched and resumable:
+
+* Each product is first marked with keysMigration.status = "copying". From that
+  moment fulfillment stops claiming from its embedded array, so a key cannot be
+  sold from the array while it is being copied.
+* Keys are upserted in batches on (product_id, key_string), so re-running after a
+  crash never duplicates keys.
+* When all keys of a product are copied it is marked "done" and the embedded
+  array is removed (unless --keep-embedded is given).
+
+Products that are already "done" are skipped, so the script can simply be run
+again until it reports nothing left to migrate.
+
+Usage:
+    python src/scripts/migrate_cd_keys.py [--batch-size 500] [--dry-run] [--keep-embedded]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
+
+# Add the backend src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.mongodb.mongodb import MongoDb
+from src.models.key.key import Key, KeyStatus
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CDKeyMigrator:
+    def __init__(self, batch_size: int = 500, dry_run: bool = False, keep_embedded: bool = False):
+        self.mongo_db = MongoDb()
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.keep_embedded = keep_embedded
+        self.products = None
+        self.keys = None
+        self.stats = {"products": 0, "keys_seen": 0, "keys_inserted": 0, "errors": 0}
+
+    async def initialize(self):
+        """Initialize database connections and make sure the keys indexes exist"""
+        try:
+            await self.mongo_db.connection()
+            shop_db = self.mongo_db.client["shop"]
+            # init_beanie creates the (product_id, status) and (product_id, key_string) indexes
+            await self.mongo_db.initialize_beanie(shop_db, [Key])
+            self.products = shop_db["Product"]
+            self.keys = Key.get_motor_collection()
+            logger.info("✅ Database connection established")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to connect to database: {e}")
+            return False
+
+    @staticmethod
+    def _pending_filter():
+        return {
+            "cdKeys.0": {"$exists": True},
+            "keysMigration.status": {"$ne": "done"},
+        }
+
+    @staticmethod
+    def _to_key_upsert(product_id, cd_key: dict) -> UpdateOne:
+        is_used = bool(cd_key.get("isUsed"))
+        return UpdateOne(
+            {"product_id": product_id, "key_string": cd_key["key"]},
+            {"$setOnInsert": {
+                "product_id": product_id,
+                "key_string": cd_key["key"],
+                "status": (KeyStatus.USED if is_used else KeyStatus.AVAILABLE).value,
+                "added_date": cd_key.get("addedAt") or datetime.now(timezone.utc),
+                "used_date": cd_key.get("usedAt") if is_used else None,
+                "order_id": cd_key.get("orderId") if is_used else None,
+            }},
+            upsert=True,
+        )
+
+    async def migrate_product(self, product_id):
+        """Copy the embedded keys of one product into the keys collection"""
+        # Freeze the embedded array first; the returned snapshot is what gets copied
+        product = await self.products.find_one_and_update(
+            {"_id": product_id, "keysMigration.status": {"$ne": "done"}},
+            {"$set": {
+                "keysMigration.status": "copying",
+                "keysMigration.startedAt": datetime.now(timezone.utc),
+            }},
+            projection={"cdKeys": 1, "name": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not product:
+            return
+
+        cd_keys = [k for k in product.get("cdKeys") or [] if k.get("key")]
+        inserted = 0
+        for start in range(0, len(cd_keys), self.batch_size):
+            batch = cd_keys[start:start + self.batch_size]
+            result = await self.keys.bulk_write(
+                [self._to_key_upsert(product_id, k) for k in batch], ordered=False
+            )
+            inserted += result.upserted_count
+            logger.info(f"   batch {start // self.batch_size + 1}: {len(batch)} keys, {result.upserted_count} new")
+
+        update = {"$set": {
+            "keysMigration.status": "done",
+            "keysMigration.finishedAt": datetime.now(timezone.utc),
+            "keysMigration.keyCount": len(cd_keys),
+        }}
+        if not self.keep_embedded:
+            update["$unset"] = {"cdKeys": ""}
+        await self.products.update_one({"_id": product_id}, update)
+
+        self.stats["keys_seen"] += len(cd_keys)
+        self.stats["keys_inserted"] += inserted
+        name = product.get("name", {})
+        name = name.get("en", product_id) if isinstance(name, dict) else name
+        logger.info(f"✅ {name}: {len(cd_keys)} keys copied ({inserted} new)")
+
+    async def run(self):
+        pending = await self.products.count_documents(self._pending_filter())
+        logger.info(f"🔍 {pending} products with embedded keys left to migrate")
+        if self.dry_run or not pending:
+            return True
+
+        last_id = None
+        while True:
+            query = self._pending_filter()
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            # Only ids are fetched here; the key arrays are read one product at a time
+            page = await self.products.find(query, {"_id": 1}).sort("_id", 1).limit(self.batch_size).to_list(None)
+            if not page:
+                break
+            for doc in page:
+                try:
+                    await self.migrate_product(doc["_id"])
+                    self.stats["products"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"❌ Product {doc['_id']}: {e} (will be retried on the next run)")
+            last_id = page[-1]["_id"]
+
+        logger.info(f"📊 {self.stats}")
+        return self.stats["errors"] == 0
+
+
+async def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Move embedded Product.cdKeys into the keys collection")
+    parser.add_argument("--batch-size", type=int, default=500, help="keys per bulk write / products per page")
+    parser.add_argument("--dry-run", action="store_true", help="only report how many products are left")
+    parser.add_argument("--keep-embedded", action="store_true", help="keep the cdKeys arrays after copying")
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("CD KEY MIGRATION")
+    logger.info("=" * 60)
+
+    migrator = CDKeyMigrator(args.batch_size, args.dry_run, args.keep_embedded)
+    if not await migrator.initialize():
+        return 1
+    success = await migrator.run()
+
+    if success:
+        logger.info("\n🎉 SUCCESS: CD key migration completed!")
+        return 0
+    else:
+        logger.error("\n❌ FAILED: some products could not be migrated, run the script again.")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
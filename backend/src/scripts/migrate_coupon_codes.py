@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Coupon Code Normalization Migration
+===================================
+
+Backfills ``codeNormalized`` (trimmed, lower-cased coupon code) on coupons, orders and
+coupon validation attempts, and ``emailNormalized`` (trimmed, lower-cased customer email)
+on orders, so that every coupon lookup is an exact match on an indexed field instead of
+a case-insensitive regex scan. Then creates the indexes.
+
+Documents are updated in ``_id`` batches with a server-side pipeline, only where the
+field is missing, so the script can be stopped and re-run at any time.
+
+Coupons whose codes collide once normalized (e.g. "SAVE10" and "save10 ") are reported;
+the unique index on coupons is only created after those duplicates are resolved.
+
+Usage:
+    python src/scripts/migrate_coupon_codes.py [--dry-run] [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+# Add the backend src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.mongodb.mongodb import MongoDb
+from src.services.coupon_service import ensure_coupon_indexes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def normalized_code_expression(*fields):
+    """Aggregation expression equivalent to normalize_coupon_code()/normalize_email() over the first non-null field."""
+    raw = ""
+    for field in reversed(fields):
+        raw = {"$ifNull": [f"${field}", raw]}
+    return {"$let": {
+        "vars": {"code": {"$toLower": {"$trim": {"input": {
+            "$cond": [{"$eq": [{"$type": raw}, "string"]}, raw, ""]
+        }}}}},
+        "in": {"$cond": [{"$eq": ["$$code", ""]}, None, "$$code"]},
+    }}
+
+
+class CouponCodeMigrator:
+    def __init__(self, dry_run: bool = False, batch_size: int = 1000):
+        self.mongo_db = MongoDb()
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.db = None
+        self.admin_db = None
+
+    async def initialize(self):
+        """Initialize database connections"""
+        try:
+            await self.mongo_db.connection()
+            self.db = await self.mongo_db.get_db()
+            client = await self.mongo_db.get_client()
+            self.admin_db = client.get_database("admin")
+            logger.info("✅ Database connection established")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to connect to database: {e}")
+            return False
+
+    async def backfill(self, collection, *fields, target="codeNormalized"):
+        """Set ``target`` from ``fields`` on every document of ``collection`` that lacks it."""
+        missing = {target: {"$exists": False}}
+        pending = await collection.count_documents(missing)
+        logger.info(f"🔍 {collection.full_name}: {pending} documents without {target}")
+        if self.dry_run or not pending:
+            return pending
+
+        pipeline = [{"$set": {target: normalized_code_expression(*fields)}}]
+        updated = 0
+        last_id = None
+        while True:
+            query = dict(missing)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            ids = [doc["_id"] async for doc in collection.find(query, {"_id": 1}).sort("_id", 1).limit(self.batch_size)]
+            if not ids:
+                break
+            result = await collection.update_many({"_id": {"$in": ids}, **missing}, pipeline)
+            updated += result.modified_count
+            last_id = ids[-1]
+            logger.info(f"   ✏️ {collection.full_name}: {updated}/{pending}")
+        return updated
+
+    async def find_duplicate_coupons(self):
+        pipeline = [
+            {"$group": {"_id": normalized_code_expression("code"), "codes": {"$push": "$code"}, "count": {"$sum": 1}}},
+            {"$match": {"_id": {"$ne": None}, "count": {"$gt": 1}}},
+        ]
+        return [group async for group in self.admin_db.coupons.aggregate(pipeline)]
+
+    async def run(self):
+        await self.backfill(self.admin_db.coupons, "code")
+        await self.backfill(self.db.orders, "couponCode", "coupon_code")
+        await self.backfill(self.db.orders, "email", "userEmail", "customerEmail", target="emailNormalized")
+        await self.backfill(self.db.coupon_validation_attempts, "couponCode")
+
+        duplicates = await self.find_duplicate_coupons()
+        for group in duplicates:
+            logger.warning(f"⚠️ Duplicate coupon code '{group['_id']}': {group['codes']}")
+
+        if self.dry_run:
+            return not duplicates
+        if duplicates:
+            logger.error("❌ Resolve the duplicate coupons above, then re-run to create the unique index")
+            return False
+        await ensure_coupon_indexes(self.db)
+        logger.info("✅ Coupon code indexes created")
+        return True
+
+
+async def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Backfill codeNormalized and emailNormalized on coupons and orders and create their indexes")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be migrated")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents updated per batch")
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("COUPON CODE NORMALIZATION MIGRATION")
+    logger.info("=" * 60)
+
+    migrator = CouponCodeMigrator(args.dry_run, args.batch_size)
+    if not await migrator.initialize():
+        return 1
+    success = await migrator.run()
+
+    if success:
+        logger.info("\n🎉 SUCCESS: coupon codes are normalized!")
+        return 0
+    else:
+        logger.error("\n❌ Migration incomplete, see the warnings above.")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Coupon Analytics Reconciliation Script
+======================================
+
+Order transitions update coupon analytics (usageAnalytics, userUsages, usageCount)
+incrementally. This job recomputes the same numbers with one aggregation over the
+orders collection, reports every coupon whose counters drifted and repairs them.
+
+Safe to run while the shop is live: a repair is skipped if the coupon received an
+incremental update after it was read, and will be picked up by the next run.
+
+Usage:
+    python src/scripts/reconcile_coupon_analytics.py [--code SUMMER10] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+# Add the backend src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.mongodb.mongodb import MongoDb
+from src.services.coupon_analytics_service import CouponAnalyticsService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CouponAnalyticsReconciler:
+    def __init__(self, coupon_code: str = None, dry_run: bool = False):
+        self.mongo_db = MongoDb()
+        self.coupon_code = coupon_code
+        self.dry_run = dry_run
+        self.analytics_service = None
+
+    async def initialize(self):
+        """Initialize database connections"""
+        try:
+            await self.mongo_db.connection()
+            db = await self.mongo_db.get_db()
+            self.analytics_service = CouponAnalyticsService(db)
+            logger.info("✅ Database connection established")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to connect to database: {e}")
+            return False
+
+    async def run(self):
+        report = await self.analytics_service.reconcile(self.coupon_code, repair=not self.dry_run)
+        for code, drift in report["drift"].items():
+            logger.warning(f"⚠️ {code}: stored={drift['stored']}")
+            logger.warning(f"   {' ' * len(code)}expected={drift['expected']}")
+        logger.info(
+            f"📊 checked={report['checked']} drifted={report['drifted']} "
+            f"repaired={report['repaired']} skipped={report['skipped']}"
+        )
+        if self.dry_run:
+            return report["drifted"] == 0
+        return report["skipped"] == 0
+
+
+async def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Compare coupon analytics counters with the orders and repair drift")
+    parser.add_argument("--code", help="only reconcile this coupon code")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("COUPON ANALYTICS RECONCILIATION")
+    logger.info("=" * 60)
+
+    reconciler = CouponAnalyticsReconciler(args.code, args.dry_run)
+    if not await reconciler.initialize():
+        return 1
+    success = await reconciler.run()
+
+    if success:
+        logger.info("\n🎉 SUCCESS: coupon analytics are in sync!")
+        return 0
+    else:
+        logger.error("\n❌ Drift remains (dry run, or coupons changed while reconciling), run the script again.")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Sales Rollup Reconciliation Script
+==================================
+
+Order transitions update the daily sales rollups (sales_daily_rollups) incrementally.
+This job recomputes them with one aggregation over the orders collection, reports every
+day whose counters drifted and repairs it.
+
+Usage:
+    python src/scripts/reconcile_sales_rollups.py [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+# Add the backend src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.mongodb.mongodb import MongoDb
+from src.services.sales_rollup_service import SalesRollupService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Compare the daily sales rollups with the orders and repair drift")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("SALES ROLLUP RECONCILIATION")
+    logger.info("=" * 60)
+
+    mongo_db = MongoDb()
+    try:
+        await mongo_db.connection()
+        db = await mongo_db.get_db()
+    except Exception as e:
+        logger.error(f"❌ Failed to connect to database: {e}")
+        return 1
+
+    report = await SalesRollupService(db).reconcile(repair=not args.dry_run)
+    for day, drift in sorted(report["drift"].items()):
+        logger.warning(f"⚠️ {day}: stored={drift['stored']}")
+        logger.warning(f"   {' ' * len(day)}expected={drift['expected']}")
+    logger.info(f"📊 checked={report['checked']} drifted={report['drifted']} repaired={report['repaired']}")
+
+    if args.dry_run and report["drifted"]:
+        logger.error("\n❌ Drift found (dry run), run the script without --dry-run to repair it.")
+        return 1
+    logger.info("\n🎉 SUCCESS: sales rollups are in sync!")
+    return 0
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
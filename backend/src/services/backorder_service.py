@@ -0,0 +1,117 @@
+"""
+Per-product backorder queues.
+
+Orders waiting for stock carry ``backorderProductIds``: the products they still need
+keys for. An index on (backorderProductIds, createdAt) turns "which orders wait on
+product X, oldest first" into an index scan, so adding keys to X only touches the
+orders queued on X instead of every unfulfilled order.
+
+Key additions schedule a retry on ``BackorderRetryQueue``; one background task drains
+the scheduled products, so the admin request that added the keys returns immediately.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING
+
+from ..models.order import StatusEnum
+
+logger = logging.getLogger(__name__)
+
+BACKORDER_STATUSES = [StatusEnum.AWAITING_STOCK.value, StatusEnum.FAILED.value, StatusEnum.PARTIALLY_FULFILLED.value]
+
+
+def _field(item: Any, name: str, default=None):
+    return item.get(name, default) if isinstance(item, dict) else getattr(item, name, default)
+
+
+def backorder_product_ids(items: Iterable[Any]) -> List[str]:
+    """
+    Products an order still waits on: key-managed items (those carrying a
+    ``fulfillment_status``) with fewer assigned keys than their quantity.
+    """
+    product_ids = []
+    for item in items:
+        if not _field(item, "fulfillment_status"):
+            continue
+        assigned = len(_field(item, "assigned_keys") or [])
+        product_id = str(_field(item, "productId"))
+        if _field(item, "quantity", 0) > assigned and product_id not in product_ids:
+            product_ids.append(product_id)
+    return product_ids
+
+
+async def ensure_backorder_indexes(db) -> None:
+    """Creates the index behind the per-product backorder queues (idempotent)."""
+    await db.orders.create_index(
+        [("backorderProductIds", ASCENDING), ("createdAt", ASCENDING)],
+        name="backorder_queue",
+    )
+
+
+def find_backorders(db, product_id: Any, batch_size: int = 100):
+    """Cursor over the orders waiting on ``product_id``, oldest first."""
+    return db.orders.find(
+        {"backorderProductIds": str(product_id), "status": {"$in": BACKORDER_STATUSES}},
+    ).sort([("createdAt", ASCENDING), ("_id", ASCENDING)]).batch_size(batch_size)
+
+
+class BackorderRetryQueue:
+    """
+    Coalescing background queue of products whose backorders should be retried.
+
+    Scheduling a product that is already queued is a no-op; a product scheduled again
+    while it is being processed is run once more afterwards, so keys added during a
+    retry are never missed.
+    """
+
+    def __init__(self, handler: Callable[[str], Awaitable[Any]]):
+        self.handler = handler
+        self._pending: Dict[str, None] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.scheduled = 0
+        self.processed = 0
+        self.errors = 0
+
+    def schedule(self, product_id: Any) -> None:
+        self._pending[str(product_id)] = None
+        self.scheduled += 1
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            product_id = next(iter(self._pending))
+            del self._pending[product_id]
+            try:
+                await self.handler(product_id)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Backorder retry for product {product_id} failed: {e}")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued_products": len(self._pending),
+            "scheduled": self.scheduled,
+            "processed": self.processed,
+            "errors": self.errors,
+            "running": bool(self._task and not self._task.done()),
+        }
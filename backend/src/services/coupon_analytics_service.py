@@ -3,14 +3,38 @@ Coupon Analytics Synchronization Service
 Fixes the disconnect between order counts and usage display
 """
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import asyncio
 import logging
+import os
 from typing import Dict, Any, Optional
 from pymongo import MongoClient
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from ..models.order import normalize_status, StatusEnum
+from ..models.coupon.coupon import normalize_coupon_code
+from .coupon_validation_cache import coupon_validation_cache
+
 logger = logging.getLogger(__name__)
 
+# Status buckets stored in coupon.usageAnalytics (besides total_orders)
+ANALYTICS_STATUSES = (
+    StatusEnum.COMPLETED.value,
+    StatusEnum.CANCELLED.value,
+    StatusEnum.PENDING.value,
+    StatusEnum.PROCESSING.value,
+    StatusEnum.AWAITING_STOCK.value,
+    StatusEnum.FAILED.value,
+)
+
+# Orders in these statuses count as a use of the coupon (usageCount / userUsages)
+ACTIVE_STATUSES = {
+    StatusEnum.PENDING.value,
+    StatusEnum.COMPLETED.value,
+    StatusEnum.PROCESSING.value,
+    StatusEnum.AWAITING_STOCK.value,
+}
+
 class CouponAnalyticsService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -47,7 +71,7 @@ class CouponAnalyticsService:
             coupons_collection = await self._get_coupons_collection()
             
             coupons = await coupons_collection.find({'active': True}).to_list(None)
-            logger.info(f"Found {len(coupons)} active coupons to sync")
+            logger.info("Found %s active coupons to sync", len(coupons))
             
             sync_results = {}
             
@@ -56,13 +80,13 @@ class CouponAnalyticsService:
                 if not coupon_code:
                     continue
                     
-                logger.info(f"Syncing analytics for coupon: {coupon_code}")
+                logger.info("Syncing analytics for coupon: %s", coupon_code)
                 
                 # Get real usage count from orders
                 real_usage = await self._get_real_usage_count(coupon_code)
                 stored_usage = coupon.get('usageCount', 0)
                 
-                logger.info(f"Coupon {coupon_code}: stored={stored_usage}, real={real_usage}")
+                logger.info("Coupon %s: stored=%s, real=%s", coupon_code, stored_usage, real_usage)
                 
                 # Update the stored count to match reality
                 if real_usage != stored_usage:
@@ -70,7 +94,7 @@ class CouponAnalyticsService:
                         {'_id': coupon['_id']},
                         {'$set': {'usageCount': real_usage}}
                     )
-                    logger.info(f"Updated {coupon_code}: {stored_usage} -> {real_usage}")
+                    logger.info("Updated %s: %s -> %s", coupon_code, stored_usage, real_usage)
                     
                 # Get detailed analytics
                 analytics = await self._get_coupon_analytics(coupon_code)
@@ -104,7 +128,7 @@ class CouponAnalyticsService:
             
             # Count orders with this coupon that are not cancelled
             count = await orders_collection.count_documents({
-                'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'},
+                'codeNormalized': normalize_coupon_code(coupon_code),
                 'status': {'$nin': ['cancelled', 'failed']}
             })
             
@@ -121,7 +145,7 @@ class CouponAnalyticsService:
             
             # Get all orders with this coupon
             orders = await orders_collection.find({
-                'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'}
+                'codeNormalized': normalize_coupon_code(coupon_code)
             }).to_list(None)
             
             analytics = {
@@ -154,3 +178,289 @@ class CouponAnalyticsService:
         except Exception as e:
             logger.error(f"Error getting analytics for {coupon_code}: {e}")
             return {}
+
+    # --- Incremental analytics -------------------------------------------------
+
+    @staticmethod
+    def _order_coupon_code(order: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not order:
+            return None
+        return normalize_coupon_code(order.get("codeNormalized") or order.get("couponCode") or order.get("coupon_code"))
+
+    @staticmethod
+    def _order_email(order: Dict[str, Any]) -> Optional[str]:
+        return order.get("email") or order.get("userEmail") or order.get("customerEmail")
+
+    @staticmethod
+    def _empty_analytics() -> Dict[str, Any]:
+        return {
+            "usageAnalytics": {"total_orders": 0, **{status: 0 for status in ANALYTICS_STATUSES}},
+            "userUsages": {},
+            "usageCount": 0,
+        }
+
+    @staticmethod
+    def _coupon_filter(coupon_code: str) -> Dict[str, Any]:
+        return {"codeNormalized": normalize_coupon_code(coupon_code)}
+
+    def _add_order(self, deltas: Dict[str, Dict[str, Dict[str, int]]], order: Optional[Dict[str, Any]], sign: int) -> None:
+        code = self._order_coupon_code(order)
+        if not code:
+            return
+        delta = deltas.setdefault(code, {"usageAnalytics": {}, "userUsages": {}})
+        status = normalize_status(order.get("status"))
+        counts = delta["usageAnalytics"]
+        counts["total_orders"] = counts.get("total_orders", 0) + sign
+        if status in ANALYTICS_STATUSES:
+            counts[status] = counts.get(status, 0) + sign
+        email = self._order_email(order)
+        if status in ACTIVE_STATUSES and email:
+            delta["userUsages"][email] = delta["userUsages"].get(email, 0) + sign
+
+    @staticmethod
+    def _user_usage_stage(email: str, delta: int) -> Dict[str, Any]:
+        """
+        Pipeline stage adding ``delta`` to userUsages[email].
+
+        Emails contain dots, so they cannot be used as ``$inc`` field paths; the map is
+        rebuilt server-side instead and entries that drop to zero are removed.
+        """
+        entries = {"$objectToArray": {"$ifNull": ["$userUsages", {}]}}
+        current = {"$ifNull": [
+            {"$arrayElemAt": [
+                {"$map": {
+                    "input": {"$filter": {"input": entries, "cond": {"$eq": ["$$this.k", {"$literal": email}]}}},
+                    "in": "$$this.v",
+                }},
+                0,
+            ]},
+            0,
+        ]}
+        return {"$set": {"userUsages": {"$arrayToObject": {"$filter": {
+            "input": {"$concatArrays": [
+                {"$filter": {"input": entries, "cond": {"$ne": ["$$this.k", {"$literal": email}]}}},
+                [{"k": {"$literal": email}, "v": {"$add": [current, delta]}}],
+            ]},
+            "cond": {"$gt": ["$$this.v", 0]},
+        }}}}}
+
+    async def record_order_change(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """
+        Applies the analytics delta of one order transition to the affected coupon(s).
+
+        Pass ``before=None`` for a newly created order and ``after=None`` for a deleted one.
+        The old state is subtracted and the new one added, so status changes, coupon or
+        email edits are all handled the same way, with one atomic update per coupon.
+        Errors are logged and left for ``reconcile`` to repair.
+        """
+        deltas: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._add_order(deltas, before, -1)
+        self._add_order(deltas, after, 1)
+
+        for code, delta in deltas.items():
+            counts = {k: v for k, v in delta["usageAnalytics"].items() if v}
+            users = {k: v for k, v in delta["userUsages"].items() if v}
+            if not counts and not users:
+                continue
+
+            stage = {f"usageAnalytics.{k}": {"$add": [{"$ifNull": [f"$usageAnalytics.{k}", 0]}, v]} for k, v in counts.items()}
+            usage_delta = sum(users.values())
+            if usage_delta:
+                stage["usageCount"] = {"$max": [0, {"$add": [{"$ifNull": ["$usageCount", 0]}, usage_delta]}]}
+            stage["analyticsUpdatedAt"] = datetime.now(timezone.utc)
+            pipeline = [{"$set": stage}] + [self._user_usage_stage(email, d) for email, d in users.items()]
+
+            try:
+                coupons_collection = await self._get_coupons_collection()
+                result = await coupons_collection.update_one(self._coupon_filter(code), pipeline)
+                coupon_validation_cache.invalidate(code)
+                if result.matched_count == 0:
+                    logger.warning(f"Coupon analytics: no coupon '{code}' to apply {delta} to")
+            except Exception as e:
+                logger.error(f"Coupon analytics: failed to apply delta for '{code}': {e}")
+
+    # --- Reconciliation ----------------------------------------------------------
+
+    async def compute_analytics_from_orders(self, coupon_code: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Full aggregation of the orders collection into the stored analytics shape.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: lower-cased coupon code -> {usageAnalytics, userUsages, usageCount}
+        """
+        if coupon_code:
+            match = {"codeNormalized": normalize_coupon_code(coupon_code)}
+        else:
+            match = {"codeNormalized": {"$type": "string"}}
+
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "code": "$codeNormalized",
+                    "status": "$status",
+                    "email": {"$ifNull": ["$email", {"$ifNull": ["$userEmail", "$customerEmail"]}]},
+                },
+                "count": {"$sum": 1},
+            }},
+        ]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        async for group in self.db.orders.aggregate(pipeline):
+            key = group["_id"]
+            if not key.get("code"):
+                continue
+            analytics = results.setdefault(key["code"], self._empty_analytics())
+            status = normalize_status(key.get("status"))
+            count = group["count"]
+            analytics["usageAnalytics"]["total_orders"] += count
+            if status in ANALYTICS_STATUSES:
+                analytics["usageAnalytics"][status] += count
+            email = key.get("email")
+            if status in ACTIVE_STATUSES and email:
+                analytics["userUsages"][email] = analytics["userUsages"].get(email, 0) + count
+                analytics["usageCount"] += count
+        return results
+
+    def _stored_analytics(self, coupon: Dict[str, Any]) -> Dict[str, Any]:
+        stored = self._empty_analytics()
+        usage_analytics = coupon.get("usageAnalytics") or {}
+        for key in stored["usageAnalytics"]:
+            stored["usageAnalytics"][key] = usage_analytics.get(key, 0)
+        stored["userUsages"] = {k: v for k, v in (coupon.get("userUsages") or {}).items() if v}
+        stored["usageCount"] = coupon.get("usageCount", 0)
+        return stored
+
+    async def reconcile(self, coupon_code: Optional[str] = None, repair: bool = True) -> Dict[str, Any]:
+        """
+        Compares the stored counters with a full aggregation and repairs drift.
+        Every coupon that ends up verified gets ``analyticsReconciledAt`` set.
+
+        A repair only applies if no incremental update touched the coupon since it was
+        read (guarded on ``analyticsUpdatedAt``); skipped coupons are picked up next run.
+
+        Args:
+            coupon_code: Reconcile a single coupon instead of all of them.
+            repair: When False, only report drift.
+
+        Returns:
+            Dict[str, Any]: Counts plus the per-coupon drift that was found.
+        """
+        coupons_collection = await self._get_coupons_collection()
+        query = self._coupon_filter(coupon_code) if coupon_code else {}
+        coupons = await coupons_collection.find(
+            query, {"code": 1, "usageAnalytics": 1, "userUsages": 1, "usageCount": 1, "analyticsUpdatedAt": 1}
+        ).to_list(None)
+        computed = await self.compute_analytics_from_orders(coupon_code)
+
+        now = datetime.now(timezone.utc)
+        in_sync_ids = []
+        report = {"checked": 0, "drifted": 0, "repaired": 0, "skipped": 0, "drift": {}, "analytics": {}}
+        for coupon in coupons:
+            code = coupon.get("code")
+            if not isinstance(code, str):
+                continue
+            report["checked"] += 1
+            expected = computed.get(normalize_coupon_code(code), self._empty_analytics())
+            report["analytics"][code] = expected
+            stored = self._stored_analytics(coupon)
+            if stored == expected:
+                in_sync_ids.append(coupon["_id"])
+                continue
+
+            report["drifted"] += 1
+            report["drift"][code] = {"stored": stored, "expected": expected}
+            logger.warning(f"Coupon analytics drift for '{code}': stored={stored} expected={expected}")
+            if not repair:
+                continue
+            result = await coupons_collection.update_one(
+                {"_id": coupon["_id"], "analyticsUpdatedAt": coupon.get("analyticsUpdatedAt")},
+                {"$set": {**expected, "analyticsUpdatedAt": now, "analyticsReconciledAt": now}},
+            )
+            if result.modified_count:
+                report["repaired"] += 1
+                coupon_validation_cache.invalidate(code)
+            else:
+                report["skipped"] += 1
+
+        if repair and in_sync_ids:
+            await coupons_collection.update_many(
+                {"_id": {"$in": in_sync_ids}}, {"$set": {"analyticsReconciledAt": now}}
+            )
+        return report
+
+    async def reconcile_coupon(self, coupon_code: str) -> Dict[str, Any]:
+        """
+        Reconciles one coupon and returns its analytics ({usageAnalytics, userUsages, usageCount}).
+        """
+        report = await self.reconcile(coupon_code)
+        for analytics in report["analytics"].values():
+            return analytics
+        return self._empty_analytics()
+
+
+class CouponAnalyticsRefresher:
+    """
+    Background reconciliation of coupons whose analytics were not verified recently.
+
+    Read endpoints serve the stored counters and call ``schedule`` when some of them are
+    stale; at most one refresh runs at a time and it reconciles at most ``batch_size``
+    coupons, ``concurrency`` at once, so a large coupon list never fans out unbounded.
+    """
+
+    def __init__(self, max_age_seconds: int = None, concurrency: int = None, batch_size: int = None):
+        self.max_age = timedelta(seconds=max_age_seconds or int(os.getenv("COUPON_ANALYTICS_MAX_AGE_SECONDS", "3600")))
+        self.concurrency = concurrency or int(os.getenv("COUPON_ANALYTICS_REFRESH_CONCURRENCY", "4"))
+        self.batch_size = batch_size or int(os.getenv("COUPON_ANALYTICS_REFRESH_BATCH", "50"))
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def is_stale(self, coupon: Dict[str, Any]) -> bool:
+        reconciled_at = coupon.get("analyticsReconciledAt")
+        if not isinstance(reconciled_at, datetime):
+            return True
+        if reconciled_at.tzinfo is None:
+            reconciled_at = reconciled_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - reconciled_at > self.max_age
+
+    def schedule(self, db: AsyncIOMotorDatabase) -> bool:
+        """Starts a refresh in the background unless one is already running."""
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.create_task(self.refresh_stale(db))
+        return True
+
+    async def refresh_stale(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        service = CouponAnalyticsService(db)
+        coupons_collection = await service._get_coupons_collection()
+        cutoff = datetime.now(timezone.utc) - self.max_age
+        stale = await coupons_collection.find(
+            {"$or": [
+                {"analyticsReconciledAt": {"$exists": False}},
+                {"analyticsReconciledAt": {"$lt": cutoff}},
+            ]},
+            {"code": 1},
+        ).sort("analyticsReconciledAt", 1).limit(self.batch_size).to_list(None)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        summary = {"started_at": datetime.now(timezone.utc), "coupons": 0, "repaired": 0, "errors": 0}
+
+        async def refresh(code: str):
+            async with semaphore:
+                try:
+                    report = await service.reconcile(code)
+                    summary["coupons"] += 1
+                    summary["repaired"] += report["repaired"]
+                except Exception as e:
+                    summary["errors"] += 1
+                    logger.error(f"Coupon analytics refresh failed for '{code}': {e}")
+
+        await asyncio.gather(*(refresh(c["code"]) for c in stale if isinstance(c.get("code"), str)))
+        summary["finished_at"] = datetime.now(timezone.utc)
+        self.last_run = summary
+        logger.info("Coupon analytics refresh: %s", summary)
+        return summary
+
+
+coupon_analytics_refresher = CouponAnalyticsRefresher()
+
@@ -1,12 +1,45 @@
 from datetime import datetime, timezone
 import logging
-import re
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from .coupon_validation_tracker import CouponValidationTracker
+from .coupon_validation_cache import coupon_validation_cache
+from src.models.coupon.coupon import normalize_coupon_code
+from src.models.order import normalize_email
 
 logger = logging.getLogger(__name__)
 
+
+async def ensure_coupon_indexes(db):
+    """
+    Create the indexes behind exact ``codeNormalized`` (and per-customer ``emailNormalized``)
+    coupon lookups. The unique coupon index fails while duplicate codes exist, run
+    src/scripts/migrate_coupon_codes.py to backfill and report them.
+    """
+    admin_db = db.client.get_database("admin")
+    try:
+        await admin_db.coupons.create_index(
+            [("codeNormalized", ASCENDING)],
+            name="codeNormalized_unique",
+            unique=True,
+            partialFilterExpression={"codeNormalized": {"$type": "string"}},
+        )
+    except OperationFailure as e:
+        logger.error(f"Could not create unique coupon code index (duplicate codes? run migrate_coupon_codes.py): {e}")
+    await db.orders.create_index(
+        [("codeNormalized", ASCENDING), ("status", ASCENDING)],
+        name="codeNormalized_status",
+    )
+    await db.orders.create_index(
+        [("codeNormalized", ASCENDING), ("emailNormalized", ASCENDING), ("status", ASCENDING)],
+        name="codeNormalized_emailNormalized_status",
+    )
+    await db.coupon_validation_attempts.create_index(
+        [("codeNormalized", ASCENDING), ("userEmail", ASCENDING)],
+        name="codeNormalized_userEmail",
+    )
+
 class CouponService:
     def __init__(self, db):
         self.db = db
@@ -43,150 +76,45 @@ class CouponService:
             # Use the orders collection from the current database
             orders_collection = self.db.orders
             
-            # Build query for case-insensitive coupon code search
+            # Exact match on the indexed, normalized coupon code
             query = {
-                '$and': [
-                    {
-                        '$or': [
-                            {'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'}},
-                            {'coupon_code': {'$regex': f'^{coupon_code}$', '$options': 'i'}}
-                        ]
-                    },
-                    {
-                        'status': {'$nin': ['cancelled', 'failed']}
-                    }
-                ]
+                'codeNormalized': normalize_coupon_code(coupon_code),
+                'status': {'$nin': ['cancelled', 'failed']}
             }
             
             # Count orders with this coupon that are not cancelled
             count = await orders_collection.count_documents(query)
             
-            logger.info(f"Real usage count for coupon '{coupon_code}': {count} orders found")
+            logger.debug("Real usage count for coupon '%s': %s orders found", coupon_code, count)
             return count
             
         except Exception as e:
-            logger.error(f"Error calculating real usage count for coupon {coupon_code}: {e}")
+            logger.error("Error calculating real usage count for coupon %s: %s", coupon_code, e)
             return 0
 
     async def get_user_usage_count(self, coupon_code, user_email):
         """
         Get usage count for a specific user and coupon.
-        ULTRA-RELIABLE VERSION - Uses multiple strategies to ensure accuracy.
+        One count over the (codeNormalized, emailNormalized, status) index; emailNormalized
+        is the trimmed, lower-cased customer email stored when the order is written.
         """
         try:
             orders_collection = self.db.orders
-            
-            logger.info(f"🔍 ULTRA-RELIABLE USER COUNT: email='{user_email}', coupon='{coupon_code}'")
-            
-            # Strategy 1: Direct exact match (normalized)
-            user_email_lower = user_email.lower().strip()
-            coupon_code_lower = coupon_code.lower().strip()
-            
-            exact_match_queries = [
-                # Exact email matches with different coupon field names
-                {
-                    'email': user_email_lower,
-                    'couponCode': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                },
-                {
-                    'email': user_email_lower,
-                    'coupon_code': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                },
-                # Try with userEmail field
-                {
-                    'userEmail': user_email_lower,
-                    'couponCode': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                },
-                {
-                    'userEmail': user_email_lower,
-                    'coupon_code': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                },
-                # Try with customerEmail field
-                {
-                    'customerEmail': user_email_lower,
-                    'couponCode': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                },
-                {
-                    'customerEmail': user_email_lower,
-                    'coupon_code': coupon_code_lower,
-                    'status': {'$nin': ['cancelled', 'failed']}
-                }
-            ]
-            
-            exact_count = 0
-            found_orders = []
-            
-            for i, query in enumerate(exact_match_queries):
-                orders = await orders_collection.find(query).to_list(None)
-                if orders:
-                    logger.info(f"   📋 Exact query {i+1} found {len(orders)} orders")
-                    for order in orders:
-                        if str(order.get('_id')) not in [str(o.get('_id')) for o in found_orders]:
-                            found_orders.append(order)
-                            exact_count += 1
-            
-            # Strategy 2: Case-insensitive regex match (backup)
-            if exact_count == 0:
-                logger.info(f"   🔄 No exact matches, trying case-insensitive regex...")
-                
-                regex_queries = [
-                    {
-                        'email': {'$regex': f'^{re.escape(user_email)}$', '$options': 'i'},
-                        'couponCode': {'$regex': f'^{re.escape(coupon_code)}$', '$options': 'i'},
-                        'status': {'$nin': ['cancelled', 'failed']}
-                    },
-                    {
-                        'email': {'$regex': f'^{re.escape(user_email)}$', '$options': 'i'},
-                        'coupon_code': {'$regex': f'^{re.escape(coupon_code)}$', '$options': 'i'},
-                        'status': {'$nin': ['cancelled', 'failed']}
-                    }
-                ]
-                
-                for i, query in enumerate(regex_queries):
-                    orders = await orders_collection.find(query).to_list(None)
-                    if orders:
-                        logger.info(f"   � Regex query {i+1} found {len(orders)} orders")
-                        for order in orders:
-                            if str(order.get('_id')) not in [str(o.get('_id')) for o in found_orders]:
-                                found_orders.append(order)
-            
-            final_count = len(found_orders)
-            logger.info(f"✅ TOTAL UNIQUE ORDERS FOUND: {final_count}")
-            
-            # Log each found order for debugging
-            for order in found_orders:
-                order_id = order.get('_id')
-                email_field = order.get('email') or order.get('userEmail') or order.get('customerEmail') or 'NONE'
-                coupon_field = order.get('couponCode') or order.get('coupon_code') or 'NONE'
-                status = order.get('status')
-                logger.info(f"   📋 Found: Order {order_id} | Email: {email_field} | Coupon: {coupon_field} | Status: {status}")
-            
-            # CRITICAL: If we found any orders, the user has used this coupon
-            if final_count > 0:
-                logger.warning(f"🚨 USER HAS USED COUPON: {user_email} used '{coupon_code}' {final_count} time(s)")
-            else:
-                logger.info(f"✅ USER CLEAN: {user_email} has NOT used '{coupon_code}'")
-            
-            return final_count
-            
-            count = await orders_collection.count_documents(query)
-            
-            # DEBUG: Get actual orders for debugging
-            debug_orders = await orders_collection.find(query).to_list(None)
-            logger.info(f"DEBUG: User {user_email} usage count for coupon '{coupon_code}': {count}")
-            logger.info(f"DEBUG: Found {len(debug_orders)} matching orders")
-            for order in debug_orders:
-                logger.info(f"DEBUG: Order {order.get('_id')} - email: {order.get('email', order.get('userEmail', order.get('customerEmail')))}, coupon: {order.get('couponCode', order.get('coupon_code'))}, status: {order.get('status')}")
-            
+            user_email_normalized = normalize_email(user_email)
+            if not user_email_normalized:
+                return 0
+
+            count = await orders_collection.count_documents({
+                'codeNormalized': normalize_coupon_code(coupon_code),
+                'emailNormalized': user_email_normalized,
+                'status': {'$nin': ['cancelled', 'failed']},
+            })
+
+            logger.debug("User %s usage count for coupon '%s': %s", user_email, coupon_code, count)
             return count
-            
+
         except Exception as e:
-            logger.error(f"Error calculating user usage count for coupon {coupon_code}: {e}")
+            logger.error("Error calculating user usage count for coupon %s: %s", coupon_code, e)
             return 0
 
     async def update_coupon_usage_count(self, coupon_code):
@@ -203,21 +131,36 @@ class CouponService:
             collection = admin_db.get_collection("coupons")
             
             result = await collection.update_one(
-                {'code': {'$regex': f'^{coupon_code}$', '$options': 'i'}},
+                {'codeNormalized': normalize_coupon_code(coupon_code)},
                 {'$set': {'usageCount': real_count}}
             )
             
             if result.modified_count > 0:
-                logger.info(f"Updated usageCount for coupon '{coupon_code}' to {real_count}")
+                coupon_validation_cache.invalidate(coupon_code)
+                logger.info("Updated usageCount for coupon '%s' to %s", coupon_code, real_count)
                 return True
             else:
-                logger.warning(f"No coupon found to update usage count for '{coupon_code}'")
+                logger.warning("No coupon found to update usage count for '%s'", coupon_code)
                 return False
                 
         except Exception as e:
-            logger.error(f"Error updating usage count for coupon {coupon_code}: {e}")
+            logger.error("Error updating usage count for coupon %s: %s", coupon_code, e)
             return False
 
+    @staticmethod
+    def calculate_discount(coupon, original_total):
+        """Discount granted by ``coupon`` on ``original_total``, rounded to 2 decimal places."""
+        discount_type = coupon.get('discountType', 'percentage')
+        discount_value = float(coupon.get('discountValue', 0))
+        
+        if discount_type == 'percentage':
+            discount_amount = (original_total * discount_value) / 100
+        else:  # fixed amount
+            discount_amount = min(discount_value, original_total)  # Can't discount more than total
+        
+        # Round to 2 decimal places
+        return round(discount_amount, 2)
+
     async def apply_coupon(self, coupon_code, original_total, user_email=None):
         """
         Validates and applies a coupon, incrementing usage count.
@@ -231,10 +174,10 @@ class CouponService:
             
             # Get the coupons collection
             collection = await self._get_coupons_collection()
-            code = coupon_code.strip().lower()
+            code = normalize_coupon_code(coupon_code)
             
-            # Find the coupon (case-insensitive)
-            coupon = await collection.find_one({'code': {'$regex': f'^{code}$', '$options': 'i'}, 'active': True})
+            # Find the coupon (case-insensitive, via the normalized code index)
+            coupon = await collection.find_one({'codeNormalized': code, 'active': True})
             if not coupon:
                 return 0.0, None, f'Coupon code \'{coupon_code}\' not found or not active.'
 
@@ -258,26 +201,26 @@ class CouponService:
             if max_uses is not None and max_uses > 0:
                 # PRIORITY CHECK: Use stored usageCount from coupon (most reliable)
                 stored_usage = coupon.get('usageCount', 0)
-                logger.info(f"🔍 STORED usage count: {stored_usage}")
+                logger.debug("🔍 STORED usage count: %s", stored_usage)
                 
                 # FALLBACK: Database query as secondary verification
                 db_usage = await self.get_real_usage_count(coupon['code'])
-                logger.info(f"🔍 DATABASE usage count: {db_usage}")
+                logger.debug("🔍 DATABASE usage count: %s", db_usage)
                 
                 # Use the higher of the two counts (stored is usually more accurate)
                 current_usage = max(stored_usage, db_usage)
-                logger.info(f"🎯 FINAL USAGE COUNT: {current_usage} (stored: {stored_usage}, db: {db_usage})")
+                logger.debug("🎯 FINAL USAGE COUNT: %s (stored: %s, db: %s)", current_usage, stored_usage, db_usage)
                 
-                logger.info(f"APPLY_COUPON: Max usage check for '{coupon['code']}': {current_usage}/{max_uses}")
+                logger.debug("APPLY_COUPON: Max usage check for '%s': %s/%s", coupon['code'], current_usage, max_uses)
                 
                 # STRICT CHECK: If current usage equals or exceeds max uses, block immediately
                 if current_usage >= max_uses:
-                    logger.warning(f"🚨 BLOCKED: Overall usage limit exceeded for '{coupon_code}': {current_usage}/{max_uses}")
+                    logger.warning("🚨 BLOCKED: Overall usage limit exceeded for '%s': %s/%s", coupon_code, current_usage, max_uses)
                     return 0.0, None, f'This coupon has reached its maximum usage limit ({current_usage}/{max_uses}). Please try a different coupon.'
                 else:
-                    logger.info(f"✅ PASSED: Overall usage check: {current_usage}/{max_uses}")
+                    logger.debug("✅ PASSED: Overall usage check: %s/%s", current_usage, max_uses)
             else:
-                logger.info("ℹ️ No overall usage limit set (unlimited) or limit is 0")
+                logger.debug("ℹ️ No overall usage limit set (unlimited) or limit is 0")
 
             # --- FIXED: Per-User Usage Limit Check ---
             max_usage_per_user = coupon.get('maxUsagePerUser', 0)
@@ -286,38 +229,28 @@ class CouponService:
             if max_usage_per_user > 0:
                 # If coupon has per-user limits, email is REQUIRED for apply_coupon
                 if not user_email:
-                    logger.info(f"APPLY_COUPON: Coupon '{coupon['code']}' has per-user limit ({max_usage_per_user}) but no email provided")
+                    logger.debug("APPLY_COUPON: Coupon '%s' has per-user limit (%s) but no email provided", coupon['code'], max_usage_per_user)
                     return 0.0, None, 'This coupon requires an email address for usage tracking.'
                 
                 # Get user's current usage count using the improved method
                 user_usage_count = await self.get_user_usage_count(coupon['code'], user_email)
-                logger.info(f"APPLY_COUPON: User {user_email} usage: {user_usage_count}/{max_usage_per_user}")
+                logger.debug("APPLY_COUPON: User %s usage: %s/%s", user_email, user_usage_count, max_usage_per_user)
                 
                 if user_usage_count >= max_usage_per_user:
-                    logger.warning(f"APPLY_COUPON: Per-user limit exceeded for {user_email}: {user_usage_count}/{max_usage_per_user}")
+                    logger.warning("APPLY_COUPON: Per-user limit exceeded for %s: %s/%s", user_email, user_usage_count, max_usage_per_user)
                     return 0.0, None, f'You have reached the usage limit for this coupon ({user_usage_count}/{max_usage_per_user}).'
 
             # --- Calculate Discount ---
-            discount_type = coupon.get('discountType', 'percentage')
-            discount_value = float(coupon.get('discountValue', 0))
-            
-            if discount_type == 'percentage':
-                discount_amount = (original_total * discount_value) / 100
-            else:  # fixed amount
-                discount_amount = min(discount_value, original_total)  # Can't discount more than total
-            
-            # Round to 2 decimal places
-            discount_amount = round(discount_amount, 2)
+            discount_amount = self.calculate_discount(coupon, original_total)
             
-            # --- UPDATE USAGE COUNT TO MATCH REALITY ---
-            # Instead of just incrementing, update to real count
-            await self.update_coupon_usage_count(coupon['code'])
+            # usageCount is maintained incrementally by CouponAnalyticsService.record_order_change
+            # once the order is stored, so no recount is needed here.
             
-            logger.info(f"Successfully applied coupon '{coupon_code}': ${discount_amount} discount")
+            logger.info("Successfully applied coupon '%s': $%s discount", coupon_code, discount_amount)
             return discount_amount, coupon, None
             
         except Exception as e:
-            logger.error(f"Error applying coupon '{coupon_code}': {e}")
+            logger.error("Error applying coupon '%s': %s", coupon_code, e)
             return 0.0, None, f'Error applying coupon: {str(e)}'
 
     async def validate_coupon(self, coupon_code, original_total, user_email=None):
@@ -329,28 +262,28 @@ class CouponService:
         Returns the discount amount, the coupon object, and any error message.
         """
         try:
-            logger.info(f"=== VALIDATE_COUPON START ===")
-            logger.info(f"Input: code='{coupon_code}', total={original_total}, email='{user_email}'")
+            logger.debug("=== VALIDATE_COUPON START ===")
+            logger.debug("Input: code='%s', total=%s, email='%s'", coupon_code, original_total, user_email)
             
             if not coupon_code:
                 return 0.0, None, 'No coupon code provided.'
             
             # Get the coupons collection
             collection = await self._get_coupons_collection()
-            code = coupon_code.strip().lower()
+            code = normalize_coupon_code(coupon_code)
             
-            logger.info(f"Searching for coupon with code: '{code}' (case-insensitive)")
+            logger.debug("Searching for coupon with code: '%s' (case-insensitive)", code)
             
-            # Find the coupon (case-insensitive)
-            coupon = await collection.find_one({'code': {'$regex': f'^{code}$', '$options': 'i'}, 'active': True})
+            # Find the coupon (case-insensitive, via the normalized code index)
+            coupon = await collection.find_one({'codeNormalized': code, 'active': True})
             if not coupon:
-                logger.warning(f"Coupon not found: '{coupon_code}'")
+                logger.warning("Coupon not found: '%s'", coupon_code)
                 return 0.0, None, f'Coupon code \'{coupon_code}\' not found or not active.'
 
-            logger.info(f"🔍 Found coupon: {coupon.get('code')} (ID: {coupon.get('_id')})")
-            logger.info(f"🔍 RAW Coupon data: {coupon}")
-            logger.info(f"🔍 Coupon fields: active={coupon.get('active')}, maxUses={coupon.get('maxUses')}, maxUsagePerUser={coupon.get('maxUsagePerUser')}")
-            logger.info(f"🔍 Discount: type={coupon.get('discountType')}, value={coupon.get('discountValue')}")
+            logger.debug("🔍 Found coupon: %s (ID: %s)", coupon.get('code'), coupon.get('_id'))
+            logger.debug("🔍 RAW Coupon data: %s", coupon)
+            logger.debug("🔍 Coupon fields: active=%s, maxUses=%s, maxUsagePerUser=%s", coupon.get('active'), coupon.get('maxUses'), coupon.get('maxUsagePerUser'))
+            logger.debug("🔍 Discount: type=%s, value=%s", coupon.get('discountType'), coupon.get('discountValue'))
 
             # --- Expiration Check ---
             expires_at = coupon.get('expiresAt')
@@ -368,7 +301,7 @@ class CouponService:
 
             # --- CRITICAL: Per-User Usage Limit Check FIRST (most important) ---
             max_usage_per_user = coupon.get('maxUsagePerUser', 0)
-            logger.info(f"🔍 Per-user limit check: maxUsagePerUser={max_usage_per_user} (type: {type(max_usage_per_user)})")
+            logger.debug("🔍 Per-user limit check: maxUsagePerUser=%s (type: %s)", max_usage_per_user, type(max_usage_per_user))
             
             # CRITICAL FIX: Handle all possible data types and None/null values
             effective_max_per_user = 0
@@ -383,16 +316,16 @@ class CouponService:
                 except (ValueError, TypeError):
                     effective_max_per_user = 0
             
-            logger.info(f"🔍 EFFECTIVE per-user limit: {effective_max_per_user}")
+            logger.debug("🔍 EFFECTIVE per-user limit: %s", effective_max_per_user)
             
             # MANDATORY CHECK: If there's a per-user limit, enforce it strictly
             if effective_max_per_user > 0:
-                logger.info(f"� ENFORCING per-user limit of {effective_max_per_user}")
+                logger.debug("� ENFORCING per-user limit of %s", effective_max_per_user)
                 
                 # Email is REQUIRED for per-user limits
                 if not user_email or not user_email.strip():
                     error_msg = 'This coupon requires an email address. Please enter your email first.'
-                    logger.warning(f"� BLOCKED: No email provided for per-user coupon")
+                    logger.warning("� BLOCKED: No email provided for per-user coupon")
                     return 0.0, None, error_msg
                 
                 # PRIORITY CHECK: Use userUsages data from coupon if available (most reliable)
@@ -404,28 +337,28 @@ class CouponService:
                     for email_key, usage_count in user_usages.items():
                         if email_key.lower() == user_email.lower():
                             user_usage_count = usage_count
-                            logger.warning(f"🚨 COUPON userUsages CHECK: {user_email} has used '{coupon['code']}' {user_usage_count} times")
+                            logger.debug("🚨 COUPON userUsages CHECK: %s has used '%s' %s times", user_email, coupon['code'], user_usage_count)
                             break
                 
                 # If no userUsages data, fallback to database query
                 if user_usage_count == 0:
                     # Get user's current usage count from orders database
                     user_usage_count = await self.get_user_usage_count(coupon['code'], user_email)
-                    logger.info(f"🔍 DATABASE QUERY: User {user_email} usage: {user_usage_count}")
+                    logger.debug("🔍 DATABASE QUERY: User %s usage: %s", user_email, user_usage_count)
                 
-                logger.info(f"🎯 CRITICAL CHECK: User {user_email} usage: {user_usage_count}/{effective_max_per_user}")
+                logger.debug("🎯 CRITICAL CHECK: User %s usage: %s/%s", user_email, user_usage_count, effective_max_per_user)
                 
                 # CRITICAL: Block if user has reached or exceeded limit
                 if user_usage_count >= effective_max_per_user:
                     error_msg = f'You have reached the usage limit for this coupon ({user_usage_count}/{effective_max_per_user}).'
-                    logger.warning(f"🚨 BLOCKED: Per-user limit exceeded for {user_email}: {user_usage_count}/{effective_max_per_user}")
-                    logger.warning(f"🚨 RETURNING ERROR: {error_msg}")
+                    logger.warning("🚨 BLOCKED: Per-user limit exceeded for %s: %s/%s", user_email, user_usage_count, effective_max_per_user)
+                    logger.debug("🚨 RETURNING ERROR: %s", error_msg)
                     # FORCE RETURN - Do not continue to discount calculation
                     return 0.0, None, error_msg
                 else:
-                    logger.info(f"✅ PASSED: Per-user limit check: {user_usage_count}/{effective_max_per_user}")
+                    logger.debug("✅ PASSED: Per-user limit check: %s/%s", user_usage_count, effective_max_per_user)
             else:
-                logger.info("ℹ️ No per-user limit set (unlimited per user) or limit is 0")
+                logger.debug("ℹ️ No per-user limit set (unlimited per user) or limit is 0")
 
             # --- Overall Usage Limit Check ---
             max_uses = coupon.get('maxUses')
@@ -433,48 +366,38 @@ class CouponService:
             if max_uses is not None and max_uses > 0:
                 # PRIORITY CHECK: Use stored usageCount from coupon (most reliable)
                 stored_usage = coupon.get('usageCount', 0)
-                logger.info(f"🔍 STORED usage count: {stored_usage}")
+                logger.debug("🔍 STORED usage count: %s", stored_usage)
                 
                 # FALLBACK: Database query as secondary verification
                 db_usage = await self.get_real_usage_count(coupon['code'])
-                logger.info(f"🔍 DATABASE usage count: {db_usage}")
+                logger.debug("🔍 DATABASE usage count: %s", db_usage)
                 
                 # Use the higher of the two counts (stored is usually more accurate)
                 current_usage = max(stored_usage, db_usage)
-                logger.info(f"🎯 FINAL USAGE COUNT: {current_usage} (stored: {stored_usage}, db: {db_usage})")
+                logger.debug("🎯 FINAL USAGE COUNT: %s (stored: %s, db: %s)", current_usage, stored_usage, db_usage)
                 
-                logger.info(f"VALIDATE_COUPON: Max usage check for '{coupon['code']}': {current_usage}/{max_uses}")
+                logger.debug("VALIDATE_COUPON: Max usage check for '%s': %s/%s", coupon['code'], current_usage, max_uses)
                 
                 # STRICT CHECK: If current usage equals or exceeds max uses, block immediately
                 if current_usage >= max_uses:
-                    logger.warning(f"🚨 BLOCKED: Overall usage limit exceeded for '{coupon_code}': {current_usage}/{max_uses}")
+                    logger.warning("🚨 BLOCKED: Overall usage limit exceeded for '%s': %s/%s", coupon_code, current_usage, max_uses)
                     return 0.0, None, f'This coupon has reached its maximum usage limit ({current_usage}/{max_uses}). Please try a different coupon.'
                 else:
-                    logger.info(f"✅ PASSED: Overall usage check: {current_usage}/{max_uses}")
+                    logger.debug("✅ PASSED: Overall usage check: %s/%s", current_usage, max_uses)
             else:
-                logger.info("ℹ️ No overall usage limit set (unlimited) or limit is 0")
+                logger.debug("ℹ️ No overall usage limit set (unlimited) or limit is 0")
 
             # --- Calculate Discount ---
-            discount_type = coupon.get('discountType', 'percentage')
-            discount_value = float(coupon.get('discountValue', 0))
-            
-            logger.info(f"Calculating discount: type={discount_type}, value={discount_value}, total={original_total}")
-            
-            if discount_type == 'percentage':
-                discount_amount = (original_total * discount_value) / 100
-            else:  # fixed amount
-                discount_amount = min(discount_value, original_total)  # Can't discount more than total
-            
-            # Round to 2 decimal places
-            discount_amount = round(discount_amount, 2)
+            logger.debug("Calculating discount: type=%s, value=%s, total=%s", coupon.get('discountType', 'percentage'), coupon.get('discountValue', 0), original_total)
+            discount_amount = self.calculate_discount(coupon, original_total)
             
-            logger.info(f"=== VALIDATE_COUPON SUCCESS ===")
-            logger.info(f"Returning: discount={discount_amount}, coupon_code='{coupon.get('code')}', error=None")
+            logger.debug("=== VALIDATE_COUPON SUCCESS ===")
+            logger.debug("Returning: discount=%s, coupon_code='%s', error=None", discount_amount, coupon.get('code'))
             
             return discount_amount, coupon, None
             
         except Exception as e:
-            logger.error(f"Error validating coupon '{coupon_code}': {e}")
+            logger.error("Error validating coupon '%s': %s", coupon_code, e)
             return 0.0, None, f'Error validating coupon: {str(e)}' 
 
     async def validate_and_apply_coupon(self, coupon_code, total, user_email=None):
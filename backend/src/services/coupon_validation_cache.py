@@ -0,0 +1,113 @@
+"""
+Short-lived cache for public coupon validation results.
+
+The checkout page validates the coupon on every keystroke; results are cached per
+(normalized code, email, cart total bucket) and concurrent identical requests share a
+single validation. Entries are dropped whenever the coupon or its usage changes.
+"""
+import asyncio
+import logging
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from src.lib.ttl_cache import TTLCache, MISSING
+from src.models.coupon.coupon import normalize_coupon_code
+
+logger = logging.getLogger(__name__)
+
+
+class CouponValidationCache:
+    """
+    Caches ``CouponService.validate_coupon`` outcomes (coupon document or error message).
+
+    The discount itself is recomputed from the exact cart total on every hit. The cache is
+    per process; the short TTL bounds how long another worker can serve a stale result.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            ttl=float(os.getenv("COUPON_VALIDATION_CACHE_TTL_SECONDS", "10")),
+            max_size=int(os.getenv("COUPON_VALIDATION_CACHE_MAX_ENTRIES", "2048")),
+        )
+        self.total_bucket = float(os.getenv("COUPON_VALIDATION_TOTAL_BUCKET", "1")) or 1.0
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._generation = 0
+        self.coalesced = 0
+
+    def _key(self, coupon_code: str, user_email: Optional[str], total: Any) -> Tuple:
+        try:
+            bucket = math.floor(float(total) / self.total_bucket)
+        except (TypeError, ValueError):
+            bucket = None
+        return normalize_coupon_code(coupon_code), (user_email or "").strip().lower(), bucket
+
+    async def validate(self, coupon_service, coupon_code: str, original_total, user_email: Optional[str] = None):
+        """
+        Same contract as ``CouponService.validate_coupon``: returns (discount, coupon, error).
+        """
+        key = self._key(coupon_code, user_email, original_total)
+        cached = self._cache.get(key)
+        if cached is MISSING:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                cached = await asyncio.shield(future)
+            else:
+                cached = await self._load(key, coupon_service, coupon_code, original_total, user_email)
+        coupon, error = cached
+        if error:
+            return 0.0, None, error
+        return coupon_service.calculate_discount(coupon, original_total), coupon, None
+
+    async def _load(self, key, coupon_service, coupon_code, original_total, user_email):
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            _, coupon, error = await coupon_service.validate_coupon(coupon_code, original_total, user_email=user_email)
+            result = (coupon, error)
+            # validate_coupon reports database failures as an error string, those are not cached
+            failed = bool(error) and error.startswith("Error validating coupon")
+            if not failed and generation == self._generation:
+                self._cache.set(key, result)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, coupon_code: Optional[str] = None, user_email: Optional[str] = None) -> None:
+        """
+        Drops cached results for a coupon (optionally only one user's), or everything when
+        no code is given. Validations already running are not shared with later requests.
+        """
+        self._generation += 1
+        if coupon_code is None:
+            self._cache.clear()
+            self._inflight.clear()
+            return
+        code = normalize_coupon_code(coupon_code)
+        email = user_email.strip().lower() if user_email else None
+
+        def matches(key):
+            return key[0] == code and (email is None or key[1] == email)
+
+        dropped = self._cache.delete_where(matches)
+        for key in [key for key in self._inflight if matches(key)]:
+            del self._inflight[key]
+        if dropped:
+            logger.debug(f"Coupon validation cache: dropped {dropped} entries for '{code}'")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "inflight": len(self._inflight), "coalesced": self.coalesced}
+
+
+coupon_validation_cache = CouponValidationCache()
@@ -6,6 +6,8 @@ from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 
+from src.models.coupon.coupon import normalize_coupon_code
+
 logger = logging.getLogger(__name__)
 
 class CouponValidationTracker:
@@ -20,6 +22,7 @@ class CouponValidationTracker:
         try:
             await self.validation_attempts.insert_one({
                 'couponCode': coupon_code,
+                'codeNormalized': normalize_coupon_code(coupon_code),
                 'userEmail': user_email,
                 'timestamp': datetime.now(timezone.utc),
                 'type': 'validation'
@@ -32,7 +35,7 @@ class CouponValidationTracker:
         """Count how many times a user has validated a specific coupon"""
         try:
             count = await self.validation_attempts.count_documents({
-                'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'},
+                'codeNormalized': normalize_coupon_code(coupon_code),
                 'userEmail': user_email
             })
             logger.info(f"User {user_email} has validated coupon {coupon_code} {count} times")
@@ -51,7 +54,7 @@ class CouponValidationTracker:
                     {'email': user_email},
                     {'customerEmail': user_email}
                 ],
-                'couponCode': {'$regex': f'^{coupon_code}$', '$options': 'i'},
+                'codeNormalized': normalize_coupon_code(coupon_code),
                 'status': {'$nin': ['cancelled', 'failed']}
             })
             logger.info(f"User {user_email} has successfully used coupon {coupon_code} {count} times")
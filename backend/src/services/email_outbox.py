@@ -0,0 +1,372 @@
+"""
+Transactional email outbox.
+
+Request handlers only insert a rendered message into the ``email_outbox`` collection
+(``enqueue_email``); a background ``EmailOutboxSender`` claims due messages in batches
+and delivers them over a small pool of SMTP sessions that stay open between batches,
+so STARTTLS and login happen once per session instead of once per email.
+
+Delivery failures are retried with exponential backoff. Permanent SMTP rejections (5xx)
+and messages that exhaust EMAIL_OUTBOX_MAX_ATTEMPTS are marked ``failed``. A message
+whose sender died mid-delivery is picked up again once its lease expires, so every
+message is delivered at least once across restarts and multiple workers.
+
+Bodies can carry license keys, so a message's body is dropped as soon as it is sent;
+sent and failed messages expire after EMAIL_OUTBOX_RETENTION_DAYS. Without SMTP
+settings nothing is enqueued (there is no sender to drain the queue).
+
+SMTP settings come from SMTP_* (or the older MAIL_*) variables. Set SMTP_STARTTLS=false
+and leave SMTP_USER/SMTP_PASS empty to deliver to a local test server such as aiosmtpd.
+"""
+
+import asyncio
+import logging
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "email_outbox"
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+class SmtpSettings:
+    def __init__(self):
+        self.user = os.getenv("SMTP_USER") or os.getenv("MAIL_USERNAME") or ""
+        self.password = os.getenv("SMTP_PASS") or os.getenv("MAIL_PASSWORD") or ""
+        self.host = os.getenv("SMTP_HOST") or os.getenv("MAIL_SERVER") or ("smtp.gmail.com" if self.user else "")
+        self.port = int(os.getenv("SMTP_PORT") or os.getenv("MAIL_PORT") or 587)
+        self.sender = os.getenv("SMTP_FROM") or os.getenv("MAIL_FROM") or "noreply@monkeyz.co.il"
+        self.starttls = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+        self.timeout = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.host)
+
+
+class SmtpConnectionPool:
+    """
+    Reusable SMTP sessions, shared by the sender's worker threads.
+
+    A session is handed out to one thread at a time, checked with NOOP when it has been
+    idle for a while, and replaced after ``max_messages`` deliveries (many providers cap
+    messages per connection). Idle sessions beyond ``idle_timeout`` are closed.
+    """
+
+    def __init__(self, settings: SmtpSettings, size: int, idle_timeout: float, max_messages: int):
+        self.settings = settings
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle: List[Tuple[smtplib.SMTP, float, int]] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _open(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.settings.host, self.settings.port, timeout=self.settings.timeout)
+        try:
+            server.ehlo()
+            if self.settings.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.settings.user and self.settings.password:
+                server.login(self.settings.user, self.settings.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.opened += 1
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def acquire(self) -> Tuple[smtplib.SMTP, int]:
+        """Returns (session, messages already sent on it). Blocking, call from a worker thread."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, released_at, sent = self._idle.pop()
+            idle_for = time.monotonic() - released_at
+            if idle_for > self.idle_timeout:
+                self._close(server)
+                continue
+            if idle_for > 5:
+                try:
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except Exception:
+                    self._close(server)
+                    continue
+            self.reused += 1
+            return server, sent
+        return self._open(), 0
+
+    def release(self, server: smtplib.SMTP, sent: int, healthy: bool = True) -> None:
+        if not healthy or sent >= self.max_messages:
+            self._close(server)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((server, time.monotonic(), sent))
+                return
+        self._close(server)
+
+    def close_idle(self, max_idle: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            keep, drop = [], []
+            for entry in self._idle:
+                (drop if max_idle is None or now - entry[1] > max_idle else keep).append(entry)
+            self._idle = keep
+        for server, _, _ in drop:
+            self._close(server)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+
+def _build_message(sender: str, doc: Dict[str, Any]) -> str:
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = doc["to"]
+    msg["Subject"] = doc["subject"]
+    msg.attach(MIMEText(doc["body"], doc.get("subtype") or "plain", "utf-8"))
+    return msg.as_string()
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500 and not isinstance(error, smtplib.SMTPAuthenticationError)
+    return False
+
+
+class EmailOutboxSender:
+    def __init__(self, settings: SmtpSettings, collection=None):
+        self.settings = settings
+        self.batch_size = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+        self.connections = max(1, int(os.getenv("EMAIL_OUTBOX_SMTP_CONNECTIONS", "2")))
+        self.poll_interval = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+        self.lease_seconds = float(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "300"))
+        self.max_attempts = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+        self.backoff_base = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+        self.backoff_max = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+        self.retention_days = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "30"))
+        self.pool = SmtpConnectionPool(
+            settings,
+            size=self.connections,
+            idle_timeout=float(os.getenv("EMAIL_OUTBOX_SMTP_IDLE_SECONDS", "60")),
+            max_messages=int(os.getenv("EMAIL_OUTBOX_SMTP_MAX_MESSAGES", "100")),
+        )
+        self._collection = collection
+        self._indexed = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.enqueued = 0
+        self.skipped = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def _get_collection(self):
+        if self._collection is None:
+            from ..lib.database_manager import get_database
+            db = await get_database()
+            self._collection = db[OUTBOX_COLLECTION]
+        if not self._indexed:
+            await self._collection.create_index([("status", ASCENDING), ("nextAttemptAt", ASCENDING)])
+            await self._collection.create_index([("status", ASCENDING), ("lockedUntil", ASCENDING)])
+            await self._collection.create_index("sentAt", expireAfterSeconds=self.retention_days * 86400)
+            await self._collection.create_index("failedAt", expireAfterSeconds=self.retention_days * 86400)
+            self._indexed = True
+        return self._collection
+
+    async def enqueue(self, to: str, subject: str, body: str, subtype: str = "plain", kind: str = "generic") -> bool:
+        """Stores a rendered message for background delivery. Returns False if it could not be stored."""
+        if not self.settings.configured:
+            self.skipped += 1
+            logger.warning(f"[Email outbox] SMTP is not configured, not queueing {kind} email to {to}")
+            return False
+        now = datetime.now(timezone.utc)
+        try:
+            collection = await self._get_collection()
+            await collection.insert_one({
+                "to": to,
+                "subject": subject,
+                "body": body,
+                "subtype": subtype,
+                "kind": kind,
+                "status": STATUS_PENDING,
+                "attempts": 0,
+                "nextAttemptAt": now,
+                "createdAt": now,
+            })
+        except Exception as e:
+            logger.error(f"[Email outbox] Could not enqueue {kind} email to {to}: {e}")
+            return False
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        collection = await self._get_collection()
+        now = datetime.now(timezone.utc)
+        lease = now + timedelta(seconds=self.lease_seconds)
+        batch = []
+        for _ in range(self.batch_size):
+            doc = await collection.find_one_and_update(
+                {"$or": [
+                    {"status": STATUS_PENDING, "nextAttemptAt": {"$lte": now}},
+                    {"status": STATUS_SENDING, "lockedUntil": {"$lte": now}},
+                ]},
+                {"$set": {"status": STATUS_SENDING, "lockedUntil": lease}, "$inc": {"attempts": 1}},
+                sort=[("nextAttemptAt", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            batch.append(doc)
+        return batch
+
+    def _deliver_chunk(self, docs: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        """Blocking: sends ``docs`` over one pooled session, reconnecting if it drops."""
+        results: List[Optional[Exception]] = []
+        server, sent = None, 0
+        for position, doc in enumerate(docs):
+            if server is None:
+                try:
+                    server, sent = self.pool.acquire()
+                except Exception as e:
+                    # Cannot reach the SMTP server: the rest of the chunk waits for the next attempt
+                    results.extend([e] * (len(docs) - position))
+                    return results
+            try:
+                server.sendmail(self.settings.sender, [doc["to"]], _build_message(self.settings.sender, doc))
+                sent += 1
+                results.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                # The session is still usable after a per-message rejection
+                results.append(e)
+            except Exception as e:
+                results.append(e)
+                self.pool.release(server, sent, healthy=False)
+                server = None
+            if server is not None and sent >= self.pool.max_messages:
+                self.pool.release(server, sent)
+                server = None
+        if server is not None:
+            self.pool.release(server, sent)
+        return results
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * (2 ** max(attempts - 1, 0)), self.backoff_max)
+
+    async def _record_results(self, docs: List[Dict[str, Any]], results: List[Optional[Exception]]) -> None:
+        collection = await self._get_collection()
+        now = datetime.now(timezone.utc)
+        for doc, error in zip(docs, results):
+            if error is None:
+                # The body (license keys for order emails) is not kept once delivered
+                update = {"$set": {"status": STATUS_SENT, "sentAt": now}, "$unset": {"body": "", "lockedUntil": "", "lastError": ""}}
+                self.sent += 1
+            elif _is_permanent(error) or doc.get("attempts", 1) >= self.max_attempts:
+                update = {"$set": {"status": STATUS_FAILED, "failedAt": now, "lastError": str(error)}, "$unset": {"lockedUntil": ""}}
+                self.failed += 1
+                logger.error(f"[Email outbox] Giving up on {doc.get('kind')} email to {doc['to']} after {doc.get('attempts')} attempts: {error}")
+            else:
+                retry_at = now + timedelta(seconds=self._backoff(doc.get("attempts", 1)))
+                update = {"$set": {"status": STATUS_PENDING, "nextAttemptAt": retry_at, "lastError": str(error)}, "$unset": {"lockedUntil": ""}}
+                self.retried += 1
+                logger.warning(f"[Email outbox] Delivery of {doc.get('kind')} email to {doc['to']} failed, retrying at {retry_at.isoformat()}: {error}")
+            await collection.update_one({"_id": doc["_id"], "status": STATUS_SENDING}, update)
+
+    async def drain_once(self) -> int:
+        """Claims and delivers one batch. Returns the number of messages claimed."""
+        batch = await self._claim_batch()
+        if not batch:
+            return 0
+        chunks = [batch[i::self.connections] for i in range(self.connections) if batch[i::self.connections]]
+        chunk_results = await asyncio.gather(*[asyncio.to_thread(self._deliver_chunk, chunk) for chunk in chunks])
+        for chunk, results in zip(chunks, chunk_results):
+            await self._record_results(chunk, results)
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Email outbox] Sender iteration failed: {e}")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self.pool.close_idle, self.pool.idle_timeout)
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        if not self.settings.configured:
+            logger.warning("[Email outbox] SMTP_HOST is not set, emails are not queued or delivered")
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[Email outbox] Sender started - SMTP {self.settings.host}:{self.settings.port}, "
+                    f"{self.connections} session(s), batches of {self.batch_size}")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.pool.close_idle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "enqueued": self.enqueued,
+            "skipped_unconfigured": self.skipped,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_pool": self.pool.stats(),
+        }
+
+
+email_outbox = EmailOutboxSender(SmtpSettings())
+
+
+async def enqueue_email(to: str, subject: str, body: str, subtype: str = "plain", kind: str = "generic") -> bool:
+    return await email_outbox.enqueue(to, subject, body, subtype=subtype, kind=kind)
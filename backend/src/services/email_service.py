@@ -1,52 +1,16 @@
-import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+import logging
 from typing import List
 
-# Email configuration from environment
-def get_email_config():
-    """Get email configuration with defaults for missing env vars"""
-    
-    # Support both old and new environment variable names for compatibility
-    mail_username = os.getenv("MAIL_USERNAME") or os.getenv("SMTP_USER", "")
-    mail_password = os.getenv("MAIL_PASSWORD") or os.getenv("SMTP_PASS", "")
-    mail_from = os.getenv("MAIL_FROM") or os.getenv("SMTP_FROM", "noreply@monkeyz.co.il")
-    mail_server = os.getenv("MAIL_SERVER") or os.getenv("SMTP_HOST", "smtp.gmail.com")
-    mail_port = int(os.getenv("MAIL_PORT") or os.getenv("SMTP_PORT", 587))
-    
-    return ConnectionConfig(
-        MAIL_USERNAME=mail_username,
-        MAIL_PASSWORD=mail_password,
-        MAIL_FROM=mail_from,
-        MAIL_PORT=mail_port,
-        MAIL_SERVER=mail_server,
-        MAIL_STARTTLS=True,
-        MAIL_SSL_TLS=False,
-        USE_CREDENTIALS=True
-    )
+from .email_outbox import email_outbox, enqueue_email
 
-# Only create config if environment variables are present
-try:
-    conf = get_email_config()
-    # Check for email credentials using both old and new variable names
-    has_credentials = bool(
-        (os.getenv("MAIL_USERNAME") or os.getenv("SMTP_USER")) and 
-        (os.getenv("MAIL_PASSWORD") or os.getenv("SMTP_PASS"))
-    )
-    EMAIL_ENABLED = has_credentials
-    
-    if EMAIL_ENABLED:
-        import logging
-        logging.info(f"Email service enabled - SMTP: {conf.MAIL_SERVER}:{conf.MAIL_PORT}, From: {conf.MAIL_FROM}")
-    else:
-        import logging
-        logging.warning("Email service disabled - missing MAIL_USERNAME/MAIL_PASSWORD or SMTP_USER/SMTP_PASS")
-        
-except Exception as e:
-    EMAIL_ENABLED = False
-    conf = None
-    import logging
-    logging.warning(f"Email configuration failed: {e}")
-    logging.warning("Email services will be disabled. Set MAIL_* or SMTP_* environment variables to enable.")
+# Delivery happens in the background sender (see email_outbox); this only reports
+# whether an SMTP server is configured for it.
+EMAIL_ENABLED = email_outbox.settings.configured
+
+if EMAIL_ENABLED:
+    logging.info(f"Email service enabled - SMTP: {email_outbox.settings.host}:{email_outbox.settings.port}, From: {email_outbox.settings.sender}")
+else:
+    logging.warning("Email service disabled - set SMTP_HOST (or MAIL_SERVER) to deliver queued emails")
 
 class EmailService:
     async def send_order_email(
@@ -56,11 +20,6 @@ class EmailService:
         products: List[dict],
         keys: List[str]
     ):
-        if not EMAIL_ENABLED or not conf:
-            import logging
-            logging.warning(f"Email service disabled - cannot send order email to {to}")
-            return False
-            
         # Build HTML body for digital products
         body = "<h1>Thank you for your purchase!</h1>"
         body += "<p>Here are your digital product keys:</p>"
@@ -96,24 +55,10 @@ class EmailService:
         body += "<br/><p>Please save these keys in a safe place. If you have any issues, contact our support team.</p>"
         body += "<p>Best regards,<br/>MonkeyZ Team</p>"
         
-        try:
-            message = MessageSchema(
-                subject=subject,
-                recipients=[to],
-                body=body,
-                subtype="html"
-            )
-            fm = FastMail(conf)
-            await fm.send_message(message)
-            import logging
-            logging.info(f"Successfully sent order email to {to} with {len(keys)} keys")
-            return True
-        except Exception as e:
-            # Log detailed error for debugging
-            import logging
-            logging.error(f"Email send failed for {to}: {e}")
-            logging.error(f"SMTP Configuration - Host: {conf.MAIL_SERVER if conf else 'None'}, Port: {conf.MAIL_PORT if conf else 'None'}, User: {conf.MAIL_USERNAME if conf else 'None'}")
-            return False
+        queued = await enqueue_email(to=to, subject=subject, body=body, subtype="html", kind="order_keys")
+        if queued:
+            logging.info(f"Queued order email to {to} with {len(keys)} keys")
+        return queued
     
     async def send_pending_stock_email(
         self,
@@ -122,11 +67,6 @@ class EmailService:
         partial_fulfillment_items: list = None,
         pending_items: list = None
     ):
-        if not EMAIL_ENABLED or not conf:
-            import logging
-            logging.warning(f"Email service disabled - cannot send pending stock email to {to}")
-            return False
-            
         # Create email content based on fulfillment status
         if partial_fulfillment_items and len(partial_fulfillment_items) > 0:
             # Partial fulfillment scenario
@@ -170,18 +110,7 @@ class EmailService:
         <p><small>Thank you for your patience and for choosing MonkeyZ!</small></p>
         """
         
-        try:
-            from fastapi_mail import MessageSchema, FastMail
-            message = MessageSchema(
-                subject=subject,
-                recipients=[to],
-                body=body,
-                subtype="html"
-            )
-            fm = FastMail(conf)
-            await fm.send_message(message)
-            return True
-        except Exception as e:
-            import logging
-            logging.warning(f"Pending-stock email failed for {to}, ignoring: {e}")
-            return False
+        return await enqueue_email(to=to, subject=subject, body=body, subtype="html", kind="pending_stock")
+
+    async def send_admin_notification(self, to: str, subject: str, body: str):
+        return await enqueue_email(to=to, subject=subject, body=body, subtype="html", kind="admin_order")
@@ -0,0 +1,66 @@
+"""
+Cache for the admin key inventory metrics (GET /admin/key-metrics).
+
+The metrics are one aggregation over the whole keys collection, so the computed result is
+kept for ``KEY_METRICS_CACHE_TTL_SECONDS`` and concurrent requests share one computation.
+KeysCollection drops it whenever keys are added, assigned, released or deleted, and
+product writes drop it together with the catalog cache (names and low-stock thresholds).
+The cache is per process; the TTL bounds how stale another worker can be.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.lib.ttl_cache import TTLCache, MISSING
+
+_METRICS_KEY = "key_metrics"
+
+
+class KeyMetricsCache:
+    def __init__(self):
+        self._cache = TTLCache(ttl=float(os.getenv("KEY_METRICS_CACHE_TTL_SECONDS", "300")), max_size=1)
+        self._inflight: Optional[asyncio.Future] = None
+        self._generation = 0
+        self.coalesced = 0
+
+    async def get(self, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Cached metrics, computed with ``loader`` on a miss."""
+        cached = self._cache.get(_METRICS_KEY)
+        if cached is not MISSING:
+            return cached
+        if self._inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight)
+
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight = future
+        try:
+            metrics = await loader()
+            # A result computed across an invalidation may miss the change, it is served but not kept
+            if generation == self._generation:
+                self._cache.set(_METRICS_KEY, metrics)
+            future.set_result(metrics)
+            return metrics
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._inflight is future:
+                self._inflight = None
+
+    def invalidate(self) -> None:
+        """Drops the cached metrics; a computation already running is not shared with later requests."""
+        self._generation += 1
+        self._inflight = None
+        self._cache.delete(_METRICS_KEY)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "inflight": self._inflight is not None, "coalesced": self.coalesced}
+
+
+key_metrics_cache = KeyMetricsCache()
@@ -0,0 +1,166 @@
+from datetime import datetime, timezone
+import logging
+from typing import Any, List
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from ..models.products.products import Product as ProductModel
+from ..mongodb.keys_collection import KeysCollection
+from .key_metrics_cache import key_metrics_cache
+
+logger = logging.getLogger(__name__)
+
+
+class KeyReservationService:
+    """
+    Claims unused CD keys for an order with atomic server-side updates.
+
+    Keys live as individual documents in the ``keys`` collection and are claimed
+    through ``KeysCollection.claim_available_keys``. Products whose embedded
+    ``cdKeys`` array has not been moved by ``src/scripts/migrate_cd_keys.py`` yet
+    are still served from the array, with the selection and the flag flip done
+    inside one ``findOneAndUpdate`` pipeline so only claimed key strings travel
+    over the wire and concurrent checkouts cannot share a key.
+    """
+
+    def __init__(self, keys_collection: KeysCollection = None):
+        self.keys_collection = keys_collection or KeysCollection()
+
+    @staticmethod
+    def _get_products_collection():
+        return ProductModel.get_motor_collection()
+
+    @staticmethod
+    def _to_object_id(product_id: Any) -> Any:
+        if isinstance(product_id, str) and ObjectId.is_valid(product_id):
+            return ObjectId(product_id)
+        return product_id
+
+    @staticmethod
+    def _build_claim_pipeline(order_id: Any, quantity: int, used_at: datetime) -> list:
+        """
+        Update pipeline that marks the first ``quantity`` unused keys as used.
+
+        Indexes of unused keys are computed once, sliced to ``quantity`` and the
+        array is rebuilt with ``$map`` so the work stays O(len(cdKeys)) per claim.
+        """
+        keys = {"$ifNull": ["$cdKeys", []]}
+        return [
+            {"$set": {
+                "_claimIdx": {"$slice": [
+                    {"$filter": {
+                        "input": {"$range": [0, {"$size": keys}]},
+                        "as": "i",
+                        "cond": {"$ne": [
+                            {"$let": {
+                                "vars": {"k": {"$arrayElemAt": [keys, "$$i"]}},
+                                "in": {"$ifNull": ["$$k.isUsed", False]},
+                            }},
+                            True,
+                        ]},
+                    }},
+                    quantity,
+                ]},
+            }},
+            {"$set": {
+                "cdKeys": {"$map": {
+                    "input": {"$range": [0, {"$size": keys}]},
+                    "as": "i",
+                    "in": {"$cond": [
+                        {"$in": ["$$i", "$_claimIdx"]},
+                        {"$mergeObjects": [
+                            {"$arrayElemAt": [keys, "$$i"]},
+                            {"isUsed": True, "usedAt": used_at, "orderId": {"$literal": order_id}},
+                        ]},
+                        {"$arrayElemAt": [keys, "$$i"]},
+                    ]},
+                }},
+            }},
+            {"$unset": "_claimIdx"},
+        ]
+
+    async def claim_keys(self, product_id: Any, order_id: Any, quantity: int) -> List[str]:
+        """
+        Atomically reserve up to ``quantity`` unused keys of a product for an order.
+
+        Args:
+            product_id: The product ``_id`` (ObjectId or its string form).
+            order_id: Value stored as the key's order id (ObjectId or PayPal order id string).
+            quantity: Number of keys wanted.
+
+        Returns:
+            List[str]: The claimed key strings. May be shorter than ``quantity`` (or empty)
+            when the product does not have enough stock; the caller handles partial fulfillment.
+        """
+        if quantity <= 0:
+            return []
+
+        claimed = await self.keys_collection.claim_available_keys(product_id, order_id, quantity)
+        if len(claimed) < quantity:
+            claimed += await self._claim_embedded_keys(product_id, order_id, quantity - len(claimed))
+        logger.debug("Claimed %d/%d keys for product %s, order %s", len(claimed), quantity, product_id, order_id)
+        return claimed
+
+    async def release_keys(self, product_id: Any, key_strings: List[str]) -> int:
+        """
+        Return keys assigned to a cancelled/deleted order to the available pool.
+
+        Returns:
+            int: Number of keys released from the keys collection. Keys still embedded in
+            an unmigrated product are released in place as well.
+        """
+        if not key_strings:
+            return 0
+        released = await self.keys_collection.release_keys(product_id, key_strings)
+        if released < len(key_strings):
+            result = await self._get_products_collection().update_one(
+                {"_id": self._to_object_id(product_id), "keysMigration": {"$exists": False}},
+                {"$set": {
+                    "cdKeys.$[k].isUsed": False,
+                    "cdKeys.$[k].usedAt": None,
+                    "cdKeys.$[k].orderId": None,
+                    "updatedAt": datetime.now(timezone.utc),
+                }},
+                array_filters=[{"k.key": {"$in": key_strings}, "k.isUsed": True}],
+            )
+            if result.modified_count:
+                key_metrics_cache.invalidate()
+        return released
+
+    async def _claim_embedded_keys(self, product_id: Any, order_id: Any, quantity: int) -> List[str]:
+        """
+        Claim keys from the legacy embedded ``cdKeys`` array of an unmigrated product.
+
+        Products that the migration has started on are skipped: their keys are (being)
+        copied to the keys collection and must not be handed out twice.
+        """
+        # The projection is evaluated on the pre-update document: the first
+        # ``quantity`` unused keys there are exactly the ones the pipeline claimed.
+        result = await self._get_products_collection().find_one_and_update(
+            {
+                "_id": self._to_object_id(product_id),
+                "keysMigration": {"$exists": False},
+                "cdKeys": {"$elemMatch": {"isUsed": {"$ne": True}}},
+            },
+            self._build_claim_pipeline(order_id, quantity, datetime.now(timezone.utc)),
+            projection={
+                "_id": 0,
+                "claimed": {"$slice": [
+                    {"$filter": {
+                        "input": "$cdKeys",
+                        "as": "k",
+                        "cond": {"$ne": [{"$ifNull": ["$$k.isUsed", False]}, True]},
+                    }},
+                    quantity,
+                ]},
+            },
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not result:
+            return []
+        key_metrics_cache.invalidate()
+        return [k["key"] for k in result.get("claimed") or []]
+
+
+key_reservation_service = KeyReservationService()
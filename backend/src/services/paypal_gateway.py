@@ -0,0 +1,244 @@
+"""
+Shared PayPal REST gateway.
+
+All PayPal calls go through one ``PayPalGateway``: a single pooled ``httpx.AsyncClient``
+(keep-alive connections are reused across checkouts), an OAuth access token that is
+fetched once and reused until shortly before it expires, and a semaphore that bounds
+how many PayPal requests are in flight. Per-operation latency is kept for
+/api/health/detailed.
+
+PAYPAL_API_BASE_URL points the gateway at another host, e.g. the local stand-in in
+benchmarks/paypal_standin.py for offline checkout testing.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PAYPAL_LIVE_URL = "https://api-m.paypal.com"
+PAYPAL_SANDBOX_URL = "https://api-m.sandbox.paypal.com"
+
+
+class PayPalError(Exception):
+    """PayPal rejected the request or could not be reached."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, name: Optional[str] = None,
+                 details: Any = None):
+        self.status_code = status_code
+        self.name = name
+        self.details = details
+        super().__init__(f"{name}: {message}" if name else message)
+
+
+class PayPalBusyError(PayPalError):
+    """Too many PayPal calls already in flight; nothing was sent to PayPal."""
+
+
+class PayPalAuthError(PayPalError):
+    """The merchant credentials or access token were rejected; says nothing about the payment."""
+
+
+class PayPalUnavailableError(PayPalError):
+    """
+    PayPal could not be reached or did not answer (timeout, connection error). The
+    request may still have been applied, so callers retry it rather than undo it.
+    """
+
+
+class _OperationMetrics:
+    def __init__(self, samples: int = 500):
+        self.count = 0
+        self.errors = 0
+        self.max = 0.0
+        self._recent = deque(maxlen=samples)
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.max = max(self.max, elapsed)
+        self._recent.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        recent = sorted(self._recent)
+
+        def pct(p):
+            return round(recent[min(int(len(recent) * p), len(recent) - 1)] * 1000, 2) if recent else 0.0
+
+        return {"count": self.count, "errors": self.errors, "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+                "max_ms": round(self.max * 1000, 2)}
+
+
+class PayPalGateway:
+    def __init__(self, client_id: str, client_secret: str, base_url: str, max_concurrency: int = 20,
+                 timeout: float = 30.0, queue_timeout: float = 10.0):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+        self.token_fetches = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self._metrics: Dict[str, _OperationMetrics] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+        return self._client
+
+    def _metric(self, operation: str) -> _OperationMetrics:
+        if operation not in self._metrics:
+            self._metrics[operation] = _OperationMetrics()
+        return self._metrics[operation]
+
+    @staticmethod
+    def _error_from_response(response: httpx.Response, error_class: type = PayPalError) -> PayPalError:
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        name = payload.get("name") or payload.get("error")
+        message = payload.get("message") or payload.get("error_description") or response.text[:200]
+        return error_class(message, status_code=response.status_code, name=name, details=payload.get("details"))
+
+    async def _access_token(self) -> str:
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            started = time.perf_counter()
+            try:
+                response = await self._get_client().post(
+                    "/v1/oauth2/token",
+                    data={"grant_type": "client_credentials"},
+                    auth=(self.client_id or "", self.client_secret or ""),
+                )
+            except httpx.HTTPError as e:
+                self._metric("oauth_token").record(time.perf_counter() - started, False)
+                raise PayPalUnavailableError(f"PayPal token request failed: {e}")
+            self._metric("oauth_token").record(time.perf_counter() - started, response.is_success)
+            if not response.is_success:
+                error_class = PayPalUnavailableError if response.status_code >= 500 else PayPalAuthError
+                raise self._error_from_response(response, error_class)
+            payload = response.json()
+            self.token_fetches += 1
+            self._token = payload["access_token"]
+            # Renew a minute early so a token never expires between check and use
+            self._token_expires_at = time.monotonic() + max(float(payload.get("expires_in", 0)) - 60, 0)
+            return self._token
+
+    async def _request(self, operation: str, method: str, path: str, json: Optional[dict] = None,
+                       headers: Optional[dict] = None) -> Dict[str, Any]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PayPalBusyError("Too many concurrent PayPal requests", status_code=503)
+        self.in_flight += 1
+        started = time.perf_counter()
+        ok = False
+        try:
+            for attempt in range(2):
+                token = await self._access_token()
+                request_headers = {"Authorization": f"Bearer {token}", "Prefer": "return=representation"}
+                request_headers.update(headers or {})
+                try:
+                    response = await self._get_client().request(method, path, json=json, headers=request_headers)
+                except httpx.HTTPError as e:
+                    raise PayPalUnavailableError(f"PayPal request failed: {e}")
+                if response.status_code == 401:
+                    self._token = None
+                    if attempt == 0:
+                        # Token revoked or expired early: fetch a new one and retry once
+                        continue
+                    raise PayPalAuthError("PayPal rejected a freshly issued access token", status_code=401)
+                if not response.is_success:
+                    raise self._error_from_response(response)
+                ok = True
+                return response.json()
+        finally:
+            self._metric(operation).record(time.perf_counter() - started, ok)
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def create_order(self, order_body: dict) -> Dict[str, Any]:
+        return await self._request("create_order", "POST", "/v2/checkout/orders", json=order_body)
+
+    async def capture_order(self, order_id: str) -> Dict[str, Any]:
+        # The request id makes a retried capture idempotent on PayPal's side
+        return await self._request(
+            "capture_order", "POST", f"/v2/checkout/orders/{order_id}/capture", json={},
+            headers={"PayPal-Request-Id": f"capture-{order_id}"},
+        )
+
+    @staticmethod
+    def is_capture_declined(error: PayPalError) -> bool:
+        """
+        True for order-level capture rejections (e.g. 422 INSTRUMENT_DECLINED or
+        ORDER_NOT_APPROVED, 404 unknown order): the payment will not go through.
+        """
+        if isinstance(error, (PayPalAuthError, PayPalUnavailableError)) or error.status_code not in (404, 422):
+            return False
+        issues = {detail.get("issue") for detail in error.details or [] if isinstance(detail, dict)}
+        return "ORDER_ALREADY_CAPTURED" not in issues
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "token_fetches": self.token_fetches,
+            "token_valid": bool(self._token and time.monotonic() < self._token_expires_at),
+            "operations": {name: metrics.stats() for name, metrics in self._metrics.items()},
+        }
+
+
+def _create_gateway() -> PayPalGateway:
+    mode = os.getenv("PAYPAL_MODE", "sandbox").lower()
+    if mode == "live":
+        client_id, client_secret = os.getenv("PAYPAL_LIVE_CLIENT_ID"), os.getenv("PAYPAL_LIVE_CLIENT_SECRET")
+        default_url = PAYPAL_LIVE_URL
+    else:
+        client_id, client_secret = os.getenv("PAYPAL_CLIENT_ID"), os.getenv("PAYPAL_CLIENT_SECRET")
+        default_url = PAYPAL_SANDBOX_URL
+    return PayPalGateway(
+        client_id=client_id,
+        client_secret=client_secret,
+        base_url=os.getenv("PAYPAL_API_BASE_URL") or default_url,
+        max_concurrency=int(os.getenv("PAYPAL_MAX_CONCURRENCY", "20")),
+        timeout=float(os.getenv("PAYPAL_TIMEOUT_SECONDS", "30")),
+        queue_timeout=float(os.getenv("PAYPAL_QUEUE_TIMEOUT_SECONDS", "10")),
+    )
+
+
+paypal_gateway = _create_gateway()
@@ -0,0 +1,229 @@
+"""
+Materialized daily sales rollups.
+
+``sales_daily_rollups`` holds one document per UTC day (``_id`` "YYYY-MM-DD") plus an
+all-time document (``_id`` "all"), each with order count and revenue per order status:
+
+    {"_id": "2025-06-01", "day": datetime, "statuses": {"completed": {"orders": 3, "revenue": 59.7}}}
+
+Order transitions apply their delta through ``record_order_change`` (one ``$inc`` per
+affected day), so the admin dashboard reads at most a month of small documents instead
+of every order. ``reconcile`` recomputes the same numbers with one ``$match``/``$group``
+aggregation over the orders collection; it is the first-run backfill and the repair path
+(see src/scripts/reconcile_sales_rollups.py).
+"""
+
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..models.order import normalize_status, StatusEnum
+
+logger = logging.getLogger(__name__)
+
+SALES_ROLLUP_COLLECTION = "sales_daily_rollups"
+ALL_TIME_ID = "all"
+
+# Orders in these statuses are not counted as sales
+EXCLUDED_STATUSES = {StatusEnum.CANCELLED.value}
+
+
+def _order_datetime(order: Dict[str, Any]) -> Optional[datetime]:
+    value = order.get("createdAt") or order.get("date")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def order_day(order: Dict[str, Any]) -> Optional[str]:
+    """UTC day an order is counted on, or None if it carries no usable date."""
+    created = _order_datetime(order)
+    return created.strftime("%Y-%m-%d") if created else None
+
+
+def _order_total(order: Dict[str, Any]) -> float:
+    try:
+        return round(float(order.get("total") or 0), 2)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _sales(statuses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    orders, revenue = 0, 0.0
+    for status, bucket in (statuses or {}).items():
+        if status in EXCLUDED_STATUSES:
+            continue
+        orders += bucket.get("orders", 0)
+        revenue += bucket.get("revenue", 0.0)
+    return {"orders": orders, "revenue": round(revenue, 2)}
+
+
+class SalesRollupService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db[SALES_ROLLUP_COLLECTION]
+
+    # --- Incremental updates -----------------------------------------------------
+
+    @staticmethod
+    def _add_order(deltas: Dict[str, Dict[str, float]], order: Optional[Dict[str, Any]], sign: int) -> None:
+        if not order:
+            return
+        day = order_day(order)
+        if day is None:
+            return
+        status = normalize_status(order.get("status"))
+        total = _order_total(order)
+        for key in (day, ALL_TIME_ID):
+            delta = deltas.setdefault(key, {})
+            delta[f"statuses.{status}.orders"] = delta.get(f"statuses.{status}.orders", 0) + sign
+            delta[f"statuses.{status}.revenue"] = round(delta.get(f"statuses.{status}.revenue", 0.0) + sign * total, 2)
+
+    async def record_order_change(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """
+        Applies the sales delta of one order transition to the daily and all-time rollups.
+
+        Pass ``before=None`` for a newly created order and ``after=None`` for a deleted one.
+        Errors are logged and left for ``reconcile`` to repair.
+        """
+        deltas: Dict[str, Dict[str, float]] = {}
+        self._add_order(deltas, before, -1)
+        self._add_order(deltas, after, 1)
+
+        now = datetime.now(timezone.utc)
+        for key, delta in deltas.items():
+            increments = {field: value for field, value in delta.items() if value}
+            if not increments:
+                continue
+            update = {"$inc": increments, "$set": {"updatedAt": now}}
+            if key != ALL_TIME_ID:
+                update["$setOnInsert"] = {"day": datetime.strptime(key, "%Y-%m-%d")}
+            try:
+                await self.collection.update_one({"_id": key}, update, upsert=True)
+            except Exception as e:
+                logger.error(f"Sales rollups: failed to apply {increments} to '{key}': {e}")
+
+    # --- Reads -----------------------------------------------------------------------
+
+    async def get_summary(self, days: int = 30) -> Dict[str, Any]:
+        """
+        All-time sales and order count per status, plus one entry per day from ``days`` days
+        ago up to today (UTC), zero-filled, oldest first.
+        """
+        today = datetime.now(timezone.utc).date()
+        first_day = (today - timedelta(days=days)).isoformat()
+        cursor = self.collection.find({"_id": {"$gte": first_day, "$lte": today.isoformat()}})
+        by_day = {doc["_id"]: _sales(doc.get("statuses")) for doc in await cursor.to_list(length=days + 1)}
+
+        all_time = await self.collection.find_one({"_id": ALL_TIME_ID}) or {}
+        totals = _sales(all_time.get("statuses"))
+        daily = []
+        for offset in range(days, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            daily.append({"date": day, **by_day.get(day, {"orders": 0, "revenue": 0.0})})
+        orders_by_status = {
+            status: bucket.get("orders", 0)
+            for status, bucket in (all_time.get("statuses") or {}).items()
+            if bucket.get("orders", 0)
+        }
+        return {
+            "totalOrders": totals["orders"],
+            "totalRevenue": totals["revenue"],
+            "ordersByStatus": orders_by_status,
+            "daily": daily,
+        }
+
+    # --- Reconciliation ----------------------------------------------------------
+
+    async def compute_rollups_from_orders(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Full aggregation of the orders collection into the stored rollup shape.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: rollup _id -> statuses
+        """
+        order_date = {"$convert": {
+            "input": {"$ifNull": ["$createdAt", "$date"]}, "to": "date", "onError": None, "onNull": None,
+        }}
+        pipeline = [
+            {"$project": {"status": 1, "total": 1, "orderDate": order_date}},
+            {"$match": {"orderDate": {"$ne": None}}},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$orderDate", "timezone": "UTC"}},
+                    "status": "$status",
+                },
+                "orders": {"$sum": 1},
+                "revenue": {"$sum": {"$round": [
+                    {"$convert": {"input": "$total", "to": "double", "onError": 0, "onNull": 0}}, 2,
+                ]}},
+            }},
+        ]
+
+        results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        async for group in self.db.orders.aggregate(pipeline, allowDiskUse=True):
+            status = normalize_status(group["_id"].get("status"))
+            for key in (group["_id"]["day"], ALL_TIME_ID):
+                bucket = results.setdefault(key, {}).setdefault(status, {"orders": 0, "revenue": 0.0})
+                bucket["orders"] += group["orders"]
+                bucket["revenue"] = round(bucket["revenue"] + group["revenue"], 2)
+        return results
+
+    @staticmethod
+    def _normalized(statuses: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {
+            status: {"orders": bucket.get("orders", 0), "revenue": round(bucket.get("revenue", 0.0), 2)}
+            for status, bucket in (statuses or {}).items()
+            if bucket.get("orders", 0) or round(bucket.get("revenue", 0.0), 2)
+        }
+
+    async def reconcile(self, repair: bool = True) -> Dict[str, Any]:
+        """
+        Compares the stored rollups with a full aggregation of the orders and, when
+        ``repair`` is set, overwrites every drifted document and removes stale days.
+
+        Returns:
+            Dict[str, Any]: checked, drifted and repaired counts plus the drift per rollup _id
+        """
+        expected = await self.compute_rollups_from_orders()
+        stored = {doc["_id"]: self._normalized(doc.get("statuses")) async for doc in self.collection.find({})}
+
+        drift = {}
+        for key in set(expected) | set(stored):
+            want = self._normalized(expected.get(key, {}))
+            have = stored.get(key, {})
+            if want != have:
+                drift[key] = {"stored": have, "expected": want}
+
+        repaired = 0
+        if repair:
+            now = datetime.now(timezone.utc)
+            for key, entry in drift.items():
+                if not entry["expected"] and key != ALL_TIME_ID:
+                    await self.collection.delete_one({"_id": key})
+                else:
+                    document = {"statuses": entry["expected"], "updatedAt": now}
+                    if key != ALL_TIME_ID:
+                        document["day"] = datetime.strptime(key, "%Y-%m-%d")
+                    await self.collection.replace_one({"_id": key}, document, upsert=True)
+                repaired += 1
+
+        return {"checked": len(set(expected) | set(stored)), "drifted": len(drift), "repaired": repaired, "drift": drift}
+
+
+async def ensure_sales_rollups(db: AsyncIOMotorDatabase) -> None:
+    """Backfills the rollups from the orders on first run (no all-time document yet)."""
+    service = SalesRollupService(db)
+    if await service.collection.find_one({"_id": ALL_TIME_ID}, {"_id": 1}):
+        return
+    report = await service.reconcile(repair=True)
+    logger.info(f"Sales rollups backfilled: {report['repaired']} documents")
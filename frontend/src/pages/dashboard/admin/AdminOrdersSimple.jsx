@@ -31,6 +31,7 @@ import {
   ListItemText, // Added
   InputAdornment, // For icons in select
   Chip, // Added Chip import
+  TextField,
 } from '@mui/material';
 import { 
   Edit as EditIcon, 
@@ -39,14 +40,15 @@ import {
   Delete as DeleteIcon, 
   Close as CloseIcon,
   AssessmentOutlined as AssessmentOutlinedIcon, // For Analytics Title
-  PeopleAltOutlined as PeopleAltOutlinedIcon, // For Unique Customers
+  ReceiptLongOutlined as ReceiptLongOutlinedIcon, // For Average Order Value
   AttachMoneyOutlined as AttachMoneyOutlinedIcon, // For Revenue
-  ShoppingCartOutlined as ShoppingCartOutlinedIcon, // For Units Sold
   FilterList as FilterListIcon, // For Filter section
   InfoOutlined as InfoOutlinedIcon, // For info icons or tooltips
   ErrorOutline as ErrorOutlineIcon, // For error messages
   CheckCircleOutline as CheckCircleOutlineIcon, // For success messages
   BarChart as BarChartIcon, // For status breakdown icon
+  NavigateBefore as NavigateBeforeIcon,
+  NavigateNext as NavigateNextIcon,
 } from '@mui/icons-material'; // Added CloseIcon
 import { useTranslation } from 'react-i18next'; // For i18n
 
@@ -54,6 +56,25 @@ import { apiService } from '../../../lib/apiService'; // Adjusted path
 import OrderForm from '../../../components/admin/OrderForm'; // Adjusted path
 import { useGlobalProvider } from '../../../context/GlobalProvider'; // For notifications
 
+const ORDERS_PAGE_SIZE = 50;
+const EMPTY_ORDER_FILTERS = { status: 'all', coupon: '', email: '', createdFrom: '', createdTo: '' };
+
+// Query params of GET /api/orders for one page; the date inputs are whole UTC days, created_to is exclusive
+const buildOrderQuery = (filters, cursor) => {
+  const params = { limit: ORDERS_PAGE_SIZE };
+  if (cursor) params.cursor = cursor;
+  if (filters.status !== 'all') params.status = filters.status;
+  if (filters.coupon.trim()) params.coupon = filters.coupon.trim();
+  if (filters.email.trim()) params.email = filters.email.trim();
+  if (filters.createdFrom) params.created_from = `${filters.createdFrom}T00:00:00Z`;
+  if (filters.createdTo) {
+    const end = new Date(`${filters.createdTo}T00:00:00Z`);
+    end.setUTCDate(end.getUTCDate() + 1);
+    params.created_to = end.toISOString();
+  }
+  return params;
+};
+
 function AdminOrdersSimple() {
   const { t } = useTranslation();
   const { notify, token } = useGlobalProvider(); // Added token
@@ -65,7 +86,11 @@ function AdminOrdersSimple() {
   const [showOrderForm, setShowOrderForm] = useState(false);
   const [editingOrder, setEditingOrder] = useState(null);
   const [selectedOrderDetails, setSelectedOrderDetails] = useState(null); 
-  const [orderStatusFilter, setOrderStatusFilter] = useState('all');
+  const [filterDraft, setFilterDraft] = useState(EMPTY_ORDER_FILTERS);
+  const [orderFilters, setOrderFilters] = useState(EMPTY_ORDER_FILTERS);
+  // Cursors of the pages visited so far; the last one is the current page (null = first page)
+  const [pageCursors, setPageCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const [products, setProducts] = useState([]);
   const [loadingProducts, setLoadingProducts] = useState(false);
@@ -79,28 +104,6 @@ function AdminOrdersSimple() {
   const [analyticsData, setAnalyticsData] = useState(null); 
   const [showStatusBreakdownModal, setShowStatusBreakdownModal] = useState(false); // State for status breakdown modal
 
-  // State for analytics detail modal
-  const [showAnalyticsDetailModal, setShowAnalyticsDetailModal] = useState(false);
-  const [analyticsDetailTitle, setAnalyticsDetailTitle] = useState('');
-  const [analyticsDetailData, setAnalyticsDetailData] = useState(null);
-  const [analyticsDetailType, setAnalyticsDetailType] = useState(''); // 'customers' or 'products'
-  // State for revenue breakdown modal (placeholder for now)
-  // Removed unused: showRevenueBreakdownModal, revenueBreakdownType, handleCloseRevenueBreakdownModal
-
-
-  const handleOpenAnalyticsDetailModal = (title, data, type) => {
-    setAnalyticsDetailTitle(title);
-    setAnalyticsDetailData(data);
-    setAnalyticsDetailType(type);
-    setShowAnalyticsDetailModal(true);
-  };
-
-  const handleCloseAnalyticsDetailModal = () => {
-    setShowAnalyticsDetailModal(false);
-    setAnalyticsDetailTitle('');
-    setAnalyticsDetailData(null);
-    setAnalyticsDetailType('');  };
-  
   const handleOpenRevenueBreakdownModal = (type) => {
     // For now, using notify as a placeholder for the actual modal.
     // The modal UI can be implemented in a subsequent step.
@@ -134,7 +137,7 @@ function AdminOrdersSimple() {
       }
       
       // Refresh orders after successful update
-      await refreshOrders();
+      await refreshOrdersAndAnalytics();
       
       notify({
         message: `Order status updated to ${newStatus}`,
@@ -151,75 +154,30 @@ function AdminOrdersSimple() {
     }
   };
 
-  const calculateAnalytics = useCallback((ordersData) => {
-    if (!ordersData || ordersData.length === 0) {
-      return null;
-    }
-
-    const statusCounts = {
-      Pending: 0,
-      Processing: 0,
-      Completed: 0,
-      Cancelled: 0,
-      Total: ordersData.length,
-    };
-    let totalOriginalAmount = 0;
-    let totalFinalAmount = 0;
-    const customerOrders = {};
-    const productStats = {};
-    let totalProductsSoldCount = 0;
-
-    ordersData.forEach(order => {
-      statusCounts[order.status] = (statusCounts[order.status] || 0) + 1;
-
-      if (order.status !== 'Cancelled') {
-        totalOriginalAmount += order.original_total || order.total || 0;
-        totalFinalAmount += order.total || 0;
-
-        const customerIdentifier = order.user_id || order.email || order.customerName;
-        if (customerIdentifier) {
-          if (!customerOrders[customerIdentifier]) {
-            customerOrders[customerIdentifier] = { count: 0, totalValue: 0, name: order.customerName || order.email };
-          }
-          customerOrders[customerIdentifier].count += 1;
-          customerOrders[customerIdentifier].totalValue += order.total || 0;
-        }
+  const currentCursor = pageCursors[pageCursors.length - 1];
 
-        order.items.forEach(item => {
-          totalProductsSoldCount += item.quantity;
-          const productName = item.name || `Product ID: ${item.productId}`;
-          if (!productStats[productName]) {
-            productStats[productName] = { count: 0, quantity: 0, productId: item.productId };
-          }
-          productStats[productName].count += 1; // Number of times this product appears in orders
-          productStats[productName].quantity += item.quantity; // Total quantity sold of this product
+  // Totals come from the server-side sales rollups, not from the loaded page of orders
+  const loadAnalytics = useCallback(async () => {
+    try {
+      const response = await apiService.get('/admin/analytics');
+      if (response.data) {
+        const ordersByStatus = response.data.ordersByStatus || {};
+        setAnalyticsData({
+          totalSales: response.data.totalSales || 0,
+          averageOrderValue: response.data.averageOrderValue || 0,
+          statusCounts: {
+            ...ordersByStatus,
+            Total: Object.values(ordersByStatus).reduce((sum, count) => sum + count, 0),
+          },
         });
+      } else {
+        setAnalyticsData(null);
       }
-    });
-
-    const uniqueCustomersCount = Object.keys(customerOrders).length;
-    const uniqueProductsOrdered = Object.keys(productStats).length;
-
-    return {
-      statusCounts,
-      totalOriginalAmount,
-      totalFinalAmount,
-      customerOrders, // Detailed per customer
-      uniqueCustomersCount,
-      productStats, // Detailed per product
-      uniqueProductsOrdered,
-      totalProductsSoldCount,
-    };
-  }, []);
-
-  useEffect(() => {
-    if (orders && orders.length > 0) {
-      const data = calculateAnalytics(orders);
-      setAnalyticsData(data);
-    } else {
-      setAnalyticsData(null); // Ensure analytics data is cleared if orders are empty
+    } catch (err) {
+      console.error('Error loading order analytics:', err);
+      setAnalyticsData(null);
     }
-  }, [orders, calculateAnalytics]);
+  }, []);
 
   const loadProducts = useCallback(async () => {
     setLoadingProducts(true);
@@ -258,17 +216,18 @@ function AdminOrdersSimple() {
       setOrderError(t('admin.orders.loadErrorNotAuthenticated', 'Not authenticated. Please log in.'));
       setLoadingOrders(false);
       setOrders([]); 
-      setAnalyticsData(null); // Clear analytics data as well
+      setNextCursor(null);
       return;
     }
 
     setLoadingOrders(true);
     setOrderError(null);
     try {
-       const response = await apiService.get('/api/orders');
+      // One keyset page (newest first) with the filters applied server-side
+      const response = await apiService.get('/api/orders', buildOrderQuery(orderFilters, currentCursor));
       if (response.data) {
-        setOrders(response.data);
-        // Analytics will be recalculated by useEffect watching 'orders'
+        setOrders(response.data.orders);
+        setNextCursor(response.data.next_cursor);
       } else {
         setOrderError(response.error || t('admin.orders.loadError', 'Failed to load orders.'));
         notify({ message: t('admin.orders.loadError', 'Failed to load orders.'), type: 'error' });
@@ -281,20 +240,60 @@ function AdminOrdersSimple() {
     } finally {
       setLoadingOrders(false);
     }
-  }, [notify, t, token]); // Added token to dependency array
+  }, [notify, t, token, orderFilters, currentCursor]); // Added token to dependency array
+
+  // Reloads the current page and the rollup totals after an order was changed
+  const refreshOrdersAndAnalytics = useCallback(
+    () => Promise.all([refreshOrders(), loadAnalytics()]),
+    [refreshOrders, loadAnalytics]
+  );
 
   useEffect(() => {
     if (token) { 
-      refreshOrders();
+      loadAnalytics();
       loadProducts();
       loadUsers();
+    } else {
+      setAnalyticsData(null);
+    }
+  }, [loadAnalytics, loadProducts, loadUsers, token]);
+
+  useEffect(() => {
+    if (token) { 
+      refreshOrders();
     } else {
       setLoadingOrders(false);
       setOrders([]);
-      setAnalyticsData(null);
+      setNextCursor(null);
       setOrderError(t('admin.orders.loadErrorNotAuthenticated', 'Not authenticated. Please log in.'));
     }
-  }, [refreshOrders, loadProducts, loadUsers, token, t]); // Added t to dependency array
+  }, [refreshOrders, token, t]); // Added t to dependency array
+
+  const applyOrderFilters = (filters) => {
+    setOrderFilters(filters);
+    setPageCursors([null]); // Back to the first page
+  };
+
+  const handleOrderStatusFilterChange = (status) => {
+    const filters = { ...filterDraft, status };
+    setFilterDraft(filters);
+    applyOrderFilters(filters);
+  };
+
+  const handleClearOrderFilters = () => {
+    setFilterDraft(EMPTY_ORDER_FILTERS);
+    applyOrderFilters(EMPTY_ORDER_FILTERS);
+  };
+
+  const handleNextPage = () => {
+    if (nextCursor) {
+      setPageCursors((cursors) => [...cursors, nextCursor]);
+    }
+  };
+
+  const handlePreviousPage = () => {
+    setPageCursors((cursors) => (cursors.length > 1 ? cursors.slice(0, -1) : cursors));
+  };
 
   const handleCreateNewOrder = () => {
     setEditingOrder(null);
@@ -324,7 +323,7 @@ function AdminOrdersSimple() {
     try {
       await apiService.delete(`/api/orders/${orderToDelete._id}`);
       notify({ message: t('admin.orders.deletedSuccess', 'Order deleted successfully!'), type: 'success', icon: <CheckCircleOutlineIcon /> });
-      await refreshOrders();
+      await refreshOrdersAndAnalytics();
       handleCloseDeleteDialog();
     } catch (error) {
       console.error('Error deleting order:', error);
@@ -354,7 +353,7 @@ function AdminOrdersSimple() {
         await apiService.post('/api/orders', payload);
         notify({ message: t('admin.orders.createdSuccess', 'Order created successfully!'), type: 'success', icon: <CheckCircleOutlineIcon /> });
       }
-      await refreshOrders();
+      await refreshOrdersAndAnalytics();
       setShowOrderForm(false);
       setEditingOrder(null);
     } catch (error) {
@@ -367,10 +366,6 @@ function AdminOrdersSimple() {
     }
   };
 
-  const filteredOrders = orders.filter(order => 
-    orderStatusFilter === 'all' ? true : order.status === orderStatusFilter
-  );
-
   // --- Refresh Awaiting Stock Orders ---
   const handleRefreshAwaitingStock = async () => {
     try {
@@ -380,7 +375,7 @@ function AdminOrdersSimple() {
         notify({ message: t('admin.orders.refreshAwaitingStockError', 'Failed to refresh awaiting stock orders.'), type: 'error' });
       } else {
         notify({ message: t('admin.orders.refreshAwaitingStockSuccess', 'Awaiting stock orders refreshed!'), type: 'success' });
-        await refreshOrders();
+        await refreshOrdersAndAnalytics();
       }
     } catch (err) {
       notify({ message: t('admin.orders.refreshAwaitingStockError', 'Failed to refresh awaiting stock orders.'), type: 'error' });
@@ -428,7 +423,7 @@ function AdminOrdersSimple() {
       </Paper>
 
       {/* Order Analytics Section */}
-      {analyticsData && !loadingOrders && (
+      {analyticsData && (
         <Paper elevation={3} sx={{ p: 2, mb: 3, borderRadius: 2 }}>
           <Typography variant="h5" gutterBottom sx={{ mb: 2, display: 'flex', alignItems: 'center', color: 'text.primary' }}>
             <AssessmentOutlinedIcon sx={{ mr: 1, color: 'primary.main' }} /> {t('admin.orders.analyticsTitle', 'Order Analytics')}
@@ -451,41 +446,8 @@ function AdminOrdersSimple() {
               </Card>
             </Grid>
 
-            {/* Unique Customers Card - Clickable */}
-            <Grid item xs={12} sm={6} md={4}> {/* Adjusted grid size to md={4} */}
-              <Card 
-                onClick={() => analyticsData.customerOrders && handleOpenAnalyticsDetailModal(t('admin.analytics.customerOrderDetailsTitle', 'Customer Order Details'), analyticsData.customerOrders, 'customers')}
-                sx={{ cursor: 'pointer', '&:hover': { boxShadow: 8, transform: 'translateY(-2px)' }, transition: '0.2s', height: '100%', borderRadius: 2, display: 'flex', flexDirection: 'column' }}
-              >
-                <CardContent sx={{ flexGrow: 1, display: 'flex', flexDirection: 'column', justifyContent: 'space-between', alignItems: 'center', textAlign: 'center' }}>
-                  <PeopleAltOutlinedIcon sx={{ fontSize: 40, color: 'secondary.main', mb: 1 }} />
-                  <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.uniqueCustomers', 'Unique Customers')}</Typography>
-                  <Typography variant="h3" sx={{ fontWeight: 'bold', color: 'secondary.dark', mb: 0.5 }}>{analyticsData.uniqueCustomersCount}</Typography>
-                  {/* Button removed, card is now clickable */}
-                  <Typography variant="caption" sx={{ mt: 0, display: 'block', lineHeight: 'normal' }}>{t('admin.analytics.withNonCancelledOrders', '(non-cancelled orders)')}</Typography>
-                </CardContent>
-              </Card>
-            </Grid>
-            
-            {/* Total Revenue (Original) Card - Clickable */}
+            {/* Total Revenue Card - Clickable */}
             <Grid item xs={12} sm={6} md={4}> {/* Adjusted grid size to md={4} */}
-              <Card 
-                onClick={() => analyticsData && handleOpenRevenueBreakdownModal('original')}
-                sx={{ cursor: 'pointer', '&:hover': { boxShadow: 8, transform: 'translateY(-2px)' }, transition: '0.2s', height: '100%', borderRadius: 2, display: 'flex', flexDirection: 'column', backgroundColor: 'warning.lightest' }}
-              >
-                <CardContent sx={{ flexGrow: 1, display: 'flex', flexDirection: 'column', justifyContent: 'space-between', alignItems: 'center', textAlign: 'center' }}>
-                  <AttachMoneyOutlinedIcon sx={{ fontSize: 40, color: 'warning.main', mb: 1 }} />
-                  <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.totalRevenueOriginal', 'Total Revenue (Original)')}</Typography>
-                  <Typography variant="h4" sx={{ fontWeight: 'bold', color: 'warning.dark', mb: 0.5 }}>
-                    ₪{analyticsData.totalOriginalAmount.toFixed(2)}
-                  </Typography>
-                  <Typography variant="caption" sx={{ mt: 0, display: 'block', lineHeight: 'normal' }}>{t('admin.analytics.excludingCancelled', '(Excluding Cancelled)')}</Typography>
-                </CardContent>
-              </Card>
-            </Grid>
-
-            {/* Total Revenue (Final) Card - Clickable */}
-            <Grid item xs={12} sm={6} md={6}> {/* Adjusted grid size to md={6} */}
               <Card 
                 onClick={() => analyticsData && handleOpenRevenueBreakdownModal('final')}
                 sx={{ cursor: 'pointer', '&:hover': { boxShadow: 8, transform: 'translateY(-2px)' }, transition: '0.2s', height: '100%', borderRadius: 2, display: 'flex', flexDirection: 'column', backgroundColor: 'success.lightest' }}
@@ -494,65 +456,105 @@ function AdminOrdersSimple() {
                   <AttachMoneyOutlinedIcon sx={{ fontSize: 40, color: 'success.main', mb: 1 }} />
                   <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.totalRevenueFinal', 'Total Revenue (Final)')}</Typography>
                   <Typography variant="h4" sx={{ fontWeight: 'bold', color: 'success.dark', mb: 0.5 }}>
-                    ₪{analyticsData.totalFinalAmount.toFixed(2)}
+                    ₪{analyticsData.totalSales.toFixed(2)}
                   </Typography>
                   <Typography variant="caption" sx={{ mt: 0, display: 'block', lineHeight: 'normal' }}>{t('admin.analytics.excludingCancelled', '(Excluding Cancelled)')}</Typography>
                 </CardContent>
               </Card>
             </Grid>
 
-            {/* Total Units Sold Card */}
-            <Grid item xs={12} sm={6} md={6}> {/* Adjusted grid size to md={6} */}
+            {/* Average Order Value Card */}
+            <Grid item xs={12} sm={6} md={4}> {/* Adjusted grid size to md={4} */}
               <Card sx={{ height: '100%', borderRadius: 2, display: 'flex', flexDirection: 'column', backgroundColor: 'info.lightest' }}>
                 <CardContent sx={{ flexGrow: 1, display: 'flex', flexDirection: 'column', justifyContent: 'space-between', alignItems: 'center', textAlign: 'center' }}>
-                  <ShoppingCartOutlinedIcon sx={{ fontSize: 40, color: 'info.main', mb: 1 }} />
-                  <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.totalUnitsSold', 'Total Units Sold')}</Typography>
-                  <Typography variant="h3" sx={{ fontWeight: 'bold', color: 'info.dark', mb: 0.5 }}>{analyticsData.totalProductsSoldCount}</Typography>
-                  <Typography variant="caption" sx={{ mt: 0, display: 'block', lineHeight: 'normal' }}>{t('admin.analytics.inNonCancelledOrders', '(non-cancelled orders)')}</Typography>
-                </CardContent>
-              </Card>
-            </Grid>
-            
-            {/* Unique Products Ordered Card - Can be added if space allows or combined */}
-            {/* 
-            <Grid item xs={12} sm={6} md={3}>
-              <Card sx={{ cursor: 'pointer', '&:hover': { boxShadow: 8, transform: 'translateY(-2px)' }, transition: '0.2s', height: '100%', borderRadius: 2, display: 'flex', flexDirection: 'column' }}>
-                <CardContent sx={{ flexGrow: 1, display: 'flex', flexDirection: 'column', justifyContent: 'space-between', alignItems: 'center', textAlign: 'center' }}>
-                  <CategoryOutlinedIcon sx={{ fontSize: 40, color: 'warning.main', mb: 1 }} />
-                  <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.uniqueProductsOrdered', 'Unique Products')}</Typography>
-                  <Typography variant="h3" sx={{ fontWeight: 'bold', color: 'warning.dark' }}>{analyticsData.uniqueProductsOrdered}</Typography>
-                  <Button size="small" onClick={() => analyticsData.productStats && handleOpenAnalyticsDetailModal(t('admin.analytics.productOrderDetailsTitle', 'Product Order Details'), analyticsData.productStats, 'products')} sx={{ mt: 1 }}>{t('admin.analytics.viewDetails', 'View Details')}</Button>
-                  <Typography variant="caption" sx={{ mt: 0.5 }}>{t('admin.analytics.inNonCancelledOrders', '(non-cancelled orders)')}</Typography>
+                  <ReceiptLongOutlinedIcon sx={{ fontSize: 40, color: 'info.main', mb: 1 }} />
+                  <Typography variant="h6" sx={{ fontWeight: 'medium' }}>{t('admin.analytics.averageOrderValue', 'Average Order Value')}</Typography>
+                  <Typography variant="h4" sx={{ fontWeight: 'bold', color: 'info.dark', mb: 0.5 }}>
+                    ₪{analyticsData.averageOrderValue.toFixed(2)}
+                  </Typography>
+                  <Typography variant="caption" sx={{ mt: 0, display: 'block', lineHeight: 'normal' }}>{t('admin.analytics.excludingCancelled', '(Excluding Cancelled)')}</Typography>
                 </CardContent>
               </Card>
             </Grid>
-            */}
           </Grid>
         </Paper>
       )}
 
-      {/* Status Filter Dropdown */}
+      {/* Order Filters (applied server-side) */}
       <Paper elevation={3} sx={{ p: 2, mt: 2, mb: 2, borderRadius: 2 }}>
-        <FormControl fullWidth variant="outlined"> {/* Changed to outlined */}
-          <InputLabel id="order-status-filter-label">{t('admin.filterByStatus', 'Filter by Status')}</InputLabel>
-          <Select
-            labelId="order-status-filter-label"
-            value={orderStatusFilter}
-            label={t('admin.filterByStatus', 'Filter by Status')}
-            onChange={(e) => setOrderStatusFilter(e.target.value)}
-            startAdornment={
-              <InputAdornment position="start">
-                <FilterListIcon />
-              </InputAdornment>
-            }
-          >
-            <MenuItem value="all">{t('admin.statusAll', 'All')}</MenuItem>
-            <MenuItem value="Pending">{t('admin.statusPending', 'Pending')}</MenuItem>
-            <MenuItem value="Processing">{t('admin.statusProcessing', 'Processing')}</MenuItem>
-            <MenuItem value="Completed">{t('admin.statusCompleted', 'Completed')}</MenuItem>
-            <MenuItem value="Cancelled">{t('admin.statusCancelled', 'Cancelled')}</MenuItem>
-          </Select>
-        </FormControl>
+        <Grid container spacing={2} alignItems="center">
+          <Grid item xs={12} md={3}>
+            <FormControl fullWidth variant="outlined"> {/* Changed to outlined */}
+              <InputLabel id="order-status-filter-label">{t('admin.filterByStatus', 'Filter by Status')}</InputLabel>
+              <Select
+                labelId="order-status-filter-label"
+                value={filterDraft.status}
+                label={t('admin.filterByStatus', 'Filter by Status')}
+                onChange={(e) => handleOrderStatusFilterChange(e.target.value)}
+                startAdornment={
+                  <InputAdornment position="start">
+                    <FilterListIcon />
+                  </InputAdornment>
+                }
+              >
+                <MenuItem value="all">{t('admin.statusAll', 'All')}</MenuItem>
+                <MenuItem value="pending">{t('admin.statusPending', 'Pending')}</MenuItem>
+                <MenuItem value="processing">{t('admin.statusProcessing', 'Processing')}</MenuItem>
+                <MenuItem value="completed">{t('admin.statusCompleted', 'Completed')}</MenuItem>
+                <MenuItem value="awaiting_stock">{t('admin.statusAwaitingStock', 'Awaiting Stock')}</MenuItem>
+                <MenuItem value="partially_fulfilled">{t('admin.statusPartiallyFulfilled', 'Partially Fulfilled')}</MenuItem>
+                <MenuItem value="failed">{t('admin.statusFailed', 'Failed')}</MenuItem>
+                <MenuItem value="cancelled">{t('admin.statusCancelled', 'Cancelled')}</MenuItem>
+              </Select>
+            </FormControl>
+          </Grid>
+          <Grid item xs={12} sm={6} md={2}>
+            <TextField
+              fullWidth
+              label={t('admin.orders.filterCoupon', 'Coupon Code')}
+              value={filterDraft.coupon}
+              onChange={(e) => setFilterDraft({ ...filterDraft, coupon: e.target.value })}
+              onKeyDown={(e) => e.key === 'Enter' && applyOrderFilters(filterDraft)}
+            />
+          </Grid>
+          <Grid item xs={12} sm={6} md={3}>
+            <TextField
+              fullWidth
+              label={t('admin.orders.filterEmail', 'Customer Email')}
+              value={filterDraft.email}
+              onChange={(e) => setFilterDraft({ ...filterDraft, email: e.target.value })}
+              onKeyDown={(e) => e.key === 'Enter' && applyOrderFilters(filterDraft)}
+            />
+          </Grid>
+          <Grid item xs={6} md={2}>
+            <TextField
+              fullWidth
+              type="date"
+              label={t('admin.orders.filterFrom', 'From')}
+              InputLabelProps={{ shrink: true }}
+              value={filterDraft.createdFrom}
+              onChange={(e) => setFilterDraft({ ...filterDraft, createdFrom: e.target.value })}
+            />
+          </Grid>
+          <Grid item xs={6} md={2}>
+            <TextField
+              fullWidth
+              type="date"
+              label={t('admin.orders.filterTo', 'To')}
+              InputLabelProps={{ shrink: true }}
+              value={filterDraft.createdTo}
+              onChange={(e) => setFilterDraft({ ...filterDraft, createdTo: e.target.value })}
+            />
+          </Grid>
+          <Grid item xs={12} sx={{ display: 'flex', justifyContent: 'flex-end', gap: 1 }}>
+            <Button variant="outlined" color="secondary" onClick={handleClearOrderFilters} disabled={loadingOrders}>
+              {t('admin.orders.clearFilters', 'Clear')}
+            </Button>
+            <Button variant="contained" onClick={() => applyOrderFilters(filterDraft)} disabled={loadingOrders}>
+              {t('admin.orders.applyFilters', 'Apply Filters')}
+            </Button>
+          </Grid>
+        </Grid>
       </Paper>
 
       {/* Refresh Awaiting Stock Orders Button */}
@@ -579,12 +581,12 @@ function AdminOrdersSimple() {
         </Alert>
       )}
       
-      {!loadingOrders && !orderError && filteredOrders.length === 0 && (
+      {!loadingOrders && !orderError && orders.length === 0 && (
          <Paper elevation={1} sx={{ p: 3, textAlign: 'center', mt: 3, borderRadius: 2, backgroundColor: 'grey.100' }}>
             <InfoOutlinedIcon sx={{ fontSize: 48, color: 'grey.500', mb: 1 }} />
             <Typography variant="h6" sx={{ color: 'grey.700' }}>{t('admin.noOrdersFound', 'No orders found.')}</Typography>
             <Typography variant="body2" sx={{ color: 'grey.600' }}>
-              {orderStatusFilter === 'all' 
+              {JSON.stringify(orderFilters) === JSON.stringify(EMPTY_ORDER_FILTERS)
                 ? t('admin.noOrdersYet', 'There are no orders in the system yet.')
                 : t('admin.noOrdersMatchFilter', 'No orders match the current filter.')}
             </Typography>
@@ -592,7 +594,7 @@ function AdminOrdersSimple() {
       )}
 
       {/* Orders Table */}
-      {!loadingOrders && filteredOrders.length > 0 && (
+      {!loadingOrders && orders.length > 0 && (
         <TableContainer component={Paper} elevation={3} sx={{ borderRadius: 2 }}>
           <Table sx={{ minWidth: 750 }} aria-label="simple table">
             <TableHead sx={{ backgroundColor: (theme) => theme.palette.mode === 'dark' ? theme.palette.grey[700] : theme.palette.grey[200]}}>
@@ -610,7 +612,7 @@ function AdminOrdersSimple() {
               </TableRow>
             </TableHead>
             <TableBody>
-              {filteredOrders.map((order, index) => (
+              {orders.map((order, index) => (
                 <TableRow
                   key={order._id}
                   sx={{ 
@@ -685,6 +687,31 @@ function AdminOrdersSimple() {
         </TableContainer>
       )}
 
+      {/* Pagination (keyset cursors from GET /api/orders) */}
+      {!loadingOrders && (pageCursors.length > 1 || nextCursor) && (
+        <Box display="flex" justifyContent="flex-end" alignItems="center" gap={1} mt={2}>
+          <Typography variant="body2" color="text.secondary" sx={{ mr: 1 }}>
+            {t('admin.orders.pageNumber', 'Page {{page}}', { page: pageCursors.length })}
+          </Typography>
+          <Button
+            variant="outlined"
+            startIcon={<NavigateBeforeIcon />}
+            onClick={handlePreviousPage}
+            disabled={pageCursors.length <= 1}
+          >
+            {t('admin.orders.previousPage', 'Previous')}
+          </Button>
+          <Button
+            variant="outlined"
+            endIcon={<NavigateNextIcon />}
+            onClick={handleNextPage}
+            disabled={!nextCursor}
+          >
+            {t('admin.orders.nextPage', 'Next')}
+          </Button>
+        </Box>
+      )}
+
       {/* Order Details Modal (Overlay) - Enhanced */}
       {selectedOrderDetails && (
         <Dialog 
@@ -835,75 +862,6 @@ function AdminOrdersSimple() {
         </DialogActions>
       </Dialog>
 
-      {/* Analytics Detail Modal (for Customers/Products) - Enhanced */}
-      <Dialog open={showAnalyticsDetailModal} onClose={handleCloseAnalyticsDetailModal} maxWidth="md" fullWidth PaperProps={{ sx: { borderRadius: 2 } }}>
-        <DialogTitle sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', borderBottom: (theme) => `1px solid ${theme.palette.divider}` }}>
-          {analyticsDetailTitle}
-          <IconButton
-            aria-label="close"
-            onClick={handleCloseAnalyticsDetailModal}
-            size="small"
-          >
-            <CloseIcon />
-          </IconButton>
-        </DialogTitle>
-        <DialogContent dividers>
-          {analyticsDetailData && analyticsDetailType === 'customers' && (
-            <TableContainer component={Paper} elevation={0} sx={{ maxHeight: 440 }}>
-              <Table stickyHeader aria-label="customer analytics table">
-                <TableHead sx={{ backgroundColor: (theme) => theme.palette.grey[100] }}>
-                  <TableRow>
-                    <TableCell sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.customerName', 'Customer Name/ID')}</TableCell>
-                    <TableCell align="right" sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.orderCount', 'Order Count')}</TableCell>
-                    <TableCell align="right" sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.totalSpent', 'Total Spent')}</TableCell>
-                  </TableRow>
-                </TableHead>
-                <TableBody>
-                  {Object.entries(analyticsDetailData)
-                    .sort(([, a], [, b]) => b.totalValue - a.totalValue) // Sort by total spent
-                    .map(([key, value]) => (
-                    <TableRow hover key={key} sx={{ '&:nth-of-type(odd)': { backgroundColor: (theme) => theme.palette.action.hover }}}>
-                      <TableCell>{value.name}</TableCell>
-                      <TableCell align="right">{value.count}</TableCell>
-                      <TableCell align="right">{`₪${value.totalValue.toFixed(2)}`}</TableCell>
-                    </TableRow>
-                  ))}
-                </TableBody>
-              </Table>
-            </TableContainer>
-          )}
-          {analyticsDetailData && analyticsDetailType === 'products' && (
-            <TableContainer component={Paper} elevation={0} sx={{ maxHeight: 440 }}>
-              <Table stickyHeader aria-label="product analytics table">
-                <TableHead sx={{ backgroundColor: (theme) => theme.palette.grey[100] }}>
-                  <TableRow>
-                    <TableCell sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.productName', 'Product Name')}</TableCell>
-                    <TableCell sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.productId', 'Product ID')}</TableCell>
-                    <TableCell align="right" sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.timesOrdered', 'Times Ordered')}</TableCell>
-                    <TableCell align="right" sx={{ fontWeight: 'bold' }}>{t('admin.analytics.modal.totalQuantitySold', 'Total Quantity Sold')}</TableCell>
-                  </TableRow>
-                </TableHead>
-                <TableBody>
-                  {Object.entries(analyticsDetailData)
-                    .sort(([, a], [, b]) => b.quantity - a.quantity) // Sort by quantity sold
-                    .map(([productName, stats]) => (
-                    <TableRow hover key={productName} sx={{ '&:nth-of-type(odd)': { backgroundColor: (theme) => theme.palette.action.hover }}}>
-                      <TableCell>{productName}</TableCell>
-                      <TableCell>{stats.productId}</TableCell>
-                      <TableCell align="right">{stats.count}</TableCell>
-                      <TableCell align="right">{stats.quantity}</TableCell>
-                    </TableRow>
-                  ))}
-                </TableBody>
-              </Table>
-            </TableContainer>
-          )}
-        </DialogContent>
-        <DialogActions sx={{ borderTop: (theme) => `1px solid ${theme.palette.divider}`, p: 2 }}>
-          <Button onClick={handleCloseAnalyticsDetailModal} variant="outlined">{t('admin.buttons.close', 'Close')}</Button>
-        </DialogActions>
-      </Dialog>
-
       {/* Status Breakdown Modal - Enhanced */}
       <Dialog open={showStatusBreakdownModal} onClose={handleCloseStatusBreakdownModal} maxWidth="xs" fullWidth PaperProps={{ sx: { borderRadius: 2 } }}>
         <DialogTitle sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', borderBottom: (theme) => `1px solid ${theme.palette.divider}` }}>